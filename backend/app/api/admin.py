@@ -1,18 +1,28 @@
 import logging
 import uuid
-import csv
-import io
 import secrets
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Header, Request, UploadFile, File
-from fastapi.responses import StreamingResponse
+from datetime import datetime
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Header, Query, Request, UploadFile, File
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import Integer, select, func, case, delete
+from sqlalchemy import Integer, select, func, delete
 
 from app.database import get_db
 from app.models import Customer, Domain, WidgetConfig, IngestionJob, DocumentChunk, QueryLog, UserProfile, Product, Room
 from app.services.admin_audit import log_admin_action
+from app.services.analytics_rollups import query_stats
+from app.services.answer_cache import invalidate_answers
+from app.services.tenant_context import forget_tenant, invalidate_tenant
+from app.services.export import (
+    ADMIN_QUERY_EXPORT_COLUMNS,
+    LEAD_EXPORT_COLUMNS,
+    LEADS,
+    QUERY_LOGS,
+    ExportRequestError,
+    export_response,
+)
 from app.services.ingestion import get_ingestion_service
+from app.services.ingestion_queue import enqueue_ingestion
 from app.services.vector_store import get_vector_store_service
 from app.config import get_settings
 
@@ -86,8 +96,7 @@ class QABatchJobResult(BaseModel):
 
 class QABatchResponse(BaseModel):
     total: int
-    succeeded: int
-    failed: int
+    queued: int  # jobs run in the background; poll /admin/jobs/{customer_id}
     results: list[QABatchJobResult]
 
 
@@ -107,6 +116,7 @@ class UpdateConfigRequest(BaseModel):
     show_sources: bool | None = None
     show_suggestions: bool | None = None
     confidence_threshold: float | None = Field(None, ge=0.1, le=0.5)
+    rerank_mode: str | None = Field(None, pattern="^(local|llm_fallback|llm)$")
     enable_identity_verification: bool | None = None
     identity_custom_fields: str | None = None  # JSON array of {"key", "label", "required"}
     lead_intents: str | None = None  # JSON array of lead intent configs
@@ -128,6 +138,7 @@ class JobInfo(BaseModel):
     chunks_created: int
     created_at: str
     completed_at: str | None
+    embedding_chunks_per_second: float | None = None
 
 
 class JobsListResponse(BaseModel):
@@ -174,6 +185,7 @@ class RetrievalStatsResponse(BaseModel):
     avg_context_tokens: float | None
     mode_breakdown: list[ModeCount]
     health_score: float
+    answer_cache_hit_rate: float = 0.0
 
 
 class LeadInfo(BaseModel):
@@ -219,7 +231,6 @@ class QueryLogsListResponse(BaseModel):
 @router.post("/customers", response_model=CreateCustomerResponse)
 async def create_customer(
     request: CreateCustomerRequest,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     _: str = Depends(verify_admin_key),
 ):
@@ -262,18 +273,19 @@ async def create_customer(
     )
     db.add(config)
 
-    await db.commit()
-
-    # Queue auto-ingestion for allowed domains
+    # Queue auto-ingestion for allowed domains (same transaction as the customer)
     if request.allowed_domains:
-        from app.services.auto_ingest import run_auto_ingestion
-        background_tasks.add_task(
-            run_auto_ingestion,
-            customer.id,
-            customer.site_id,
-            request.allowed_domains,
+        await enqueue_ingestion(
+            db,
+            customer_id=customer.id,
+            site_id=customer.site_id,
+            kind="auto_ingest",
+            payload={"domains": request.allowed_domains},
+            commit=False,
         )
 
+    await db.commit()
+
     # Send welcome email if contact_email provided
     if request.contact_email:
         from app.services.email import send_welcome_email
@@ -356,6 +368,7 @@ async def rotate_customer_api_key(
     new_key = f"zk_live_{site_id}_{secrets.token_urlsafe(24)}"
     customer.api_key = new_key
     await db.commit()
+    await invalidate_tenant(db, customer.id, site_id)
 
     await log_admin_action(
         db,
@@ -394,6 +407,7 @@ async def toggle_customer_active(
         )
     customer.is_active = not customer.is_active
     await db.commit()
+    await invalidate_tenant(db, customer.id, site_id)
     return {"is_active": customer.is_active, "message": f"Widget {'enabled' if customer.is_active else 'disabled'} successfully"}
 
 
@@ -428,6 +442,7 @@ async def update_customer(
             db.add(Domain(customer_id=customer.id, domain=d.lower().strip()))
 
     await db.commit()
+    await invalidate_tenant(db, customer.id, site_id)
     return {"message": "Customer updated successfully"}
 
 
@@ -462,6 +477,7 @@ async def delete_customer(
     from sqlalchemy import text
     await db.execute(text("DELETE FROM customers WHERE id = :cid"), {"cid": str(customer_id)})
     await db.commit()
+    forget_tenant(customer_id, site_id)
 
     # Pinecone namespace cleanup (Z-Ops hardening, #18). Idempotent — empty
     # or missing namespaces are a no-op. Failure does not roll back the DB
@@ -571,54 +587,22 @@ async def get_retrieval_stats(
     from datetime import datetime, timedelta
     since = datetime.utcnow() - timedelta(days=7)
 
-    # Single aggregation query for all scalar metrics + fallback breakdown
-    agg = await db.execute(
-        select(
-            func.count().label("total"),
-            func.sum(case((QueryLog.fallback_triggered == True, 1), else_=0)).label("fallback_count"),
-            func.sum(case((QueryLog.retrieval_blocked == True, 1), else_=0)).label("blocked_count"),
-            func.sum(case((QueryLog.llm_declined == True, 1), else_=0)).label("llm_decline_count"),
-            func.sum(case((QueryLog.retrieval_empty == True, 1), else_=0)).label("empty_count"),
-            func.avg(QueryLog.top_score).label("avg_top_score"),
-            func.avg(QueryLog.response_time_ms).label("avg_response_time"),
-            func.avg(QueryLog.context_tokens).label("avg_context_tokens"),
-        ).where(
-            QueryLog.customer_id == customer.id,
-            QueryLog.created_at >= since,
-        )
-    )
-    row = agg.one()
-    total = row.total or 0
-    fallback_count = int(row.fallback_count or 0)
-    blocked_count = int(row.blocked_count or 0)
-    llm_decline_count = int(row.llm_decline_count or 0)
-    empty_count = int(row.empty_count or 0)
-    avg_top = round(float(row.avg_top_score), 3) if row.avg_top_score is not None else None
-    avg_rt = round(float(row.avg_response_time), 0) if row.avg_response_time is not None else None
-    avg_ctx = round(float(row.avg_context_tokens), 0) if row.avg_context_tokens is not None else None
-
-    # Threshold guard count (retrieval_mode = 'hybrid_threshold')
-    tg = await db.execute(
-        select(func.count()).select_from(QueryLog).where(
-            QueryLog.customer_id == customer.id,
-            QueryLog.created_at >= since,
-            QueryLog.retrieval_mode == "hybrid_threshold",
-        )
-    )
-    threshold_count = tg.scalar() or 0
-
-    # Mode breakdown
-    modes = await db.execute(
-        select(
-            QueryLog.retrieval_mode,
-            func.count().label("cnt"),
-        ).where(
-            QueryLog.customer_id == customer.id,
-            QueryLog.created_at >= since,
-            QueryLog.retrieval_mode.isnot(None),
-        ).group_by(QueryLog.retrieval_mode)
-    )
-    mode_breakdown = [ModeCount(mode=r[0], count=r[1]) for r in modes.fetchall()]
+    # Whole days come from the daily rollups, the rest from query_logs
+    stats = await query_stats(db, customer.id, since, with_questions=False)
+    total = stats.total
+    fallback_count = stats.fallback
+    blocked_count = stats.blocked
+    llm_decline_count = stats.llm_declined
+    empty_count = stats.empty
+    cache_hit_count = stats.cache_hit
+    threshold_count = stats.threshold_guard
+    avg_top = round(stats.avg_top_score, 3) if stats.avg_top_score is not None else None
+    avg_rt = round(stats.avg_response_time, 0) if stats.avg_response_time is not None else None
+    avg_ctx = round(stats.avg_context_tokens, 0) if stats.avg_context_tokens is not None else None
+    mode_breakdown = [
+        ModeCount(mode=mode, count=count)
+        for mode, count in sorted(stats.modes.items(), key=lambda item: -item[1])
+    ]
 
     # Compute rates for return + health score
     fallback_rate = round((fallback_count / total) * 100, 1) if total > 0 else 0.0
@@ -626,6 +610,7 @@ async def get_retrieval_stats(
     llm_decline_rate = round((llm_decline_count / total) * 100, 1) if total > 0 else 0.0
     retrieval_empty_rate = round((empty_count / total) * 100, 1) if total > 0 else 0.0
     threshold_guard_rate = round((threshold_count / total) * 100, 1) if total > 0 else 0.0
+    answer_cache_hit_rate = round((cache_hit_count / total) * 100, 1) if total > 0 else 0.0
 
     # Health score (0–100) — Phase 4F refined formula
     if total == 0:
@@ -651,6 +636,7 @@ async def get_retrieval_stats(
         avg_context_tokens=avg_ctx,
         mode_breakdown=mode_breakdown,
         health_score=health_score,
+        answer_cache_hit_rate=answer_cache_hit_rate,
     )
 
 
@@ -660,7 +646,7 @@ async def ingest_url(
     db: AsyncSession = Depends(get_db),
     _: str = Depends(verify_admin_key),
 ):
-    """Ingest content from a URL."""
+    """Queue ingestion of a URL. Poll /admin/jobs/{customer_id} for progress."""
     # Get customer
     result = await db.execute(
         select(Customer).where(Customer.site_id == request.customer_id)
@@ -673,29 +659,19 @@ async def ingest_url(
             detail={"code": "CUSTOMER_NOT_FOUND", "message": "Customer not found"},
         )
 
-    ingestion_service = get_ingestion_service()
-
-    try:
-        job = await ingestion_service.ingest_url(
-            db=db,
-            customer_id=customer.id,
-            site_id=customer.site_id,
-            url=request.url,
-            depth=request.depth,
-            max_pages=request.max_pages,
-        )
-
-        return JobResponse(
-            job_id=str(job.id),
-            status=job.status,
-            message=f"Ingestion completed. {job.chunks_created} chunks created.",
-        )
+    task = await enqueue_ingestion(
+        db,
+        customer_id=customer.id,
+        site_id=customer.site_id,
+        kind="url",
+        payload={"url": request.url, "depth": request.depth, "max_pages": request.max_pages},
+    )
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail={"code": "INGESTION_FAILED", "message": str(e)},
-        )
+    return JobResponse(
+        job_id=str(task.job_id),
+        status="pending",
+        message="Ingestion queued.",
+    )
 
 
 @router.post("/ingest/text", response_model=JobResponse)
@@ -704,7 +680,7 @@ async def ingest_text(
     db: AsyncSession = Depends(get_db),
     _: str = Depends(verify_admin_key),
 ):
-    """Ingest raw text content."""
+    """Queue ingestion of raw text content."""
     # Get customer
     result = await db.execute(
         select(Customer).where(Customer.site_id == request.customer_id)
@@ -717,28 +693,19 @@ async def ingest_text(
             detail={"code": "CUSTOMER_NOT_FOUND", "message": "Customer not found"},
         )
 
-    ingestion_service = get_ingestion_service()
-
-    try:
-        job = await ingestion_service.ingest_text(
-            db=db,
-            customer_id=customer.id,
-            site_id=customer.site_id,
-            text=request.text,
-            source_title=request.title,
-        )
-
-        return JobResponse(
-            job_id=str(job.id),
-            status=job.status,
-            message=f"Ingestion completed. {job.chunks_created} chunks created.",
-        )
+    task = await enqueue_ingestion(
+        db,
+        customer_id=customer.id,
+        site_id=customer.site_id,
+        kind="text",
+        payload={"text": request.text, "source_title": request.title},
+    )
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail={"code": "INGESTION_FAILED", "message": str(e)},
-        )
+    return JobResponse(
+        job_id=str(task.job_id),
+        status="pending",
+        message="Ingestion queued.",
+    )
 
 
 ALLOWED_EXTENSIONS = {
@@ -756,7 +723,7 @@ async def ingest_file(
     db: AsyncSession = Depends(get_db),
     _: str = Depends(verify_admin_key),
 ):
-    """Upload and ingest a document (PDF, DOCX, or TXT)."""
+    """Upload a document (PDF, DOCX, or TXT) and queue its ingestion."""
     # Get customer
     result = await db.execute(
         select(Customer).where(Customer.site_id == site_id)
@@ -788,29 +755,20 @@ async def ingest_file(
             detail={"code": "FILE_TOO_LARGE", "message": f"Maximum file size is {MAX_FILE_SIZE // (1024*1024)}MB"},
         )
 
-    ingestion_service = get_ingestion_service()
-
-    try:
-        job = await ingestion_service.ingest_file(
-            db=db,
-            customer_id=customer.id,
-            site_id=customer.site_id,
-            file_bytes=content,
-            filename=filename,
-            source_type=source_type,
-        )
-
-        return JobResponse(
-            job_id=str(job.id),
-            status=job.status,
-            message=f"Ingestion {job.status}. {job.chunks_created} chunks created.",
-        )
+    task = await enqueue_ingestion(
+        db,
+        customer_id=customer.id,
+        site_id=customer.site_id,
+        kind="file",
+        payload={"filename": filename, "source_type": source_type},
+        blob=content,
+    )
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail={"code": "INGESTION_FAILED", "message": str(e)},
-        )
+    return JobResponse(
+        job_id=str(task.job_id),
+        status="pending",
+        message="Ingestion queued.",
+    )
 
 
 @router.post("/ingest/qa", response_model=JobResponse)
@@ -819,7 +777,7 @@ async def ingest_qa(
     db: AsyncSession = Depends(get_db),
     _: str = Depends(verify_admin_key),
 ):
-    """Ingest a Q&A seed pair as structured knowledge."""
+    """Queue a Q&A seed pair for ingestion as structured knowledge."""
     # Get customer
     result = await db.execute(
         select(Customer).where(Customer.site_id == request.site_id)
@@ -832,28 +790,19 @@ async def ingest_qa(
             detail={"code": "CUSTOMER_NOT_FOUND", "message": "Customer not found"},
         )
 
-    ingestion_service = get_ingestion_service()
-
-    try:
-        job = await ingestion_service.ingest_qa(
-            db=db,
-            customer_id=customer.id,
-            site_id=customer.site_id,
-            question=request.question,
-            answer=request.answer,
-        )
-
-        return JobResponse(
-            job_id=str(job.id),
-            status=job.status,
-            message=f"QA seed ingested. {job.chunks_created} chunks created.",
-        )
+    task = await enqueue_ingestion(
+        db,
+        customer_id=customer.id,
+        site_id=customer.site_id,
+        kind="qa",
+        payload={"question": request.question, "answer": request.answer},
+    )
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail={"code": "INGESTION_FAILED", "message": str(e)},
-        )
+    return JobResponse(
+        job_id=str(task.job_id),
+        status="pending",
+        message="QA seed queued.",
+    )
 
 
 @router.post("/ingest/qa/batch", response_model=QABatchResponse)
@@ -862,7 +811,11 @@ async def ingest_qa_batch(
     db: AsyncSession = Depends(get_db),
     _: str = Depends(verify_admin_key),
 ):
-    """Ingest multiple Q&A seed pairs in a single request."""
+    """Queue multiple Q&A seed pairs in a single request (one job per pair).
+
+    Nothing has run yet, so there is no succeeded/failed count: each result
+    carries its job_id. Poll /admin/jobs/{customer_id} for the outcome.
+    """
     # Get customer
     result = await db.execute(
         select(Customer).where(Customer.site_id == request.site_id)
@@ -875,43 +828,27 @@ async def ingest_qa_batch(
             detail={"code": "CUSTOMER_NOT_FOUND", "message": "Customer not found"},
         )
 
-    ingestion_service = get_ingestion_service()
     results = []
-    succeeded = 0
-    failed = 0
-
     for pair in request.qa_pairs:
-        try:
-            job = await ingestion_service.ingest_qa(
-                db=db,
-                customer_id=customer.id,
-                site_id=customer.site_id,
-                question=pair.question,
-                answer=pair.answer,
-            )
-            results.append(QABatchJobResult(
-                question=pair.question[:80],
-                job_id=str(job.id),
-                status=job.status,
-                chunks_created=job.chunks_created,
-            ))
-            if job.status == "completed":
-                succeeded += 1
-            else:
-                failed += 1
-        except Exception:
-            failed += 1
-            results.append(QABatchJobResult(
-                question=pair.question[:80],
-                job_id="",
-                status="failed",
-                chunks_created=0,
-            ))
+        task = await enqueue_ingestion(
+            db,
+            customer_id=customer.id,
+            site_id=customer.site_id,
+            kind="qa",
+            payload={"question": pair.question, "answer": pair.answer},
+            commit=False,
+        )
+        results.append(QABatchJobResult(
+            question=pair.question[:80],
+            job_id=str(task.job_id),
+            status="pending",
+            chunks_created=0,
+        ))
+    await db.commit()
 
     return QABatchResponse(
         total=len(request.qa_pairs),
-        succeeded=succeeded,
-        failed=failed,
+        queued=len(results),
         results=results,
     )
 
@@ -956,6 +893,7 @@ async def update_config(
             setattr(config, field, value)
 
     await db.commit()
+    await invalidate_tenant(db, customer.id, customer.site_id)
 
     return {"message": "Config updated successfully"}
 
@@ -1005,6 +943,10 @@ async def list_jobs(
                 chunks_created=job.chunks_created,
                 created_at=job.created_at.isoformat(),
                 completed_at=job.completed_at.isoformat() if job.completed_at else None,
+                embedding_chunks_per_second=(
+                    round(job.embedding_chunks / job.embedding_seconds, 1)
+                    if job.embedding_chunks and job.embedding_seconds else None
+                ),
             )
             for job in jobs
         ],
@@ -1038,6 +980,7 @@ async def reindex_customer(
             db=db,
             site_id=customer.site_id,
         )
+        await invalidate_answers(db, customer.id)
 
         return JobResponse(
             job_id="",
@@ -1129,32 +1072,26 @@ async def list_leads(
 @router.get("/leads/{site_id}/export")
 async def export_leads(
     site_id: str,
+    columns: str | None = Query(None, description="Comma-separated column names"),
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False),
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = Query(None),
     db: AsyncSession = Depends(get_db),
     _: str = Depends(verify_admin_key),
 ):
-    """CSV export of all leads for a tenant."""
+    """Streaming CSV/NDJSON export of a tenant's leads (optionally a created_at range)."""
     customer = await _resolve_customer(site_id, db)
-
-    rows = (
-        await db.execute(
-            select(UserProfile)
-            .where(UserProfile.customer_id == customer.id)
-            .order_by(UserProfile.created_at.desc())
+    try:
+        return export_response(
+            LEADS, customer.id, f"{site_id}_leads",
+            default_columns=LEAD_EXPORT_COLUMNS, columns=columns, fmt=fmt, compress=gzip, since=from_, until=to,
+        )
+    except ExportRequestError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"code": "INVALID_EXPORT", "message": str(e)},
         )
-    ).scalars().all()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["email", "name", "phone", "location", "user_type", "lead_intent", "custom_fields", "created_at"])
-    for u in rows:
-        writer.writerow([u.email, u.name, u.phone, u.location, u.user_type, u.lead_intent, u.custom_fields, u.created_at.isoformat()])
-
-    output.seek(0)
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={site_id}_leads.csv"},
-    )
 
 
 @router.delete("/leads/{site_id}/{lead_id}")
@@ -1241,36 +1178,27 @@ async def list_queries(
 @router.get("/queries/{site_id}/export")
 async def export_queries(
     site_id: str,
+    columns: str | None = Query(None, description="Comma-separated column names"),
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False),
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = Query(None),
     db: AsyncSession = Depends(get_db),
     _: str = Depends(verify_admin_key),
 ):
-    """CSV export of all queries for a tenant."""
+    """Streaming CSV/NDJSON export of a tenant's queries (optionally a created_at range)."""
     customer = await _resolve_customer(site_id, db)
-
-    rows = (
-        await db.execute(
-            select(QueryLog)
-            .where(QueryLog.customer_id == customer.id)
-            .order_by(QueryLog.created_at.desc())
+    try:
+        return export_response(
+            QUERY_LOGS, customer.id, f"{site_id}_queries",
+            default_columns=ADMIN_QUERY_EXPORT_COLUMNS, columns=columns, fmt=fmt, compress=gzip,
+            since=from_, until=to,
+        )
+    except ExportRequestError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"code": "INVALID_EXPORT", "message": str(e)},
         )
-    ).scalars().all()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["question", "answer", "top_score", "response_time_ms", "retrieval_mode", "fallback_triggered", "origin_domain", "created_at"])
-    for q in rows:
-        writer.writerow([
-            q.question, q.answer, q.top_score, q.response_time_ms,
-            q.retrieval_mode, q.fallback_triggered, q.origin_domain,
-            q.created_at.isoformat(),
-        ])
-
-    output.seek(0)
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={site_id}_queries.csv"},
-    )
 
 
 @router.post("/backup/snapshot")
@@ -1410,6 +1338,7 @@ async def delete_product(
         )
 
     await db.commit()
+    await invalidate_answers(db, customer.id)
     return {"message": "Product deleted successfully"}
 
 
@@ -1465,7 +1394,6 @@ async def get_product_stats(
 @router.post("/products/{site_id}/rescrape")
 async def rescrape_products(
     site_id: str,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     _: str = Depends(verify_admin_key),
 ):
@@ -1484,8 +1412,13 @@ async def rescrape_products(
             detail={"code": "NO_DOMAINS", "message": "No domains configured for this customer"},
         )
 
-    from app.services.auto_ingest import run_auto_ingestion
-    background_tasks.add_task(run_auto_ingestion, customer.id, customer.site_id, domains)
+    await enqueue_ingestion(
+        db,
+        customer_id=customer.id,
+        site_id=customer.site_id,
+        kind="auto_ingest",
+        payload={"domains": domains},
+    )
 
     return {"message": "Re-scrape queued for all domains"}
 
@@ -1604,39 +1537,13 @@ async def get_query_analytics(
     cid = str(customer.id)
     since = datetime.utcnow() - timedelta(days=30)
 
-    # Feedback summary
-    feedback_result = await db.execute(text("""
-        SELECT
-            COUNT(*) FILTER (WHERE feedback_vote IS NOT NULL) as total_feedback,
-            COUNT(*) FILTER (WHERE feedback_vote = 1) as positive,
-            COUNT(*) FILTER (WHERE feedback_vote = -1) as negative
-        FROM query_logs WHERE customer_id = :cid AND created_at > :since
-    """), {"cid": cid, "since": since})
-    fb = feedback_result.one()
-    total_feedback = fb[0] or 0
-    positive = fb[1] or 0
-    negative = fb[2] or 0
+    # Feedback summary and failed queries (grouped by question, counted)
+    stats = await query_stats(db, customer.id, since)
+    positive = stats.feedback_positive
+    negative = stats.feedback_negative
+    total_feedback = positive + negative
     satisfaction_rate = round((positive / total_feedback * 100) if total_feedback > 0 else 0, 1)
-
-    # Failed queries (grouped by question, counted)
-    failed_result = await db.execute(text("""
-        SELECT LOWER(TRIM(question)) as q,
-               COUNT(*) as cnt,
-               ROUND(AVG(top_score)::numeric, 3) as avg_score,
-               SUM(CASE WHEN feedback_vote = -1 THEN 1 ELSE 0 END) as neg_count
-        FROM query_logs
-        WHERE customer_id = :cid AND created_at > :since
-          AND (fallback_triggered = true OR retrieval_empty = true
-               OR llm_declined = true OR top_score < 0.25 OR feedback_vote = -1)
-        GROUP BY LOWER(TRIM(question))
-        HAVING COUNT(*) >= 1
-        ORDER BY cnt DESC
-        LIMIT 30
-    """), {"cid": cid, "since": since})
-    failed_queries = [
-        {"question": row[0], "count": row[1], "avg_score": float(row[2]) if row[2] else 0, "negative_feedback": row[3]}
-        for row in failed_result.fetchall()
-    ]
+    failed_queries = stats.failed_questions(30)
 
     # Negative feedback queries (individual, with answers)
     neg_result = await db.execute(text("""
@@ -1865,6 +1772,7 @@ async def clone_from_template(
         new_config.show_suggestions = tmpl_config.show_suggestions
         new_config.quick_actions = tmpl_config.quick_actions
         new_config.confidence_threshold = tmpl_config.confidence_threshold
+        new_config.rerank_mode = tmpl_config.rerank_mode
         new_config.enable_identity_verification = tmpl_config.enable_identity_verification
         new_config.identity_custom_fields = tmpl_config.identity_custom_fields
         new_config.lead_intents = tmpl_config.lead_intents
@@ -1916,6 +1824,7 @@ async def clone_from_template(
         profile_cloned = True
 
     await db.commit()
+    await invalidate_tenant(db, new_customer.id, new_customer.site_id)
 
     return {
         "message": f"Configuration cloned from '{template_site_id}' to '{site_id}'",
@@ -27,14 +27,13 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel, Field
-from sqlalchemy import case, desc, func, select, text
+from sqlalchemy import func, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_admin_tenant, require_master_admin
 from app.database import get_db
 from app.models.customer import Customer
 from app.models.order import Order
-from app.models.query_log import QueryLog
 from app.models.tenant_backend_credentials import TenantBackendCredentials
 from app.models.tenant_outbound_webhook import TenantOutboundWebhook
 from app.models.user_profile import UserProfile
@@ -43,6 +42,7 @@ from app.services.admin_audit import (
     _resolve_actor_for_admin_tenant,
     log_admin_action,
 )
+from app.services.analytics_rollups import query_stats
 from app.services.connectors.encryption import (
     BackendCredentialsEncryptionError,
     encrypt,
@@ -52,6 +52,7 @@ from app.services.tenant_provisioning import (
     TenantProvisioningService,
     generate_webhook_signing_secret,
 )
+from app.services.tenant_context import forget_tenant
 from app.services.vector_store import get_vector_store_service
 
 logger = logging.getLogger("zunkiree.admin.tenants")
@@ -370,6 +371,7 @@ async def delete_tenant(
     # SQLAlchemy needing each relation registered. Mirrors admin.py's pattern.
     await db.execute(text("DELETE FROM customers WHERE id = :cid"), {"cid": str(customer_id)})
     await db.commit()
+    forget_tenant(customer_id, site_id)
 
     # Pinecone namespace cleanup (Z-Ops hardening, #18). Idempotent.
     try:
@@ -526,35 +528,14 @@ async def get_analytics(
     if from_ is None:
         from_ = to - timedelta(days=30)
 
-    # queries_total + queries_with_answer + p95 in one aggregation pass.
+    # queries_total + queries_with_answer + p95 + top questions: whole days
+    # from the daily rollups, the partial edges from query_logs.
     # queries_with_answer = answer present AND not a fallback dispatch.
-    agg = (
-        await db.execute(
-            select(
-                func.count().label("total"),
-                func.sum(
-                    case(
-                        (
-                            (QueryLog.answer.isnot(None))
-                            & (QueryLog.fallback_triggered.is_(False)),
-                            1,
-                        ),
-                        else_=0,
-                    )
-                ).label("with_answer"),
-                func.percentile_cont(0.95)
-                .within_group(QueryLog.response_time_ms.asc())
-                .label("p95"),
-            ).where(
-                QueryLog.customer_id == customer.id,
-                QueryLog.created_at >= from_,
-                QueryLog.created_at <= to,
-            )
-        )
-    ).one()
-    queries_total = int(agg.total or 0)
-    queries_with_answer = int(agg.with_answer or 0)
-    p95_value = float(agg.p95) if agg.p95 is not None else None
+    # p95 is read off the rollups' latency histogram (within one bucket).
+    stats = await query_stats(db, customer.id, from_, to)
+    queries_total = stats.total
+    queries_with_answer = stats.with_answer
+    p95_value = stats.latency_percentile(0.95)
 
     leads_captured = int(
         (
@@ -582,28 +563,10 @@ async def get_analytics(
         or 0
     )
 
-    # top_questions: group by normalised question, but return the question as
-    # the user originally typed it. MIN(question) over the group is stable
-    # and cheaper than FIRST_VALUE/window.
-    top_rows = (
-        await db.execute(
-            select(
-                func.lower(func.trim(QueryLog.question)).label("norm"),
-                func.min(QueryLog.question).label("display"),
-                func.count().label("cnt"),
-            )
-            .where(
-                QueryLog.customer_id == customer.id,
-                QueryLog.created_at >= from_,
-                QueryLog.created_at <= to,
-            )
-            .group_by(func.lower(func.trim(QueryLog.question)))
-            .order_by(desc("cnt"))
-            .limit(10)
-        )
-    ).all()
+    # top_questions: grouped by normalised question, returned as the user
+    # originally typed it (MIN(question) over the group).
     top_questions = [
-        TopQuestion(question=row.display, count=int(row.cnt)) for row in top_rows
+        TopQuestion(question=display, count=count) for display, count in stats.top_questions(10)
     ]
 
     return AnalyticsResponse(
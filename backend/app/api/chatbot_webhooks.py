@@ -1,6 +1,8 @@
 """
 Meta webhook handler — receives Instagram, Messenger, and WhatsApp DMs.
-Returns 200 OK immediately and processes messages in background.
+Verifies the signature, stores message events in the durable inbox and
+returns 200 OK; the inbox worker (app/services/meta_inbox.py) runs the
+per-platform processors below, in order per sender.
 """
 import hashlib
 import logging
@@ -11,6 +13,9 @@ from app.database import async_session_maker
 from app.config import get_settings
 from app.services.meta_messaging import verify_webhook_signature, decrypt_token, get_meta_messaging_client
 from app.services.chatbot_query import get_chatbot_query_service
+from app.services.meta_inbox import enqueue_webhook
+from app.services.keyed_state import get_keyed_state_store
+from app.services.telemetry import get_telemetry_writer
 from app.models.chatbot import ChatbotChannel, ChatbotMessageLog
 
 from sqlalchemy import select
@@ -35,12 +40,16 @@ if settings.meta_app_secret:
 else:
     logger.error("META_APP_SECRET is empty — HMAC verification will 503 on every POST /webhooks/meta")
 
-# Cache last product results per sender for size quick replies
-_last_products: dict[str, list[dict]] = {}
+# Per-sender DM state lives in the keyed state store (KEYED_STATE_BACKEND) so
+# it survives restarts and is shared by every inbox worker and replica.
+# Last product results per sender ("channel_id:sender_id"), for size quick replies.
+LAST_PRODUCTS_NS = "dm_last_products"
+LAST_PRODUCTS_TTL_SECONDS = 6 * 60 * 60
 
 # Pending add-to-cart: keyed by "page_id:sender_id" → product_id
 # Set when user taps a carousel "Add to Cart" button; consumed when user replies with a size.
-_pending_cart_add: dict[str, str] = {}
+PENDING_CART_ADD_NS = "dm_pending_cart_add"
+PENDING_CART_ADD_TTL_SECONDS = 30 * 60
 
 
 @router.get("")
@@ -90,7 +99,7 @@ async def verify_webhook(
 async def receive_webhook(request: Request):
     """
     Receive incoming messages from Instagram/Messenger/WhatsApp.
-    Returns 200 OK immediately; processes message in background task.
+    Returns 200 OK once the events are in the inbox; processing is async.
     """
     payload = await request.body()
 
@@ -145,17 +154,11 @@ async def receive_webhook(request: Request):
     except json.JSONDecodeError:
         return {"status": "invalid_json"}
 
-    # Determine platform from object field
-    obj = data.get("object", "")
-    entries = data.get("entry", [])
-
-    for entry in entries:
-        if obj == "instagram":
-            await _process_instagram_entry(entry)
-        elif obj == "page":
-            await _process_messenger_entry(entry)
-        elif obj == "whatsapp_business_account":
-            await _process_whatsapp_entry(entry)
+    # Persist message events to the inbox and ack; the inbox worker runs the
+    # DM pipeline per sender, in order. A failed insert surfaces as a 5xx so
+    # Meta redelivers.
+    async with async_session_maker() as db:
+        await enqueue_webhook(db, data)
 
     # Must return 200 quickly — Meta retries on timeout
     return {"status": "ok"}
@@ -194,7 +197,9 @@ async def _process_instagram_entry(entry: dict):
                         label = f"'{name}'" if name else f"product {pid}"
                         message_text = f"Add {label} to my cart [product_id:{pid}]"
                         # Remember which product so the size reply can bypass the agent
-                        _pending_cart_add[f"{page_id}:{sender_id}"] = pid
+                        await get_keyed_state_store().set(
+                            PENDING_CART_ADD_NS, f"{page_id}:{sender_id}", pid, PENDING_CART_ADD_TTL_SECONDS,
+                        )
                     elif action == "details":
                         message_text = f"Tell me more about {action_data.get('name', 'this product')}"
                     else:
@@ -279,7 +284,9 @@ async def _process_messenger_entry(entry: dict):
                         name = action_data.get("name", "")
                         label = f"'{name}'" if name else f"product {pid}"
                         message_text = f"Add {label} to my cart [product_id:{pid}]"
-                        _pending_cart_add[f"{page_id}:{sender_id}"] = pid
+                        await get_keyed_state_store().set(
+                            PENDING_CART_ADD_NS, f"{page_id}:{sender_id}", pid, PENDING_CART_ADD_TTL_SECONDS,
+                        )
                     elif action == "details":
                         message_text = f"Tell me more about {action_data.get('name', 'this product')}"
                     else:
@@ -364,6 +371,10 @@ async def _handle_incoming_message(
     """
     Core message handler. Runs with its own DB session since this may
     execute after the webhook response has been sent.
+
+    Errors are logged and re-raised, so the inbox worker retries the row.
+    Meta redeliveries never get here twice: the inbox drops them on its
+    (platform, message id) key.
     """
     async with async_session_maker() as db:
         try:
@@ -410,19 +421,11 @@ async def _handle_incoming_message(
             except Exception:
                 pass  # Non-critical
 
-            # Deduplication check
-            if message_id:
-                existing = await db.execute(
-                    select(ChatbotMessageLog.id).where(
-                        ChatbotMessageLog.platform_message_id == message_id
-                    )
-                )
-                if existing.scalar_one_or_none():
-                    logger.debug("Duplicate message %s — skipping", message_id)
-                    return
-
-            # Log inbound message
-            inbound_log = ChatbotMessageLog(
+            # Log inbound message (one row per attempt; duplicates are dropped
+            # by the inbox, and a message-log check would skip every retry)
+            telemetry = get_telemetry_writer()
+            await telemetry.add(
+                ChatbotMessageLog,
                 channel_id=channel.id,
                 customer_id=channel.customer_id,
                 platform_sender_id=sender_id,
@@ -430,25 +433,27 @@ async def _handle_incoming_message(
                 direction="inbound",
                 message_text=message_text,
             )
-            db.add(inbound_log)
-            await db.commit()
 
             # Direct add-to-cart bypasses — skip agent when we already know the product.
+            # Popping consumes the pending entry for every path below; the
+            # branches that still need it re-arm it.
+            state = get_keyed_state_store()
             pkey = f"{page_id}:{sender_id}"
-            pending_pid = _pending_cart_add.pop(pkey, None)
+            sender_key = f"{channel.id}:{sender_id}"
+            pending_pid = await state.pop(PENDING_CART_ADD_NS, pkey)
+            last_products = (await state.get(LAST_PRODUCTS_NS, sender_key) or []) if pending_pid else []
 
             if pending_pid and is_postback:
                 # User tapped "Add to Cart" from carousel. Check if product has sizes.
-                sender_key = f"{channel.id}:{sender_id}"
                 product_sizes = []
-                for p in _last_products.get(sender_key, []):
+                for p in last_products:
                     if str(p.get("id", "")) == str(pending_pid):
                         product_sizes = [s.strip() for s in p.get("sizes", []) if s and s.strip()]
                         break
 
                 if product_sizes:
                     # Re-arm pending so the next size quick-reply tap triggers direct add.
-                    _pending_cart_add[pkey] = pending_pid
+                    await state.set(PENDING_CART_ADD_NS, pkey, pending_pid, PENDING_CART_ADD_TTL_SECONDS)
                     size_prompt = "What size would you like?"
                     try:
                         await client.send_quick_replies(
@@ -488,21 +493,19 @@ async def _handle_incoming_message(
                         access_token=access_token, recipient_id=sender_id, text=bot_reply,
                     )
 
-                outbound_log = ChatbotMessageLog(
+                await telemetry.add(
+                    ChatbotMessageLog,
                     channel_id=channel.id, customer_id=channel.customer_id,
                     platform_sender_id=sender_id, direction="outbound", message_text=bot_reply,
                 )
-                db.add(outbound_log)
-                await db.commit()
                 return
 
             elif pending_pid and is_quick_reply:
                 # Only treat as a size tap if the text actually matches one of the
                 # product's sizes. Chips like "Show my cart" / "Checkout" must fall
                 # through to the agent, not be used as a size string.
-                sender_key = f"{channel.id}:{sender_id}"
                 product_sizes_upper = []
-                for p in _last_products.get(sender_key, []):
+                for p in last_products:
                     if str(p.get("id", "")) == str(pending_pid):
                         product_sizes_upper = [s.strip().upper() for s in p.get("sizes", []) if s and s.strip()]
                         break
@@ -526,7 +529,7 @@ async def _handle_incoming_message(
                     # Build richer confirmation with cart summary + CTA chips
                     size_tapped = message_text.strip()
                     product_name = next(
-                        (p.get("name", "") for p in _last_products.get(sender_key, [])
+                        (p.get("name", "") for p in last_products
                          if str(p.get("id", "")) == str(pending_pid)),
                         "",
                     )
@@ -560,21 +563,17 @@ async def _handle_incoming_message(
                         access_token=access_token, recipient_id=sender_id,
                         text=bot_reply, options=chips,
                     )
-                    outbound_log = ChatbotMessageLog(
+                    await telemetry.add(
+                        ChatbotMessageLog,
                         channel_id=channel.id, customer_id=channel.customer_id,
                         platform_sender_id=sender_id, direction="outbound", message_text=bot_reply,
                     )
-                    db.add(outbound_log)
-                    await db.commit()
                     return
-                else:
-                    # Not a size (e.g. "Show my cart", "Checkout") — re-arm and fall
-                    # through to agent so it handles the real intent.
-                    _pending_cart_add[pkey] = pending_pid
+                # Not a size (e.g. "Show my cart", "Checkout") — fall through to
+                # the agent so it handles the real intent.
 
-            # Clear any stale pending entry before handing off to agent — the agent
-            # path will re-arm it if it decides to ask about size.
-            _pending_cart_add.pop(pkey, None)
+            # The pending entry was consumed above, so the agent starts clean —
+            # the agent path re-arms it if it decides to ask about size.
 
             # Process via RAG pipeline
             chatbot_service = get_chatbot_query_service()
@@ -597,9 +596,8 @@ async def _handle_incoming_message(
                 await _update_feedback_from_signal(db, channel.id, sender_id, feedback_signal)
 
             # Cache products for size quick replies on follow-up turns
-            sender_key = f"{channel.id}:{sender_id}"
             if products:
-                _last_products[sender_key] = products
+                await state.set(LAST_PRODUCTS_NS, sender_key, products, LAST_PRODUCTS_TTL_SECONDS)
 
             # Detect if agent is asking about size — show sizes as quick replies
             answer_lower = answer.lower()
@@ -608,7 +606,9 @@ async def _handle_incoming_message(
                 "size?", "pick a size", "choose a size", "select a size",
             ])
             available_sizes = []
-            size_source = products or _last_products.get(sender_key, [])
+            size_source = products
+            if size_question and not size_source:
+                size_source = await state.get(LAST_PRODUCTS_NS, sender_key) or []
             if size_question and size_source:
                 for p in size_source:
                     for s in p.get("sizes", []):
@@ -616,8 +616,10 @@ async def _handle_incoming_message(
                             available_sizes.append(s)
                 # Arm the pending cache so the user's size tap bypasses the agent.
                 # Only applies when there's a single unambiguous product in context.
-                if pkey not in _pending_cart_add and len(size_source) == 1:
-                    _pending_cart_add[pkey] = size_source[0]["id"]
+                if len(size_source) == 1:
+                    await state.add(
+                        PENDING_CART_ADD_NS, pkey, size_source[0]["id"], PENDING_CART_ADD_TTL_SECONDS,
+                    )
 
             # Decide what to attach to the answer message
             quick_reply_options = None
@@ -694,7 +696,8 @@ async def _handle_incoming_message(
                     logger.warning("Suggestions failed: %s", e)
 
             # Log outbound message
-            outbound_log = ChatbotMessageLog(
+            await telemetry.add(
+                ChatbotMessageLog,
                 channel_id=channel.id,
                 customer_id=channel.customer_id,
                 platform_sender_id=sender_id,
@@ -703,14 +706,13 @@ async def _handle_incoming_message(
                 response_time_ms=response_time_ms,
                 query_log_id=query_log_id,
             )
-            db.add(outbound_log)
-            await db.commit()
 
         except Exception as e:
             logger.error("Error processing %s message from %s: %s", platform, sender_id, e, exc_info=True)
             # Log the error
             try:
-                error_log = ChatbotMessageLog(
+                await get_telemetry_writer().add(
+                    ChatbotMessageLog,
                     channel_id=channel.id if 'channel' in dir() else None,
                     customer_id=channel.customer_id if 'channel' in dir() else None,
                     platform_sender_id=sender_id,
@@ -719,10 +721,9 @@ async def _handle_incoming_message(
                     message_text=message_text,
                     error=str(e),
                 )
-                db.add(error_log)
-                await db.commit()
             except Exception:
                 pass  # Don't let error logging break the flow
+            raise  # the inbox worker retries the row
 
 
 async def _send_unsupported_type_reply(
@@ -777,6 +778,8 @@ async def _update_feedback_from_signal(
     from datetime import datetime
 
     try:
+        # The last outbound log (and its query log) may still be buffered.
+        await get_telemetry_writer().flush()
         # Find the most recent outbound message for this sender
         result = await db.execute(
             select(ChatbotMessageLog).where(
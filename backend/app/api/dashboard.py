@@ -1,15 +1,22 @@
-import csv
-import io
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Header, UploadFile, File
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, UploadFile, File
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, text
 
 from app.database import get_db
 from app.models import Customer, UserProfile, QueryLog, WidgetConfig, IngestionJob
-from app.services.ingestion import get_ingestion_service
+from app.services.analytics_rollups import count_queries, query_stats
+from app.services.export import (
+    LEAD_EXPORT_COLUMNS,
+    LEADS,
+    QUERY_EXPORT_COLUMNS,
+    QUERY_LOGS,
+    ExportRequestError,
+    export_response,
+)
+from app.services.tenant_context import invalidate_tenant
+from app.services.ingestion_queue import enqueue_ingestion
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
@@ -91,11 +98,7 @@ async def dashboard_overview(
         )
     )).scalar() or 0
 
-    queries_count = (await db.execute(
-        select(func.count()).select_from(QueryLog).where(
-            QueryLog.customer_id == customer.id
-        )
-    )).scalar() or 0
+    queries_count = await count_queries(db, customer.id)
 
     config = (await db.execute(
         select(WidgetConfig).where(WidgetConfig.customer_id == customer.id)
@@ -161,28 +164,21 @@ async def list_leads(
 
 @router.get("/leads/export")
 async def export_leads(
+    columns: str | None = Query(None, description="Comma-separated column names"),
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False),
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = Query(None),
     customer: Customer = Depends(get_current_customer),
-    db: AsyncSession = Depends(get_db),
 ):
-    """CSV export of all leads."""
-    rows = (await db.execute(
-        select(UserProfile)
-        .where(UserProfile.customer_id == customer.id)
-        .order_by(UserProfile.created_at.desc())
-    )).scalars().all()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["email", "name", "phone", "location", "user_type", "lead_intent", "custom_fields", "created_at"])
-    for u in rows:
-        writer.writerow([u.email, u.name, u.phone, u.location, u.user_type, u.lead_intent, u.custom_fields, u.created_at.isoformat()])
-
-    output.seek(0)
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={customer.site_id}_leads.csv"},
-    )
+    """Streaming CSV/NDJSON export of leads (optionally a created_at range)."""
+    try:
+        return export_response(
+            LEADS, customer.id, f"{customer.site_id}_leads",
+            default_columns=LEAD_EXPORT_COLUMNS, columns=columns, fmt=fmt, compress=gzip, since=from_, until=to,
+        )
+    except ExportRequestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/queries", response_model=QueriesResponse)
@@ -231,31 +227,21 @@ async def list_queries(
 
 @router.get("/queries/export")
 async def export_queries(
+    columns: str | None = Query(None, description="Comma-separated column names"),
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False),
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = Query(None),
     customer: Customer = Depends(get_current_customer),
-    db: AsyncSession = Depends(get_db),
 ):
-    """CSV export of all queries."""
-    rows = (await db.execute(
-        select(QueryLog)
-        .where(QueryLog.customer_id == customer.id)
-        .order_by(QueryLog.created_at.desc())
-    )).scalars().all()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["question", "answer", "top_score", "response_time_ms", "fallback_triggered", "created_at"])
-    for q in rows:
-        writer.writerow([
-            q.question, q.answer, q.top_score, q.response_time_ms,
-            q.fallback_triggered, q.created_at.isoformat(),
-        ])
-
-    output.seek(0)
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={customer.site_id}_queries.csv"},
-    )
+    """Streaming CSV/NDJSON export of queries (optionally a created_at range)."""
+    try:
+        return export_response(
+            QUERY_LOGS, customer.id, f"{customer.site_id}_queries",
+            default_columns=QUERY_EXPORT_COLUMNS, columns=columns, fmt=fmt, compress=gzip, since=from_, until=to,
+        )
+    except ExportRequestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 # --- Ingestion endpoints ---
@@ -302,27 +288,19 @@ async def dashboard_ingest_url(
     customer: Customer = Depends(get_current_customer),
     db: AsyncSession = Depends(get_db),
 ):
-    """Ingest content from a URL (client-facing)."""
-    ingestion_service = get_ingestion_service()
-    try:
-        job = await ingestion_service.ingest_url(
-            db=db,
-            customer_id=customer.id,
-            site_id=customer.site_id,
-            url=request.url,
-            depth=0,
-            max_pages=request.max_pages,
-        )
-        return JobResponse(
-            job_id=str(job.id),
-            status=job.status,
-            message=f"Ingestion completed. {job.chunks_created} chunks created.",
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail={"code": "INGESTION_FAILED", "message": str(e)},
-        )
+    """Queue ingestion of a URL (client-facing). Poll /dashboard/jobs for progress."""
+    task = await enqueue_ingestion(
+        db,
+        customer_id=customer.id,
+        site_id=customer.site_id,
+        kind="url",
+        payload={"url": request.url, "depth": 0, "max_pages": request.max_pages},
+    )
+    return JobResponse(
+        job_id=str(task.job_id),
+        status="pending",
+        message="Ingestion queued.",
+    )
 
 
 ALLOWED_EXTENSIONS = {".pdf": "pdf", ".docx": "docx", ".txt": "text"}
@@ -349,26 +327,19 @@ async def dashboard_ingest_file(
             status_code=400,
             detail={"code": "FILE_TOO_LARGE", "message": "Maximum file size is 10MB"},
         )
-    ingestion_service = get_ingestion_service()
-    try:
-        job = await ingestion_service.ingest_file(
-            db=db,
-            customer_id=customer.id,
-            site_id=customer.site_id,
-            file_bytes=content,
-            filename=filename,
-            source_type=ALLOWED_EXTENSIONS[ext],
-        )
-        return JobResponse(
-            job_id=str(job.id),
-            status=job.status,
-            message=f"Ingestion {job.status}. {job.chunks_created} chunks created.",
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail={"code": "INGESTION_FAILED", "message": str(e)},
-        )
+    task = await enqueue_ingestion(
+        db,
+        customer_id=customer.id,
+        site_id=customer.site_id,
+        kind="file",
+        payload={"filename": filename, "source_type": ALLOWED_EXTENSIONS[ext]},
+        blob=content,
+    )
+    return JobResponse(
+        job_id=str(task.job_id),
+        status="pending",
+        message="Ingestion queued.",
+    )
 
 
 @router.post("/ingest/qa/batch", response_model=dict)
@@ -377,26 +348,23 @@ async def dashboard_ingest_qa_batch(
     customer: Customer = Depends(get_current_customer),
     db: AsyncSession = Depends(get_db),
 ):
-    """Ingest multiple Q&A pairs (client-facing)."""
-    ingestion_service = get_ingestion_service()
-    succeeded = 0
-    failed = 0
+    """Queue ingestion of multiple Q&A pairs (client-facing), one job per pair.
+
+    Returns the queued job ids. Poll /dashboard/jobs for their outcome.
+    """
+    job_ids = []
     for pair in request.qa_pairs:
-        try:
-            job = await ingestion_service.ingest_qa(
-                db=db,
-                customer_id=customer.id,
-                site_id=customer.site_id,
-                question=pair.question,
-                answer=pair.answer,
-            )
-            if job.status == "completed":
-                succeeded += 1
-            else:
-                failed += 1
-        except Exception:
-            failed += 1
-    return {"total": len(request.qa_pairs), "succeeded": succeeded, "failed": failed}
+        task = await enqueue_ingestion(
+            db,
+            customer_id=customer.id,
+            site_id=customer.site_id,
+            kind="qa",
+            payload={"question": pair.question, "answer": pair.answer},
+            commit=False,
+        )
+        job_ids.append(str(task.job_id))
+    await db.commit()
+    return {"total": len(request.qa_pairs), "queued": len(job_ids), "job_ids": job_ids}
 
 
 # --- Widget config endpoints ---
@@ -463,6 +431,7 @@ async def update_dashboard_config(
         if value is not None:
             setattr(config, field, value)
     await db.commit()
+    await invalidate_tenant(db, customer.id, customer.site_id)
     return {"message": "Config updated successfully"}
 
 
@@ -516,39 +485,13 @@ async def get_search_quality(
     cid = str(customer.id)
     since = datetime.utcnow() - timedelta(days=30)
 
-    # Feedback summary
-    feedback_result = await db.execute(text("""
-        SELECT
-            COUNT(*) FILTER (WHERE feedback_vote IS NOT NULL) as total_feedback,
-            COUNT(*) FILTER (WHERE feedback_vote = 1) as positive,
-            COUNT(*) FILTER (WHERE feedback_vote = -1) as negative
-        FROM query_logs WHERE customer_id = :cid AND created_at > :since
-    """), {"cid": cid, "since": since})
-    fb = feedback_result.one()
-    total_feedback = fb[0] or 0
-    positive = fb[1] or 0
-    negative = fb[2] or 0
+    # Feedback summary and failed queries (grouped by question, counted)
+    stats = await query_stats(db, customer.id, since)
+    positive = stats.feedback_positive
+    negative = stats.feedback_negative
+    total_feedback = positive + negative
     satisfaction_rate = round((positive / total_feedback * 100) if total_feedback > 0 else 0, 1)
-
-    # Failed queries (grouped by question, counted)
-    failed_result = await db.execute(text("""
-        SELECT LOWER(TRIM(question)) as q,
-               COUNT(*) as cnt,
-               ROUND(AVG(top_score)::numeric, 3) as avg_score,
-               SUM(CASE WHEN feedback_vote = -1 THEN 1 ELSE 0 END) as neg_count
-        FROM query_logs
-        WHERE customer_id = :cid AND created_at > :since
-          AND (fallback_triggered = true OR retrieval_empty = true
-               OR llm_declined = true OR top_score < 0.25 OR feedback_vote = -1)
-        GROUP BY LOWER(TRIM(question))
-        HAVING COUNT(*) >= 1
-        ORDER BY cnt DESC
-        LIMIT 30
-    """), {"cid": cid, "since": since})
-    failed_queries = [
-        {"question": row[0], "count": row[1], "avg_score": float(row[2]) if row[2] else 0, "negative_feedback": row[3]}
-        for row in failed_result.fetchall()
-    ]
+    failed_queries = stats.failed_questions(30)
 
     # Negative feedback queries (individual, with answers)
     neg_result = await db.execute(text("""
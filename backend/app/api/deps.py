@@ -23,7 +23,7 @@ from datetime import datetime
 from typing import Optional
 
 from fastapi import Depends, Header, HTTPException, Request
-from sqlalchemy import select, update
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
@@ -31,6 +31,7 @@ from app.database import get_db
 from app.models.customer import Customer
 from app.models.tenant_admin_token import TenantAdminToken
 from app.services.admin_token_hash import verify_token
+from app.services.telemetry import get_telemetry_writer
 
 logger = logging.getLogger("zunkiree.deps")
 
@@ -112,8 +113,9 @@ async def get_admin_tenant(
     5. Stash the matched token's public id on `request.state.admin_token_id`
        so destructive handlers can attribute audit-log rows to the specific
        token used (Z-Ops hardening sweep).
-    6. Update last_used_at fire-and-forget. Errors here do NOT fail the
-       request — auditing is best-effort.
+    6. Queue the last_used_at update on the write-behind telemetry writer
+       (coalesced per token, flushed in batches). Errors here do NOT fail
+       the request — auditing is best-effort.
     """
     if not x_zunkiree_site_id:
         raise _unauthorized(
@@ -181,12 +183,9 @@ async def get_admin_tenant(
     # Best-effort last_used_at update. Swallow exceptions — auditing must
     # never block the request.
     try:
-        await db.execute(
-            update(TenantAdminToken)
-            .where(TenantAdminToken.id == matched.id)
-            .values(last_used_at=datetime.utcnow())
+        await get_telemetry_writer().update(
+            TenantAdminToken, matched.id, last_used_at=datetime.utcnow(),
         )
-        await db.commit()
     except Exception:
         logger.warning("Failed to update last_used_at for admin token", exc_info=True)
 
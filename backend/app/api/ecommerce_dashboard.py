@@ -3,20 +3,20 @@ Ecommerce dashboard API endpoints — orders, products, analytics for merchants.
 Authenticated via x-api-key header.
 """
 import json
-import csv
-import io
 import logging
 import uuid
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, Header, Query
-from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, text, desc
 
 from app.database import get_db
 from app.models import Customer, Product, WidgetConfig
-from app.models.order import Order
+from app.models.order import Order, OrderItem
+from app.services.answer_cache import invalidate_answers
+from app.services.export import ORDER_EXPORT_COLUMNS, ORDERS, ExportRequestError, export_response
+from app.services.tenant_context import invalidate_tenant
 
 logger = logging.getLogger("zunkiree.ecommerce_dashboard")
 
@@ -126,28 +126,22 @@ async def update_order_status(
 @router.get("/orders/export")
 async def export_orders(
     x_api_key: str = Header(...),
+    columns: str | None = Query(None, description="Comma-separated column names"),
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False),
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = Query(None),
     db: AsyncSession = Depends(get_db),
 ):
-    """Export all orders as CSV."""
+    """Streaming CSV/NDJSON export of orders (optionally a created_at range)."""
     customer = await _authenticate(db, x_api_key)
-
-    result = await db.execute(
-        select(Order).where(Order.customer_id == customer.id).order_by(desc(Order.created_at))
-    )
-    orders = result.scalars().all()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["order_number", "status", "payment_status", "total", "currency", "shopper_email", "created_at"])
-    for o in orders:
-        writer.writerow([o.order_number, o.status, o.payment_status, o.total, o.currency, o.shopper_email or "", o.created_at.isoformat() if o.created_at else ""])
-
-    output.seek(0)
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=orders.csv"},
-    )
+    try:
+        return export_response(
+            ORDERS, customer.id, "orders",
+            default_columns=ORDER_EXPORT_COLUMNS, columns=columns, fmt=fmt, compress=gzip, since=from_, until=to,
+        )
+    except ExportRequestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 # ===== Products =====
@@ -264,6 +258,7 @@ async def update_product(
         product.colors = json.dumps(body.colors)
     product.updated_at = datetime.utcnow()
     await db.commit()
+    await invalidate_answers(db, customer.id)
 
     return {"product": _product_to_dict(product)}
 
@@ -299,6 +294,7 @@ async def create_product(
     )
     db.add(product)
     await db.commit()
+    await invalidate_answers(db, customer.id)
     await db.refresh(product)
 
     return {"product": _product_to_dict(product)}
@@ -322,6 +318,7 @@ async def delete_product(
 
     await db.delete(product)
     await db.commit()
+    await invalidate_answers(db, customer.id)
 
     return {"detail": "Product deleted"}
 
@@ -383,29 +380,20 @@ async def analytics_overview(
     """Get overview KPIs: revenue, order count, avg order value, pending orders."""
     customer = await _authenticate(db, x_api_key)
 
-    # Total revenue (paid orders)
-    rev_result = await db.execute(
-        select(func.sum(Order.total), func.count()).where(
-            Order.customer_id == customer.id, Order.payment_status == "paid"
-        )
-    )
-    rev_row = rev_result.one_or_none()
-    total_revenue = rev_row[0] or 0 if rev_row else 0
-    paid_orders = rev_row[1] or 0 if rev_row else 0
-
-    # Total orders
-    total_result = await db.execute(
-        select(func.count()).select_from(Order).where(Order.customer_id == customer.id)
-    )
-    total_orders = total_result.scalar() or 0
-
-    # Pending orders
-    pending_result = await db.execute(
-        select(func.count()).select_from(Order).where(
-            Order.customer_id == customer.id, Order.status.in_(["pending", "payment_pending"])
-        )
-    )
-    pending_orders = pending_result.scalar() or 0
+    # One pass over the tenant's orders for every KPI
+    paid = Order.payment_status == "paid"
+    row = (await db.execute(
+        select(
+            func.coalesce(func.sum(Order.total).filter(paid), 0).label("total_revenue"),
+            func.count().filter(paid).label("paid_orders"),
+            func.count().label("total_orders"),
+            func.count().filter(Order.status.in_(["pending", "payment_pending"])).label("pending_orders"),
+        ).where(Order.customer_id == customer.id)
+    )).one()
+    total_revenue = row.total_revenue or 0
+    paid_orders = row.paid_orders or 0
+    total_orders = row.total_orders or 0
+    pending_orders = row.pending_orders or 0
 
     avg_order_value = round(total_revenue / paid_orders, 2) if paid_orders > 0 else 0
 
@@ -459,32 +447,26 @@ async def analytics_top_products(
     """Top products by revenue from paid orders."""
     customer = await _authenticate(db, x_api_key)
 
-    # Get all paid orders and aggregate by product
+    # Aggregated over order_items (customer_id, product_id index) joined to
+    # the paid orders; MAX(name) picks one display name per product.
+    revenue = func.sum(OrderItem.price * OrderItem.quantity).label("revenue")
     result = await db.execute(
-        select(Order.items).where(
-            Order.customer_id == customer.id, Order.payment_status == "paid"
+        select(
+            OrderItem.product_id,
+            func.max(OrderItem.name).label("name"),
+            revenue,
+            func.sum(OrderItem.quantity).label("units_sold"),
         )
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(OrderItem.customer_id == customer.id, Order.payment_status == "paid")
+        .group_by(OrderItem.product_id)
+        .order_by(desc(revenue))
+        .limit(limit)
     )
-
-    product_revenue: dict[str, dict] = {}
-    for row in result.fetchall():
-        items = json.loads(row[0]) if row[0] else []
-        for item in items:
-            pid = item.get("product_id", item.get("name", "unknown"))
-            if pid not in product_revenue:
-                product_revenue[pid] = {
-                    "name": item.get("name", "Unknown"),
-                    "revenue": 0,
-                    "units_sold": 0,
-                }
-            qty = item.get("quantity", 1)
-            product_revenue[pid]["revenue"] += item.get("price", 0) * qty
-            product_revenue[pid]["units_sold"] += qty
-
-    # Sort and limit
-    sorted_products = sorted(product_revenue.values(), key=lambda x: x["revenue"], reverse=True)[:limit]
-    for p in sorted_products:
-        p["revenue"] = round(p["revenue"], 2)
+    sorted_products = [
+        {"name": row.name, "revenue": round(row.revenue or 0, 2), "units_sold": int(row.units_sold or 0)}
+        for row in result.all()
+    ]
 
     return {"products": sorted_products}
 
@@ -524,6 +506,7 @@ async def update_settings(
         config.shipping_countries = json.dumps(body.shipping_countries)
 
     await db.commit()
+    await invalidate_tenant(db, customer.id, customer.site_id)
 
     return {
         "stripe_account_id": config.stripe_account_id,
@@ -2,7 +2,6 @@ import json
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy import func, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -10,6 +9,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import Customer, QueryLog, DocumentChunk, WidgetConfig
 from app.services.query import get_query_service
+from app.services.tenant_context import get_tenant_context_cache
+from app.services.telemetry import get_telemetry_writer
 from app.services.verification import (
     get_or_create_session,
     handle_email_submission,
@@ -24,6 +25,7 @@ from app.services.verification import (
     looks_like_code,
 )
 from app.services.personalization import classify_query, parse_lead_intents, _is_registration_query
+from app.utils.sse import sse_response
 from app.config import get_settings
 
 logger = logging.getLogger("zunkiree.query.api")
@@ -78,13 +80,11 @@ async def autocomplete(
     Return autocomplete suggestions based on popular past queries and document titles.
     Only returns genuine questions — never personal data (names, emails, phones, etc.).
     """
-    # Resolve customer
-    result = await db.execute(
-        select(Customer).where(Customer.site_id == site_id, Customer.is_active == True)
-    )
-    customer = result.scalar_one_or_none()
-    if not customer:
+    # Resolve customer (cached tenant context — this endpoint fires per keystroke)
+    tenant = await get_tenant_context_cache().get(db, site_id)
+    if not tenant:
         return {"suggestions": []}
+    customer = tenant.customer
 
     q_lower = q.strip().lower()
     suggestions: list[str] = []
@@ -140,10 +140,7 @@ async def autocomplete(
 
     # 3. Quick actions from widget config that match
     if len(suggestions) < 5:
-        config_result = await db.execute(
-            select(WidgetConfig).where(WidgetConfig.customer_id == customer.id)
-        )
-        config = config_result.scalar_one_or_none()
+        config = tenant.widget_config
         if config and config.quick_actions:
             try:
                 actions = json.loads(config.quick_actions)
@@ -198,16 +195,15 @@ async def submit_query(
 
     query_service = get_query_service()
 
-    try:
-        customer = await query_service._get_customer(db, query.site_id)
-        if not customer:
-            raise ValueError("Invalid site_id")
-        config = await query_service._get_widget_config(db, customer.id)
-    except ValueError as e:
+    # Cached per site_id; process_query(_stream) reuses the same snapshot.
+    tenant = await query_service.get_tenant_context(db, query.site_id)
+    if not tenant:
         raise HTTPException(
             status_code=401,
-            detail={"code": "INVALID_SITE_ID", "message": str(e)},
+            detail={"code": "INVALID_SITE_ID", "message": "Invalid site_id"},
         )
+    customer = tenant.customer
+    config = tenant.widget_config
 
     brand_name = config.brand_name if config else customer.name
 
@@ -489,16 +485,15 @@ async def submit_query_stream(
 
     query_service = get_query_service()
 
-    try:
-        customer = await query_service._get_customer(db, query.site_id)
-        if not customer:
-            raise ValueError("Invalid site_id")
-        config = await query_service._get_widget_config(db, customer.id)
-    except ValueError as e:
+    # Cached per site_id; process_query(_stream) reuses the same snapshot.
+    tenant = await query_service.get_tenant_context(db, query.site_id)
+    if not tenant:
         raise HTTPException(
             status_code=401,
-            detail={"code": "INVALID_SITE_ID", "message": str(e)},
+            detail={"code": "INVALID_SITE_ID", "message": "Invalid site_id"},
         )
+    customer = tenant.customer
+    config = tenant.widget_config
 
     brand_name = config.brand_name if config else customer.name
 
@@ -518,10 +513,10 @@ async def submit_query_stream(
                 greeting = GREETING_RESPONSES[lang].format(brand_name=brand_name)
             else:
                 greeting = f"Hi! I'm {brand_name}. How can I help you today?"
-            yield f"data: {json.dumps({'type': 'token', 'data': greeting})}\n\n"
-            yield f"data: {json.dumps({'type': 'done', 'answer': greeting, 'suggestions': suggestions, 'sources': [], 'session_id': query.session_id})}\n\n"
+            yield {'type': 'token', 'data': greeting}
+            yield {'type': 'done', 'answer': greeting, 'suggestions': suggestions, 'sources': [], 'session_id': query.session_id}
 
-        return StreamingResponse(greeting_stream(), media_type="text/event-stream")
+        return sse_response(greeting_stream())
 
     # --- Identity verification + lead capture (same logic as non-stream) ---
     user_email: str | None = None
@@ -546,9 +541,9 @@ async def submit_query_stream(
             # immediate is either a QueryResponse or a dict with stream-through data
             if isinstance(immediate, QueryResponse):
                 async def immediate_stream():
-                    yield f"data: {json.dumps({'type': 'token', 'data': immediate.answer})}\n\n"
-                    yield f"data: {json.dumps({'type': 'done', 'answer': immediate.answer, 'suggestions': immediate.suggestions, 'sources': [], 'session_id': immediate.session_id})}\n\n"
-                return StreamingResponse(immediate_stream(), media_type="text/event-stream")
+                    yield {'type': 'token', 'data': immediate.answer}
+                    yield {'type': 'done', 'answer': immediate.answer, 'suggestions': immediate.suggestions, 'sources': [], 'session_id': immediate.session_id}
+                return sse_response(immediate_stream())
             # dict means we should stream-through with enrichments
             user_email = immediate.get("user_email")
             user_profile_dict = immediate.get("user_profile")
@@ -562,9 +557,9 @@ async def submit_query_stream(
                     if v_session.pending_question or v_session.question_count >= 6:
                         message = await handle_email_submission(db, v_session, question_to_answer.strip(), brand_name)
                         async def email_stream():
-                            yield f"data: {json.dumps({'type': 'token', 'data': message})}\n\n"
-                            yield f"data: {json.dumps({'type': 'done', 'answer': message, 'suggestions': [], 'sources': [], 'session_id': query.session_id})}\n\n"
-                        return StreamingResponse(email_stream(), media_type="text/event-stream")
+                            yield {'type': 'token', 'data': message}
+                            yield {'type': 'done', 'answer': message, 'suggestions': [], 'sources': [], 'session_id': query.session_id}
+                        return sse_response(email_stream())
 
                 if is_reg_query or _is_registration_query(question_to_answer):
                     v_session.pending_question = question_to_answer
@@ -577,9 +572,9 @@ async def submit_query_stream(
                     await db.commit()
                     msg = "I can help you with that! Please enter your email address so I can check your account or get you started."
                     async def reg_stream():
-                        yield f"data: {json.dumps({'type': 'token', 'data': msg})}\n\n"
-                        yield f"data: {json.dumps({'type': 'done', 'answer': msg, 'suggestions': [], 'sources': [], 'session_id': query.session_id})}\n\n"
-                    return StreamingResponse(reg_stream(), media_type="text/event-stream")
+                        yield {'type': 'token', 'data': msg}
+                        yield {'type': 'done', 'answer': msg, 'suggestions': [], 'sources': [], 'session_id': query.session_id}
+                    return sse_response(reg_stream())
 
                 v_session.question_count = (v_session.question_count or 0) + 1
                 await db.commit()
@@ -613,7 +608,7 @@ async def submit_query_stream(
                     brand_name=brand_name,
                     image_data=query.image_data,
                 ):
-                    yield f"data: {json.dumps(event)}\n\n"
+                    yield event
                 return
 
             # Route hospitality customers to booking agent
@@ -628,12 +623,12 @@ async def submit_query_stream(
                     customer_id=customer.id,
                     brand_name=brand_name,
                 ):
-                    yield f"data: {json.dumps(event)}\n\n"
+                    yield event
                 return
 
             # Standard RAG pipeline for non-ecommerce
             if welcome_prefix:
-                yield f"data: {json.dumps({'type': 'token', 'data': welcome_prefix + ' '})}\n\n"
+                yield {'type': 'token', 'data': welcome_prefix + ' '}
                 prefix_sent = True
             async for event in query_service.process_query_stream(
                 db=db,
@@ -647,19 +642,19 @@ async def submit_query_stream(
                 language=query.language,
             ):
                 if event["type"] == "token":
-                    yield f"data: {json.dumps({'type': 'token', 'data': event['data']})}\n\n"
+                    yield {'type': 'token', 'data': event['data']}
                 elif event["type"] == "done":
                     answer = event["answer"]
                     if lead_signup_cta:
                         answer += "\n\nWant our team to reach out and help you further? Just share your email address!"
-                    yield f"data: {json.dumps({'type': 'done', 'answer': answer, 'suggestions': event.get('suggestions', []), 'sources': event.get('sources', []), 'session_id': query.session_id})}\n\n"
+                    yield {'type': 'done', 'answer': answer, 'suggestions': event.get('suggestions', []), 'sources': event.get('sources', []), 'session_id': query.session_id}
                 elif event["type"] == "error":
-                    yield f"data: {json.dumps({'type': 'error', 'message': event['message']})}\n\n"
+                    yield {'type': 'error', 'message': event['message']}
         except Exception as e:
             logger.exception("[QUERY-STREAM] Error: %s", e)
-            yield f"data: {json.dumps({'type': 'error', 'message': 'An error occurred processing your request'})}\n\n"
+            yield {'type': 'error', 'message': 'An error occurred processing your request'}
 
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
+    return sse_response(event_stream())
 
 
 async def _handle_verification_for_stream(
@@ -828,6 +823,11 @@ async def submit_feedback(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid query_log_id")
 
+    # The log row may still be buffered in this process's telemetry writer.
+    writer = get_telemetry_writer()
+    if any(row["id"] == log_id for row in writer.pending(QueryLog)):
+        await writer.flush()
+
     result = await db.execute(select(QueryLog).where(QueryLog.id == log_id))
     log = result.scalar_one_or_none()
     if not log:
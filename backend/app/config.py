@@ -11,8 +11,8 @@ class Settings(BaseSettings):
     openai_api_key: str
 
     # Pinecone
-    pinecone_api_key: str
-    pinecone_host: str
+    pinecone_api_key: str = ""  # required when vector_store_backend == "pinecone"
+    pinecone_host: str = ""
     pinecone_index_name: str = "zunkiree-search"
 
     # Database
@@ -33,6 +33,34 @@ class Settings(BaseSettings):
     top_k_chunks: int = 5
     confidence_threshold: float = 0.25
 
+    # Tenant context cache (customer + widget config + profile + domains per
+    # site_id, per-process; see app/services/tenant_context.py). 0 disables.
+    tenant_context_ttl_seconds: int = 60
+    tenant_context_max_entries: int = 1024
+
+    # Semantic answer cache (per-tenant, per-process entries; invalidated across
+    # workers via tenant_content_versions — see app/services/answer_cache.py)
+    answer_cache_enabled: bool = True
+    answer_cache_similarity_threshold: float = 0.95
+    answer_cache_ttl_seconds: int = 3600
+    answer_cache_max_entries_per_tenant: int = 256
+
+    # Local reranker for the ambiguous top_score band (see
+    # app/services/reranker.py); weights are shares of a 0..1 score
+    rerank_bm25_weight: float = 0.5
+    rerank_proximity_weight: float = 0.2
+    rerank_vector_weight: float = 0.3
+    rerank_bm25_k1: float = 1.2
+    rerank_bm25_b: float = 0.75
+    # rerank_mode=llm_fallback tenants call the LLM when the local top two
+    # scores are closer than this
+    rerank_llm_fallback_margin: float = 0.05
+
+    # Single-flight coalescing: identical concurrent personalisation-free
+    # questions (same site, normalised text, language) share one retrieval +
+    # generation, per process — see QueryService._coalesced_events
+    query_coalescing_enabled: bool = True
+
     # LLM Configuration
     llm_provider: str = "openai"  # Future: anthropic, azure, etc.
     llm_model: str = "gpt-4o-mini"  # Default: cheap, fast model
@@ -63,6 +91,53 @@ class Settings(BaseSettings):
     # Embeddings
     embedding_model: str = "text-embedding-3-large"
     embedding_dimensions: int = 3072
+    # Query embedding cache (in-process LRU + optional shared Postgres tier)
+    embedding_cache_size: int = 2048  # entries; 0 disables the in-process tier
+    embedding_cache_ttl_seconds: int = 86400
+    embedding_cache_shared: bool = False
+    # Ingestion embedding pipeline (see app/services/embedding_pipeline.py).
+    # The TPM/RPM limits are shared by every ingest in the process; set them
+    # to your OpenAI tier divided by the number of worker processes.
+    embedding_batch_max_tokens: int = 16000
+    embedding_batch_max_items: int = 256
+    embedding_concurrency: int = 4  # batches in flight per ingest call
+    embedding_tpm_limit: int = 1000000  # 0 disables
+    embedding_rpm_limit: int = 3000  # 0 disables
+    embedding_max_retries: int = 5  # on 429 / 5xx / connection errors
+    embedding_retry_base_seconds: float = 1.0  # doubled per retry, jittered
+
+    # Vector store — the Pinecone client is synchronous, so calls run on a
+    # bounded thread pool instead of the event loop. This caps how many
+    # Pinecone requests a single worker has in flight at once.
+    vector_store_max_concurrency: int = 8
+    # "pinecone" or "local" (memory-mapped NumPy index on disk; no network —
+    # for tests, laptops and single-box deploys). See local_vector_index.py.
+    vector_store_backend: str = "pinecone"
+    local_vector_index_dir: str = "./data/vector_index"
+
+    # Site crawler for URL ingestion (see app/utils/crawling.py SiteCrawler).
+    # One pooled HTTP client per crawl; pages are fetched concurrently up to
+    # crawl_concurrency, with at most crawl_per_host_concurrency per host.
+    crawl_concurrency: int = 8
+    crawl_per_host_concurrency: int = 4
+    crawl_timeout_seconds: int = 30
+    crawl_respect_robots: bool = False  # skip URLs disallowed by robots.txt
+    crawl_use_sitemap: bool = False  # seed the frontier from sitemap.xml when depth > 0
+
+    # Ingestion queue (see app/services/ingestion_queue.py). API replicas only
+    # enqueue; `python -m app.worker` runs the work. Set
+    # ingestion_worker_embedded to run the worker inside the API process
+    # instead (single-box/dev).
+    ingestion_worker_concurrency: int = 2
+    ingestion_max_attempts: int = 3
+    ingestion_retry_base_seconds: int = 30  # doubled per failed attempt, capped at 1h
+    ingestion_heartbeat_seconds: int = 15
+    ingestion_stale_after_seconds: int = 120  # reclaim running tasks with no heartbeat for this long
+    ingestion_worker_embedded: bool = False
+
+    # Bulk document_chunks writes (see app/services/chunk_writer.py)
+    chunk_write_method: str = "copy"  # copy | insert (multi-row INSERT)
+    chunk_write_batch_size: int = 1000  # rows per COPY/INSERT statement
 
     # Agenticom Sync (legacy global secret; per-tenant credentials in tenant_backend_credentials)
     agenticom_api_url: str = ""  # e.g., https://api-agenticom.zunkireelabs.com
@@ -87,6 +162,37 @@ class Settings(BaseSettings):
     chatbot_encryption_key: str = ""  # Fernet key for encrypting page_access_tokens
     chatbot_max_history: int = 10
     chatbot_conversation_ttl_days: int = 7
+    # Inbox rows processed concurrently per process (one at a time per sender).
+    meta_inbox_concurrency: int = 8
+
+    # Widget agent conversation history (see app/services/conversation.py).
+    # "memory" is a per-process bounded LRU; "postgres" is shared by every
+    # worker and replica (no sticky sessions needed).
+    conversation_store_backend: str = "memory"
+    conversation_max_sessions: int = 10000
+    conversation_max_bytes: int = 64 * 1024 * 1024
+
+    # Short-lived keyed state such as pending DM "Add to Cart" products (see
+    # app/services/keyed_state.py). "memory" is per-process; "postgres" is
+    # shared, so any Meta inbox worker can pick up the sender's next message.
+    keyed_state_backend: str = "memory"
+    keyed_state_max_entries: int = 50000
+
+    # Write-behind telemetry (query logs, DM logs, admin token last_used_at;
+    # see app/services/telemetry.py): flush after this many buffered rows or
+    # this long after the first, whichever comes first.
+    telemetry_batch_size: int = 200
+    telemetry_flush_interval_ms: int = 500
+    telemetry_max_buffered: int = 10000
+
+    # Daily analytics rollups of query_logs (see app/services/analytics_rollups.py)
+    analytics_rollup_interval_seconds: int = 300
+    analytics_rollup_grace_seconds: int = 600  # wait after midnight before rolling the day
+    analytics_rollup_max_days_per_run: int = 31  # backfill pace
+    analytics_rollup_top_questions: int = 50  # per tenant-day
+
+    # Streaming CSV/NDJSON exports (see app/services/export.py)
+    export_batch_size: int = 1000  # rows per server-side cursor fetch
 
     class Config:
         env_file = ".env"
@@ -20,6 +20,12 @@ from app.api.admin_inbound_webhooks import router as admin_inbound_webhooks_rout
 from app.api.admin_tenants import router as admin_tenants_router
 from app.middleware.correlation import CorrelationMiddleware
 from app.services.inbound_event_dispatcher import run_dispatcher_loop
+from app.services.ingestion_queue import IngestionWorker
+from app.services.meta_inbox import MetaInboxWorker
+from app.services.conversation import run_conversation_sweeper
+from app.services.keyed_state import run_keyed_state_sweeper
+from app.services.telemetry import get_telemetry_writer
+from app.services.analytics_rollups import run_analytics_rollup_job
 
 # --- Logging configuration (before anything else) ---
 logging.basicConfig(
@@ -53,6 +59,25 @@ async def lifespan(app: FastAPI):
     app.state.inbound_dispatcher_stop_event = stop_event
     app.state.inbound_dispatcher_task = dispatcher_task
 
+    # Meta DM inbox worker — POST /webhooks/meta only enqueues. Claims are
+    # per-sender ordered and SKIP LOCKED, so every replica can run one.
+    meta_inbox_task = asyncio.create_task(MetaInboxWorker().run(stop_event))
+
+    # Expire idle widget conversations (either backend) on a timer rather
+    # than only when a session is touched again.
+    conversation_sweeper_task = asyncio.create_task(run_conversation_sweeper(stop_event))
+    keyed_state_sweeper_task = asyncio.create_task(run_keyed_state_sweeper(stop_event))
+
+    # Daily query_logs rollups for the analytics endpoints; an advisory lock
+    # keeps it to one replica per pass.
+    analytics_rollup_task = asyncio.create_task(run_analytics_rollup_job(stop_event))
+
+    # Ingestion normally runs in the separate worker process (app/worker.py);
+    # single-box/dev deploys can run it here instead.
+    ingestion_task = None
+    if settings.ingestion_worker_embedded:
+        ingestion_task = asyncio.create_task(IngestionWorker().run(stop_event))
+
     yield
 
     # Shutdown
@@ -66,6 +91,24 @@ async def lifespan(app: FastAPI):
             await dispatcher_task
         except (asyncio.CancelledError, Exception):
             pass
+    try:
+        await asyncio.wait_for(meta_inbox_task, timeout=15)
+    except asyncio.TimeoutError:
+        meta_inbox_task.cancel()
+    except Exception:
+        pass
+    conversation_sweeper_task.cancel()
+    keyed_state_sweeper_task.cancel()
+    analytics_rollup_task.cancel()
+    if ingestion_task is not None:
+        try:
+            await asyncio.wait_for(ingestion_task, timeout=30)
+        except asyncio.TimeoutError:
+            ingestion_task.cancel()
+        except Exception:
+            pass
+    # Last: the workers above may still have logged rows on their way out.
+    await get_telemetry_writer().close()
 
 
 app = FastAPI(
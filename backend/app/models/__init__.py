@@ -1,14 +1,14 @@
 from app.models.customer import Customer
 from app.models.domain import Domain
 from app.models.widget_config import WidgetConfig
-from app.models.ingestion import IngestionJob, DocumentChunk
+from app.models.ingestion import IngestionJob, DocumentChunk, CrawledPage
 from app.models.query_log import QueryLog
 from app.models.verification import VerificationSession
 from app.models.user_profile import UserProfile
 from app.models.product import Product
 from app.models.cart import ShoppingCart
 from app.models.wishlist import Wishlist
-from app.models.order import Order
+from app.models.order import Order, OrderItem
 from app.models.payment import Payment
 from app.models.room import Room
 from app.models.chatbot import ChatbotChannel, ChatbotConversation, ChatbotMessageLog
@@ -18,6 +18,13 @@ from app.models.tenant_admin_token import TenantAdminToken
 from app.models.tenant_outbound_webhook import TenantOutboundWebhook
 from app.models.inbound_webhook_event import InboundWebhookEvent
 from app.models.admin_audit_log import AdminAuditLog
+from app.models.embedding_cache import EmbeddingCacheEntry
+from app.models.tenant_content_version import TenantContentVersion
+from app.models.ingestion_task import IngestionTask
+from app.models.meta_webhook_inbox import MetaWebhookInbox
+from app.models.widget_conversation import WidgetConversation
+from app.models.keyed_state import KeyedState
+from app.models.analytics_rollup import QueryLogDailyRollup, AnalyticsRollupState
 
 __all__ = [
     "Customer",
@@ -25,6 +32,7 @@ __all__ = [
     "WidgetConfig",
     "IngestionJob",
     "DocumentChunk",
+    "CrawledPage",
     "QueryLog",
     "VerificationSession",
     "UserProfile",
@@ -32,6 +40,7 @@ __all__ = [
     "ShoppingCart",
     "Wishlist",
     "Order",
+    "OrderItem",
     "Payment",
     "Room",
     "ChatbotChannel",
@@ -43,4 +52,12 @@ __all__ = [
     "TenantOutboundWebhook",
     "InboundWebhookEvent",
     "AdminAuditLog",
+    "EmbeddingCacheEntry",
+    "TenantContentVersion",
+    "IngestionTask",
+    "MetaWebhookInbox",
+    "WidgetConversation",
+    "KeyedState",
+    "QueryLogDailyRollup",
+    "AnalyticsRollupState",
 ]
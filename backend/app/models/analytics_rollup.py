@@ -0,0 +1,60 @@
+import uuid
+from datetime import date, datetime
+from typing import Any
+
+from sqlalchemy import BigInteger, Date, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class QueryLogDailyRollup(Base):
+    """query_logs aggregates for one tenant and UTC day (migration 049).
+
+    Written by the analytics rollup job (app/services/analytics_rollups.py);
+    the JSONB columns hold the latency histogram, retrieval-mode counts and
+    the day's top normalised / failed questions.
+    """
+
+    __tablename__ = "query_log_daily_rollups"
+
+    customer_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("customers.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    with_answer: Mapped[int] = mapped_column(Integer, default=0)
+    fallback: Mapped[int] = mapped_column(Integer, default=0)
+    blocked: Mapped[int] = mapped_column(Integer, default=0)
+    llm_declined: Mapped[int] = mapped_column(Integer, default=0)
+    empty: Mapped[int] = mapped_column(Integer, default=0)
+    rerank: Mapped[int] = mapped_column(Integer, default=0)
+    cache_hit: Mapped[int] = mapped_column(Integer, default=0)
+    threshold_guard: Mapped[int] = mapped_column(Integer, default=0)
+    feedback_positive: Mapped[int] = mapped_column(Integer, default=0)
+    feedback_negative: Mapped[int] = mapped_column(Integer, default=0)
+    top_score_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    top_score_n: Mapped[int] = mapped_column(Integer, default=0)
+    response_time_sum: Mapped[int] = mapped_column(BigInteger, default=0)
+    response_time_n: Mapped[int] = mapped_column(Integer, default=0)
+    context_tokens_sum: Mapped[int] = mapped_column(BigInteger, default=0)
+    context_tokens_n: Mapped[int] = mapped_column(Integer, default=0)
+    latency_histogram: Mapped[Any] = mapped_column(JSONB, nullable=False, default=list)
+    modes: Mapped[Any] = mapped_column(JSONB, nullable=False, default=dict)
+    top_questions: Mapped[Any] = mapped_column(JSONB, nullable=False, default=list)
+    failed_questions: Mapped[Any] = mapped_column(JSONB, nullable=False, default=list)
+    computed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class AnalyticsRollupState(Base):
+    """Progress of a rollup job: last closed day rolled, and when late
+    feedback was last checked for."""
+
+    __tablename__ = "analytics_rollup_state"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    rolled_through: Mapped[date | None] = mapped_column(Date, nullable=True)
+    feedback_checked_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
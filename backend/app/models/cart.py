@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, DateTime, ForeignKey, Text
+from sqlalchemy import BigInteger, String, DateTime, ForeignKey, Text
 from sqlalchemy.orm import Mapped, mapped_column
 from app.database import Base
 
@@ -18,5 +18,7 @@ class ShoppingCart(Base):
         nullable=False,
     )
     items: Mapped[str] = mapped_column(Text, default="[]")  # JSON array of cart items
+    # Bumped on every write; CartService writes compare-and-swap on it (migration 045).
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=1)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY, REAL
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class EmbeddingCacheEntry(Base):
+    """Shared tier of the query embedding cache (migration 038).
+
+    Read and written with raw SQL by `app.services.embedding_cache` only when
+    EMBEDDING_CACHE_SHARED is on; mapped here so `init_db` creates the table.
+    """
+
+    __tablename__ = "embedding_cache"
+
+    cache_key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    dimensions: Mapped[int] = mapped_column(Integer, nullable=False)
+    embedding: Mapped[list[float]] = mapped_column(ARRAY(REAL), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=datetime.utcnow, index=True,
+    )
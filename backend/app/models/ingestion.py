@@ -1,6 +1,7 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, DateTime, ForeignKey, Integer, Text, Column
+from sqlalchemy import String, DateTime, Float, ForeignKey, Integer, Text, Column, Computed, UniqueConstraint
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.types import TypeDecorator
 from sqlalchemy.sql import func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -25,6 +26,10 @@ class IngestionJob(Base):
     status: Mapped[str] = mapped_column(String(20), default="pending", index=True)  # pending, processing, completed, failed
     chunks_created: Mapped[int] = mapped_column(Integer, default=0)
     error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Embedding throughput (migration 051): chunks embedded and seconds spent
+    # in the embedding pipeline, summed over the job's _process_chunks calls.
+    embedding_chunks: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    embedding_seconds: Mapped[float | None] = mapped_column(Float, nullable=True)
     started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     completed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
@@ -58,7 +63,9 @@ class DocumentChunk(Base):
     source_url: Mapped[str | None] = mapped_column(Text, nullable=True)
     source_title: Mapped[str | None] = mapped_column(String(255), nullable=True)
     token_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
-    search_vector = Column("search_vector", nullable=True)
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)  # SHA256 of content
+    # Generated by Postgres (migration 048); never written by the app.
+    search_vector = Column("search_vector", TSVECTOR, Computed("to_tsvector('english', content)", persisted=True))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -66,4 +73,33 @@ class DocumentChunk(Base):
     job: Mapped["IngestionJob"] = relationship(back_populates="chunks")
 
 
+class CrawledPage(Base):
+    """Last crawl of one URL for incremental re-ingestion.
+
+    Holds the HTTP validators for conditional GETs, a hash of the extracted
+    text (so an unchanged page is not re-chunked even when the server ignores
+    validators) and the page's links (so a 304 still expands the crawl).
+    """
+
+    __tablename__ = "crawled_pages"
+    __table_args__ = (UniqueConstraint("customer_id", "url", name="uq_crawled_pages_customer_url"),)
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        primary_key=True,
+        default=uuid.uuid4,
+    )
+    customer_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("customers.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    url: Mapped[str] = mapped_column(Text, nullable=False)  # normalize_url() form
+    etag: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    last_modified: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    links: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON array
+    last_crawled_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 from app.models.customer import Customer
@@ -0,0 +1,52 @@
+"""
+IngestionTask — durable queue row for ingestion work (migration 042).
+
+API handlers enqueue a task (and, for url/text/file/qa work, the
+IngestionJob it will run) and return immediately. The ingestion worker
+(`python -m app.worker`) claims queued rows with `FOR UPDATE SKIP LOCKED`,
+heartbeats while running, and either finishes, re-queues with backoff, or
+fails the task. A `running` row whose heartbeat goes stale (worker crashed or
+was redeployed) is claimed again.
+"""
+import uuid
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Integer, LargeBinary, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class IngestionTask(Base):
+    __tablename__ = "ingestion_tasks"
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    customer_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("customers.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    job_id: Mapped[uuid.UUID | None] = mapped_column(
+        ForeignKey("ingestion_jobs.id", ondelete="CASCADE"),
+        nullable=True,
+    )
+
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)  # url, text, file, qa, auto_ingest
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    blob: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)  # uploaded file bytes
+
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="queued")  # queued, running, done, failed
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=3)
+    run_after: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=datetime.utcnow,
+    )
+    locked_by: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=datetime.utcnow,
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import DateTime, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class KeyedState(Base):
+    """One short-lived key/value with an expiry (migration 046).
+
+    Backs PostgresKeyedStateStore; `namespace` separates uses (e.g. the DM
+    handler's pending cart adds from its last product results). Expired rows
+    read as absent and the sweep deletes them.
+    """
+
+    __tablename__ = "keyed_state"
+
+    namespace: Mapped[str] = mapped_column(String(64), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    value: Mapped[Any] = mapped_column(JSONB, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,44 @@
+"""
+MetaWebhookInbox — durable inbox for Meta messaging webhooks (migration 043).
+
+POST /webhooks/meta inserts one row per message/postback event with
+`ON CONFLICT (platform, dedup_key) DO NOTHING` and acks; the inbox worker
+(app/services/meta_inbox.py) processes rows in `id` order per
+(page_id, sender_id). `payload` is the event re-wrapped as a single-event
+webhook entry, so the existing per-platform entry processors run unchanged.
+"""
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Integer, String, Text, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class MetaWebhookInbox(Base):
+    __tablename__ = "meta_webhook_inbox"
+    __table_args__ = (
+        UniqueConstraint("platform", "dedup_key", name="uq_meta_webhook_inbox_platform_dedup_key"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    platform: Mapped[str] = mapped_column(String(20), nullable=False)  # instagram, messenger, whatsapp
+    page_id: Mapped[str] = mapped_column(String(100), nullable=False)
+    sender_id: Mapped[str] = mapped_column(String(100), nullable=False)
+    dedup_key: Mapped[str] = mapped_column(String(200), nullable=False)  # message mid, or a hash of the event
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")  # pending, processing, done, failed
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    run_after: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=datetime.utcnow,
+    )
+    locked_by: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    locked_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    received_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=datetime.utcnow,
+    )
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
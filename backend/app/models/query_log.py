@@ -35,6 +35,7 @@ class QueryLog(Base):
     retrieval_blocked: Mapped[bool] = mapped_column(Boolean, default=False)
     llm_declined: Mapped[bool] = mapped_column(Boolean, default=False)
     retrieval_empty: Mapped[bool] = mapped_column(Boolean, default=False)
+    answer_cache_hit: Mapped[bool] = mapped_column(Boolean, default=False)
     feedback_vote: Mapped[Optional[int]] = mapped_column(SmallInteger, nullable=True)
     feedback_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,25 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class TenantContentVersion(Base):
+    """Per-tenant content version shared by every worker (migration 040).
+
+    Bumped whenever a tenant's answerable content or config changes; the
+    semantic answer cache only serves entries written under the current
+    version. No FK to customers — a bump after a tenant delete must not fail,
+    and an orphaned row is harmless.
+    """
+
+    __tablename__ = "tenant_content_versions"
+
+    customer_id: Mapped[uuid.UUID] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=1)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=datetime.utcnow,
+    )
@@ -32,6 +32,7 @@ class WidgetConfig(Base):
     show_suggestions: Mapped[bool] = mapped_column(Boolean, default=True)
     quick_actions: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON string of suggestion strings
     confidence_threshold: Mapped[float] = mapped_column(Float, default=0.25)
+    rerank_mode: Mapped[str] = mapped_column(String(20), default="local")  # local | llm_fallback | llm
     enable_identity_verification: Mapped[bool] = mapped_column(Boolean, default=False)
     identity_custom_fields: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON array of custom field defs
     lead_intents: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON array of lead intent configs
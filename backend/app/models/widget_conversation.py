@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class WidgetConversation(Base):
+    """Widget agent history for one session (migration 044).
+
+    Backs PostgresConversationStore so any worker or replica can serve the
+    next turn. No FK to customers — sessions are anonymous and the sweep
+    removes idle rows.
+    """
+
+    __tablename__ = "widget_conversations"
+
+    session_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    messages: Mapped[list] = mapped_column(JSONB, nullable=False, default=list)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=datetime.utcnow, index=True,
+    )
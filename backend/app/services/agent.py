@@ -63,6 +63,49 @@ class AgentService:
         - {"type": "address_form", "data": {...}} for inline address form
         - {"type": "done", "answer": "...", "suggestions": [...]}
         """
+        from app.services.cart import get_cart_service
+        cart_service = get_cart_service()
+
+        # Validate the cached cart once, then coalesce this turn's cart writes
+        # into a single compare-and-swap at the end (or before checkout).
+        await cart_service.load_from_db(db, session_id)
+        cart_service.begin_turn(session_id)
+        try:
+            async for event in self._agent_turn_stream(
+                db=db,
+                site_id=site_id,
+                session_id=session_id,
+                question=question,
+                customer_id=customer_id,
+                brand_name=brand_name,
+                image_data=image_data,
+                system_prompt_override=system_prompt_override,
+                conversation_history=conversation_history,
+                force_tool_on_first_turn=force_tool_on_first_turn,
+                platform_sender_id=platform_sender_id,
+            ):
+                if event["type"] in ("checkout", "address_form", "done"):
+                    # The client may read the cart back from the DB from here on.
+                    await cart_service.flush_turn(db, session_id)
+                yield event
+        finally:
+            await cart_service.end_turn(db, session_id)
+
+    async def _agent_turn_stream(
+        self,
+        db: AsyncSession,
+        site_id: str,
+        session_id: str,
+        question: str,
+        customer_id: uuid.UUID,
+        brand_name: str,
+        image_data: str | None = None,
+        system_prompt_override: str | None = None,
+        conversation_history: list[dict] | None = None,
+        force_tool_on_first_turn: bool = False,
+        platform_sender_id: str | None = None,
+    ):
+        """Run one agent turn; see process_agent_stream for the events yielded."""
         # If image_data is provided, use GPT-4o Vision to describe the item
         if image_data:
             try:
@@ -90,18 +133,14 @@ class AgentService:
         else:
             system_prompt = ECOMMERCE_SYSTEM_PROMPT.format(brand_name=brand_name)
 
-        # Load cart from DB if this is a returning session
-        from app.services.cart import get_cart_service
-        await get_cart_service().load_from_db(db, session_id)
-
         # Get conversation history — prefer DB-backed history when provided (e.g., from DM flow)
         if conversation_history is not None:
             history = conversation_history
         else:
-            history = self.conversation_store.get_messages(session_id)
+            history = await self.conversation_store.get_messages(session_id)
 
-        # Add user message to in-memory store (for widget sessions)
-        self.conversation_store.add_message(session_id, "user", question)
+        # Add user message to the conversation store (for widget sessions)
+        await self.conversation_store.add_message(session_id, "user", question)
 
         # Build messages for OpenAI — keep last 10 messages to reduce latency
         messages = [{"role": "system", "content": system_prompt}]
@@ -275,7 +314,7 @@ class AgentService:
 
         # Save assistant response to conversation
         if full_answer:
-            self.conversation_store.add_message(session_id, "assistant", full_answer)
+            await self.conversation_store.add_message(session_id, "assistant", full_answer)
 
         # Generate suggestions
         suggestions = _generate_shopping_suggestions(full_answer)
@@ -0,0 +1,466 @@
+"""
+Per-tenant daily rollups of query_logs for the analytics endpoints.
+
+query_log_daily_rollups holds one row per (tenant, UTC day):
+- counts: total, answered, fallback, blocked, LLM-declined, empty retrieval,
+  rerank, answer-cache hits and threshold-guard queries;
+- feedback votes (by the day the query was asked);
+- sums/counts for the average top score, response time and context tokens;
+- a response-time histogram (fixed LATENCY_BUCKETS_MS) for percentiles;
+- retrieval-mode counts;
+- the day's top ANALYTICS_ROLLUP_TOP_QUESTIONS normalised questions, and
+  separately its top failed questions (fallback, empty, declined, low score
+  or a thumbs-down).
+
+`run_analytics_rollup_job` rolls each closed day once it is
+ANALYTICS_ROLLUP_GRACE_SECONDS old, so buffered telemetry rows have landed.
+Each run re-rolls the (tenant, day) pairs that received feedback since the
+last run, so votes cast days later still count. It backfills at most
+ANALYTICS_ROLLUP_MAX_DAYS_PER_RUN days per run. A transaction-level
+advisory lock makes sure only one replica rolls at a time.
+
+Readers call `query_stats()`. It serves whole rolled days from the rollups,
+and aggregates the rest of the window (a partial first day, anything not
+rolled yet, today) from raw query_logs with the same code the job uses.
+Counts, averages and feedback are exact. Two results are estimates:
+- p95 comes from the histogram, so it is accurate to within one bucket.
+- Top questions across days merge per-day top lists, so a question that
+  never makes a single day's list is missed.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import and_, case, func, literal_column, or_, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.config import get_settings
+from app.database import async_session_maker
+from app.models import AnalyticsRollupState, QueryLog, QueryLogDailyRollup
+
+logger = logging.getLogger("zunkiree.analytics.rollups")
+
+settings = get_settings()
+
+ROLLUP_NAME = "query_logs"
+
+# Lower edges of the response-time histogram buckets, in milliseconds; the
+# last bucket is open-ended.
+LATENCY_BUCKETS_MS = (
+    0, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 7500, 10000, 15000, 20000, 30000, 60000,
+)
+
+_BUCKET_EDGES = literal_column("ARRAY[%s]::int[]" % ",".join(str(edge) for edge in LATENCY_BUCKETS_MS))
+
+# Same "failed" definition the search-quality endpoints always used.
+LOW_SCORE = 0.25
+
+# Arbitrary constant for pg_try_advisory_xact_lock.
+_LOCK_KEY = 0x5A524F4C  # "ZROL"
+
+# Votes are stamped before their commit; re-check a little overlap.
+_FEEDBACK_OVERLAP = timedelta(minutes=5)
+
+
+def _now() -> datetime:
+    return datetime.utcnow()
+
+
+def _midnight(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+@dataclass
+class QueryStats:
+    """Aggregates over any set of query_logs rows; `merge` adds two together."""
+
+    total: int = 0
+    with_answer: int = 0
+    fallback: int = 0
+    blocked: int = 0
+    llm_declined: int = 0
+    empty: int = 0
+    rerank: int = 0
+    cache_hit: int = 0
+    threshold_guard: int = 0
+    feedback_positive: int = 0
+    feedback_negative: int = 0
+    top_score_sum: float = 0.0
+    top_score_n: int = 0
+    response_time_sum: int = 0
+    response_time_n: int = 0
+    context_tokens_sum: int = 0
+    context_tokens_n: int = 0
+    latency_histogram: list[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS_MS))
+    modes: dict[str, int] = field(default_factory=dict)
+    # normalised question -> [display (MIN of the raw text), count]
+    questions: dict[str, list] = field(default_factory=dict)
+    # normalised question -> [count, top_score_sum, top_score_n, negative votes]
+    failed: dict[str, list] = field(default_factory=dict)
+
+    _COUNTERS = (
+        "total", "with_answer", "fallback", "blocked", "llm_declined", "empty", "rerank", "cache_hit",
+        "threshold_guard", "feedback_positive", "feedback_negative", "top_score_sum", "top_score_n",
+        "response_time_sum", "response_time_n", "context_tokens_sum", "context_tokens_n",
+    )
+
+    def merge(self, other: QueryStats) -> None:
+        for name in self._COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.latency_histogram = [a + b for a, b in zip(self.latency_histogram, other.latency_histogram)]
+        for mode, count in other.modes.items():
+            self.modes[mode] = self.modes.get(mode, 0) + count
+        for norm, (display, count) in other.questions.items():
+            mine = self.questions.get(norm)
+            if mine is None:
+                self.questions[norm] = [display, count]
+            else:
+                mine[0] = min(mine[0], display)
+                mine[1] += count
+        for norm, values in other.failed.items():
+            mine = self.failed.setdefault(norm, [0, 0.0, 0, 0])
+            for i, value in enumerate(values):
+                mine[i] += value
+
+    # ---------- Derived values ----------
+
+    @property
+    def avg_top_score(self) -> float | None:
+        return self.top_score_sum / self.top_score_n if self.top_score_n else None
+
+    @property
+    def avg_response_time(self) -> float | None:
+        return self.response_time_sum / self.response_time_n if self.response_time_n else None
+
+    @property
+    def avg_context_tokens(self) -> float | None:
+        return self.context_tokens_sum / self.context_tokens_n if self.context_tokens_n else None
+
+    def latency_percentile(self, pct: float) -> float | None:
+        """percentile_cont-style estimate, interpolated inside the bucket."""
+        n = sum(self.latency_histogram)
+        if not n:
+            return None
+        rank = pct * (n - 1)
+        seen = 0
+        for i, count in enumerate(self.latency_histogram):
+            if count and rank < seen + count:
+                low = LATENCY_BUCKETS_MS[i]
+                if i + 1 == len(LATENCY_BUCKETS_MS):
+                    return float(low)
+                high = LATENCY_BUCKETS_MS[i + 1]
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return float(LATENCY_BUCKETS_MS[-1])
+
+    def top_questions(self, limit: int) -> list[tuple[str, int]]:
+        """(display, count), most asked first."""
+        ranked = sorted(self.questions.items(), key=lambda item: (-item[1][1], item[0]))
+        return [(display, count) for _, (display, count) in ranked[:limit]]
+
+    def failed_questions(self, limit: int) -> list[dict]:
+        ranked = sorted(self.failed.items(), key=lambda item: (-item[1][0], item[0]))
+        return [
+            {
+                "question": norm,
+                "count": count,
+                "avg_score": round(score_sum / score_n, 3) if score_n else 0,
+                "negative_feedback": negative,
+            }
+            for norm, (count, score_sum, score_n, negative) in ranked[:limit]
+        ]
+
+    # ---------- Rollup rows ----------
+
+    def to_row(self, customer_id, day: date, top_limit: int) -> dict:
+        top = sorted(self.questions.items(), key=lambda item: (-item[1][1], item[0]))[:top_limit]
+        failed = sorted(self.failed.items(), key=lambda item: (-item[1][0], item[0]))[:top_limit]
+        row = {name: getattr(self, name) for name in self._COUNTERS}
+        row.update(
+            customer_id=customer_id,
+            day=day,
+            latency_histogram=self.latency_histogram,
+            modes=self.modes,
+            top_questions=[[norm, display, count] for norm, (display, count) in top],
+            failed_questions=[[norm, *values] for norm, values in failed],
+            computed_at=_now(),
+        )
+        return row
+
+    @classmethod
+    def from_row(cls, row) -> QueryStats:
+        stats = cls(**{name: getattr(row, name) or 0 for name in cls._COUNTERS})
+        histogram = list(row.latency_histogram or [])
+        stats.latency_histogram = (histogram + [0] * len(LATENCY_BUCKETS_MS))[:len(LATENCY_BUCKETS_MS)]
+        stats.modes = dict(row.modes or {})
+        stats.questions = {norm: [display, count] for norm, display, count in (row.top_questions or [])}
+        stats.failed = {item[0]: list(item[1:]) for item in (row.failed_questions or [])}
+        return stats
+
+
+# ---------- Aggregation over raw query_logs ----------
+
+def _flag(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+async def aggregate(
+    db,
+    ranges: list[tuple[datetime, datetime, bool]],
+    customer_ids: list | None = None,
+    with_questions: bool = True,
+) -> dict[tuple, QueryStats]:
+    """QueryStats per (customer_id, day) over query_logs rows whose created_at
+    falls in any of `ranges` ((start, end, end_inclusive); start inclusive)."""
+    in_range = or_(*[
+        and_(QueryLog.created_at >= start, QueryLog.created_at <= end if inclusive else QueryLog.created_at < end)
+        for start, end, inclusive in ranges
+    ])
+    where = [in_range]
+    if customer_ids is not None:
+        where.append(QueryLog.customer_id.in_(customer_ids))
+    day = func.date(QueryLog.created_at).label("day")
+    keys = (QueryLog.customer_id, day)
+    out: dict[tuple, QueryStats] = {}
+
+    def stats_for(row) -> QueryStats:
+        return out.setdefault((row.customer_id, row.day), QueryStats())
+
+    scalars = await db.execute(
+        select(
+            *keys,
+            func.count().label("total"),
+            _flag(QueryLog.answer.isnot(None) & QueryLog.fallback_triggered.is_(False)).label("with_answer"),
+            _flag(QueryLog.fallback_triggered.is_(True)).label("fallback"),
+            _flag(QueryLog.retrieval_blocked.is_(True)).label("blocked"),
+            _flag(QueryLog.llm_declined.is_(True)).label("llm_declined"),
+            _flag(QueryLog.retrieval_empty.is_(True)).label("empty"),
+            _flag(QueryLog.rerank_triggered.is_(True)).label("rerank"),
+            _flag(QueryLog.answer_cache_hit.is_(True)).label("cache_hit"),
+            _flag(QueryLog.retrieval_mode == "hybrid_threshold").label("threshold_guard"),
+            _flag(QueryLog.feedback_vote == 1).label("feedback_positive"),
+            _flag(QueryLog.feedback_vote == -1).label("feedback_negative"),
+            func.sum(QueryLog.top_score).label("top_score_sum"),
+            func.count(QueryLog.top_score).label("top_score_n"),
+            func.sum(QueryLog.response_time_ms).label("response_time_sum"),
+            func.count(QueryLog.response_time_ms).label("response_time_n"),
+            func.sum(QueryLog.context_tokens).label("context_tokens_sum"),
+            func.count(QueryLog.context_tokens).label("context_tokens_n"),
+        ).where(*where).group_by(*keys)
+    )
+    for row in scalars.all():
+        stats = stats_for(row)
+        for name in QueryStats._COUNTERS:
+            value = getattr(row, name) or 0
+            setattr(stats, name, float(value) if name == "top_score_sum" else int(value))
+
+    bucket = func.width_bucket(QueryLog.response_time_ms, _BUCKET_EDGES).label("bucket")
+    histogram = await db.execute(
+        select(*keys, bucket, func.count().label("cnt"))
+        .where(*where, QueryLog.response_time_ms.isnot(None), QueryLog.response_time_ms >= 0)
+        .group_by(*keys, bucket)
+    )
+    for row in histogram.all():
+        stats_for(row).latency_histogram[row.bucket - 1] += row.cnt
+
+    modes = await db.execute(
+        select(*keys, QueryLog.retrieval_mode, func.count().label("cnt"))
+        .where(*where, QueryLog.retrieval_mode.isnot(None))
+        .group_by(*keys, QueryLog.retrieval_mode)
+    )
+    for row in modes.all():
+        stats_for(row).modes[row.retrieval_mode] = row.cnt
+
+    if with_questions:
+        failed = (
+            QueryLog.fallback_triggered.is_(True) | QueryLog.retrieval_empty.is_(True)
+            | QueryLog.llm_declined.is_(True) | (QueryLog.top_score < LOW_SCORE) | (QueryLog.feedback_vote == -1)
+        )
+        norm = func.lower(func.trim(QueryLog.question)).label("norm")
+        questions = await db.execute(
+            select(
+                *keys,
+                norm,
+                func.min(QueryLog.question).label("display"),
+                func.count().label("cnt"),
+                _flag(failed).label("failed_cnt"),
+                func.sum(case((failed, QueryLog.top_score), else_=None)).label("failed_score_sum"),
+                func.count(case((failed, QueryLog.top_score), else_=None)).label("failed_score_n"),
+                _flag(failed & (QueryLog.feedback_vote == -1)).label("failed_negative"),
+            ).where(*where).group_by(*keys, norm)
+        )
+        for row in questions.all():
+            stats = stats_for(row)
+            stats.questions[row.norm] = [row.display, row.cnt]
+            if row.failed_cnt:
+                stats.failed[row.norm] = [
+                    int(row.failed_cnt), float(row.failed_score_sum or 0.0),
+                    int(row.failed_score_n or 0), int(row.failed_negative or 0),
+                ]
+    return out
+
+
+# ---------- Readers ----------
+
+async def _rolled_through(db) -> date | None:
+    return (await db.execute(
+        select(AnalyticsRollupState.rolled_through).where(AnalyticsRollupState.name == ROLLUP_NAME)
+    )).scalar()
+
+
+def split_window(
+    since: datetime | None, until: datetime, rolled_through: date | None,
+) -> tuple[tuple[date, date] | None, list[tuple[datetime, datetime, bool]]]:
+    """Split [since, until] into whole rolled days (first, last) and the raw
+    ranges around them. `since=None` means all history."""
+    everything = [(since or datetime.min, until, True)]
+    if rolled_through is None:
+        return None, everything
+    if since is None:
+        first = date.min
+    else:
+        first = since.date() if since == _midnight(since.date()) else since.date() + timedelta(days=1)
+    last = min(rolled_through, until.date() - timedelta(days=1))
+    if first > last:
+        return None, everything
+    ranges = []
+    if since is not None and since < _midnight(first):
+        ranges.append((since, _midnight(first), False))
+    ranges.append((_midnight(last + timedelta(days=1)), until, True))
+    return (first, last), ranges
+
+
+async def query_stats(
+    db,
+    customer_id,
+    since: datetime | None,
+    until: datetime | None = None,
+    with_questions: bool = True,
+) -> QueryStats:
+    """QueryStats for one tenant over [since, until] (until defaults to now)."""
+    until = until or _now()
+    days, ranges = split_window(since, until, await _rolled_through(db))
+    stats = QueryStats()
+    if days is not None:
+        rows = await db.execute(
+            select(QueryLogDailyRollup).where(
+                QueryLogDailyRollup.customer_id == customer_id,
+                QueryLogDailyRollup.day >= days[0],
+                QueryLogDailyRollup.day <= days[1],
+            )
+        )
+        for row in rows.scalars().all():
+            stats.merge(QueryStats.from_row(row))
+    for partial in (await aggregate(db, ranges, [customer_id], with_questions)).values():
+        stats.merge(partial)
+    return stats
+
+
+async def count_queries(db, customer_id) -> int:
+    """All-time query count for one tenant."""
+    rolled_through = await _rolled_through(db)
+    rolled = 0
+    since = datetime.min
+    if rolled_through is not None:
+        rolled = (await db.execute(
+            select(func.coalesce(func.sum(QueryLogDailyRollup.total), 0)).where(
+                QueryLogDailyRollup.customer_id == customer_id,
+                QueryLogDailyRollup.day <= rolled_through,
+            )
+        )).scalar() or 0
+        since = _midnight(rolled_through + timedelta(days=1))
+    recent = (await db.execute(
+        select(func.count()).select_from(QueryLog).where(
+            QueryLog.customer_id == customer_id,
+            QueryLog.created_at >= since,
+        )
+    )).scalar() or 0
+    return int(rolled) + int(recent)
+
+
+# ---------- Background job ----------
+
+async def _upsert(db, rows: list[dict]) -> None:
+    if not rows:
+        return
+    statement = pg_insert(QueryLogDailyRollup).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[QueryLogDailyRollup.customer_id, QueryLogDailyRollup.day],
+        set_={name: statement.excluded[name] for name in rows[0] if name not in ("customer_id", "day")},
+    )
+    await db.execute(statement)
+
+
+async def _roll_day(db, day: date, customer_ids: list | None = None) -> int:
+    window = [(_midnight(day), _midnight(day + timedelta(days=1)), False)]
+    per_key = await aggregate(db, window, customer_ids)
+    top_limit = settings.analytics_rollup_top_questions
+    await _upsert(db, [stats.to_row(cid, row_day, top_limit) for (cid, row_day), stats in per_key.items()])
+    return len(per_key)
+
+
+async def roll_up(session_maker=None) -> int:
+    """One rollup pass. Returns the number of (tenant, day) rows written."""
+    session_maker = session_maker or async_session_maker
+    async with session_maker() as db:
+        locked = (await db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})).scalar()
+        if not locked:
+            return 0
+        now = _now()
+        state = await db.get(AnalyticsRollupState, ROLLUP_NAME)
+        if state is None:
+            state = AnalyticsRollupState(name=ROLLUP_NAME)
+            db.add(state)
+
+        # Last day that is closed and past the grace period.
+        target = (now - timedelta(seconds=settings.analytics_rollup_grace_seconds)).date() - timedelta(days=1)
+        if state.rolled_through is not None:
+            start = state.rolled_through + timedelta(days=1)
+        else:
+            first = (await db.execute(select(func.min(QueryLog.created_at)))).scalar()
+            start = first.date() if first else target + timedelta(days=1)
+        end = min(target, start + timedelta(days=settings.analytics_rollup_max_days_per_run - 1))
+
+        written = 0
+        # Votes on already-rolled days: re-roll just those tenants' days.
+        if state.rolled_through is not None and state.feedback_checked_at is not None:
+            touched = await db.execute(
+                select(QueryLog.customer_id, func.date(QueryLog.created_at).label("day")).where(
+                    QueryLog.feedback_at >= state.feedback_checked_at,
+                    QueryLog.created_at < _midnight(state.rolled_through + timedelta(days=1)),
+                ).distinct()
+            )
+            by_day: dict[date, list] = {}
+            for customer_id, day in touched.all():
+                by_day.setdefault(day, []).append(customer_id)
+            for day, customer_ids in sorted(by_day.items()):
+                written += await _roll_day(db, day, customer_ids)
+
+        day = start
+        while day <= end:
+            written += await _roll_day(db, day)
+            day += timedelta(days=1)
+        if start <= end:
+            state.rolled_through = end
+        state.feedback_checked_at = now - _FEEDBACK_OVERLAP
+        state.updated_at = now
+        await db.commit()
+    if start <= end:
+        logger.info("[ANALYTICS-ROLLUP] rolled %s..%s (%d tenant-days)", start, end, written)
+    return written
+
+
+async def run_analytics_rollup_job(stop_event: asyncio.Event) -> None:
+    """Roll up query_logs every ANALYTICS_ROLLUP_INTERVAL_SECONDS until `stop_event` is set."""
+    while not stop_event.is_set():
+        try:
+            await roll_up()
+        except Exception:
+            logger.exception("[ANALYTICS-ROLLUP] pass failed; continuing")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=settings.analytics_rollup_interval_seconds)
+        except asyncio.TimeoutError:
+            pass
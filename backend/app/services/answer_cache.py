@@ -0,0 +1,267 @@
+"""
+Per-tenant semantic answer cache for the widget RAG pipeline.
+
+Many widget questions within one tenant are near-duplicates ("delivery
+charges?" / "what are the delivery charges"). A hit here skips Pinecone,
+Postgres retrieval and the LLM generation entirely.
+
+Entries are bucketed by (customer_id, language) and matched by cosine
+similarity of the query embedding against every cached question in the
+bucket — one float32 matrix-vector product. A hit needs similarity at or
+above ANSWER_CACHE_SIMILARITY_THRESHOLD.
+
+Only personalisation-free answers are cached (no verified user email); the
+caller decides that.
+
+Invalidation has to reach every worker, not just the one that ran the
+ingestion job or config write. Each tenant has a row in
+tenant_content_versions; `invalidate_answers(db, customer_id)` bumps it (and
+drops the local buckets), and every lookup/store carries the version the
+request read, so a bucket written under an older version is discarded on
+first sight in any process. Writers call it after ingestion jobs complete,
+after widget config / business profile / domain / product changes, and when
+a tenant's vectors are wiped.
+"""
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+
+logger = logging.getLogger("zunkiree.answer_cache")
+
+settings = get_settings()
+
+CONTENT_VERSION_SQL = text(
+    "SELECT version FROM tenant_content_versions WHERE customer_id = :cid"
+)
+
+BUMP_CONTENT_VERSION_SQL = text(
+    """
+    INSERT INTO tenant_content_versions (customer_id, version, updated_at)
+    VALUES (:cid, 1, NOW())
+    ON CONFLICT (customer_id) DO UPDATE
+    SET version = tenant_content_versions.version + 1, updated_at = NOW()
+    """
+)
+
+
+def _now() -> float:
+    """Cache clock; tests patch this instead of the time module."""
+    return time.monotonic()
+
+
+@dataclass(frozen=True)
+class CachedAnswer:
+    answer: str
+    suggestions: list[str]
+    sources: list[dict]
+    chunks_used: int
+    top_score: float | None
+    avg_score: float | None
+    context_tokens: int
+
+
+@dataclass
+class _Bucket:
+    version: int
+    vectors: list[np.ndarray] = field(default_factory=list)
+    entries: list[tuple[float, CachedAnswer]] = field(default_factory=list)  # (expires_at, answer)
+    _matrix: np.ndarray | None = None
+
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix = np.vstack(self.vectors)
+        return self._matrix
+
+    def append(self, vector: np.ndarray, expires_at: float, answer: CachedAnswer, max_entries: int) -> None:
+        self.vectors.append(vector)
+        self.entries.append((expires_at, answer))
+        if len(self.entries) > max_entries:
+            del self.vectors[0]
+            del self.entries[0]
+        self._matrix = None
+
+    def drop_expired(self, now: float) -> None:
+        keep = [i for i, (expires_at, _) in enumerate(self.entries) if expires_at > now]
+        if len(keep) != len(self.entries):
+            self.vectors = [self.vectors[i] for i in keep]
+            self.entries = [self.entries[i] for i in keep]
+            self._matrix = None
+
+
+def _normalise(embedding: list[float]) -> np.ndarray | None:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    if norm == 0.0:
+        return None
+    return vector / norm
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        enabled: bool | None = None,
+        similarity_threshold: float | None = None,
+        ttl_seconds: int | None = None,
+        max_entries_per_tenant: int | None = None,
+    ):
+        self.enabled = settings.answer_cache_enabled if enabled is None else enabled
+        self.similarity_threshold = (
+            settings.answer_cache_similarity_threshold if similarity_threshold is None else similarity_threshold
+        )
+        self.ttl_seconds = settings.answer_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.max_entries_per_tenant = (
+            settings.answer_cache_max_entries_per_tenant if max_entries_per_tenant is None else max_entries_per_tenant
+        )
+        self._buckets: dict[tuple[str, str], _Bucket] = {}
+
+    @staticmethod
+    def _key(customer_id: uuid.UUID | str, language: str | None) -> tuple[str, str]:
+        return str(customer_id), language or "en"
+
+    def lookup(
+        self,
+        customer_id: uuid.UUID | str,
+        language: str | None,
+        embedding: list[float],
+        version: int,
+    ) -> tuple[CachedAnswer, float] | None:
+        """Return (answer, similarity) for the closest cached question, or None.
+
+        `version` is the tenant's current content version; a bucket written
+        under any other version is stale and dropped.
+        """
+        if not self.enabled:
+            return None
+        key = self._key(customer_id, language)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return None
+        if bucket.version != version:
+            del self._buckets[key]
+            return None
+        bucket.drop_expired(_now())
+        if not bucket.entries:
+            return None
+        query = _normalise(embedding)
+        if query is None:
+            return None
+
+        similarities = bucket.matrix() @ query
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        if similarity < self.similarity_threshold:
+            return None
+        return bucket.entries[best][1], similarity
+
+    def store(
+        self,
+        customer_id: uuid.UUID | str,
+        language: str | None,
+        embedding: list[float],
+        answer: CachedAnswer,
+        version: int,
+    ) -> None:
+        if not self.enabled or self.max_entries_per_tenant <= 0:
+            return
+        vector = _normalise(embedding)
+        if vector is None:
+            return
+        key = self._key(customer_id, language)
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.version != version:
+            bucket = self._buckets[key] = _Bucket(version=version)
+        bucket.append(vector, _now() + self.ttl_seconds, answer, self.max_entries_per_tenant)
+
+    def invalidate(self, customer_id: uuid.UUID | str) -> None:
+        """Drop every cached answer for a tenant (all languages), this process only.
+
+        Use `invalidate_answers` from write paths so other workers see it too.
+        """
+        cid = str(customer_id)
+        stale = [key for key in self._buckets if key[0] == cid]
+        for key in stale:
+            del self._buckets[key]
+        if stale:
+            logger.info("[ANSWER-CACHE] invalidated customer_id=%s buckets=%d", cid, len(stale))
+
+
+async def get_content_version(db: AsyncSession, customer_id: uuid.UUID | str) -> int | None:
+    """Current shared content version for a tenant (0 if never bumped).
+
+    Returns None when the version can't be read; callers then skip the cache
+    rather than risk serving a stale answer.
+    """
+    try:
+        result = await db.execute(CONTENT_VERSION_SQL, {"cid": str(customer_id)})
+        return result.scalar_one_or_none() or 0
+    except Exception as e:
+        logger.warning("[ANSWER-CACHE] content version read failed customer_id=%s: %s", customer_id, e)
+        return None
+
+
+async def invalidate_answers(
+    db: AsyncSession,
+    customer_id: uuid.UUID | str,
+    commit: bool = True,
+) -> None:
+    """Invalidation hook for every write that changes what a tenant's bot can
+    answer. Bumps the shared content version and drops this process's buckets.
+
+    Pass commit=False inside a caller-managed transaction (the bump then
+    lands with the caller's commit). Failures are logged, never raised — a
+    missed bump costs cache freshness, not the caller's write.
+    """
+    get_answer_cache().invalidate(customer_id)
+    try:
+        if commit:
+            await db.execute(BUMP_CONTENT_VERSION_SQL, {"cid": str(customer_id)})
+            await db.commit()
+        else:
+            # Savepoint so a failed bump can't poison the caller's transaction.
+            async with db.begin_nested():
+                await db.execute(BUMP_CONTENT_VERSION_SQL, {"cid": str(customer_id)})
+    except Exception as e:
+        logger.error("[ANSWER-CACHE] content version bump failed customer_id=%s: %s", customer_id, e)
+        if commit:
+            await db.rollback()
+
+
+def iter_answer_tokens(answer: str) -> list[str]:
+    """Split a cached answer into word-sized tokens for SSE replay.
+
+    Whitespace stays attached to the preceding word so the concatenated
+    tokens reproduce the answer exactly.
+    """
+    tokens: list[str] = []
+    start = 0
+    length = len(answer)
+    while start < length:
+        end = start
+        while end < length and not answer[end].isspace():
+            end += 1
+        while end < length and answer[end].isspace():
+            end += 1
+        tokens.append(answer[start:end])
+        start = end
+    return tokens
+
+
+# Singleton instance
+_answer_cache: SemanticAnswerCache | None = None
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = SemanticAnswerCache()
+    return _answer_cache
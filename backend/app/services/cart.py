@@ -1,17 +1,71 @@
 """
-Shopping cart service — in-memory with async DB write-through.
+Shopping cart service — in-process cache over versioned `shopping_carts` rows.
+
+Each cached cart remembers the row `version` it was built from and the
+mutations applied since (`ops`).
+
+- `load_from_db` asks the DB for the row's version and only fetches and
+  parses `items` when it moved; the cart is then rebuilt and unsaved ops are
+  replayed on top.
+- Writes are compare-and-swap on `version`. If another worker or replica
+  wrote first, the cart is rebased on their row and the ops replayed, so
+  concurrent writers don't lose each other's changes.
+- Between `begin_turn` and `end_turn` (one agent turn) `save_to_db` only
+  marks the cart dirty and reloads are skipped, so a turn costs one version
+  check and at most one write, however many cart tools it runs.
+- Carts idle for CART_IDLE_SECONDS, or beyond MAX_CACHED_CARTS, are evicted
+  (never while a turn is open on them).
 """
 import json
+import time
 import uuid
 import logging
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-
-from app.models.cart import ShoppingCart
+from sqlalchemy import text
 
 logger = logging.getLogger("zunkiree.cart")
 
+CART_IDLE_SECONDS = 30 * 60
+MAX_CACHED_CARTS = 10000
+MAX_CAS_ATTEMPTS = 3
+
+# Items only come back when the caller's version is stale.
+_LOAD_SQL = text(
+    """
+    SELECT version, CASE WHEN version <> :known_version THEN items END AS items
+    FROM shopping_carts
+    WHERE session_id = :session_id
+    """
+)
+
+_INSERT_SQL = text(
+    """
+    INSERT INTO shopping_carts (id, session_id, customer_id, items, version, created_at, updated_at)
+    VALUES (:id, :session_id, :customer_id, :items, 1, NOW() AT TIME ZONE 'utc', NOW() AT TIME ZONE 'utc')
+    ON CONFLICT (session_id) DO NOTHING
+    RETURNING version
+    """
+)
+
+_CAS_UPDATE_SQL = text(
+    """
+    UPDATE shopping_carts
+    SET items = :items, version = version + 1, updated_at = NOW() AT TIME ZONE 'utc'
+    WHERE session_id = :session_id AND version = :expected_version
+    RETURNING version
+    """
+)
+
+
+def _now() -> float:
+    return time.monotonic()
+
+
+class CartConflictError(RuntimeError):
+    """The cart kept changing underneath a write for MAX_CAS_ATTEMPTS tries."""
+
 
 @dataclass
 class CartItem:
@@ -55,40 +109,120 @@ class CartState:
         }
 
 
+@dataclass
+class _CachedCart:
+    state: CartState
+    version: int = 0  # shopping_carts.version `state` is based on; 0 = no row
+    ops: list[tuple[str, dict]] = field(default_factory=list)  # unsaved mutations
+    last_access: float = 0.0
+
+
 class CartService:
-    def __init__(self):
-        self._carts: dict[str, CartState] = {}
+    def __init__(self, idle_seconds: float = CART_IDLE_SECONDS, max_carts: int = MAX_CACHED_CARTS):
+        self.idle_seconds = idle_seconds
+        self.max_carts = max_carts
+        # Least recently used first.
+        self._carts: OrderedDict[str, _CachedCart] = OrderedDict()
+        # session_id -> open turn count; customer_id to write with on end_turn.
+        self._turns: dict[str, int] = {}
+        self._turn_customer: dict[str, uuid.UUID] = {}
+
+    # ---------- Cache ----------
+
+    def _entry(self, session_id: str) -> _CachedCart:
+        entry = self._carts.get(session_id)
+        if entry is None:
+            entry = self._carts[session_id] = _CachedCart(state=CartState())
+        entry.last_access = _now()
+        self._carts.move_to_end(session_id)
+        self._evict()
+        return entry
+
+    def _evict(self) -> None:
+        cutoff = _now() - self.idle_seconds
+        for session_id in list(self._carts):
+            entry = self._carts[session_id]
+            if entry.last_access >= cutoff and len(self._carts) <= self.max_carts:
+                break
+            if session_id in self._turns:
+                continue
+            if entry.ops:
+                logger.warning("[CART] evicting session=%s with %d unsaved changes", session_id, len(entry.ops))
+            del self._carts[session_id]
 
     def get_cart(self, session_id: str) -> CartState:
-        """Get cart for a session (in-memory only — use async get_cart_with_db for DB fallback)."""
-        if session_id not in self._carts:
-            self._carts[session_id] = CartState()
-        return self._carts[session_id]
+        """Get cart for a session from the cache (call load_from_db to revalidate against the DB)."""
+        return self._entry(session_id).state
 
     async def load_from_db(self, db: AsyncSession, session_id: str) -> CartState:
-        """Load cart from DB — always authoritative. Overwrites any in-memory state."""
-        result = await db.execute(
-            select(ShoppingCart).where(ShoppingCart.session_id == session_id)
-        )
-        db_cart = result.scalar_one_or_none()
+        """Bring the cached cart up to date with the DB row.
+
+        Costs one small query; items are only fetched and parsed when the
+        row's version changed. Unsaved local changes are replayed on top.
+        Inside an open turn the cart was already validated, so this is free.
+        """
+        entry = self._entry(session_id)
+        if session_id in self._turns:
+            return entry.state
+        result = await db.execute(_LOAD_SQL, {"session_id": session_id, "known_version": entry.version})
+        self._rebase(entry, result.one_or_none())
+        return entry.state
+
+    def _rebase(self, entry: _CachedCart, row) -> None:
+        if row is None:
+            if not entry.version:
+                return  # still no row; the cache holds only local changes
+            version, items_json = 0, "[]"  # row deleted (e.g. after checkout)
+        elif row.items is None:
+            return  # version unchanged; the cache is current
+        else:
+            version, items_json = row.version, row.items
         cart = CartState()
-        if db_cart and db_cart.items:
-            items_data = json.loads(db_cart.items)
-            for item in items_data:
-                cart.items.append(CartItem(
-                    product_id=item.get("product_id", ""),
-                    name=item.get("name", ""),
-                    price=item.get("price", 0),
-                    currency=item.get("currency", ""),
-                    quantity=item.get("quantity", 1),
-                    size=item.get("size", ""),
-                    color=item.get("color", ""),
-                    image=item.get("image", ""),
-                    url=item.get("url", ""),
-                ))
-            self._recalculate(cart)
-        self._carts[session_id] = cart
-        return cart
+        for item in json.loads(items_json or "[]"):
+            cart.items.append(CartItem(
+                product_id=item.get("product_id", ""),
+                name=item.get("name", ""),
+                price=item.get("price", 0),
+                currency=item.get("currency", ""),
+                quantity=item.get("quantity", 1),
+                size=item.get("size", ""),
+                color=item.get("color", ""),
+                image=item.get("image", ""),
+                url=item.get("url", ""),
+            ))
+        for op, args in entry.ops:
+            self._apply(cart, op, args)
+        self._recalculate(cart)
+        entry.state = cart
+        entry.version = version
+
+    # ---------- Mutations ----------
+
+    def _mutate(self, session_id: str, op: str, args: dict) -> CartState:
+        entry = self._entry(session_id)
+        entry.ops.append((op, args))
+        self._apply(entry.state, op, args)
+        self._recalculate(entry.state)
+        return entry.state
+
+    @staticmethod
+    def _apply(cart: CartState, op: str, args: dict) -> None:
+        if op == "add":
+            # Same product + size + color increments the existing line.
+            for item in cart.items:
+                if item.product_id == args["product_id"] and item.size == args["size"] and item.color == args["color"]:
+                    item.quantity += args["quantity"]
+                    return
+            cart.items.append(CartItem(**args))
+        elif op == "remove":
+            # By line identity, not index: a replay after a rebase runs on
+            # another replica's item list. Skipped if that line is gone.
+            for i, item in enumerate(cart.items):
+                if item.product_id == args["product_id"] and item.size == args["size"] and item.color == args["color"]:
+                    cart.items.pop(i)
+                    return
+        elif op == "clear":
+            cart.items.clear()
 
     def add_item(
         self,
@@ -104,41 +238,33 @@ class CartService:
         url: str = "",
     ) -> CartState:
         """Add an item to the cart."""
-        cart = self.get_cart(session_id)
-
-        # Check if item already exists (same product + size + color)
-        for item in cart.items:
-            if item.product_id == product_id and item.size == size and item.color == color:
-                item.quantity += quantity
-                self._recalculate(cart)
-                return cart
-
-        cart.items.append(CartItem(
-            product_id=product_id,
-            name=name,
-            price=price,
-            currency=currency,
-            quantity=quantity,
-            size=size,
-            color=color,
-            image=image,
-            url=url,
-        ))
-        self._recalculate(cart)
-        return cart
+        return self._mutate(session_id, "add", {
+            "product_id": product_id,
+            "name": name,
+            "price": price,
+            "currency": currency,
+            "quantity": quantity,
+            "size": size,
+            "color": color,
+            "image": image,
+            "url": url,
+        })
 
     def remove_item(self, session_id: str, index: int) -> CartState:
         """Remove item at index from cart."""
-        cart = self.get_cart(session_id)
-        if 0 <= index < len(cart.items):
-            cart.items.pop(index)
-        self._recalculate(cart)
-        return cart
+        entry = self._entry(session_id)
+        if not 0 <= index < len(entry.state.items):
+            return entry.state
+        item = entry.state.items[index]
+        return self._mutate(session_id, "remove", {
+            "product_id": item.product_id,
+            "size": item.size,
+            "color": item.color,
+        })
 
     def clear_cart(self, session_id: str) -> CartState:
         """Clear all items from cart."""
-        self._carts[session_id] = CartState()
-        return self._carts[session_id]
+        return self._mutate(session_id, "clear", {})
 
     def _recalculate(self, cart: CartState) -> None:
         """Recalculate cart totals."""
@@ -147,27 +273,69 @@ class CartService:
         if cart.items:
             cart.currency = cart.items[0].currency
 
+    # ---------- Persistence ----------
+
     async def save_to_db(self, db: AsyncSession, session_id: str, customer_id: uuid.UUID) -> None:
-        """Write-through: persist cart state to database."""
-        cart = self.get_cart(session_id)
-        result = await db.execute(
-            select(ShoppingCart).where(ShoppingCart.session_id == session_id)
-        )
-        db_cart = result.scalar_one_or_none()
+        """Persist the cart (compare-and-swap). Deferred to end_turn inside an open turn."""
+        if session_id in self._turns:
+            self._turn_customer[session_id] = customer_id
+            return
+        await self._flush(db, session_id, customer_id)
 
-        items_json = json.dumps([item.to_dict() for item in cart.items])
+    async def _flush(self, db: AsyncSession, session_id: str, customer_id: uuid.UUID) -> None:
+        entry = self._carts.get(session_id)
+        if entry is None or not entry.ops:
+            return
+        for _ in range(MAX_CAS_ATTEMPTS):
+            if not entry.state.items and not entry.version:
+                entry.ops.clear()  # empty cart and no row: nothing to store
+                return
+            params = {
+                "session_id": session_id,
+                "items": json.dumps([item.to_dict() for item in entry.state.items]),
+            }
+            if entry.version:
+                result = await db.execute(_CAS_UPDATE_SQL, {**params, "expected_version": entry.version})
+            else:
+                result = await db.execute(
+                    _INSERT_SQL, {**params, "id": uuid.uuid4(), "customer_id": customer_id},
+                )
+            new_version = result.scalar_one_or_none()
+            if new_version is not None:
+                await db.commit()
+                entry.version = new_version
+                entry.ops.clear()
+                return
+            # Someone else wrote (or deleted) the row first: rebase on it and
+            # replay this cart's changes.
+            logger.info("[CART] version conflict on session=%s; rebasing", session_id)
+            result = await db.execute(_LOAD_SQL, {"session_id": session_id, "known_version": -1})
+            self._rebase(entry, result.one_or_none())
+        raise CartConflictError(f"cart {session_id} changed concurrently {MAX_CAS_ATTEMPTS} times")
 
-        if db_cart:
-            db_cart.items = items_json
-        else:
-            db_cart = ShoppingCart(
-                session_id=session_id,
-                customer_id=customer_id,
-                items=items_json,
-            )
-            db.add(db_cart)
-
-        await db.commit()
+    # ---------- Agent turns ----------
+
+    def begin_turn(self, session_id: str) -> None:
+        """Defer cart writes for `session_id` until the matching end_turn.
+        Call after load_from_db has validated the cart."""
+        self._turns[session_id] = self._turns.get(session_id, 0) + 1
+
+    async def flush_turn(self, db: AsyncSession, session_id: str) -> None:
+        """Write the turn's deferred changes now (e.g. before checkout), keeping the turn open."""
+        customer_id = self._turn_customer.get(session_id)
+        if customer_id is not None:
+            await self._flush(db, session_id, customer_id)
+
+    async def end_turn(self, db: AsyncSession, session_id: str) -> None:
+        """Close a turn and write its changes in one compare-and-swap."""
+        remaining = self._turns.get(session_id, 0) - 1
+        if remaining > 0:
+            self._turns[session_id] = remaining
+            return
+        self._turns.pop(session_id, None)
+        customer_id = self._turn_customer.pop(session_id, None)
+        if customer_id is not None:
+            await self._flush(db, session_id, customer_id)
 
 
 # Singleton
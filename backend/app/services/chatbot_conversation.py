@@ -1,6 +1,8 @@
 """
 Persistent conversation store for chatbot DMs.
-Backed by PostgreSQL (chatbot_conversations table).
+Backed by PostgreSQL (chatbot_conversations table). New messages go through
+the write-behind telemetry writer; history reads merge in this process's
+still-buffered messages so a sender's next turn sees the previous one.
 """
 import logging
 from datetime import datetime, timedelta
@@ -10,6 +12,7 @@ from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.chatbot import ChatbotConversation
+from app.services.telemetry import get_telemetry_writer
 from app.config import get_settings
 
 logger = logging.getLogger("zunkiree.chatbot.conversation")
@@ -40,9 +43,18 @@ class ChatbotConversationService:
             .order_by(ChatbotConversation.created_at.desc())
             .limit(max_messages)
         )
-        rows = result.scalars().all()
-        # Reverse to chronological order
-        return [{"role": r.role, "content": r.content} for r in reversed(rows)]
+        rows = [
+            {"id": r.id, "role": r.role, "content": r.content, "created_at": r.created_at}
+            for r in result.scalars().all()
+        ]
+        seen = {r["id"] for r in rows}
+        rows += [
+            r for r in get_telemetry_writer().pending(ChatbotConversation)
+            if r["channel_id"] == channel_id and r["platform_sender_id"] == sender_id and r["id"] not in seen
+        ]
+        rows.sort(key=lambda r: r["created_at"])
+        # Chronological order, newest max_messages
+        return [{"role": r["role"], "content": r["content"]} for r in rows[-max_messages:]]
 
     async def add_message(
         self,
@@ -52,15 +64,14 @@ class ChatbotConversationService:
         role: str,
         content: str,
     ) -> None:
-        """Persist a single message."""
-        msg = ChatbotConversation(
+        """Persist a single message (buffered; `db` is not written to)."""
+        await get_telemetry_writer().add(
+            ChatbotConversation,
             channel_id=channel_id,
             platform_sender_id=sender_id,
             role=role,
             content=content,
         )
-        db.add(msg)
-        await db.commit()
 
     async def cleanup_expired(self, db: AsyncSession) -> int:
         """Delete conversations older than TTL. Returns count deleted."""
@@ -0,0 +1,97 @@
+"""
+Bulk writes of document_chunks rows for every ingest path.
+
+IngestionService._process_chunks used to add one DocumentChunk ORM object
+per chunk and flush them all at commit: a unit-of-work pass per object and
+one INSERT parameter set per row. `write_chunks` writes plain tuples
+instead, in CHUNK_WRITE_BATCH_SIZE batches:
+
+- `copy` (default): asyncpg's binary COPY (`copy_records_to_table`) on the
+  session's connection. One round trip per batch and no SQL to parse.
+- `insert`: a Core `INSERT` executed with the whole batch. SQLAlchemy sends
+  that as multi-row `INSERT ... VALUES (...), (...)` statements. Use it on
+  drivers without COPY.
+
+Both run inside the session's current transaction (COPY too: it goes
+through the connection the session has already begun), and `write_chunks`
+never commits. The caller owns the transaction, so chunk rows commit or roll
+back together with whatever else it wrote (CrawledPage hashes, deleted
+chunks). search_vector is a generated column (migration 048), so Postgres
+computes it during the COPY/INSERT itself.
+"""
+from __future__ import annotations
+
+import uuid
+from collections.abc import Sequence
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import DocumentChunk
+
+settings = get_settings()
+
+# Every column the app writes; search_vector is generated by Postgres.
+CHUNK_COLUMNS = (
+    "id", "customer_id", "job_id", "vector_id", "chunk_index", "content", "content_preview",
+    "source_url", "source_title", "token_count", "content_hash", "created_at",
+)
+
+WRITE_METHODS = ("copy", "insert")
+
+
+def chunk_row(
+    customer_id: uuid.UUID,
+    job_id: uuid.UUID,
+    vector_id: str,
+    chunk: dict,
+    content_hash: str,
+    created_at: datetime | None = None,
+) -> tuple:
+    """One document_chunks row, in CHUNK_COLUMNS order."""
+    return (
+        uuid.uuid4(),
+        customer_id,
+        job_id,
+        vector_id,
+        chunk["chunk_index"],
+        chunk["content"],
+        chunk["content"][:500],
+        chunk.get("source_url"),
+        chunk.get("source_title"),
+        chunk.get("token_count"),
+        content_hash,
+        created_at or datetime.utcnow(),
+    )
+
+
+async def _copy(db: AsyncSession, rows: Sequence[tuple]) -> None:
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        DocumentChunk.__tablename__, records=rows, columns=CHUNK_COLUMNS,
+    )
+
+
+async def _insert(db: AsyncSession, rows: Sequence[tuple]) -> None:
+    await db.execute(insert(DocumentChunk.__table__), [dict(zip(CHUNK_COLUMNS, row)) for row in rows])
+
+
+async def write_chunks(
+    db: AsyncSession,
+    rows: Sequence[tuple],
+    method: str | None = None,
+    batch_size: int | None = None,
+) -> int:
+    """Write `rows` (see chunk_row) in the session's transaction, without
+    committing. Returns the row count."""
+    method = method or settings.chunk_write_method
+    if method not in WRITE_METHODS:
+        raise ValueError(f"Unknown chunk write method: {method}")
+    batch_size = batch_size or settings.chunk_write_batch_size
+    write = _copy if method == "copy" else _insert
+    for start in range(0, len(rows), batch_size):
+        await write(db, rows[start:start + batch_size])
+    return len(rows)
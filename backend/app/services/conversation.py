@@ -1,68 +1,264 @@
 """
-Per-session conversation memory store for multi-turn shopping conversations.
-In-memory with 4-hour TTL.
+Per-session conversation memory for multi-turn widget agent conversations.
+
+Two backends behind one async interface, picked by CONVERSATION_STORE_BACKEND:
+
+- "memory": in-process LRU. Sessions idle longer than TTL_SECONDS are
+  dropped by a background sweep, and the least recently used sessions are
+  evicted once either CONVERSATION_MAX_SESSIONS or CONVERSATION_MAX_BYTES
+  (approximate payload size) is exceeded. History is per worker, so
+  multi-worker deploys need sticky sessions.
+- "postgres": one `widget_conversations` row per session (migration 044),
+  appended and trimmed in a single upsert, so any worker or replica can
+  serve the next turn.
+
+Every backend keeps the last MAX_MESSAGES messages per session and returns
+copies, so callers can't mutate stored history.
 """
-import time
+from __future__ import annotations
+
+import asyncio
+import json
 import logging
-from collections import defaultdict
+import time
+from collections import OrderedDict
+from typing import Protocol
+
+from sqlalchemy import text
+
+from app.config import get_settings
+from app.database import async_session_maker
 
 logger = logging.getLogger("zunkiree.conversation")
 
+settings = get_settings()
+
 TTL_SECONDS = 4 * 60 * 60  # 4 hours
+MAX_MESSAGES = 20
+SWEEP_INTERVAL_SECONDS = 60
+# Rough per-message overhead on top of the content length (dict, keys, list slot).
+_MESSAGE_OVERHEAD_BYTES = 200
 
 
-class ConversationStore:
-    def __init__(self):
-        self._store: dict[str, dict] = {}
+def _now() -> float:
+    return time.time()
 
-    def _ensure_session(self, session_id: str) -> dict:
-        now = time.time()
-        if session_id not in self._store or (now - self._store[session_id]["last_access"]) > TTL_SECONDS:
-            self._store[session_id] = {
-                "messages": [],
-                "last_access": now,
-            }
-        self._store[session_id]["last_access"] = now
-        return self._store[session_id]
 
-    def get_messages(self, session_id: str) -> list[dict]:
-        """Get conversation messages for a session."""
-        session = self._ensure_session(session_id)
-        return session["messages"]
+def _message_size(message: dict) -> int:
+    size = _MESSAGE_OVERHEAD_BYTES + len(message.get("content") or "")
+    if message.get("tool_calls"):
+        size += len(json.dumps(message["tool_calls"]))
+    return size
+
+
+class ConversationStore(Protocol):
+    """Async conversation history surface the agents use."""
 
-    def add_message(self, session_id: str, role: str, content: str) -> None:
+    async def get_messages(self, session_id: str) -> list[dict]: ...
+
+    async def add_message(self, session_id: str, role: str, content: str) -> None: ...
+
+    async def add_tool_call(self, session_id: str, tool_call: dict) -> None: ...
+
+    async def add_tool_result(self, session_id: str, tool_call_id: str, result: str) -> None: ...
+
+    async def sweep(self) -> int: ...
+
+
+class _ConversationStoreMixin:
+    """add_* helpers shared by the backends; each backend implements append()."""
+
+    async def add_message(self, session_id: str, role: str, content: str) -> None:
         """Add a message to the conversation."""
-        session = self._ensure_session(session_id)
-        session["messages"].append({"role": role, "content": content})
-        # Keep last 20 messages to limit context size
-        if len(session["messages"]) > 20:
-            session["messages"] = session["messages"][-20:]
+        await self.append(session_id, {"role": role, "content": content})
 
-    def add_tool_call(self, session_id: str, tool_call: dict) -> None:
+    async def add_tool_call(self, session_id: str, tool_call: dict) -> None:
         """Add a tool call to the conversation."""
-        session = self._ensure_session(session_id)
-        session["messages"].append({
-            "role": "assistant",
-            "tool_calls": [tool_call],
-            "content": None,
-        })
-
-    def add_tool_result(self, session_id: str, tool_call_id: str, result: str) -> None:
+        await self.append(session_id, {"role": "assistant", "tool_calls": [tool_call], "content": None})
+
+    async def add_tool_result(self, session_id: str, tool_call_id: str, result: str) -> None:
         """Add a tool result to the conversation."""
-        session = self._ensure_session(session_id)
-        session["messages"].append({
-            "role": "tool",
-            "tool_call_id": tool_call_id,
-            "content": result,
-        })
-
-    def cleanup_expired(self) -> int:
+        await self.append(session_id, {"role": "tool", "tool_call_id": tool_call_id, "content": result})
+
+
+class InMemoryConversationStore(_ConversationStoreMixin):
+    def __init__(
+        self,
+        max_sessions: int | None = None,
+        max_bytes: int | None = None,
+        ttl_seconds: float = TTL_SECONDS,
+    ):
+        self.max_sessions = max_sessions or settings.conversation_max_sessions
+        self.max_bytes = max_bytes or settings.conversation_max_bytes
+        self.ttl_seconds = ttl_seconds
+        # session_id -> {"messages", "last_access", "size"}, least recently used first.
+        self._store: OrderedDict[str, dict] = OrderedDict()
+        self._bytes = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def _drop(self, session_id: str) -> None:
+        session = self._store.pop(session_id)
+        self._bytes -= session["size"]
+
+    def _touch(self, session_id: str, create: bool) -> dict | None:
+        now = _now()
+        session = self._store.get(session_id)
+        if session is not None and now - session["last_access"] > self.ttl_seconds:
+            self._drop(session_id)
+            session = None
+        if session is None:
+            if not create:
+                return None
+            session = self._store[session_id] = {"messages": [], "last_access": now, "size": 0}
+        session["last_access"] = now
+        self._store.move_to_end(session_id)
+        return session
+
+    async def get_messages(self, session_id: str) -> list[dict]:
+        """Get conversation messages for a session."""
+        session = self._touch(session_id, create=False)
+        return list(session["messages"]) if session else []
+
+    async def append(self, session_id: str, message: dict) -> None:
+        session = self._touch(session_id, create=True)
+        session["messages"].append(message)
+        added = _message_size(message)
+        session["size"] += added
+        self._bytes += added
+        while len(session["messages"]) > MAX_MESSAGES:
+            removed = _message_size(session["messages"].pop(0))
+            session["size"] -= removed
+            self._bytes -= removed
+        self._evict()
+
+    def _evict(self) -> None:
+        evicted = 0
+        # Never evict the session just written (the last one), even if it
+        # alone exceeds the byte cap.
+        while len(self._store) > 1 and (len(self._store) > self.max_sessions or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._store)))
+            evicted += 1
+        if evicted:
+            logger.debug("[CONVERSATION] evicted %d LRU sessions", evicted)
+
+    async def sweep(self) -> int:
         """Remove expired sessions. Returns count removed."""
-        now = time.time()
-        expired = [sid for sid, data in self._store.items() if (now - data["last_access"]) > TTL_SECONDS]
-        for sid in expired:
-            del self._store[sid]
-        return len(expired)
+        cutoff = _now() - self.ttl_seconds
+        expired = 0
+        # LRU order: stop at the first session that is still fresh.
+        while self._store:
+            session_id, session = next(iter(self._store.items()))
+            if session["last_access"] >= cutoff:
+                break
+            self._drop(session_id)
+            expired += 1
+        return expired
+
+
+class PostgresConversationStore(_ConversationStoreMixin):
+    """Shared store: one JSONB row per session in `widget_conversations`."""
+
+    _GET_SQL = text(
+        """
+        SELECT messages FROM widget_conversations
+        WHERE session_id = :session_id
+          AND updated_at > NOW() - make_interval(secs => CAST(:ttl AS double precision))
+        """
+    )
+
+    # Append and trim in one statement so concurrent turns on different
+    # workers can't lose each other's messages. An expired row starts over.
+    _APPEND_SQL = text(
+        """
+        INSERT INTO widget_conversations (session_id, messages, updated_at)
+        VALUES (:session_id, CAST(:messages AS JSONB), NOW())
+        ON CONFLICT (session_id) DO UPDATE SET
+            messages = (
+                SELECT COALESCE(jsonb_agg(t.m ORDER BY t.ord), '[]'::jsonb)
+                FROM (
+                    SELECT e.m, e.ord
+                    FROM jsonb_array_elements(
+                        CASE
+                            WHEN widget_conversations.updated_at
+                                 > NOW() - make_interval(secs => CAST(:ttl AS double precision))
+                            THEN widget_conversations.messages
+                            ELSE '[]'::jsonb
+                        END || EXCLUDED.messages
+                    ) WITH ORDINALITY AS e(m, ord)
+                    ORDER BY e.ord DESC
+                    LIMIT :max_messages
+                ) t
+            ),
+            updated_at = NOW()
+        """
+    )
+
+    _SWEEP_SQL = text(
+        """
+        DELETE FROM widget_conversations
+        WHERE updated_at < NOW() - make_interval(secs => CAST(:ttl AS double precision))
+        """
+    )
+
+    def __init__(self, ttl_seconds: float = TTL_SECONDS, session_maker=None):
+        self.ttl_seconds = ttl_seconds
+        self._session_maker = session_maker or async_session_maker
+
+    async def get_messages(self, session_id: str) -> list[dict]:
+        """Get conversation messages for a session."""
+        async with self._session_maker() as db:
+            result = await db.execute(self._GET_SQL, {"session_id": session_id, "ttl": self.ttl_seconds})
+            messages = result.scalar_one_or_none()
+        return list(messages or [])
+
+    async def append(self, session_id: str, message: dict) -> None:
+        async with self._session_maker() as db:
+            await db.execute(self._APPEND_SQL, {
+                "session_id": session_id,
+                "messages": json.dumps([message]),
+                "ttl": self.ttl_seconds,
+                "max_messages": MAX_MESSAGES,
+            })
+            await db.commit()
+
+    async def sweep(self) -> int:
+        """Remove expired sessions. Returns count removed."""
+        async with self._session_maker() as db:
+            result = await db.execute(self._SWEEP_SQL, {"ttl": self.ttl_seconds})
+            await db.commit()
+        return result.rowcount or 0
+
+
+def build_conversation_store(backend: str | None = None) -> ConversationStore:
+    """Create the store for CONVERSATION_STORE_BACKEND ("memory" or "postgres")."""
+    backend = (backend or settings.conversation_store_backend).lower()
+    if backend == "memory":
+        return InMemoryConversationStore()
+    if backend == "postgres":
+        return PostgresConversationStore()
+    raise ValueError(f"Unknown conversation_store_backend: {backend}")
+
+
+async def run_conversation_sweeper(stop_event: asyncio.Event) -> None:
+    """Expire idle sessions every SWEEP_INTERVAL_SECONDS until `stop_event` is set."""
+    store = get_conversation_store()
+    while not stop_event.is_set():
+        try:
+            removed = await store.sweep()
+            if removed:
+                logger.info("[CONVERSATION] swept %d expired sessions", removed)
+        except Exception:
+            logger.exception("[CONVERSATION] sweep failed; continuing")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=SWEEP_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
 
 
 # Singleton
@@ -72,5 +268,5 @@ _conversation_store: ConversationStore | None = None
 def get_conversation_store() -> ConversationStore:
     global _conversation_store
     if _conversation_store is None:
-        _conversation_store = ConversationStore()
+        _conversation_store = build_conversation_store()
     return _conversation_store
@@ -0,0 +1,182 @@
+"""
+Query embedding cache.
+
+Popular widget questions ("delivery charges?", "return policy") repeat
+thousands of times per tenant, and each one used to pay for an OpenAI
+embeddings round trip. EmbeddingService consults this cache first.
+
+Two tiers:
+
+1. In-process LRU with TTL. Vectors are held as float32 `array`s (~12KB
+   each at 3072 dims instead of ~100KB as a list of Python floats) so the
+   default size stays cheap.
+2. Optional shared tier in Postgres (`embedding_cache` table, migration
+   038) so a hit on one worker/replica warms the others. Enabled with
+   EMBEDDING_CACHE_SHARED. Shared-tier failures are logged and treated as
+   misses — the cache must never fail a query.
+
+Keys are sha256 over (model, dimensions, normalised text), so changing the
+embedding model or dimensions can never return a stale-shaped vector.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import text
+
+from app.config import get_settings
+from app.database import async_session_maker
+
+logger = logging.getLogger("zunkiree.embedding_cache")
+
+settings = get_settings()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _now() -> float:
+    """Cache clock. Tests patch this rather than the time module, which the
+    asyncio event loop also reads."""
+    return time.monotonic()
+
+
+def normalize_text(value: str) -> str:
+    """Case-fold and collapse whitespace so trivially different phrasings share a key."""
+    return _WHITESPACE_RE.sub(" ", value).strip().casefold()
+
+
+def make_cache_key(value: str, model: str, dimensions: int) -> str:
+    raw = f"{model}\x1f{dimensions}\x1f{normalize_text(value)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    shared_hits: int = 0
+    misses: int = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.memory_hits + self.shared_hits + self.misses
+        hits = self.memory_hits + self.shared_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        ttl_seconds: int | None = None,
+        shared: bool | None = None,
+    ):
+        self.max_entries = max_entries if max_entries is not None else settings.embedding_cache_size
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.embedding_cache_ttl_seconds
+        self.shared = shared if shared is not None else settings.embedding_cache_shared
+        # key -> (expires_at monotonic, vector)
+        self._entries: OrderedDict[str, tuple[float, array]] = OrderedDict()
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get_local(self, key: str) -> list[float] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, vector = entry
+        if expires_at <= _now():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return vector.tolist()
+
+    def _put_local(self, key: str, vector: list[float]) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (_now() + self.ttl_seconds, array("f", vector))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        """Return cached vectors for whichever keys hit; missing keys are absent."""
+        found: dict[str, list[float]] = {}
+        remote_keys: list[str] = []
+        for key in keys:
+            vector = self._get_local(key)
+            if vector is not None:
+                found[key] = vector
+                self.stats.memory_hits += 1
+            else:
+                remote_keys.append(key)
+
+        if remote_keys and self.shared:
+            shared_found = await self._get_shared(remote_keys)
+            for key, vector in shared_found.items():
+                self._put_local(key, vector)
+                found[key] = vector
+            self.stats.shared_hits += len(shared_found)
+            remote_keys = [k for k in remote_keys if k not in shared_found]
+
+        self.stats.misses += len(remote_keys)
+        return found
+
+    async def put_many(self, items: dict[str, list[float]], model: str, dimensions: int) -> None:
+        for key, vector in items.items():
+            self._put_local(key, vector)
+        if items and self.shared:
+            await self._put_shared(items, model, dimensions)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def _get_shared(self, keys: list[str]) -> dict[str, list[float]]:
+        try:
+            async with async_session_maker() as session:
+                result = await session.execute(
+                    text(
+                        """
+                        SELECT cache_key, embedding
+                        FROM embedding_cache
+                        WHERE cache_key = ANY(:keys)
+                          AND created_at > NOW() - make_interval(secs => :ttl)
+                        """
+                    ),
+                    {"keys": keys, "ttl": self.ttl_seconds},
+                )
+                return {row[0]: list(row[1]) for row in result.fetchall()}
+        except Exception as e:
+            logger.warning("[EMBED-CACHE] shared lookup failed, treating as miss: %s", e)
+            return {}
+
+    async def _put_shared(self, items: dict[str, list[float]], model: str, dimensions: int) -> None:
+        try:
+            async with async_session_maker() as session:
+                await session.execute(
+                    text(
+                        """
+                        INSERT INTO embedding_cache (cache_key, model, dimensions, embedding, created_at)
+                        VALUES (:cache_key, :model, :dimensions, :embedding, NOW())
+                        ON CONFLICT (cache_key) DO UPDATE
+                            SET embedding = EXCLUDED.embedding, created_at = NOW()
+                        """
+                    ),
+                    [
+                        {"cache_key": key, "model": model, "dimensions": dimensions, "embedding": vector}
+                        for key, vector in items.items()
+                    ],
+                )
+                await session.commit()
+        except Exception as e:
+            logger.warning("[EMBED-CACHE] shared write failed: %s", e)
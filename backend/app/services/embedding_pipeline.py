@@ -0,0 +1,223 @@
+"""
+Rate-limit-aware embedding of ingestion chunks.
+
+- Batches are sized by tokens (EMBEDDING_BATCH_MAX_TOKENS, at most
+  EMBEDDING_BATCH_MAX_ITEMS inputs) rather than a fixed 100 items, so long
+  chunks don't produce oversized requests and short ones aren't sent a
+  few at a time.
+- Up to EMBEDDING_CONCURRENCY batches are in flight at once. Each waits on
+  a process-wide limiter: two token buckets, refilled continuously, for
+  EMBEDDING_TPM_LIMIT tokens and EMBEDDING_RPM_LIMIT requests per minute.
+  Every job in the process (API or worker) shares the same budget, so
+  concurrent ingests don't trip OpenAI's limits together.
+- 429s, 5xx responses and connection errors are retried up to
+  EMBEDDING_MAX_RETRIES times with jittered exponential backoff, or after the
+  server's Retry-After when one is given. A 429 also drains the limiter, so
+  the other in-flight batches back off instead of hitting the limit again.
+- `store` runs for each batch in order, as soon as that batch's embeddings
+  are back, while later batches are still embedding. The upsert overlaps the
+  next embeddings instead of waiting for all of them. Calls to `store` never
+  overlap each other, so it may use one AsyncSession.
+- `run()` returns EmbeddingStats (chunks, tokens, requests, retries,
+  seconds). Ingestion adds these onto the job, which makes chunks per
+  second visible per job.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+import openai
+
+from app.config import get_settings
+from app.utils.chunking import count_tokens
+
+logger = logging.getLogger("zunkiree.embedding_pipeline")
+
+settings = get_settings()
+
+MAX_BACKOFF_SECONDS = 60
+
+
+def _now() -> float:
+    return time.monotonic()
+
+
+async def _sleep(seconds: float) -> None:
+    await asyncio.sleep(seconds)
+
+
+class TokenBucket:
+    """`per_minute` units per minute, bursting up to `capacity`. A limit of
+    0 or less disables the bucket."""
+
+    def __init__(self, per_minute: float, capacity: float | None = None):
+        self.rate = per_minute / 60
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = _now()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = _now()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> None:
+        if self.rate <= 0:
+            return
+        # A request larger than the bucket waits for a full bucket instead of forever.
+        amount = min(amount, self.capacity)
+        async with self._lock:  # first come, first served
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await _sleep((amount - self.tokens) / self.rate)
+
+    def drain(self) -> None:
+        self._refill()
+        self.tokens = 0
+
+
+class EmbeddingRateLimiter:
+    """Requests- and tokens-per-minute budget for the embeddings API."""
+
+    def __init__(self, tokens_per_minute: int, requests_per_minute: int):
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.requests = TokenBucket(requests_per_minute)
+
+    async def acquire(self, tokens: int) -> None:
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+    def rate_limited(self) -> None:
+        """The API answered 429: spend the budget so every caller waits a refill."""
+        self.tokens.drain()
+        self.requests.drain()
+
+
+def plan_batches(token_counts: list[int], max_tokens: int, max_items: int) -> list[tuple[int, int]]:
+    """Split items into (start, end) ranges of at most max_tokens tokens and
+    max_items items. An item over max_tokens gets a batch of its own."""
+    batches = []
+    start = 0
+    tokens = 0
+    for i, count in enumerate(token_counts):
+        if i > start and (tokens + count > max_tokens or i - start >= max_items):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += count
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+    return batches
+
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+def _retry_after(exc: Exception) -> float | None:
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Exponential backoff with full jitter after the given (1-based) attempt."""
+    ceiling = min(MAX_BACKOFF_SECONDS, settings.embedding_retry_base_seconds * 2 ** (attempt - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+@dataclass
+class EmbeddingStats:
+    chunks: int = 0
+    tokens: int = 0
+    requests: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float | None:
+        return self.chunks / self.seconds if self.seconds > 0 else None
+
+
+class EmbeddingPipeline:
+    def __init__(self, embedding_service, limiter: EmbeddingRateLimiter | None = None):
+        self.embedding_service = embedding_service
+        self.limiter = limiter or get_embedding_limiter()
+
+    async def _embed(self, texts: list[str], tokens: int, stats: EmbeddingStats) -> list[list[float]]:
+        attempt = 0
+        while True:
+            await self.limiter.acquire(tokens)
+            stats.requests += 1
+            try:
+                return await self.embedding_service.create_embeddings(texts, use_cache=False)
+            except Exception as e:
+                attempt += 1
+                if not _retryable(e) or attempt > settings.embedding_max_retries:
+                    raise
+                if isinstance(e, openai.RateLimitError):
+                    self.limiter.rate_limited()
+                delay = _retry_after(e) or backoff_seconds(attempt)
+                stats.retries += 1
+                logger.warning(
+                    "[EMBED] %s on a %d-input batch; retry %d/%d in %.1fs",
+                    type(e).__name__, len(texts), attempt, settings.embedding_max_retries, delay,
+                )
+                await _sleep(delay)
+
+    async def run(
+        self,
+        texts: list[str],
+        store: Callable[[int, int, list[list[float]]], Awaitable[None]],
+        token_counts: list[int | None] | None = None,
+    ) -> EmbeddingStats:
+        """Embed `texts` and call `store(start, end, embeddings)` for each
+        batch, in order. `token_counts` (e.g. chunk token_count) saves
+        re-tokenising; missing entries are counted here."""
+        started = _now()
+        counts = [
+            count if count is not None else count_tokens(text)
+            for text, count in zip(texts, token_counts or [None] * len(texts))
+        ]
+        batches = plan_batches(counts, settings.embedding_batch_max_tokens, settings.embedding_batch_max_items)
+        stats = EmbeddingStats(chunks=len(texts), tokens=sum(counts))
+        slots = asyncio.Semaphore(max(1, settings.embedding_concurrency))
+
+        async def embed(start: int, end: int) -> list[list[float]]:
+            async with slots:
+                return await self._embed(texts[start:end], sum(counts[start:end]), stats)
+
+        tasks = [asyncio.create_task(embed(start, end)) for start, end in batches]
+        try:
+            for (start, end), task in zip(batches, tasks):
+                await store(start, end, await task)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        stats.seconds = _now() - started
+        return stats
+
+
+# Process-wide limiter: every pipeline shares the one OpenAI budget.
+_embedding_limiter: EmbeddingRateLimiter | None = None
+
+
+def get_embedding_limiter() -> EmbeddingRateLimiter:
+    global _embedding_limiter
+    if _embedding_limiter is None:
+        _embedding_limiter = EmbeddingRateLimiter(settings.embedding_tpm_limit, settings.embedding_rpm_limit)
+    return _embedding_limiter
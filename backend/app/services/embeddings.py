@@ -1,30 +1,49 @@
 from __future__ import annotations
 from openai import AsyncOpenAI
 from app.config import get_settings
+from app.services.embedding_cache import EmbeddingCache, make_cache_key
 
 settings = get_settings()
 
 
 class EmbeddingService:
-    def __init__(self):
+    def __init__(self, cache: EmbeddingCache | None = None):
         self.client = AsyncOpenAI(api_key=settings.openai_api_key)
         self.model = settings.embedding_model
         self.dimensions = settings.embedding_dimensions
+        self.cache = cache if cache is not None else EmbeddingCache()
 
-    async def create_embedding(self, text: str) -> list[float]:
+    async def create_embedding(self, text: str, use_cache: bool = True) -> list[float]:
         """Create embedding for a single text."""
-        response = await self.client.embeddings.create(
-            model=self.model,
-            input=text,
-            dimensions=self.dimensions,
-        )
-        return response.data[0].embedding
+        return (await self.create_embeddings([text], use_cache=use_cache))[0]
+
+    async def create_embeddings(self, texts: list[str], use_cache: bool = True) -> list[list[float]]:
+        """Create embeddings for multiple texts.
 
-    async def create_embeddings(self, texts: list[str]) -> list[list[float]]:
-        """Create embeddings for multiple texts."""
+        With use_cache, texts whose normalised form is already cached are
+        served from the cache and only the misses go to the API. Bulk
+        ingestion passes use_cache=False so one-off chunk texts don't evict
+        hot query vectors from the LRU.
+        """
         if not texts:
             return []
 
+        if not use_cache:
+            return await self._embed(texts)
+
+        keys = [make_cache_key(t, self.model, self.dimensions) for t in texts]
+        unique = dict(zip(keys, texts))  # first text wins for duplicate keys
+        vectors = await self.cache.get_many(list(unique))
+
+        missing = [k for k in unique if k not in vectors]
+        if missing:
+            fresh = dict(zip(missing, await self._embed([unique[k] for k in missing])))
+            await self.cache.put_many(fresh, self.model, self.dimensions)
+            vectors.update(fresh)
+
+        return [vectors[k] for k in keys]
+
+    async def _embed(self, texts: list[str]) -> list[list[float]]:
         response = await self.client.embeddings.create(
             model=self.model,
             input=texts,
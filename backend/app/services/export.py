@@ -0,0 +1,248 @@
+"""
+Streaming CSV / NDJSON exports for the dashboard, admin and ecommerce
+export endpoints.
+
+- Rows are read through a server-side cursor (`AsyncSession.stream`) in
+  EXPORT_BATCH_SIZE batches. Only the selected columns are fetched, not ORM
+  objects, so nothing piles up in an identity map. Each batch is encoded and
+  sent before the next is read, so peak memory depends on the batch size,
+  not on how many rows the tenant has.
+- The stream uses its own session. The request's session (from the get_db
+  dependency) is not guaranteed to outlive the endpoint once the response
+  starts.
+- Callers choose the columns (`?columns=question,created_at`) out of an
+  ExportTable's whitelist, a created_at range (`?from=&to=`), CSV or
+  NDJSON (`?format=`), and optional gzip (`?gzip=true`, served as
+  `<name>.<format>.gz`).
+- Datetimes are written as naive-UTC ISO 8601 strings in both formats,
+  which matches the previous CSV exports. NULL becomes an empty CSV field
+  and JSON null.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import zlib
+from collections.abc import AsyncIterable, AsyncIterator, Sequence
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from uuid import UUID
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from app.config import get_settings
+from app.database import async_session_maker
+from app.models import Order, QueryLog, UserProfile
+from app.utils.sse import dumps
+
+settings = get_settings()
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# zlib wbits for a gzip container (header + trailer) rather than raw deflate.
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+_GZIP_LEVEL = 6
+
+
+class ExportRequestError(ValueError):
+    """Unknown column or format in an export request."""
+
+
+@dataclass(frozen=True)
+class ExportTable:
+    """The columns a tenant may export from one table, by output name."""
+
+    columns: dict
+    customer_id: object
+    created_at: object
+
+
+QUERY_LOGS = ExportTable(
+    columns={
+        "id": QueryLog.id,
+        "question": QueryLog.question,
+        "answer": QueryLog.answer,
+        "top_score": QueryLog.top_score,
+        "avg_score": QueryLog.avg_score,
+        "response_time_ms": QueryLog.response_time_ms,
+        "retrieval_mode": QueryLog.retrieval_mode,
+        "fallback_triggered": QueryLog.fallback_triggered,
+        "llm_declined": QueryLog.llm_declined,
+        "retrieval_empty": QueryLog.retrieval_empty,
+        "answer_cache_hit": QueryLog.answer_cache_hit,
+        "context_tokens": QueryLog.context_tokens,
+        "origin_domain": QueryLog.origin_domain,
+        "feedback_vote": QueryLog.feedback_vote,
+        "created_at": QueryLog.created_at,
+    },
+    customer_id=QueryLog.customer_id,
+    created_at=QueryLog.created_at,
+)
+
+LEADS = ExportTable(
+    columns={
+        "id": UserProfile.id,
+        "email": UserProfile.email,
+        "name": UserProfile.name,
+        "phone": UserProfile.phone,
+        "location": UserProfile.location,
+        "user_type": UserProfile.user_type,
+        "lead_intent": UserProfile.lead_intent,
+        "custom_fields": UserProfile.custom_fields,
+        "created_at": UserProfile.created_at,
+    },
+    customer_id=UserProfile.customer_id,
+    created_at=UserProfile.created_at,
+)
+
+ORDERS = ExportTable(
+    columns={
+        "id": Order.id,
+        "order_number": Order.order_number,
+        "status": Order.status,
+        "payment_status": Order.payment_status,
+        "payment_method": Order.payment_method,
+        "subtotal": Order.subtotal,
+        "total": Order.total,
+        "currency": Order.currency,
+        "shopper_email": Order.shopper_email,
+        "items": Order.items,
+        "external_order_number": Order.external_order_number,
+        "created_at": Order.created_at,
+    },
+    customer_id=Order.customer_id,
+    created_at=Order.created_at,
+)
+
+# Default columns per endpoint: what each CSV export always contained.
+QUERY_EXPORT_COLUMNS = ("question", "answer", "top_score", "response_time_ms", "fallback_triggered", "created_at")
+ADMIN_QUERY_EXPORT_COLUMNS = (
+    "question", "answer", "top_score", "response_time_ms", "retrieval_mode", "fallback_triggered",
+    "origin_domain", "created_at",
+)
+LEAD_EXPORT_COLUMNS = (
+    "email", "name", "phone", "location", "user_type", "lead_intent", "custom_fields", "created_at",
+)
+ORDER_EXPORT_COLUMNS = (
+    "order_number", "status", "payment_status", "total", "currency", "shopper_email", "created_at",
+)
+
+
+def select_columns(table: ExportTable, requested: str | None, default: Sequence[str]) -> list[str]:
+    """Column names from a comma-separated `?columns=` value, else `default`."""
+    if not requested:
+        return list(default)
+    names = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in names if name not in table.columns]
+    if unknown or not names:
+        raise ExportRequestError(
+            f"Unknown export column(s): {', '.join(unknown) or '(none given)'}. "
+            f"Available: {', '.join(table.columns)}"
+        )
+    return list(dict.fromkeys(names))
+
+
+def _naive_utc(value: datetime | None) -> datetime | None:
+    # created_at columns are naive UTC; see admin_tenants.get_analytics.
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def build_query(
+    table: ExportTable,
+    customer_id,
+    names: Sequence[str],
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    """Newest first, like the exports always were."""
+    statement = select(*[table.columns[name] for name in names]).where(table.customer_id == customer_id)
+    since, until = _naive_utc(since), _naive_utc(until)
+    if since is not None:
+        statement = statement.where(table.created_at >= since)
+    if until is not None:
+        statement = statement.where(table.created_at <= until)
+    return statement.order_by(table.created_at.desc())
+
+
+async def stream_rows(statement, batch_size: int | None = None, session_maker=None) -> AsyncIterator[list]:
+    """Batches of result rows from a server-side cursor."""
+    batch_size = batch_size or settings.export_batch_size
+    session_maker = session_maker or async_session_maker
+    async with session_maker() as session:
+        result = await session.stream(statement.execution_options(yield_per=batch_size))
+        async for rows in result.partitions(batch_size):
+            yield rows
+
+
+def _text(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+async def encode_csv(names: Sequence[str], batches: AsyncIterable[list]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    yield buffer.getvalue().encode()
+    async for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_text(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode()
+
+
+async def encode_ndjson(names: Sequence[str], batches: AsyncIterable[list]) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield b"".join(
+            dumps({name: _text(value) for name, value in zip(names, row)}) + b"\n" for row in rows
+        )
+
+
+async def gzip_chunks(chunks: AsyncIterable[bytes], level: int = _GZIP_LEVEL) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_response(
+    table: ExportTable,
+    customer_id,
+    filename: str,
+    default_columns: Sequence[str],
+    columns: str | None = None,
+    fmt: str = "csv",
+    compress: bool = False,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    session_maker=None,
+) -> StreamingResponse:
+    """StreamingResponse for one tenant's rows of `table`.
+
+    Raises ExportRequestError for an unknown format or column; callers turn
+    it into a 400.
+    """
+    if fmt not in FORMATS:
+        raise ExportRequestError(f"Unknown export format: {fmt}. Available: {', '.join(FORMATS)}")
+    names = select_columns(table, columns, default_columns)
+    batches = stream_rows(build_query(table, customer_id, names, since, until), session_maker=session_maker)
+    body = encode_csv(names, batches) if fmt == "csv" else encode_ndjson(names, batches)
+    filename = f"{filename}.{fmt}"
+    media_type = FORMATS[fmt]
+    if compress:
+        body = gzip_chunks(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
@@ -55,8 +55,8 @@ class HospitalityAgentService:
         """
         system_prompt = HOSPITALITY_SYSTEM_PROMPT.format(brand_name=brand_name)
 
-        history = self.conversation_store.get_messages(session_id)
-        self.conversation_store.add_message(session_id, "user", question)
+        history = await self.conversation_store.get_messages(session_id)
+        await self.conversation_store.add_message(session_id, "user", question)
 
         messages = [{"role": "system", "content": system_prompt}]
         messages.extend(history[-10:])
@@ -154,7 +154,7 @@ class HospitalityAgentService:
             break
 
         if full_answer:
-            self.conversation_store.add_message(session_id, "assistant", full_answer)
+            await self.conversation_store.add_message(session_id, "assistant", full_answer)
 
         suggestions = _generate_hospitality_suggestions(full_answer)
 
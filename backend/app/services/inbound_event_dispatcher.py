@@ -38,6 +38,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import async_session_maker
 from app.models import Customer, InboundWebhookEvent
+from app.services.answer_cache import invalidate_answers
 from app.services.connectors.resolver import ConnectorResolver
 from app.services.embeddings import get_embedding_service
 from app.services.vector_store import get_vector_store_service
@@ -137,6 +138,8 @@ async def handle_product_change(db: AsyncSession, event: InboundWebhookEvent) ->
         ],
         namespace=customer.site_id,
     )
+    # Inside the batch transaction: the version bump commits with the batch.
+    await invalidate_answers(db, customer.id, commit=False)
 
 
 async def handle_product_deleted(db: AsyncSession, event: InboundWebhookEvent) -> None:
@@ -157,6 +160,7 @@ async def handle_product_deleted(db: AsyncSession, event: InboundWebhookEvent) -
         [_stella_vector_id(str(external_id))],
         namespace=customer.site_id,
     )
+    await invalidate_answers(db, customer.id, commit=False)
 
 
 async def _stub_handler(db: AsyncSession, event: InboundWebhookEvent) -> None:
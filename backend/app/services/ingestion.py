@@ -1,20 +1,87 @@
 from __future__ import annotations
+import hashlib
+import json
 import uuid
 import logging
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, text
+from sqlalchemy import delete, select
 
-from app.models import Customer, IngestionJob, DocumentChunk, Product
+from app.config import get_settings
+from app.models import Customer, CrawledPage, IngestionJob, DocumentChunk, Product
+from app.services.answer_cache import invalidate_answers
+from app.services.chunk_writer import chunk_row, write_chunks
+from app.services.embedding_pipeline import EmbeddingPipeline
 from app.services.embeddings import get_embedding_service
 from app.services.vector_store import get_vector_store_service
 from app.utils.chunking import chunk_text
-from app.utils.crawling import crawl_url, extract_text_from_pdf
+from app.utils.crawling import SiteCrawler, extract_text_from_pdf, normalize_url
 from app.utils.file_parsers import extract_pdf_text, extract_docx_text, extract_plain_text
+from app.utils.product_scraper import ProductData, scrape_products
 
 logger = logging.getLogger(__name__)
 
+settings = get_settings()
+
 MIN_CONTENT_LENGTH = 300
+INGEST_FLUSH_CHUNKS = 100  # one embeddings request per flush
+PRODUCT_EMBED_BATCH_SIZE = 100
+
+
+def _content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _json_list(value: str | None) -> list:
+    try:
+        parsed = json.loads(value) if value else []
+    except ValueError:
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+def _product_columns(product_data: ProductData) -> dict:
+    """Product column values for a scraped product (JSON fields encoded)."""
+    return {
+        "name": product_data.name,
+        "description": product_data.description,
+        "price": product_data.price,
+        "currency": product_data.currency,
+        "original_price": product_data.original_price,
+        "images": json.dumps(product_data.images),
+        "url": product_data.url,
+        "sku": product_data.sku,
+        "brand": product_data.brand,
+        "category": product_data.category,
+        "sizes": json.dumps(product_data.sizes),
+        "colors": json.dumps(product_data.colors),
+        "in_stock": product_data.in_stock,
+        "tags": json.dumps(product_data.tags),
+    }
+
+
+def _stored_embedding_text(product: Product) -> str:
+    """The embedding text a stored product row was last embedded from."""
+    return ProductData(
+        name=product.name,
+        description=product.description or "",
+        brand=product.brand or "",
+        category=product.category or "",
+        sizes=_json_list(product.sizes),
+        colors=_json_list(product.colors),
+        tags=_json_list(product.tags),
+    ).embedding_text()
+
+
+def _scrape_page_products(html: str, page_url: str) -> list[ProductData]:
+    """Scrape one page's products, falling back to the page URL's hash for
+    products the scraper could not key."""
+    products = scrape_products(html, page_url)
+    page_hash = hashlib.sha256(page_url.encode()).hexdigest()
+    for product in products:
+        if not product.source_hash:
+            product.source_hash = page_hash
+    return products
 
 
 class IngestionService:
@@ -22,109 +89,111 @@ class IngestionService:
         self.embedding_service = get_embedding_service()
         self.vector_store = get_vector_store_service()
 
+    async def _start_job(self, db: AsyncSession, job: IngestionJob | None, **fields) -> IngestionJob:
+        """Mark a queued job (or a new one built from `fields`) as processing."""
+        if job is None:
+            job = IngestionJob(**fields)
+            db.add(job)
+        job.status = "processing"
+        job.error_message = None
+        job.embedding_chunks = None
+        job.embedding_seconds = None
+        job.started_at = datetime.utcnow()
+        job.completed_at = None
+        await db.commit()
+        await db.refresh(job)
+        return job
+
     async def _scrape_and_store_products(
         self,
         db: AsyncSession,
         customer_id: uuid.UUID,
         site_id: str,
-        html: str,
-        page_url: str,
+        pages: list[tuple[str, str]],
     ) -> int:
-        """Scrape products from HTML and upsert to database + vector store."""
-        import json
-        import hashlib
-        from app.utils.product_scraper import scrape_products
-
-        products = scrape_products(html, page_url)
-        if not products:
+        """Scrape products from crawled (url, html) pages and upsert them to
+        the database + vector store in bulk: one lookup by source_hash, one
+        embeddings call per PRODUCT_EMBED_BATCH_SIZE texts, batched vector
+        upserts and a single commit. Products whose embedding text is
+        unchanged keep their existing vector."""
+        products: list[ProductData] = []
+        for page_url, html in pages:
+            try:
+                products.extend(_scrape_page_products(html, page_url))
+            except Exception as e:
+                logger.warning("[PRODUCT-SCRAPE] Error scraping %s: %s", page_url, e)
+
+        # Last occurrence wins when a crawl sees the same product twice.
+        by_hash = {p.source_hash: p for p in products}
+        if not by_hash:
             return 0
 
-        stored = 0
-        for product_data in products:
-            source_hash = hashlib.sha256(page_url.encode()).hexdigest()
-
-            # Check for existing product (dedup by source_hash + customer_id)
-            from sqlalchemy import select as sa_select
-            existing = await db.execute(
-                sa_select(Product).where(
+        existing_rows = (
+            await db.execute(
+                select(Product).where(
                     Product.customer_id == customer_id,
-                    Product.source_hash == source_hash,
+                    Product.source_hash.in_(list(by_hash)),
                 )
             )
-            existing_product = existing.scalar_one_or_none()
-
-            if existing_product:
-                # Update existing product
-                existing_product.name = product_data.name
-                existing_product.description = product_data.description
-                existing_product.price = product_data.price
-                existing_product.currency = product_data.currency
-                existing_product.original_price = product_data.original_price
-                existing_product.images = json.dumps(product_data.images)
-                existing_product.url = product_data.url
-                existing_product.sku = product_data.sku
-                existing_product.brand = product_data.brand
-                existing_product.category = product_data.category
-                existing_product.sizes = json.dumps(product_data.sizes)
-                existing_product.colors = json.dumps(product_data.colors)
-                existing_product.in_stock = product_data.in_stock
-                existing_product.tags = json.dumps(product_data.tags)
-                existing_product.scraped_at = datetime.utcnow()
-                product_id = existing_product.id
-            else:
-                # Create new product
-                product = Product(
+        ).scalars().all()
+        existing = {}
+        for row in existing_rows:
+            existing.setdefault(row.source_hash, row)
+
+        now = datetime.utcnow()
+        to_embed: list[tuple[Product, str]] = []
+        new_rows = []
+        for source_hash, product_data in by_hash.items():
+            embedding_text = product_data.embedding_text()
+            row = existing.get(source_hash)
+            if row is None:
+                row = Product(
+                    id=uuid.uuid4(),
                     customer_id=customer_id,
-                    name=product_data.name,
-                    description=product_data.description,
-                    price=product_data.price,
-                    currency=product_data.currency,
-                    original_price=product_data.original_price,
-                    images=json.dumps(product_data.images),
-                    url=product_data.url,
-                    sku=product_data.sku,
-                    brand=product_data.brand,
-                    category=product_data.category,
-                    sizes=json.dumps(product_data.sizes),
-                    colors=json.dumps(product_data.colors),
-                    in_stock=product_data.in_stock,
-                    tags=json.dumps(product_data.tags),
                     source_hash=source_hash,
-                    scraped_at=datetime.utcnow(),
+                    **_product_columns(product_data),
+                    scraped_at=now,
                 )
-                db.add(product)
-                await db.flush()
-                product_id = product.id
+                new_rows.append(row)
+                to_embed.append((row, embedding_text))
+                continue
 
-            # Embed product for vector search
-            embedding_text = product_data.embedding_text()
-            embeddings = await self.embedding_service.create_embeddings([embedding_text])
-            if embeddings:
-                vector_id = f"product_{product_id}"
-                await self.vector_store.upsert_vectors(
-                    [{
-                        "id": vector_id,
-                        "values": embeddings[0],
-                        "metadata": {
-                            "type": "product",
-                            "product_id": str(product_id),
-                            "site_id": site_id,
-                        },
-                    }],
-                    namespace=site_id,
-                )
+            unchanged = row.vector_id and _stored_embedding_text(row) == embedding_text
+            for column, value in _product_columns(product_data).items():
+                setattr(row, column, value)
+            row.scraped_at = now
+            if not unchanged:
+                to_embed.append((row, embedding_text))
 
-                # Update vector_id on product
-                if existing_product:
-                    existing_product.vector_id = vector_id
-                else:
-                    product.vector_id = vector_id
+        db.add_all(new_rows)
 
-            stored += 1
+        vectors = []
+        for i in range(0, len(to_embed), PRODUCT_EMBED_BATCH_SIZE):
+            batch = to_embed[i:i + PRODUCT_EMBED_BATCH_SIZE]
+            embeddings = await self.embedding_service.create_embeddings(
+                [embedding_text for _, embedding_text in batch], use_cache=False,
+            )
+            for (row, _), embedding in zip(batch, embeddings):
+                vectors.append({
+                    "id": f"product_{row.id}",
+                    "values": embedding,
+                    "metadata": {
+                        "type": "product",
+                        "product_id": str(row.id),
+                        "site_id": site_id,
+                    },
+                })
+        await self.vector_store.upsert_vectors(vectors, namespace=site_id)
+
+        for vector, (row, _) in zip(vectors, to_embed):
+            row.vector_id = vector["id"]
 
         await db.commit()
-        logger.info("[PRODUCT-SCRAPE] Stored %d products from %s", stored, page_url)
-        return stored
+        logger.info(
+            "[PRODUCT-SCRAPE] Stored %d products from %d pages (new=%d embedded=%d)",
+            len(by_hash), len(pages), len(new_rows), len(to_embed),
+        )
+        return len(by_hash)
 
     async def ingest_url(
         self,
@@ -134,6 +203,7 @@ class IngestionService:
         url: str,
         depth: int = 0,
         max_pages: int = 1,
+        job: IngestionJob | None = None,
     ) -> IngestionJob:
         """
         Ingest content from a URL.
@@ -145,22 +215,17 @@ class IngestionService:
             url: URL to crawl
             depth: Crawl depth (0 = single page)
             max_pages: Maximum pages to crawl
+            job: Queued IngestionJob to run (a new one is created when omitted)
 
         Returns:
             IngestionJob record
         """
-        # Create job record
-        job = IngestionJob(
-            customer_id=customer_id,
-            source_type="url",
-            source_url=url,
-            status="processing",
-            started_at=datetime.utcnow(),
-        )
-        db.add(job)
-        await db.commit()
-        await db.refresh(job)
+        job = await self._start_job(db, job, customer_id=customer_id, source_type="url", source_url=url)
 
+        # Vectors of chunks deleted in the open transaction, and of deletes
+        # already committed; only the latter are removed from the vector store.
+        vanished_vector_ids: list[str] = []
+        stale_vector_ids: list[str] = []
         try:
             # Check if customer is ecommerce (for product scraping)
             customer_result = await db.execute(
@@ -169,84 +234,224 @@ class IngestionService:
             customer = customer_result.scalar_one_or_none()
             is_ecommerce = customer and customer.website_type == "ecommerce"
 
-            # Crawl URLs
-            pages_to_process = [url]
-            processed_urls = set()
-            all_chunks = []
+            # Previous crawl state drives conditional GETs and chunk diffs.
+            known_pages = {
+                page.url: page
+                for page in (
+                    await db.execute(select(CrawledPage).where(CrawledPage.customer_id == customer_id))
+                ).scalars().all()
+            }
+
+            # Crawl concurrently and chunk + embed changed pages as they
+            # arrive, flushing every INGEST_FLUSH_CHUNKS new chunks.
+            crawler = SiteCrawler(
+                max_pages=max_pages,
+                depth=depth,
+                concurrency=settings.crawl_concurrency,
+                per_host_concurrency=settings.crawl_per_host_concurrency,
+                timeout=settings.crawl_timeout_seconds,
+                respect_robots=settings.crawl_respect_robots,
+                use_sitemap=settings.crawl_use_sitemap,
+                validators={
+                    page_url: {
+                        "etag": page.etag,
+                        "last_modified": page.last_modified,
+                        "links": _json_list(page.links),
+                    }
+                    for page_url, page in known_pages.items()
+                },
+            )
+            pending_chunks: list[dict] = []
+            chunks_created = 0
+            stats = {"pages": 0, "unchanged": 0, "kept": 0, "deleted": 0}
             crawled_html_pages: list[tuple[str, str]] = []  # (url, html)
 
-            while pages_to_process and len(processed_urls) < max_pages:
-                current_url = pages_to_process.pop(0)
-
-                if current_url in processed_urls:
+            async for page_data in crawler.crawl(url):
+                stats["pages"] += 1
+                page_key = normalize_url(page_data["url"])
+                page = known_pages.get(page_key)
+
+                if page_data.get("gone"):
+                    stats["deleted"] += await self._drop_page_chunks(
+                        db, customer_id, page_data["url"], vanished_vector_ids,
+                    )
+                    if page is not None:
+                        await db.delete(page)
+                        del known_pages[page_key]
                     continue
 
-                processed_urls.add(current_url)
-
-                try:
-                    # Crawl the page
-                    page_data = await crawl_url(current_url)
-
-                    # Store raw HTML for product scraping
-                    if page_data.get("html"):
-                        crawled_html_pages.append((current_url, page_data["html"]))
-
-                    # Chunk the content
-                    chunks = chunk_text(page_data["content"])
+                if page is None:
+                    page = CrawledPage(customer_id=customer_id, url=page_key)
+                    db.add(page)
+                    known_pages[page_key] = page
+                page.last_crawled_at = datetime.utcnow()
+                if page_data.get("not_modified"):
+                    stats["unchanged"] += 1
+                    continue
 
-                    for chunk in chunks:
-                        chunk["source_url"] = current_url
-                        chunk["source_title"] = page_data["title"]
-                        all_chunks.append(chunk)
+                page.etag = page_data.get("etag")
+                page.last_modified = page_data.get("last_modified")
+                page.links = json.dumps(page_data["links"])
 
-                    # Add links to queue if depth > 0
-                    if depth > 0 and len(processed_urls) < max_pages:
-                        for link in page_data["links"][:10]:  # Limit links per page
-                            if link not in processed_urls:
-                                pages_to_process.append(link)
+                # Keep raw HTML for product scraping
+                if is_ecommerce and page_data.get("html"):
+                    crawled_html_pages.append((page_data["url"], page_data["html"]))
 
-                except Exception as e:
-                    print(f"Error crawling {current_url}: {e}")
+                content_hash = _content_hash(page_data["content"])
+                if page.content_hash == content_hash:
+                    stats["unchanged"] += 1
                     continue
-
-            # Generate embeddings and store
-            if all_chunks:
+                page.content_hash = content_hash
+
+                chunks = chunk_text(page_data["content"])
+                for chunk in chunks:
+                    chunk["source_url"] = page_data["url"]
+                    chunk["source_title"] = page_data["title"]
+                fresh, kept, deleted = await self._diff_page_chunks(
+                    db, customer_id, page_data["url"], chunks, vanished_vector_ids,
+                )
+                pending_chunks.extend(fresh)
+                stats["kept"] += kept
+                stats["deleted"] += deleted
+
+                if len(pending_chunks) >= INGEST_FLUSH_CHUNKS:
+                    await self._process_chunks(
+                        db=db,
+                        job=job,
+                        site_id=site_id,
+                        chunks=pending_chunks,
+                        start_index=chunks_created,
+                    )
+                    chunks_created += len(pending_chunks)
+                    pending_chunks = []
+                    stale_vector_ids.extend(vanished_vector_ids)
+                    vanished_vector_ids.clear()
+
+            # Generate embeddings and store the remainder
+            if pending_chunks:
                 await self._process_chunks(
                     db=db,
                     job=job,
                     site_id=site_id,
-                    chunks=all_chunks,
+                    chunks=pending_chunks,
+                    start_index=chunks_created,
                 )
+                chunks_created += len(pending_chunks)
+
+            logger.info(
+                "[INGEST] %s pages=%d unchanged=%d chunks new=%d kept=%d deleted=%d",
+                url, stats["pages"], stats["unchanged"], chunks_created, stats["kept"], stats["deleted"],
+            )
 
             # Scrape products if ecommerce
             if is_ecommerce and crawled_html_pages:
-                for page_url, html in crawled_html_pages:
-                    try:
-                        await self._scrape_and_store_products(
-                            db=db,
-                            customer_id=customer_id,
-                            site_id=site_id,
-                            html=html,
-                            page_url=page_url,
-                        )
-                    except Exception as e:
-                        logger.warning("[PRODUCT-SCRAPE] Error scraping %s: %s", page_url, e)
+                try:
+                    await self._scrape_and_store_products(
+                        db=db,
+                        customer_id=customer_id,
+                        site_id=site_id,
+                        pages=crawled_html_pages,
+                    )
+                except Exception as e:
+                    logger.warning("[PRODUCT-SCRAPE] Error storing products for %s: %s", url, e)
 
             # Update job status
             job.status = "completed"
-            job.chunks_created = len(all_chunks)
+            job.chunks_created = chunks_created
             job.completed_at = datetime.utcnow()
             await db.commit()
+            stale_vector_ids.extend(vanished_vector_ids)
+            await invalidate_answers(db, customer_id)
 
         except Exception as e:
+            # Drop uncommitted page hashes and chunk deletes so the next crawl
+            # retries those pages instead of treating them as unchanged.
+            await db.rollback()
             job.status = "failed"
             job.error_message = str(e)
             job.completed_at = datetime.utcnow()
             await db.commit()
             raise
+        finally:
+            if stale_vector_ids:
+                try:
+                    await self.vector_store.delete_vectors(stale_vector_ids, namespace=site_id)
+                except Exception as e:
+                    # Orphaned vectors are harmless: retrieval drops ids with
+                    # no document_chunks row.
+                    logger.warning("[INGEST] Failed to delete %d stale vectors: %s", len(stale_vector_ids), e)
 
         return job
 
+    async def _diff_page_chunks(
+        self,
+        db: AsyncSession,
+        customer_id: uuid.UUID,
+        page_url: str,
+        chunks: list[dict],
+        vanished_vector_ids: list[str],
+    ) -> tuple[list[dict], int, int]:
+        """Match a re-crawled page's chunks against its stored chunks by
+        content hash.
+
+        Unchanged chunks keep their row and vector (only chunk_index is
+        updated); stored chunks with no match are deleted and their vector ids
+        appended to `vanished_vector_ids`. Returns (chunks that need
+        embedding, kept count, deleted count).
+        """
+        stored: dict[str, list[DocumentChunk]] = {}
+        for row in (
+            await db.execute(
+                select(DocumentChunk).where(
+                    DocumentChunk.customer_id == customer_id,
+                    DocumentChunk.source_url == page_url,
+                )
+            )
+        ).scalars().all():
+            stored.setdefault(row.content_hash or _content_hash(row.content), []).append(row)
+
+        fresh = []
+        kept = 0
+        for chunk in chunks:
+            chunk["content_hash"] = _content_hash(chunk["content"])
+            rows = stored.get(chunk["content_hash"])
+            if rows:
+                row = rows.pop()
+                row.chunk_index = chunk["chunk_index"]
+                row.content_hash = chunk["content_hash"]
+                kept += 1
+            else:
+                fresh.append(chunk)
+
+        # Leftovers include duplicate copies piled up by earlier full re-ingests.
+        vanished = [row for rows in stored.values() for row in rows]
+        if vanished:
+            await db.execute(
+                delete(DocumentChunk).where(DocumentChunk.id.in_([row.id for row in vanished]))
+            )
+            vanished_vector_ids.extend(row.vector_id for row in vanished)
+        return fresh, kept, len(vanished)
+
+    async def _drop_page_chunks(
+        self,
+        db: AsyncSession,
+        customer_id: uuid.UUID,
+        page_url: str,
+        vanished_vector_ids: list[str],
+    ) -> int:
+        """Delete every stored chunk of a page that no longer exists."""
+        result = await db.execute(
+            delete(DocumentChunk)
+            .where(
+                DocumentChunk.customer_id == customer_id,
+                DocumentChunk.source_url == page_url,
+            )
+            .returning(DocumentChunk.vector_id)
+        )
+        vector_ids = list(result.scalars().all())
+        vanished_vector_ids.extend(vector_ids)
+        return len(vector_ids)
+
     async def ingest_text(
         self,
         db: AsyncSession,
@@ -254,6 +459,7 @@ class IngestionService:
         site_id: str,
         text: str,
         source_title: str = "Uploaded Text",
+        job: IngestionJob | None = None,
     ) -> IngestionJob:
         """
         Ingest raw text content.
@@ -264,21 +470,14 @@ class IngestionService:
             site_id: Customer site ID (Pinecone namespace)
             text: Text content to ingest
             source_title: Title for the content
+            job: Queued IngestionJob to run (a new one is created when omitted)
 
         Returns:
             IngestionJob record
         """
-        # Create job record
-        job = IngestionJob(
-            customer_id=customer_id,
-            source_type="text",
-            source_filename=source_title,
-            status="processing",
-            started_at=datetime.utcnow(),
+        job = await self._start_job(
+            db, job, customer_id=customer_id, source_type="text", source_filename=source_title,
         )
-        db.add(job)
-        await db.commit()
-        await db.refresh(job)
 
         try:
             # Chunk the content
@@ -301,6 +500,7 @@ class IngestionService:
             job.chunks_created = len(chunks)
             job.completed_at = datetime.utcnow()
             await db.commit()
+            await invalidate_answers(db, customer_id)
 
         except Exception as e:
             job.status = "failed"
@@ -368,6 +568,7 @@ class IngestionService:
             job.chunks_created = len(chunks)
             job.completed_at = datetime.utcnow()
             await db.commit()
+            await invalidate_answers(db, customer_id)
 
         except Exception as e:
             job.status = "failed"
@@ -386,6 +587,7 @@ class IngestionService:
         file_bytes: bytes,
         filename: str,
         source_type: str,
+        job: IngestionJob | None = None,
     ) -> IngestionJob:
         """
         Ingest content from an uploaded file (PDF, DOCX, or plain text).
@@ -397,20 +599,14 @@ class IngestionService:
             file_bytes: Raw file bytes
             filename: Original filename
             source_type: File type — "pdf", "docx", or "text"
+            job: Queued IngestionJob to run (a new one is created when omitted)
 
         Returns:
             IngestionJob record
         """
-        job = IngestionJob(
-            customer_id=customer_id,
-            source_type=source_type,
-            source_filename=filename,
-            status="processing",
-            started_at=datetime.utcnow(),
+        job = await self._start_job(
+            db, job, customer_id=customer_id, source_type=source_type, source_filename=filename,
         )
-        db.add(job)
-        await db.commit()
-        await db.refresh(job)
 
         try:
             # Extract text based on source type
@@ -448,6 +644,7 @@ class IngestionService:
             job.chunks_created = len(chunks)
             job.completed_at = datetime.utcnow()
             await db.commit()
+            await invalidate_answers(db, customer_id)
             logger.info("File ingestion completed: %s → %d chunks", filename, len(chunks))
 
         except Exception as e:
@@ -467,6 +664,7 @@ class IngestionService:
         question: str,
         answer: str,
         source_prefix: str = "QA",
+        job: IngestionJob | None = None,
     ) -> IngestionJob:
         """
         Ingest a Q&A seed pair as a knowledge chunk.
@@ -478,20 +676,15 @@ class IngestionService:
             question: The question
             answer: The answer
             source_prefix: Prefix for source_filename (default "QA", use "Auto-FAQ" for auto-generated)
+            job: Queued IngestionJob to run (a new one is created when omitted)
 
         Returns:
             IngestionJob record
         """
-        job = IngestionJob(
-            customer_id=customer_id,
-            source_type="qa_seed",
+        job = await self._start_job(
+            db, job, customer_id=customer_id, source_type="qa_seed",
             source_filename=f"{source_prefix}: {question[:80]}",
-            status="processing",
-            started_at=datetime.utcnow(),
         )
-        db.add(job)
-        await db.commit()
-        await db.refresh(job)
 
         try:
             # Combine Q&A into a single text block
@@ -514,6 +707,7 @@ class IngestionService:
             job.chunks_created = len(chunks)
             job.completed_at = datetime.utcnow()
             await db.commit()
+            await invalidate_answers(db, customer_id)
             logger.info("QA seed ingested: %d chunks for site %s", len(chunks), site_id)
 
         except Exception as e:
@@ -531,68 +725,56 @@ class IngestionService:
         job: IngestionJob,
         site_id: str,
         chunks: list[dict],
+        start_index: int = 0,
     ) -> None:
-        """Process chunks: generate embeddings and store in vector DB."""
-        # Extract content for embedding
-        texts = [chunk["content"] for chunk in chunks]
-
-        # Generate embeddings in batches
-        batch_size = 100
-        all_embeddings = []
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            embeddings = await self.embedding_service.create_embeddings(batch)
-            all_embeddings.extend(embeddings)
-
-        # Prepare vectors for Pinecone
-        vectors = []
-        for i, (chunk, embedding) in enumerate(zip(chunks, all_embeddings)):
-            vector_id = f"{job.id}_{i}"
-
-            vectors.append({
-                "id": vector_id,
-                "values": embedding,
-                "metadata": {
-                    "source_url": chunk.get("source_url", ""),
-                    "source_title": chunk.get("source_title", ""),
-                    "chunk_index": chunk["chunk_index"],
-                    "job_id": str(job.id),
-                    "site_id": site_id,
-                },
-            })
-
-            # Create document chunk record with full content in Postgres
-            doc_chunk = DocumentChunk(
-                customer_id=job.customer_id,
-                job_id=job.id,
-                vector_id=vector_id,
-                chunk_index=chunk["chunk_index"],
-                content=chunk["content"],
-                content_preview=chunk["content"][:500],
-                source_url=chunk.get("source_url"),
-                source_title=chunk.get("source_title"),
-                token_count=chunk.get("token_count"),
-            )
-            db.add(doc_chunk)
-
-        # Upsert to Pinecone
-        await self.vector_store.upsert_vectors(vectors, namespace=site_id)
+        """Process chunks: generate embeddings and store in vector DB.
+
+        Embeddings come from the rate-limited EmbeddingPipeline; each batch
+        is upserted to the vector store and written to Postgres while the
+        next batches embed. Nothing commits until every batch is written:
+        the single commit at the end also covers the caller's pending
+        CrawledPage hashes and chunk deletes, so a failed batch leaves them
+        all to the caller's rollback. `start_index` offsets vector ids when
+        one job's chunks are written in several calls (streamed crawls)."""
+
+        async def store(start: int, end: int, embeddings: list[list[float]]) -> None:
+            vectors = []
+            rows = []
+            for i, (chunk, embedding) in enumerate(zip(chunks[start:end], embeddings), start=start):
+                vector_id = f"{job.id}_{start_index + i}"
+                vectors.append({
+                    "id": vector_id,
+                    "values": embedding,
+                    "metadata": {
+                        "source_url": chunk.get("source_url", ""),
+                        "source_title": chunk.get("source_title", ""),
+                        "chunk_index": chunk["chunk_index"],
+                        "job_id": str(job.id),
+                        "site_id": site_id,
+                    },
+                })
+                rows.append(chunk_row(
+                    job.customer_id, job.id, vector_id, chunk,
+                    chunk.get("content_hash") or _content_hash(chunk["content"]),
+                ))
+            await self.vector_store.upsert_vectors(vectors, namespace=site_id)
+            # Bulk write with full content (search_vector is a generated column).
+            # No commit here: see the docstring.
+            await write_chunks(db, rows)
+
+        pipeline = EmbeddingPipeline(self.embedding_service)
+        stats = await pipeline.run(
+            [chunk["content"] for chunk in chunks], store, [chunk.get("token_count") for chunk in chunks],
+        )
 
-        # Commit document chunks
+        # Per-job throughput: summed over every call for the job
+        job.embedding_chunks = (job.embedding_chunks or 0) + stats.chunks
+        job.embedding_seconds = (job.embedding_seconds or 0.0) + stats.seconds
         await db.commit()
-
-        # Backfill search_vector for full-text search
-        vector_ids = [v["id"] for v in vectors]
-        await db.execute(
-            text("""
-                UPDATE document_chunks
-                SET search_vector = to_tsvector('english', content)
-                WHERE vector_id = ANY(:vector_ids)
-                AND search_vector IS NULL
-            """),
-            {"vector_ids": vector_ids},
+        logger.info(
+            "[EMBED] job=%s chunks=%d tokens=%d requests=%d retries=%d %.1f chunks/s",
+            job.id, stats.chunks, stats.tokens, stats.requests, stats.retries, stats.chunks_per_second or 0.0,
         )
-        await db.commit()
 
     async def delete_customer_data(
         self,
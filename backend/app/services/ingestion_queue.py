@@ -0,0 +1,400 @@
+"""
+Durable ingestion queue and worker.
+
+API handlers call `enqueue_ingestion()` and return straight away; the work
+runs in the ingestion worker process (`python -m app.worker`), away from the
+event loop that serves widget queries. For url/text/file/qa work the
+IngestionJob row is created at enqueue time with status "pending", so the
+caller can hand its id back to the dashboard immediately.
+
+Worker loop, one per process:
+
+1. Claim up to (concurrency - running) rows from `ingestion_tasks` in one
+   statement: due `queued` rows, plus `running` rows whose heartbeat is older
+   than INGESTION_STALE_AFTER_SECONDS (the worker that had them died).
+   `FOR UPDATE SKIP LOCKED` keeps two workers off the same row, as in the
+   inbound dispatcher — but the row lock is released as soon as the claim
+   commits, because ingestion runs for minutes; ownership is then the
+   `locked_by` column plus the heartbeat.
+2. Run each claimed task in its own asyncio task and session, heartbeating
+   every INGESTION_HEARTBEAT_SECONDS.
+3. On success mark it `done`. On failure re-queue it with jittered
+   exponential backoff until `max_attempts`, then mark it `failed`.
+4. On shutdown, wait briefly for running tasks, then cancel them and put
+   them back in the queue without spending an attempt.
+
+Every state change after the claim is guarded by `locked_by`, so a worker
+whose task was reclaimed cannot overwrite the new owner's result.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import async_session_maker
+from app.models import IngestionJob, IngestionTask
+
+logger = logging.getLogger("zunkiree.ingestion_queue")
+
+settings = get_settings()
+
+POLL_INTERVAL_SECONDS = 2
+SHUTDOWN_GRACE_SECONDS = 20
+MAX_BACKOFF_SECONDS = 3600
+PURGE_INTERVAL_SECONDS = 3600
+RETENTION_INTERVAL = "7 days"
+
+
+CLAIM_SQL = text(
+    """
+    WITH picked AS (
+        SELECT id
+        FROM ingestion_tasks
+        WHERE (status = 'queued' AND run_after <= NOW())
+           OR (status = 'running'
+               AND heartbeat_at < NOW() - make_interval(secs => CAST(:stale_seconds AS double precision)))
+        ORDER BY run_after ASC
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE ingestion_tasks AS t
+    SET status = 'running',
+        attempts = t.attempts + 1,
+        locked_by = :worker_id,
+        heartbeat_at = NOW()
+    FROM picked
+    WHERE t.id = picked.id
+    RETURNING t.id
+    """
+)
+
+HEARTBEAT_SQL = text(
+    """
+    UPDATE ingestion_tasks
+    SET heartbeat_at = NOW()
+    WHERE id = ANY(CAST(:ids AS uuid[])) AND locked_by = :worker_id AND status = 'running'
+    """
+)
+
+FINISH_SQL = text(
+    """
+    UPDATE ingestion_tasks
+    SET status = :status, last_error = :error, finished_at = NOW(),
+        locked_by = NULL, heartbeat_at = NULL, blob = NULL
+    WHERE id = :id AND locked_by = :worker_id
+    """
+)
+
+RETRY_SQL = text(
+    """
+    UPDATE ingestion_tasks
+    SET status = 'queued', last_error = :error, run_after = :run_after,
+        locked_by = NULL, heartbeat_at = NULL
+    WHERE id = :id AND locked_by = :worker_id
+    """
+)
+
+# Shutdown: hand unfinished tasks back without spending an attempt.
+RELEASE_SQL = text(
+    """
+    UPDATE ingestion_tasks
+    SET status = 'queued', attempts = GREATEST(attempts - 1, 0),
+        locked_by = NULL, heartbeat_at = NULL
+    WHERE id = ANY(CAST(:ids AS uuid[])) AND locked_by = :worker_id AND status = 'running'
+    """
+)
+
+PURGE_SQL = text(
+    f"""
+    DELETE FROM ingestion_tasks
+    WHERE status IN ('done', 'failed')
+      AND finished_at < NOW() - INTERVAL '{RETENTION_INTERVAL}'
+    """
+)
+
+
+# ---------- Handlers ----------
+
+Handler = Callable[[AsyncSession, IngestionTask, IngestionJob | None], Awaitable[None]]
+
+
+async def _handle_url(db: AsyncSession, task: IngestionTask, job: IngestionJob | None) -> None:
+    from app.services.ingestion import get_ingestion_service
+    p = task.payload
+    await get_ingestion_service().ingest_url(
+        db=db, customer_id=task.customer_id, site_id=p["site_id"], url=p["url"],
+        depth=p.get("depth", 0), max_pages=p.get("max_pages", 1), job=job,
+    )
+
+
+async def _handle_text(db: AsyncSession, task: IngestionTask, job: IngestionJob | None) -> None:
+    from app.services.ingestion import get_ingestion_service
+    p = task.payload
+    await get_ingestion_service().ingest_text(
+        db=db, customer_id=task.customer_id, site_id=p["site_id"], text=p["text"],
+        source_title=p.get("source_title") or "Uploaded Text", job=job,
+    )
+
+
+async def _handle_file(db: AsyncSession, task: IngestionTask, job: IngestionJob | None) -> None:
+    from app.services.ingestion import get_ingestion_service
+    p = task.payload
+    await get_ingestion_service().ingest_file(
+        db=db, customer_id=task.customer_id, site_id=p["site_id"], file_bytes=task.blob or b"",
+        filename=p["filename"], source_type=p["source_type"], job=job,
+    )
+
+
+async def _handle_qa(db: AsyncSession, task: IngestionTask, job: IngestionJob | None) -> None:
+    from app.services.ingestion import get_ingestion_service
+    p = task.payload
+    await get_ingestion_service().ingest_qa(
+        db=db, customer_id=task.customer_id, site_id=p["site_id"], question=p["question"],
+        answer=p["answer"], source_prefix=p.get("source_prefix", "QA"), job=job,
+    )
+
+
+async def _handle_auto_ingest(db: AsyncSession, task: IngestionTask, job: IngestionJob | None) -> None:
+    from app.services.auto_ingest import run_auto_ingestion
+    await run_auto_ingestion(task.customer_id, task.payload["site_id"], task.payload["domains"])
+
+
+HANDLERS: dict[str, Handler] = {
+    "url": _handle_url,
+    "text": _handle_text,
+    "file": _handle_file,
+    "qa": _handle_qa,
+    "auto_ingest": _handle_auto_ingest,
+}
+
+# IngestionJob columns for kinds that report progress through a job row.
+_JOB_FIELDS: dict[str, Callable[[dict], dict]] = {
+    "url": lambda p: {"source_type": "url", "source_url": p["url"]},
+    "text": lambda p: {"source_type": "text", "source_filename": p.get("source_title") or "Uploaded Text"},
+    "file": lambda p: {"source_type": p["source_type"], "source_filename": p["filename"]},
+    "qa": lambda p: {
+        "source_type": "qa_seed",
+        "source_filename": f"{p.get('source_prefix', 'QA')}: {p['question'][:80]}",
+    },
+}
+
+
+# ---------- Enqueue (API side) ----------
+
+async def enqueue_ingestion(
+    db: AsyncSession,
+    *,
+    customer_id: uuid.UUID,
+    site_id: str,
+    kind: str,
+    payload: dict,
+    blob: bytes | None = None,
+    commit: bool = True,
+) -> IngestionTask:
+    """Queue one unit of ingestion work. For url/text/file/qa the pending
+    IngestionJob is created in the same transaction and linked via
+    `task.job_id`."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown ingestion task kind: {kind}")
+    payload = {**payload, "site_id": site_id}
+
+    job_id = None
+    if kind in _JOB_FIELDS:
+        job = IngestionJob(
+            id=uuid.uuid4(), customer_id=customer_id, status="pending", **_JOB_FIELDS[kind](payload),
+        )
+        db.add(job)
+        job_id = job.id
+
+    task = IngestionTask(
+        id=uuid.uuid4(),
+        customer_id=customer_id,
+        job_id=job_id,
+        kind=kind,
+        payload=payload,
+        blob=blob,
+        status="queued",
+        attempts=0,
+        max_attempts=settings.ingestion_max_attempts,
+        run_after=datetime.now(timezone.utc),
+    )
+    db.add(task)
+    if commit:
+        await db.commit()
+    logger.info("[INGEST-QUEUE] queued kind=%s task_id=%s job_id=%s site_id=%s", kind, task.id, job_id, site_id)
+    return task
+
+
+# ---------- Worker ----------
+
+def retry_delay_seconds(attempt: int, base_seconds: float | None = None) -> float:
+    """Exponential backoff with +-20% jitter after the given (1-based) attempt."""
+    base = settings.ingestion_retry_base_seconds if base_seconds is None else base_seconds
+    return min(MAX_BACKOFF_SECONDS, base * 2 ** max(attempt - 1, 0)) * random.uniform(0.8, 1.2)
+
+
+async def claim_tasks(session: AsyncSession, worker_id: str, limit: int, stale_seconds: float) -> list[uuid.UUID]:
+    """Claim up to `limit` due or stale tasks for `worker_id` (one transaction)."""
+    async with session.begin():
+        result = await session.execute(
+            CLAIM_SQL, {"limit": limit, "worker_id": worker_id, "stale_seconds": stale_seconds},
+        )
+        return list(result.scalars().all())
+
+
+class IngestionWorker:
+    def __init__(
+        self,
+        concurrency: int | None = None,
+        worker_id: str | None = None,
+        heartbeat_seconds: float | None = None,
+        stale_after_seconds: float | None = None,
+    ):
+        self.concurrency = max(1, concurrency or settings.ingestion_worker_concurrency)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.heartbeat_seconds = heartbeat_seconds or settings.ingestion_heartbeat_seconds
+        self.stale_after_seconds = stale_after_seconds or settings.ingestion_stale_after_seconds
+        self._running: dict[uuid.UUID, asyncio.Task] = {}
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        logger.info(
+            "[INGEST-WORKER] started worker_id=%s concurrency=%d", self.worker_id, self.concurrency,
+        )
+        loop = asyncio.get_running_loop()
+        last_heartbeat = last_purge = loop.time()
+        while not stop_event.is_set():
+            try:
+                free = self.concurrency - len(self._running)
+                if free > 0:
+                    await self._claim_and_start(free)
+                now = loop.time()
+                if self._running and now - last_heartbeat >= self.heartbeat_seconds:
+                    await self._heartbeat()
+                    last_heartbeat = now
+                if now - last_purge >= PURGE_INTERVAL_SECONDS:
+                    await self._purge()
+                    last_purge = now
+            except Exception:
+                logger.exception("[INGEST-WORKER] tick failed; continuing")
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        await self._shutdown()
+        logger.info("[INGEST-WORKER] stopped worker_id=%s", self.worker_id)
+
+    async def _claim_and_start(self, limit: int) -> None:
+        async with async_session_maker() as session:
+            ids = await claim_tasks(session, self.worker_id, limit, self.stale_after_seconds)
+        for task_id in ids:
+            task = asyncio.create_task(self.run_task(task_id))
+            self._running[task_id] = task
+            task.add_done_callback(lambda _, task_id=task_id: self._running.pop(task_id, None))
+
+    async def _heartbeat(self) -> None:
+        async with async_session_maker() as session:
+            await session.execute(HEARTBEAT_SQL, {"ids": list(self._running), "worker_id": self.worker_id})
+            await session.commit()
+
+    async def _purge(self) -> None:
+        async with async_session_maker() as session:
+            result = await session.execute(PURGE_SQL)
+            await session.commit()
+        if result.rowcount:
+            logger.info("[INGEST-WORKER] purged %d finished tasks", result.rowcount)
+
+    async def _shutdown(self) -> None:
+        if not self._running:
+            return
+        _, pending = await asyncio.wait(list(self._running.values()), timeout=SHUTDOWN_GRACE_SECONDS)
+        if not pending:
+            return
+        ids = [task_id for task_id, task in self._running.items() if task in pending]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        try:
+            async with async_session_maker() as session:
+                await session.execute(RELEASE_SQL, {"ids": ids, "worker_id": self.worker_id})
+                await session.commit()
+            logger.info("[INGEST-WORKER] released %d unfinished tasks", len(ids))
+        except Exception:
+            # Not fatal: the rows are reclaimed once their heartbeat goes stale.
+            logger.exception("[INGEST-WORKER] failed to release unfinished tasks")
+
+    async def run_task(self, task_id: uuid.UUID) -> None:
+        """Run one claimed task to completion, retry or failure."""
+        async with async_session_maker() as db:
+            task = await db.get(IngestionTask, task_id)
+            if task is None:
+                return
+            job = await db.get(IngestionJob, task.job_id) if task.job_id else None
+            kind, attempts, max_attempts, job_id = task.kind, task.attempts, task.max_attempts, task.job_id
+
+            if attempts > max_attempts:
+                # Reclaimed after its last attempt's worker died mid-run.
+                await self._finish(db, task_id, job_id, "failed", "worker stopped heartbeating on the final attempt")
+                return
+
+            handler = HANDLERS.get(kind)
+            try:
+                if handler is None:
+                    raise ValueError(f"no handler registered for {kind!r}")
+                await handler(db, task, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                await db.rollback()
+                error = repr(exc)
+                if attempts < max_attempts:
+                    delay = retry_delay_seconds(attempts)
+                    await self._retry(db, task_id, job_id, error, delay)
+                    logger.warning(
+                        "[INGEST-WORKER] task_id=%s kind=%s attempt %d/%d failed; retry in %.0fs: %s",
+                        task_id, kind, attempts, max_attempts, delay, error,
+                    )
+                else:
+                    await self._finish(db, task_id, job_id, "failed", error)
+                    logger.error(
+                        "[INGEST-WORKER] task_id=%s kind=%s failed after %d attempts: %s",
+                        task_id, kind, attempts, error,
+                    )
+            else:
+                await self._finish(db, task_id, job_id, "done", None)
+                logger.info("[INGEST-WORKER] task_id=%s kind=%s done (attempt %d)", task_id, kind, attempts)
+
+    async def _finish(
+        self, db: AsyncSession, task_id: uuid.UUID, job_id: uuid.UUID | None, status: str, error: str | None,
+    ) -> None:
+        await db.execute(FINISH_SQL, {"id": task_id, "worker_id": self.worker_id, "status": status, "error": error})
+        if status == "failed" and job_id is not None:
+            await db.execute(
+                text(
+                    "UPDATE ingestion_jobs SET status = 'failed', error_message = :error, "
+                    "completed_at = NOW() WHERE id = :id AND status <> 'completed'"
+                ),
+                {"id": job_id, "error": error},
+            )
+        await db.commit()
+
+    async def _retry(
+        self, db: AsyncSession, task_id: uuid.UUID, job_id: uuid.UUID | None, error: str, delay: float,
+    ) -> None:
+        run_after = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        await db.execute(RETRY_SQL, {"id": task_id, "worker_id": self.worker_id, "error": error, "run_after": run_after})
+        if job_id is not None:
+            await db.execute(
+                text("UPDATE ingestion_jobs SET status = 'pending', error_message = :error WHERE id = :id"),
+                {"id": job_id, "error": f"retrying: {error}"},
+            )
+        await db.commit()
@@ -0,0 +1,237 @@
+"""
+Small keyed state with per-key TTL, for short-lived conversational state such
+as the DM handler's pending "Add to Cart" product and last product results.
+
+Two backends behind one async interface, picked by KEYED_STATE_BACKEND:
+
+- "memory": in-process, LRU-bounded at KEYED_STATE_MAX_ENTRIES keys. State
+  is lost on restart and not visible to other workers.
+- "postgres": `keyed_state` rows (migration 046), shared by every worker and
+  replica. `pop` is a single DELETE ... RETURNING and `add` a conditional
+  upsert, so both stay atomic across processes.
+
+Values must be JSON-serialisable; values over MAX_VALUE_BYTES are refused
+(logged, not raised) on either backend so a large product list can't bloat
+the store. Expired keys read as absent and are removed by `sweep()`.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Protocol
+
+from sqlalchemy import text
+
+from app.config import get_settings
+from app.database import async_session_maker
+
+logger = logging.getLogger("zunkiree.keyed_state")
+
+settings = get_settings()
+
+MAX_VALUE_BYTES = 64 * 1024
+SWEEP_INTERVAL_SECONDS = 300
+
+
+def _now() -> float:
+    return time.time()
+
+
+def _encode(namespace: str, key: str, value: Any) -> str | None:
+    encoded = json.dumps(value, default=str)
+    if len(encoded) > MAX_VALUE_BYTES:
+        logger.warning(
+            "[KEYED-STATE] refusing %d-byte value for %s:%s (max %d)", len(encoded), namespace, key, MAX_VALUE_BYTES,
+        )
+        return None
+    return encoded
+
+
+class KeyedStateStore(Protocol):
+    async def get(self, namespace: str, key: str) -> Any | None: ...
+
+    async def set(self, namespace: str, key: str, value: Any, ttl_seconds: float) -> None: ...
+
+    async def add(self, namespace: str, key: str, value: Any, ttl_seconds: float) -> bool: ...
+
+    async def pop(self, namespace: str, key: str) -> Any | None: ...
+
+    async def delete(self, namespace: str, key: str) -> None: ...
+
+    async def sweep(self) -> int: ...
+
+
+class InMemoryKeyedStateStore:
+    def __init__(self, max_entries: int | None = None):
+        self.max_entries = max_entries or settings.keyed_state_max_entries
+        # (namespace, key) -> (encoded value, expires_at), least recently set first.
+        self._entries: OrderedDict[tuple[str, str], tuple[str, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _live(self, entry_key: tuple[str, str]) -> str | None:
+        entry = self._entries.get(entry_key)
+        if entry is None:
+            return None
+        if entry[1] <= _now():
+            del self._entries[entry_key]
+            return None
+        return entry[0]
+
+    async def get(self, namespace: str, key: str) -> Any | None:
+        encoded = self._live((namespace, key))
+        return None if encoded is None else json.loads(encoded)
+
+    async def set(self, namespace: str, key: str, value: Any, ttl_seconds: float) -> None:
+        encoded = _encode(namespace, key, value)
+        if encoded is None:
+            return
+        entry_key = (namespace, key)
+        self._entries[entry_key] = (encoded, _now() + ttl_seconds)
+        self._entries.move_to_end(entry_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def add(self, namespace: str, key: str, value: Any, ttl_seconds: float) -> bool:
+        """Set only if the key is absent or expired. Returns True if set."""
+        if self._live((namespace, key)) is not None:
+            return False
+        await self.set(namespace, key, value, ttl_seconds)
+        return (namespace, key) in self._entries
+
+    async def pop(self, namespace: str, key: str) -> Any | None:
+        encoded = self._live((namespace, key))
+        if encoded is None:
+            return None
+        del self._entries[(namespace, key)]
+        return json.loads(encoded)
+
+    async def delete(self, namespace: str, key: str) -> None:
+        self._entries.pop((namespace, key), None)
+
+    async def sweep(self) -> int:
+        now = _now()
+        expired = [k for k, (_, expires_at) in self._entries.items() if expires_at <= now]
+        for k in expired:
+            del self._entries[k]
+        return len(expired)
+
+
+class PostgresKeyedStateStore:
+    _GET_SQL = text(
+        "SELECT value FROM keyed_state WHERE namespace = :namespace AND key = :key AND expires_at > NOW()"
+    )
+    _SET_SQL = text(
+        """
+        INSERT INTO keyed_state (namespace, key, value, expires_at)
+        VALUES (:namespace, :key, CAST(:value AS JSONB),
+                NOW() + make_interval(secs => CAST(:ttl AS double precision)))
+        ON CONFLICT (namespace, key) DO UPDATE
+        SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at
+        """
+    )
+    # Only replaces an expired row, so concurrent adds have exactly one winner.
+    _ADD_SQL = text(
+        """
+        INSERT INTO keyed_state (namespace, key, value, expires_at)
+        VALUES (:namespace, :key, CAST(:value AS JSONB),
+                NOW() + make_interval(secs => CAST(:ttl AS double precision)))
+        ON CONFLICT (namespace, key) DO UPDATE
+        SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at
+        WHERE keyed_state.expires_at <= NOW()
+        RETURNING 1
+        """
+    )
+    _POP_SQL = text(
+        """
+        DELETE FROM keyed_state WHERE namespace = :namespace AND key = :key
+        RETURNING value, expires_at > NOW() AS live
+        """
+    )
+    _DELETE_SQL = text("DELETE FROM keyed_state WHERE namespace = :namespace AND key = :key")
+    _SWEEP_SQL = text("DELETE FROM keyed_state WHERE expires_at <= NOW()")
+
+    def __init__(self, session_maker=None):
+        self._session_maker = session_maker or async_session_maker
+
+    async def _execute(self, statement, params: dict, commit: bool):
+        async with self._session_maker() as db:
+            result = await db.execute(statement, params)
+            if commit:
+                await db.commit()
+            return result
+
+    async def get(self, namespace: str, key: str) -> Any | None:
+        result = await self._execute(self._GET_SQL, {"namespace": namespace, "key": key}, commit=False)
+        return result.scalar_one_or_none()
+
+    async def set(self, namespace: str, key: str, value: Any, ttl_seconds: float) -> None:
+        encoded = _encode(namespace, key, value)
+        if encoded is None:
+            return
+        await self._execute(
+            self._SET_SQL, {"namespace": namespace, "key": key, "value": encoded, "ttl": ttl_seconds}, commit=True,
+        )
+
+    async def add(self, namespace: str, key: str, value: Any, ttl_seconds: float) -> bool:
+        """Set only if the key is absent or expired. Returns True if set."""
+        encoded = _encode(namespace, key, value)
+        if encoded is None:
+            return False
+        result = await self._execute(
+            self._ADD_SQL, {"namespace": namespace, "key": key, "value": encoded, "ttl": ttl_seconds}, commit=True,
+        )
+        return result.scalar_one_or_none() is not None
+
+    async def pop(self, namespace: str, key: str) -> Any | None:
+        result = await self._execute(self._POP_SQL, {"namespace": namespace, "key": key}, commit=True)
+        row = result.one_or_none()
+        return row.value if row is not None and row.live else None
+
+    async def delete(self, namespace: str, key: str) -> None:
+        await self._execute(self._DELETE_SQL, {"namespace": namespace, "key": key}, commit=True)
+
+    async def sweep(self) -> int:
+        result = await self._execute(self._SWEEP_SQL, {}, commit=True)
+        return result.rowcount or 0
+
+
+def build_keyed_state_store(backend: str | None = None) -> KeyedStateStore:
+    """Create the store for KEYED_STATE_BACKEND ("memory" or "postgres")."""
+    backend = (backend or settings.keyed_state_backend).lower()
+    if backend == "memory":
+        return InMemoryKeyedStateStore()
+    if backend == "postgres":
+        return PostgresKeyedStateStore()
+    raise ValueError(f"Unknown keyed_state_backend: {backend}")
+
+
+async def run_keyed_state_sweeper(stop_event: asyncio.Event) -> None:
+    """Drop expired keys every SWEEP_INTERVAL_SECONDS until `stop_event` is set."""
+    store = get_keyed_state_store()
+    while not stop_event.is_set():
+        try:
+            removed = await store.sweep()
+            if removed:
+                logger.info("[KEYED-STATE] swept %d expired keys", removed)
+        except Exception:
+            logger.exception("[KEYED-STATE] sweep failed; continuing")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=SWEEP_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+# Singleton
+_keyed_state_store: KeyedStateStore | None = None
+
+
+def get_keyed_state_store() -> KeyedStateStore:
+    global _keyed_state_store
+    if _keyed_state_store is None:
+        _keyed_state_store = build_keyed_state_store()
+    return _keyed_state_store
@@ -488,7 +488,9 @@ class LLMService:
     ) -> list[dict]:
         """
         Use LLM to rerank chunks by relevance to the question.
-        Called only for ambiguous queries (0.25 < top_score < 0.45).
+        Called for ambiguous queries (threshold < top_score < 0.60) of tenants
+        whose rerank_mode is "llm", or "llm_fallback" when the local reranker
+        (app/services/reranker.py) is undecided.
 
         Args:
             question: User's question
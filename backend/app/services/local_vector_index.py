@@ -0,0 +1,374 @@
+"""
+Local in-process vector index — a drop-in for the Pinecone Index client.
+
+Used when VECTOR_STORE_BACKEND=local: tests, laptops and single-box deploys
+that should not depend on the network. It implements the same synchronous
+surface VectorStoreService calls on a Pinecone index (`upsert`, `query`,
+`delete`), so the service wraps it with the same executor and latency stats.
+
+Layout — one directory per namespace under LOCAL_VECTOR_INDEX_DIR:
+
+    meta.json                  dim, capacity, generation (rewritten only on
+                               growth/compaction)
+    vectors.<generation>.f32   float32 matrix, `capacity` rows x `dim` cols,
+                               unit-normalised so dot product == cosine
+    rows.<generation>.jsonl    append-only journal of row assignments:
+                               {"r": row, "id": id, "m": metadata}, with
+                               "id": null tombstoning a deleted row
+
+The matrix is opened with np.memmap, so every worker process on the host
+maps the same file and shares its pages through the OS page cache instead of
+holding a private copy. Upserts write their rows in place and append one
+journal line per vector, so a batch costs O(batch) regardless of index size;
+readers replay only the journal tail they haven't seen. When the matrix has
+to grow, or deletes leave more dead rows than live ones, the writer compacts
+into a new generation and atomically replaces meta.json.
+
+Writers hold an exclusive flock on the namespace and readers a shared one,
+so a query never sees a half-written row or a generation file that a
+concurrent compaction is about to unlink.
+
+Queries are one batched matrix-vector product over the live rows, masked by
+the `$eq` / `$in` metadata filters VectorStoreService.query_vectors builds,
+with top-k taken by argpartition.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX dev boxes; thread lock only
+    fcntl = None
+
+logger = logging.getLogger("zunkiree.local_vector_index")
+
+_MIN_CAPACITY = 256
+_SAFE_NAMESPACE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+@dataclass
+class LocalMatch:
+    id: str
+    score: float
+    metadata: dict = field(default_factory=dict)
+
+
+@dataclass
+class LocalQueryResult:
+    matches: list[LocalMatch]
+
+
+class _Namespace:
+    """One namespace's on-disk state plus the current memory map.
+
+    Every method expects the caller to hold `lock` and the namespace flock.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.meta_stamp: tuple[int, int] | None = None  # (inode, mtime_ns) of meta.json
+        self.journal_offset = 0
+        self._reset()
+
+    @property
+    def meta_path(self) -> Path:
+        return self.path / "meta.json"
+
+    def matrix_path(self, generation: int) -> Path:
+        return self.path / f"vectors.{generation}.f32"
+
+    def journal_path(self, generation: int) -> Path:
+        return self.path / f"rows.{generation}.jsonl"
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    def _reset(self) -> None:
+        self.meta_stamp = None
+        self.journal_offset = 0
+        self.dim = self.capacity = self.generation = 0
+        self.ids: list[str | None] = []
+        self.metadata: list[dict] = []
+        self.positions: dict[str, int] = {}
+        self.matrix: np.memmap | None = None
+
+    def refresh(self) -> None:
+        """Catch up with other writers: remap on a new generation, then replay
+        any journal lines appended since the last refresh."""
+        try:
+            stat = self.meta_path.stat()
+        except FileNotFoundError:
+            # Under the flock this can only mean the namespace was deleted.
+            if self.meta_stamp is not None:
+                self._reset()
+            return
+
+        # meta.json is always replaced via rename, so a new inode means a new
+        # generation even when two writes land inside one mtime tick.
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        if stamp != self.meta_stamp:
+            meta = json.loads(self.meta_path.read_text())
+            self._reset()
+            self.dim = meta["dim"]
+            self.capacity = meta["capacity"]
+            self.generation = meta["generation"]
+            self.matrix = np.memmap(
+                self.matrix_path(self.generation), dtype=np.float32, mode="r+",
+                shape=(self.capacity, self.dim),
+            )
+            self.meta_stamp = stamp
+
+        journal = self.journal_path(self.generation)
+        size = journal.stat().st_size
+        if size > self.journal_offset:
+            with open(journal, "rb") as f:
+                f.seek(self.journal_offset)
+                tail = f.read(size - self.journal_offset)
+            for line in tail.splitlines():
+                record = json.loads(line)
+                self._apply(record["r"], record["id"], record.get("m") or {})
+            self.journal_offset = size
+
+    def _apply(self, row: int, vector_id: str | None, metadata: dict) -> None:
+        while len(self.ids) <= row:
+            self.ids.append(None)
+            self.metadata.append({})
+        previous = self.ids[row]
+        if previous is not None and self.positions.get(previous) == row:
+            del self.positions[previous]
+        self.ids[row] = vector_id
+        self.metadata[row] = metadata
+        if vector_id is not None:
+            self.positions[vector_id] = row
+
+    def append_journal(self, records: list[dict]) -> None:
+        journal = self.journal_path(self.generation)
+        with open(journal, "ab") as f:
+            f.write(b"".join(json.dumps(r).encode("utf-8") + b"\n" for r in records))
+        self.journal_offset = journal.stat().st_size
+
+    def rebuild(self, capacity: int, dim: int) -> None:
+        """Compact live rows into a fresh generation of `capacity` rows."""
+        live = [row for row, vid in enumerate(self.ids) if vid is not None]
+        old_generation = self.generation
+        new_generation = old_generation + 1
+
+        matrix = np.memmap(
+            self.matrix_path(new_generation), dtype=np.float32, mode="w+",
+            shape=(capacity, dim),
+        )
+        if live and self.matrix is not None:
+            matrix[:len(live)] = self.matrix[live]
+        matrix.flush()
+        records = [
+            {"r": new_row, "id": self.ids[row], "m": self.metadata[row]}
+            for new_row, row in enumerate(live)
+        ]
+        self.journal_path(new_generation).write_bytes(
+            b"".join(json.dumps(r).encode("utf-8") + b"\n" for r in records)
+        )
+
+        tmp = self.path / "meta.json.tmp"
+        tmp.write_text(json.dumps({"dim": dim, "capacity": capacity, "generation": new_generation}))
+        os.replace(tmp, self.meta_path)
+
+        # Readers still mapping the old file keep their pages until they remap.
+        for path in (self.matrix_path(old_generation), self.journal_path(old_generation)):
+            path.unlink(missing_ok=True)
+        self.meta_stamp = None
+        self.refresh()
+
+
+def _normalise_rows(values: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(values, axis=1, keepdims=True)
+    norms[norms == 0.0] = 1.0
+    return values / norms
+
+
+def _matches_filter(metadata: dict, query_filter: dict) -> bool:
+    for key, condition in query_filter.items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+            if "$ne" in condition and value == condition["$ne"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class LocalVectorIndex:
+    """Memory-mapped NumPy index exposing the Pinecone Index call surface."""
+
+    def __init__(self, root: str | os.PathLike):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._namespaces: dict[str, _Namespace] = {}
+        self._namespaces_lock = threading.Lock()
+
+    def _dirname(self, namespace: str) -> str:
+        if _SAFE_NAMESPACE.match(namespace):
+            return namespace
+        return "ns_" + hashlib.sha1(namespace.encode("utf-8")).hexdigest()
+
+    def _namespace(self, namespace: str) -> _Namespace:
+        with self._namespaces_lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                ns = _Namespace(self.root / self._dirname(namespace or "_default"))
+                self._namespaces[namespace] = ns
+            return ns
+
+    @contextmanager
+    def _locked(self, ns: _Namespace, exclusive: bool):
+        """Thread lock plus a namespace flock (exclusive for writers, shared
+        for readers), then bring the namespace up to date."""
+        with ns.lock:
+            if exclusive:
+                ns.path.mkdir(parents=True, exist_ok=True)
+            elif not ns.path.exists():
+                ns._reset()
+                yield
+                return
+            if fcntl is None:
+                ns.refresh()
+                yield
+                return
+            with open(ns.path / ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    ns.refresh()
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # --- Pinecone Index surface ---
+
+    def upsert(self, vectors: list[dict], namespace: str = "") -> dict:
+        if not vectors:
+            return {"upserted_count": 0}
+        values = _normalise_rows(np.asarray([v["values"] for v in vectors], dtype=np.float32))
+        ns = self._namespace(namespace)
+
+        with self._locked(ns, exclusive=True):
+            if ns.matrix is not None and values.shape[1] != ns.dim:
+                raise ValueError(
+                    f"Vector dimension {values.shape[1]} does not match namespace dimension {ns.dim}"
+                )
+
+            new_ids = {v["id"] for v in vectors if v["id"] not in ns.positions}
+            needed = ns.count + len(new_ids)
+            if ns.matrix is None or needed > ns.capacity:
+                ns.rebuild(max(_MIN_CAPACITY, ns.capacity * 2, needed), values.shape[1])
+
+            records = []
+            next_row = ns.count
+            for row_values, vector in zip(values, vectors):
+                row = ns.positions.get(vector["id"])
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                metadata = dict(vector.get("metadata") or {})
+                ns.matrix[row] = row_values
+                ns._apply(row, vector["id"], metadata)
+                records.append({"r": row, "id": vector["id"], "m": metadata})
+            ns.matrix.flush()
+            ns.append_journal(records)
+
+        return {"upserted_count": len(vectors)}
+
+    def query(
+        self,
+        vector: list[float],
+        namespace: str = "",
+        top_k: int = 10,
+        include_metadata: bool = False,
+        filter: dict | None = None,
+    ) -> LocalQueryResult:
+        ns = self._namespace(namespace)
+        with self._locked(ns, exclusive=False):
+            if ns.matrix is None or ns.count == 0 or top_k <= 0:
+                return LocalQueryResult(matches=[])
+            count = ns.count
+            ids = ns.ids
+            metadata = ns.metadata
+
+            query = np.asarray(vector, dtype=np.float32)
+            norm = float(np.linalg.norm(query))
+            if norm == 0.0:
+                return LocalQueryResult(matches=[])
+            scores = ns.matrix[:count] @ (query / norm)
+
+            mask = np.fromiter((vid is not None for vid in ids), dtype=bool, count=count)
+            if filter:
+                mask &= np.fromiter(
+                    (_matches_filter(meta, filter) for meta in metadata),
+                    dtype=bool, count=count,
+                )
+            candidates = np.flatnonzero(mask)
+            if candidates.size == 0:
+                return LocalQueryResult(matches=[])
+
+            candidate_scores = scores[candidates]
+            k = min(top_k, candidates.size)
+            top = np.argpartition(-candidate_scores, k - 1)[:k]
+            top = top[np.argsort(-candidate_scores[top], kind="stable")]
+
+            return LocalQueryResult(matches=[
+                LocalMatch(
+                    id=ids[candidates[i]],
+                    score=float(candidate_scores[i]),
+                    metadata=dict(metadata[candidates[i]]) if include_metadata else {},
+                )
+                for i in top
+            ])
+
+    def delete(
+        self,
+        ids: list[str] | None = None,
+        delete_all: bool = False,
+        namespace: str = "",
+    ) -> dict:
+        ns = self._namespace(namespace)
+        with self._locked(ns, exclusive=True):
+            if delete_all:
+                ns.meta_path.unlink(missing_ok=True)
+                for pattern in ("vectors.*.f32", "rows.*.jsonl"):
+                    for path in ns.path.glob(pattern):
+                        path.unlink()
+                ns._reset()
+                return {}
+            if ns.matrix is None:
+                return {}
+
+            records = []
+            for vid in ids or []:
+                row = ns.positions.get(vid)
+                if row is not None:
+                    ns._apply(row, None, {})
+                    records.append({"r": row, "id": None})
+            if not records:
+                return {}
+
+            live = len(ns.positions)
+            if ns.count - live > live:
+                ns.rebuild(max(_MIN_CAPACITY, live * 2), ns.dim)
+            else:
+                ns.append_journal(records)
+        return {}
@@ -0,0 +1,323 @@
+"""
+Meta webhook inbox (Instagram / Messenger / WhatsApp DMs).
+
+POST /webhooks/meta used to run the whole DM pipeline — mark_seen, typing,
+DB writes, the agent/RAG call and the outbound sends — before answering
+Meta, so slow replies turned into Meta timeouts and redeliveries. Now the
+receiver only verifies the signature, calls `enqueue_webhook()` and acks:
+
+- `extract_inbox_rows()` splits the payload into one row per message or
+  postback event, re-wrapped as a single-event entry so the existing
+  `_process_*_entry` functions in app/api/chatbot_webhooks.py run unchanged.
+- Rows are inserted in one statement with `ON CONFLICT (platform,
+  dedup_key) DO NOTHING`; the dedup key is the message id (mid / wamid), or a
+  hash of the event when Meta sends none.
+
+The inbox worker (started from `app.main.lifespan`) runs up to
+META_INBOX_CONCURRENCY rows at once. Each claim takes only the oldest
+unfinished row of each (page_id, sender_id) conversation, and skips
+conversations whose head row is already being processed, so one sender's
+messages are handled strictly in order while different senders run in
+parallel — across replicas too, via FOR UPDATE SKIP LOCKED. A failed row
+is retried with backoff (blocking only its own conversation) up to
+MAX_ATTEMPTS, then marked failed so the conversation moves on. While a row
+runs, its worker refreshes `locked_at` every HEARTBEAT_SECONDS, so only a
+`processing` row whose worker died (no heartbeat for STALE_AFTER_SECONDS)
+is reclaimed, however long its handler takes.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import async_session_maker
+from app.models import MetaWebhookInbox
+
+logger = logging.getLogger("zunkiree.meta_inbox")
+
+settings = get_settings()
+
+POLL_INTERVAL_SECONDS = 1
+MAX_ATTEMPTS = 3
+MAX_BACKOFF_SECONDS = 60
+STALE_AFTER_SECONDS = 300
+HEARTBEAT_SECONDS = 30
+PURGE_INTERVAL_SECONDS = 3600
+RETENTION_INTERVAL = "7 days"
+
+# Set by the receiver after an insert so the worker in the same process
+# claims the new row now instead of on its next poll.
+_wakeup = asyncio.Event()
+
+
+# Oldest unfinished row per conversation; only heads that are due (or whose
+# worker went stale) are claimable. The outer WHERE is re-checked against the
+# latest row version after the lock, so a head another worker claimed and
+# committed meanwhile is skipped rather than claimed twice.
+CLAIM_SQL = text(
+    """
+    WITH heads AS (
+        SELECT DISTINCT ON (page_id, sender_id) id, status, run_after, locked_at
+        FROM meta_webhook_inbox
+        WHERE status IN ('pending', 'processing')
+        ORDER BY page_id, sender_id, id
+    ), ready AS (
+        SELECT id FROM heads
+        WHERE (status = 'pending' AND run_after <= NOW())
+           OR (status = 'processing'
+               AND locked_at < NOW() - make_interval(secs => CAST(:stale_seconds AS double precision)))
+        ORDER BY id
+        LIMIT :limit
+    ), picked AS (
+        SELECT m.id
+        FROM meta_webhook_inbox m
+        JOIN ready ON ready.id = m.id
+        WHERE (m.status = 'pending' AND m.run_after <= NOW())
+           OR (m.status = 'processing'
+               AND m.locked_at < NOW() - make_interval(secs => CAST(:stale_seconds AS double precision)))
+        FOR UPDATE OF m SKIP LOCKED
+    )
+    UPDATE meta_webhook_inbox AS t
+    SET status = 'processing',
+        attempts = t.attempts + 1,
+        locked_by = :worker_id,
+        locked_at = NOW()
+    FROM picked
+    WHERE t.id = picked.id
+    RETURNING t.id, t.platform, t.payload, t.attempts
+    """
+)
+
+HEARTBEAT_SQL = text(
+    """
+    UPDATE meta_webhook_inbox
+    SET locked_at = NOW()
+    WHERE id = ANY(CAST(:ids AS bigint[])) AND locked_by = :worker_id AND status = 'processing'
+    """
+)
+
+DONE_SQL = text(
+    """
+    UPDATE meta_webhook_inbox
+    SET status = 'done', processed_at = NOW(), locked_by = NULL
+    WHERE id = :id AND locked_by = :worker_id
+    """
+)
+
+RETRY_SQL = text(
+    """
+    UPDATE meta_webhook_inbox
+    SET status = 'pending', last_error = :error, run_after = :run_after, locked_by = NULL
+    WHERE id = :id AND locked_by = :worker_id
+    """
+)
+
+FAIL_SQL = text(
+    """
+    UPDATE meta_webhook_inbox
+    SET status = 'failed', last_error = :error, processed_at = NOW(), locked_by = NULL
+    WHERE id = :id AND locked_by = :worker_id
+    """
+)
+
+PURGE_SQL = text(
+    f"""
+    DELETE FROM meta_webhook_inbox
+    WHERE status IN ('done', 'failed')
+      AND processed_at < NOW() - INTERVAL '{RETENTION_INTERVAL}'
+    """
+)
+
+
+# ---------- Receiver side ----------
+
+def _event_key(event: dict) -> str:
+    return "sha256:" + hashlib.sha256(json.dumps(event, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def extract_inbox_rows(data: dict) -> list[dict]:
+    """One inbox row per message/postback event in a Meta webhook payload.
+
+    Read receipts, deliveries and other events without a message are dropped
+    here, as the entry processors would skip them anyway.
+    """
+    obj = data.get("object", "")
+    rows: list[dict] = []
+    for entry in data.get("entry", []):
+        if obj in ("instagram", "page"):
+            platform = "instagram" if obj == "instagram" else "messenger"
+            for event in entry.get("messaging", []):
+                sender_id = event.get("sender", {}).get("id")
+                message = event.get("message") or {}
+                postback = event.get("postback") or {}
+                if not sender_id or not (message or postback):
+                    continue
+                rows.append({
+                    "platform": platform,
+                    "page_id": str(event.get("recipient", {}).get("id") or ""),
+                    "sender_id": str(sender_id),
+                    "dedup_key": message.get("mid") or postback.get("mid") or _event_key(event),
+                    "payload": {"messaging": [event]},
+                })
+        elif obj == "whatsapp_business_account":
+            for change in entry.get("changes", []):
+                value = change.get("value", {})
+                metadata = value.get("metadata", {})
+                for msg in value.get("messages", []):
+                    sender_id = msg.get("from")
+                    if not sender_id:
+                        continue
+                    rows.append({
+                        "platform": "whatsapp",
+                        "page_id": str(metadata.get("phone_number_id") or ""),
+                        "sender_id": str(sender_id),
+                        "dedup_key": msg.get("id") or _event_key(msg),
+                        "payload": {"changes": [{"value": {"metadata": metadata, "messages": [msg]}}]},
+                    })
+    return rows
+
+
+async def enqueue_webhook(db: AsyncSession, data: dict) -> int:
+    """Persist the payload's message events to the inbox (one INSERT, one
+    commit) and wake the local worker. Returns the number of new rows;
+    redeliveries of events already in the inbox are no-ops."""
+    rows = extract_inbox_rows(data)
+    if not rows:
+        return 0
+    result = await db.execute(
+        insert(MetaWebhookInbox)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["platform", "dedup_key"])
+        .returning(MetaWebhookInbox.id)
+    )
+    inserted = len(result.scalars().all())
+    await db.commit()
+    if inserted:
+        _wakeup.set()
+    if inserted < len(rows):
+        logger.info("[META-INBOX] %d of %d events were redeliveries", len(rows) - inserted, len(rows))
+    return inserted
+
+
+# ---------- Worker side ----------
+
+async def process_row(platform: str, payload: dict) -> None:
+    """Run one inbox row through the existing per-platform entry processor."""
+    from app.api import chatbot_webhooks
+
+    processors = {
+        "instagram": chatbot_webhooks._process_instagram_entry,
+        "messenger": chatbot_webhooks._process_messenger_entry,
+        "whatsapp": chatbot_webhooks._process_whatsapp_entry,
+    }
+    await processors[platform](payload)
+
+
+async def claim_rows(session: AsyncSession, worker_id: str, limit: int) -> list:
+    """Claim up to `limit` conversation-head rows for `worker_id` (one transaction)."""
+    async with session.begin():
+        result = await session.execute(
+            CLAIM_SQL, {"limit": limit, "worker_id": worker_id, "stale_seconds": STALE_AFTER_SECONDS},
+        )
+        return list(result.all())
+
+
+class MetaInboxWorker:
+    def __init__(self, concurrency: int | None = None, worker_id: str | None = None):
+        self.concurrency = max(1, concurrency or settings.meta_inbox_concurrency)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._running: dict[int, asyncio.Task] = {}
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        logger.info("[META-INBOX] worker started worker_id=%s concurrency=%d", self.worker_id, self.concurrency)
+        loop = asyncio.get_running_loop()
+        last_heartbeat = last_purge = loop.time()
+        stop_wait = asyncio.ensure_future(stop_event.wait())
+        try:
+            while not stop_event.is_set():
+                _wakeup.clear()
+                try:
+                    free = self.concurrency - len(self._running)
+                    if free > 0:
+                        await self._claim_and_start(free)
+                    now = loop.time()
+                    if self._running and now - last_heartbeat >= HEARTBEAT_SECONDS:
+                        await self._heartbeat()
+                        last_heartbeat = now
+                    if now - last_purge >= PURGE_INTERVAL_SECONDS:
+                        await self._purge()
+                        last_purge = now
+                except Exception:
+                    logger.exception("[META-INBOX] tick failed; continuing")
+                # Sleep until the poll interval, a new webhook, a finished
+                # row (the sender's next message may now be claimable) or stop.
+                wake = asyncio.ensure_future(_wakeup.wait())
+                await asyncio.wait({wake, stop_wait}, timeout=POLL_INTERVAL_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+                wake.cancel()
+        finally:
+            stop_wait.cancel()
+        if self._running:
+            # Rows left unfinished are reclaimed after STALE_AFTER_SECONDS.
+            await asyncio.wait(list(self._running.values()), timeout=10)
+        logger.info("[META-INBOX] worker stopped worker_id=%s", self.worker_id)
+
+    async def _claim_and_start(self, limit: int) -> None:
+        async with async_session_maker() as session:
+            rows = await claim_rows(session, self.worker_id, limit)
+        for row in rows:
+            task = asyncio.create_task(self.run_row(row.id, row.platform, row.payload, row.attempts))
+            self._running[row.id] = task
+            task.add_done_callback(lambda _, row_id=row.id: self._row_finished(row_id))
+
+    def _row_finished(self, row_id: int) -> None:
+        self._running.pop(row_id, None)
+        _wakeup.set()
+
+    async def _heartbeat(self) -> None:
+        async with async_session_maker() as session:
+            await session.execute(HEARTBEAT_SQL, {"ids": list(self._running), "worker_id": self.worker_id})
+            await session.commit()
+
+    async def _purge(self) -> None:
+        async with async_session_maker() as session:
+            result = await session.execute(PURGE_SQL)
+            await session.commit()
+        if result.rowcount:
+            logger.info("[META-INBOX] purged %d processed rows", result.rowcount)
+
+    async def run_row(self, row_id: int, platform: str, payload: dict, attempts: int) -> None:
+        """Process one claimed row, then mark it done, retry it or fail it."""
+        try:
+            await process_row(platform, payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            error = repr(exc)
+            params = {"id": row_id, "worker_id": self.worker_id, "error": error}
+            if attempts < MAX_ATTEMPTS:
+                delay = min(MAX_BACKOFF_SECONDS, 2 ** attempts)
+                params["run_after"] = datetime.now(timezone.utc) + timedelta(seconds=delay)
+                statement = RETRY_SQL
+                logger.warning(
+                    "[META-INBOX] row %s attempt %d/%d failed; retry in %ss: %s",
+                    row_id, attempts, MAX_ATTEMPTS, delay, error,
+                )
+            else:
+                statement = FAIL_SQL
+                logger.error("[META-INBOX] row %s failed after %d attempts: %s", row_id, attempts, error)
+        else:
+            statement, params = DONE_SQL, {"id": row_id, "worker_id": self.worker_id}
+        async with async_session_maker() as session:
+            await session.execute(statement, params)
+            await session.commit()
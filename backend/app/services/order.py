@@ -11,7 +11,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, update, delete
 
 from app.models.cart import ShoppingCart
-from app.models.order import Order
+from app.models.order import Order, OrderItem
 from app.services.cart import get_cart_service
 from app.services.sender_profile_service import get_sender_profile_service
 from app.config import get_settings
@@ -34,6 +34,29 @@ def _split_name(full_name: str) -> tuple[str | None, str | None]:
     return parts[0], parts[1] if len(parts) > 1 else None
 
 
+def build_order_items(order: Order, items: list[dict]) -> list[OrderItem]:
+    """Normalised order_items rows for an order's item snapshot. Same
+    fallbacks as the migration 050 backfill."""
+    rows = []
+    for line_no, item in enumerate(items):
+        # A null or empty product_id falls back to the name, as in the backfill.
+        product_id = item.get("product_id") or item.get("name") or "unknown"
+        rows.append(OrderItem(
+            order_id=order.id,
+            customer_id=order.customer_id,
+            line_no=line_no,
+            product_id=str(product_id)[:255],
+            name=(item.get("name") or "Unknown")[:500],
+            price=item.get("price") or 0,
+            quantity=item.get("quantity") or 1,
+            currency=item.get("currency") or order.currency,
+            size=(item.get("size") or "")[:100] or None,
+            color=(item.get("color") or "")[:100] or None,
+            created_at=order.created_at,
+        ))
+    return rows
+
+
 class OrderService:
     async def create_order_from_cart(
         self,
@@ -60,6 +83,7 @@ class OrderService:
 
         is_cod = payment_method == "cod"
         order = Order(
+            id=uuid.uuid4(),
             order_number=generate_order_number(),
             customer_id=customer_id,
             session_id=session_id,
@@ -74,8 +98,11 @@ class OrderService:
             billing_address=json.dumps(billing_address) if billing_address else None,
             shipping_address=json.dumps(shipping_address) if shipping_address else None,
             notes=notes,
+            created_at=datetime.utcnow(),
         )
         db.add(order)
+        # Line items go in the same transaction; analytics aggregate these.
+        db.add_all(build_order_items(order, items_snapshot))
         await db.commit()
         await db.refresh(order)
 
@@ -7,6 +7,7 @@ from sqlalchemy import select, text, func
 
 from app.models import Customer, DocumentChunk, WidgetConfig
 from app.models.business_profile import BusinessProfile
+from app.services.tenant_context import invalidate_tenant
 from app.config import get_settings
 from app.utils.chunking import count_tokens
 
@@ -127,6 +128,7 @@ class ProfileBuilderService:
             profile.status = "completed"
             profile.updated_at = datetime.utcnow()
             await db.commit()
+            await invalidate_tenant(db, customer_id, site_id)
 
             logger.info(
                 "[PROFILE] Completed for customer_id=%s category=%s model=%s approach=%s",
@@ -390,16 +392,16 @@ class ProfileBuilderService:
         extraction: dict,
     ) -> None:
         """
-        Ingest auto-generated FAQ pairs via the existing ingestion pipeline.
+        Queue auto-generated FAQ pairs on the ingestion queue (one qa task each).
+        The tasks commit with the profile, and the worker embeds them.
         """
         faqs = extraction.get("top_faqs", [])
         if not faqs or not isinstance(faqs, list):
             return
 
-        from app.services.ingestion import get_ingestion_service
-        ingestion_service = get_ingestion_service()
+        from app.services.ingestion_queue import enqueue_ingestion
 
-        ingested_count = 0
+        queued_count = 0
         for faq in faqs[:10]:
             if not isinstance(faq, dict):
                 continue
@@ -408,20 +410,17 @@ class ProfileBuilderService:
             if not question or not answer:
                 continue
 
-            try:
-                await ingestion_service.ingest_qa(
-                    db=db,
-                    customer_id=customer_id,
-                    site_id=site_id,
-                    question=question,
-                    answer=answer,
-                    source_prefix="Auto-FAQ",
-                )
-                ingested_count += 1
-            except Exception as e:
-                logger.warning("[PROFILE] Failed to ingest FAQ '%s': %s", question[:50], e)
-
-        logger.info("[PROFILE] Ingested %d auto-FAQs for site_id=%s", ingested_count, site_id)
+            await enqueue_ingestion(
+                db,
+                customer_id=customer_id,
+                site_id=site_id,
+                kind="qa",
+                payload={"question": question, "answer": answer, "source_prefix": "Auto-FAQ"},
+                commit=False,
+            )
+            queued_count += 1
+
+        logger.info("[PROFILE] Queued %d auto-FAQs for site_id=%s", queued_count, site_id)
 
 
 # Singleton instance
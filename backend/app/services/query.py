@@ -1,15 +1,22 @@
 from __future__ import annotations
+import asyncio
+import functools
 import time
 import hashlib
 import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, text
 
+from app.database import async_session_maker
 from app.models import Customer, WidgetConfig, Domain, QueryLog, DocumentChunk, IngestionJob
 from app.models.business_profile import BusinessProfile
+from app.services.answer_cache import CachedAnswer, get_answer_cache, get_content_version, iter_answer_tokens
+from app.services.tenant_context import TenantContext, get_tenant_context_cache
 from app.services.embeddings import get_embedding_service
 from app.services.vector_store import get_vector_store_service
+from app.services.telemetry import get_telemetry_writer
 from app.services.llm import get_llm_service
+from app.services.reranker import get_lexical_reranker
 from app.utils.chunking import count_tokens
 from app.config import get_settings
 
@@ -21,11 +28,64 @@ settings = get_settings()
 MAX_CONTEXT_TOKENS = 4000
 
 
+def _normalize_question(question: str) -> str:
+    """Coalescing key form of a question: case- and whitespace-insensitive."""
+    return " ".join(question.lower().split())
+
+
+class _Flight:
+    """
+    One in-flight `_answer_events` run shared by identical concurrent
+    questions. Events are kept for the flight's lifetime, so a request that
+    attaches mid-stream still replays the stream from the first token.
+    """
+
+    def __init__(self):
+        self.events: list[dict] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.waiters = 1
+        self.task: asyncio.Task | None = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        # Wake everyone parked on the current event, then start a new one.
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, event: dict) -> None:
+        self.events.append(event)
+        self._notify()
+
+    def finish(self) -> None:
+        self.done = True
+        self._notify()
+
+    async def subscribe(self):
+        index = 0
+        while True:
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
 class QueryService:
     def __init__(self):
         self.embedding_service = get_embedding_service()
         self.vector_store = get_vector_store_service()
         self.llm_service = get_llm_service()
+        self.answer_cache = get_answer_cache()
+        self.tenant_cache = get_tenant_context_cache()
+        # Independent sessions for retrieval legs that run alongside the request session.
+        self.session_factory = async_session_maker
+        # Coalesced questions currently being answered, by (stream, site_id,
+        # normalised question, language).
+        self._inflight: dict[tuple, _Flight] = {}
 
     async def _check_ingestion_status(self, db: AsyncSession, customer_id) -> str:
         """
@@ -37,7 +97,10 @@ class QueryService:
             select(
                 func.count().label("total"),
                 func.sum(case((IngestionJob.status == "completed", 1), else_=0)).label("completed"),
-                func.sum(case((IngestionJob.status == "processing", 1), else_=0)).label("processing"),
+                # Queued jobs count as processing: the worker will pick them up.
+                func.sum(
+                    case((IngestionJob.status.in_(("pending", "processing")), 1), else_=0)
+                ).label("processing"),
             ).where(IngestionJob.customer_id == customer_id)
         )
         row = result.one()
@@ -61,31 +124,98 @@ class QueryService:
         site_id: str,
         question: str,
         user_email: str | None = None,
+        check_answer_cache: bool = False,
+        language: str | None = None,
     ) -> dict:
         """
         Shared retrieval pipeline used by both streaming and non-streaming paths.
 
         Returns dict with keys:
             chunks_for_llm, top_score, avg_score, threshold, rerank_triggered,
-            retrieval_mode, retrieval_empty, no_data_status (None | "processing" | "empty")
+            retrieval_mode, retrieval_empty, no_data_status (None | "processing" | "empty"),
+            timings (per-stage milliseconds), answer_cache_hit,
+            query_embedding, content_version
+
+        With check_answer_cache, the vector leg looks the question up in the
+        semantic answer cache as soon as it is embedded. On a hit the keyword
+        leg is cancelled and only answer_cache_hit ((answer, similarity)),
+        timings, query_embedding and content_version are returned.
+
+        The vector leg (embed → Pinecone) and the keyword leg (Postgres
+        full-text) don't depend on each other, so they run concurrently and
+        retrieval latency tracks the slower leg rather than the sum. The
+        keyword leg gets its own session — one AsyncSession can't run two
+        statements at once. A failure in either leg cancels the other.
         """
-        # Generate query embedding
-        query_embedding = await self.embedding_service.create_embedding(question)
+        retrieval_start = time.perf_counter()
+        timings: dict[str, float] = {}
 
         # Hybrid retrieval: vector + keyword
         initial_fetch_k = 8
 
-        logger.warning("[QUERY-TRACE] pinecone_namespace=%s site_id_filter=%s initial_fetch_k=%s embedding_dim=%d", site_id, site_id, initial_fetch_k, len(query_embedding))
+        cache_state: dict = {"hit": None, "embedding": None, "version": None}
 
         # List A: Pinecone vector search
-        vector_matches = await self.vector_store.query_vectors(
-            query_vector=query_embedding,
-            namespace=site_id,
-            top_k=initial_fetch_k,
-            site_id=site_id,
-        )
+        async def _vector_leg() -> list[dict]:
+            stage_start = time.perf_counter()
+            embedding = await self.embedding_service.create_embedding(question)
+            timings["embed_ms"] = _elapsed_ms(stage_start)
+            cache_state["embedding"] = embedding
+
+            if check_answer_cache:
+                version = await get_content_version(db, customer.id)
+                cache_state["version"] = version
+                if version is not None:
+                    hit = self.answer_cache.lookup(customer.id, language, embedding, version)
+                    if hit:
+                        cache_state["hit"] = hit
+                        keyword_task.cancel()
+                        return []
+
+            logger.warning("[QUERY-TRACE] pinecone_namespace=%s site_id_filter=%s initial_fetch_k=%s embedding_dim=%d", site_id, site_id, initial_fetch_k, len(embedding))
+
+            stage_start = time.perf_counter()
+            matches = await self.vector_store.query_vectors(
+                query_vector=embedding,
+                namespace=site_id,
+                top_k=initial_fetch_k,
+                site_id=site_id,
+            )
+            timings["vector_ms"] = _elapsed_ms(stage_start)
+            return matches
+
+        # List B: Postgres full-text keyword search (boost with email if verified)
+        async def _keyword_leg() -> list[str]:
+            keyword_query = f"{question} {user_email}" if user_email else question
+            stage_start = time.perf_counter()
+            async with self.session_factory() as keyword_db:
+                ids = await self._keyword_search(keyword_db, customer.id, keyword_query, limit=initial_fetch_k)
+            timings["keyword_ms"] = _elapsed_ms(stage_start)
+            return ids
+
+        # TaskGroup, not gather: if one leg fails the other is cancelled, so a
+        # stray keyword query can't keep holding a pooled session.
+        try:
+            async with asyncio.TaskGroup() as legs:
+                vector_task = legs.create_task(_vector_leg())
+                keyword_task = legs.create_task(_keyword_leg())
+        except ExceptionGroup as group:
+            # Callers handle a leg's own exception, as they did with gather.
+            raise group.exceptions[0]
+        cache_fields = {
+            "answer_cache_hit": cache_state["hit"],
+            "query_embedding": cache_state["embedding"],
+            "content_version": cache_state["version"],
+        }
+        if cache_state["hit"]:
+            timings["total_ms"] = _elapsed_ms(retrieval_start)
+            return {"timings": timings, **cache_fields}
+
+        vector_matches, keyword_ids = vector_task.result(), keyword_task.result()
+
         vector_ids = [match["id"] for match in vector_matches]
         logger.warning("[QUERY-TRACE] vector_results_ids=%s", vector_ids[:5])
+        logger.warning("[QUERY-TRACE] keyword_results_ids=%s", keyword_ids[:5])
 
         # Compute retrieval score metrics
         vector_scores = [match["score"] for match in vector_matches]
@@ -128,11 +258,6 @@ class QueryService:
             site_id, top_score or 0, adaptive_top_k, rerank_needed, fusion_top_n,
         )
 
-        # List B: Postgres full-text keyword search (boost with email if verified)
-        keyword_query = f"{question} {user_email}" if user_email else question
-        keyword_ids = await self._keyword_search(db, customer.id, keyword_query, limit=initial_fetch_k)
-        logger.warning("[QUERY-TRACE] keyword_results_ids=%s", keyword_ids[:5])
-
         # Fuse results via Reciprocal Rank Fusion
         fused_ids = _reciprocal_rank_fusion(vector_ids, keyword_ids, k=60, top_n=fusion_top_n)
         logger.warning("[QUERY-TRACE] fused_results_ids=%s", fused_ids[:5])
@@ -141,6 +266,7 @@ class QueryService:
         if not fused_ids:
             status = await self._check_ingestion_status(db, customer.id)
             if status in ("processing", "empty"):
+                timings["total_ms"] = _elapsed_ms(retrieval_start)
                 return {
                     "chunks_for_llm": [],
                     "top_score": top_score,
@@ -150,11 +276,15 @@ class QueryService:
                     "retrieval_mode": "hybrid",
                     "retrieval_empty": not vector_matches,
                     "no_data_status": status,
+                    "timings": timings,
+                    **cache_fields,
                 }
             logger.info("[QUERY-TRACE] No fused matches, LLM will attempt general knowledge answer site_id=%s", site_id)
 
         # Fetch full chunk content from PostgreSQL (defense-in-depth: filter by customer_id)
+        stage_start = time.perf_counter()
         db_chunks = await self._fetch_chunks_by_vector_ids(db, fused_ids, customer.id)
+        timings["fetch_ms"] = _elapsed_ms(stage_start)
 
         logger.warning("[QUERY-TRACE] postgres_chunks=%d customer_id=%s vector_ids_requested=%d", len(db_chunks), customer.id, len(fused_ids))
         if len(db_chunks) < len(fused_ids):
@@ -162,6 +292,7 @@ class QueryService:
 
         # Build ordered chunk list preserving RRF fusion ranking
         fused_rank = {vid: idx for idx, vid in enumerate(fused_ids)}
+        vector_score = {match["id"]: match["score"] for match in vector_matches}
         chunks_for_llm = []
         for chunk in db_chunks:
             chunks_for_llm.append({
@@ -169,6 +300,7 @@ class QueryService:
                 "source_url": chunk.source_url or "",
                 "source_title": chunk.source_title or "Source",
                 "score": len(fused_ids) - fused_rank.get(chunk.vector_id, len(fused_ids)),
+                "vector_score": vector_score.get(chunk.vector_id),
             })
         chunks_for_llm.sort(key=lambda c: c["score"], reverse=True)
 
@@ -177,18 +309,36 @@ class QueryService:
         retrieval_mode = "hybrid"
         if rerank_needed and len(chunks_for_llm) > 1:
             rerank_top_n = min(adaptive_top_k, len(chunks_for_llm))
-            chunks_for_llm = await self.llm_service.rerank_chunks(
-                question=question,
-                chunks=chunks_for_llm,
-                top_n=rerank_top_n,
-            )
+            rerank_mode = (config.rerank_mode if config else None) or "local"
+            stage_start = time.perf_counter()
+            use_llm = rerank_mode == "llm"
+            if not use_llm:
+                # Local lexical + vector rerank, in-process; the LLM is only
+                # consulted when the tenant opted into it as a fallback and
+                # the local ranking is undecided.
+                chunks_for_llm, margin = get_lexical_reranker().rerank(question, chunks_for_llm)
+                timings["local_rerank_ms"] = _elapsed_ms(stage_start)
+                use_llm = rerank_mode == "llm_fallback" and margin < settings.rerank_llm_fallback_margin
+                retrieval_mode = "hybrid_local_rerank"
+            if use_llm:
+                stage_start = time.perf_counter()
+                chunks_for_llm = await self.llm_service.rerank_chunks(
+                    question=question,
+                    chunks=chunks_for_llm,
+                    top_n=rerank_top_n,
+                )
+                timings["rerank_ms"] = _elapsed_ms(stage_start)
+                retrieval_mode = "hybrid_rerank"
+            chunks_for_llm = chunks_for_llm[:rerank_top_n]
             rerank_triggered = True
-            retrieval_mode = "hybrid_rerank"
             logger.info(
-                "[ADAPTIVE] site_id=%s rerank_triggered=True rerank_top_n=%d chunks_after_rerank=%d",
-                site_id, rerank_top_n, len(chunks_for_llm),
+                "[ADAPTIVE] site_id=%s rerank_triggered=True mode=%s rerank_top_n=%d chunks_after_rerank=%d",
+                site_id, retrieval_mode, rerank_top_n, len(chunks_for_llm),
             )
 
+        timings["total_ms"] = _elapsed_ms(retrieval_start)
+        logger.info("[RETRIEVAL-TIMING] site_id=%s %s", site_id, " ".join(f"{k}={v}" for k, v in timings.items()))
+
         return {
             "chunks_for_llm": chunks_for_llm,
             "top_score": top_score,
@@ -198,6 +348,8 @@ class QueryService:
             "retrieval_mode": retrieval_mode,
             "retrieval_empty": not vector_matches,
             "no_data_status": None,
+            "timings": timings,
+            **cache_fields,
         }
 
     def _build_llm_params(
@@ -243,35 +395,44 @@ class QueryService:
                 seen_urls.add(url)
         return sources
 
-    async def process_query(
+    async def _answer_events(
         self,
         db: AsyncSession,
+        tenant: TenantContext,
         site_id: str,
         question: str,
-        origin: str | None = None,
-        user_agent: str | None = None,
-        ip_address: str | None = None,
+        language: str | None,
+        stream: bool,
         user_email: str | None = None,
         user_profile: dict | None = None,
-        language: str | None = None,
-    ) -> dict:
+    ):
         """
-        Process a user query end-to-end (non-streaming).
+        Retrieval + generation shared by both query paths (and by every request
+        attached to a coalesced flight). Yields token events when `stream` is
+        set, then one {"type": "result", ...} event the caller finishes from.
+        Nothing request-specific (origin, IP, timing, logging) happens here.
         """
-        start_time = time.time()
-
-        customer = await self._get_customer(db, site_id)
-        if not customer:
-            raise ValueError("Invalid site_id")
-
-        if origin and not await self._validate_origin(db, customer.id, origin):
-            raise PermissionError("Origin domain not allowed")
+        customer = tenant.customer
+        config = tenant.widget_config
 
-        config = await self._get_widget_config(db, customer.id)
-        profile = await self._get_business_profile(db, customer.id)
+        # Semantic answer cache — personalisation-free questions only. The
+        # lookup runs inside the vector leg, alongside keyword retrieval.
+        cacheable = self.answer_cache.enabled and not user_email
 
         # Shared retrieval pipeline
-        retrieval = await self._retrieve_and_rank(db, customer, config, site_id, question, user_email)
+        retrieval = await self._retrieve_and_rank(
+            db, customer, config, site_id, question, user_email,
+            check_answer_cache=cacheable, language=language,
+        )
+
+        if retrieval["answer_cache_hit"]:
+            # A hit is replayed as a fast token stream
+            cached, _ = retrieval["answer_cache_hit"]
+            if stream:
+                for token in iter_answer_tokens(cached.answer):
+                    yield {"type": "token", "data": token}
+            yield {"type": "result", "retrieval": retrieval}
+            return
 
         # Handle no-data status
         if retrieval["no_data_status"]:
@@ -280,13 +441,14 @@ class QueryService:
                 if retrieval["no_data_status"] == "processing"
                 else "I'm still setting up and don't have information about this website yet. Please check back soon!"
             )
-            return {"answer": msg, "suggestions": [], "sources": []}
+            if stream:
+                yield {"type": "token", "data": msg}
+            yield {"type": "result", "retrieval": retrieval, "no_data_message": msg}
+            return
 
         chunks_for_llm = retrieval["chunks_for_llm"]
-        llm_params = self._build_llm_params(config, customer, profile)
-
-        # Generate answer
-        result = await self.llm_service.generate_answer(
+        llm_params = self._build_llm_params(config, customer, tenant.business_profile)
+        llm_kwargs = dict(
             question=question,
             context_chunks=chunks_for_llm,
             user_email=user_email,
@@ -295,16 +457,192 @@ class QueryService:
             **llm_params,
         )
 
-        # Calculate metrics
-        response_time_ms = int((time.time() - start_time) * 1000)
+        if stream:
+            # Stream the LLM response
+            answer = ""
+            suggestions = []
+            context_tokens = 0
+            async for event in self.llm_service.generate_answer_stream(**llm_kwargs):
+                if event["type"] == "token":
+                    yield event
+                elif event["type"] == "done":
+                    answer = event["answer"]
+                    suggestions = event["suggestions"]
+                    context_tokens = event.get("context_tokens", 0)
+        else:
+            result = await self.llm_service.generate_answer(**llm_kwargs)
+            answer = result["answer"]
+            suggestions = result["suggestions"]
+            context_tokens = result.get("context_tokens", 0)
+
         fallback_message = llm_params["fallback_message"]
-        context_tokens = result.get("context_tokens", 0)
-        llm_declined = result["answer"] == fallback_message and context_tokens > 0
+        llm_declined = answer == fallback_message and context_tokens > 0
         fallback_triggered = retrieval["retrieval_empty"] or llm_declined
+        suggestions = suggestions if llm_params["show_suggestions"] else []
+        sources = self._build_sources(chunks_for_llm, config)
+
+        if (
+            cacheable
+            and chunks_for_llm
+            and answer
+            and answer != fallback_message
+            and not retrieval["retrieval_empty"]
+            and retrieval["content_version"] is not None
+        ):
+            self.answer_cache.store(customer.id, language, retrieval["query_embedding"], CachedAnswer(
+                answer=answer,
+                suggestions=suggestions,
+                sources=sources,
+                chunks_used=len(chunks_for_llm),
+                top_score=retrieval["top_score"],
+                avg_score=retrieval["avg_score"],
+                context_tokens=context_tokens,
+            ), version=retrieval["content_version"])
+
+        yield {
+            "type": "result",
+            "retrieval": retrieval,
+            "answer": answer,
+            "suggestions": suggestions,
+            "sources": sources,
+            "context_tokens": context_tokens,
+            "llm_declined": llm_declined,
+            "fallback_triggered": fallback_triggered,
+        }
+
+    async def _coalesced_events(
+        self,
+        db: AsyncSession,
+        tenant: TenantContext,
+        site_id: str,
+        question: str,
+        language: str | None,
+        stream: bool,
+        user_email: str | None = None,
+        user_profile: dict | None = None,
+    ):
+        """
+        `_answer_events`, shared between identical concurrent questions.
+
+        Personalisation-free requests with the same (site_id, normalised
+        question, language) attach to one in-flight retrieval + generation
+        and each receive its full event stream from the start. Personalised
+        requests (verified email or profile) always run on their own.
+        """
+        if user_email or user_profile or not settings.query_coalescing_enabled:
+            async for event in self._answer_events(
+                db, tenant, site_id, question, language, stream, user_email, user_profile,
+            ):
+                yield event
+            return
+
+        key = (stream, site_id, _normalize_question(question), language or "en")
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._inflight[key] = flight
+            # The shared work runs in its own task and session, so it outlives
+            # the request that started it if that client goes away.
+            flight.task = asyncio.create_task(
+                self._run_flight(flight, tenant, site_id, question, language, stream)
+            )
+            flight.task.add_done_callback(functools.partial(self._end_flight, key, flight))
+        else:
+            flight.waiters += 1
+            logger.info("[COALESCE] joined in-flight query site_id=%s waiters=%d", site_id, flight.waiters)
+
+        async for event in flight.subscribe():
+            yield event
+
+    async def _run_flight(
+        self,
+        flight: _Flight,
+        tenant: TenantContext,
+        site_id: str,
+        question: str,
+        language: str | None,
+        stream: bool,
+    ) -> None:
+        async with self.session_factory() as db:
+            async for event in self._answer_events(db, tenant, site_id, question, language, stream):
+                flight.publish(event)
+
+    def _end_flight(self, key: tuple, flight: _Flight, task: asyncio.Task) -> None:
+        """Done callback of a flight's task. Runs however the task ended, even
+        when it was cancelled (e.g. shutdown) before it started, so attached
+        requests always wake up with a result or an error."""
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if task.cancelled():
+            flight.error = RuntimeError("Query was cancelled before it finished")
+        else:
+            flight.error = task.exception()
+        flight.finish()
+
+    async def process_query(
+        self,
+        db: AsyncSession,
+        site_id: str,
+        question: str,
+        origin: str | None = None,
+        user_agent: str | None = None,
+        ip_address: str | None = None,
+        user_email: str | None = None,
+        user_profile: dict | None = None,
+        language: str | None = None,
+    ) -> dict:
+        """
+        Process a user query end-to-end (non-streaming).
+        """
+        start_time = time.time()
+
+        tenant = await self.get_tenant_context(db, site_id)
+        if not tenant:
+            raise ValueError("Invalid site_id")
+
+        if origin and not tenant.allows_origin(origin):
+            raise PermissionError("Origin domain not allowed")
+
+        customer = tenant.customer
+
+        async for result in self._coalesced_events(
+            db, tenant, site_id, question, language, False, user_email, user_profile,
+        ):
+            pass
+        retrieval = result["retrieval"]
+
+        if retrieval["answer_cache_hit"]:
+            cached, similarity = retrieval["answer_cache_hit"]
+            query_log_id = await self._log_cache_hit(
+                customer, question, cached, similarity, start_time, origin, user_agent, ip_address,
+            )
+            return {
+                "answer": cached.answer,
+                "suggestions": list(cached.suggestions),
+                "sources": list(cached.sources),
+                "_meta": {
+                    "top_score": cached.top_score,
+                    "fallback_triggered": False,
+                    "llm_declined": False,
+                    "chunks_used": cached.chunks_used,
+                    "query_log_id": query_log_id,
+                    "answer_cache_hit": True,
+                },
+            }
+
+        if "no_data_message" in result:
+            return {"answer": result["no_data_message"], "suggestions": [], "sources": []}
+
+        chunks_for_llm = retrieval["chunks_for_llm"]
+        context_tokens = result["context_tokens"]
+        llm_declined = result["llm_declined"]
+        fallback_triggered = result["fallback_triggered"]
+
+        # Calculate metrics
+        response_time_ms = int((time.time() - start_time) * 1000)
 
         # Log query
         query_log_id = await self._log_query(
-            db=db,
             customer_id=customer.id,
             question=question,
             answer=result["answer"],
@@ -333,8 +671,8 @@ class QueryService:
 
         return {
             "answer": result["answer"],
-            "suggestions": result["suggestions"] if llm_params["show_suggestions"] else [],
-            "sources": self._build_sources(chunks_for_llm, config),
+            "suggestions": list(result["suggestions"]),
+            "sources": list(result["sources"]),
             "_meta": {
                 "top_score": retrieval["top_score"],
                 "fallback_triggered": fallback_triggered,
@@ -363,69 +701,94 @@ class QueryService:
         """
         start_time = time.time()
 
-        customer = await self._get_customer(db, site_id)
-        if not customer:
+        tenant = await self.get_tenant_context(db, site_id)
+        if not tenant:
             yield {"type": "error", "message": "Invalid site_id"}
             return
 
-        if origin and not await self._validate_origin(db, customer.id, origin):
+        if origin and not tenant.allows_origin(origin):
             yield {"type": "error", "message": "Origin domain not allowed"}
             return
 
-        config = await self._get_widget_config(db, customer.id)
-        profile = await self._get_business_profile(db, customer.id)
+        customer = tenant.customer
 
-        # Shared retrieval pipeline
-        retrieval = await self._retrieve_and_rank(db, customer, config, site_id, question, user_email)
+        result = None
+        async for event in self._coalesced_events(
+            db, tenant, site_id, question, language, True, user_email, user_profile,
+        ):
+            if event["type"] == "result":
+                result = event
+            else:
+                yield event
+        retrieval = result["retrieval"]
 
-        # Handle no-data status
-        if retrieval["no_data_status"]:
-            msg = (
-                "I'm still learning about this website. Content is being indexed — please check back in a few minutes!"
-                if retrieval["no_data_status"] == "processing"
-                else "I'm still setting up and don't have information about this website yet. Please check back soon!"
+        if retrieval["answer_cache_hit"]:
+            cached, similarity = retrieval["answer_cache_hit"]
+            log_id = await self._log_cache_hit(
+                customer, question, cached, similarity, start_time, origin, user_agent, ip_address,
             )
-            yield {"type": "token", "data": msg}
-            yield {"type": "done", "answer": msg, "suggestions": [], "sources": []}
+            yield {
+                "type": "done",
+                "answer": cached.answer,
+                "suggestions": list(cached.suggestions),
+                "sources": list(cached.sources),
+                "query_log_id": log_id,
+            }
             return
 
-        chunks_for_llm = retrieval["chunks_for_llm"]
-        llm_params = self._build_llm_params(config, customer, profile)
-
-        # Stream the LLM response
-        full_answer = ""
-        suggestions = []
-        async for event in self.llm_service.generate_answer_stream(
-            question=question,
-            context_chunks=chunks_for_llm,
-            user_email=user_email,
-            user_profile=user_profile,
-            language=language,
-            **llm_params,
-        ):
-            if event["type"] == "token":
-                yield event
-            elif event["type"] == "done":
-                full_answer = event["answer"]
-                suggestions = event["suggestions"]
+        if "no_data_message" in result:
+            msg = result["no_data_message"]
+            yield {"type": "done", "answer": msg, "suggestions": [], "sources": []}
+            return
 
         # Log query
         response_time_ms = int((time.time() - start_time) * 1000)
         log_id = await self._log_query(
-            db=db, customer_id=customer.id, question=question, answer=full_answer,
-            chunks_used=len(chunks_for_llm), response_time_ms=response_time_ms,
+            customer_id=customer.id, question=question, answer=result["answer"],
+            chunks_used=len(retrieval["chunks_for_llm"]), response_time_ms=response_time_ms,
             origin=origin, user_agent=user_agent, ip_address=ip_address,
             top_score=retrieval["top_score"],
         )
 
         yield {
             "type": "done",
-            "answer": full_answer,
-            "suggestions": suggestions if llm_params["show_suggestions"] else [],
-            "sources": self._build_sources(chunks_for_llm, config),
+            "answer": result["answer"],
+            "suggestions": list(result["suggestions"]),
+            "sources": list(result["sources"]),
             "query_log_id": log_id,
         }
 
+    async def _log_cache_hit(
+        self,
+        customer: Customer,
+        question: str,
+        cached: CachedAnswer,
+        similarity: float,
+        start_time: float,
+        origin: str | None,
+        user_agent: str | None,
+        ip_address: str | None,
+    ) -> str | None:
+        """Log an answer served from the semantic answer cache."""
+        logger.info(
+            "[ANSWER-CACHE] hit site_id=%s similarity=%.4f", customer.site_id, similarity,
+        )
+        return await self._log_query(
+            customer_id=customer.id,
+            question=question,
+            answer=cached.answer,
+            chunks_used=cached.chunks_used,
+            response_time_ms=int((time.time() - start_time) * 1000),
+            origin=origin,
+            user_agent=user_agent,
+            ip_address=ip_address,
+            top_score=cached.top_score,
+            avg_score=cached.avg_score,
+            retrieval_mode="answer_cache",
+            context_tokens=cached.context_tokens,
+            answer_cache_hit=True,
+        )
+
     async def _keyword_search(
         self,
         db: AsyncSession,
@@ -436,14 +799,19 @@ class QueryService:
         """
         Full-text keyword search on document_chunks.
         Returns ranked list of vector_ids.
+
+        The question is parsed once (websearch_to_tsquery, so quoted phrases,
+        OR and -term work) and matched through the tenant-scoped
+        (customer_id, search_vector) GIN index. Every match in the tenant is
+        ranked, so the best ts_rank hits always reach the fusion.
         """
         result = await db.execute(
             text("""
-                SELECT vector_id,
-                       ts_rank(search_vector, plainto_tsquery('english', :query)) AS rank
-                FROM document_chunks
-                WHERE customer_id = :customer_id
-                  AND search_vector @@ plainto_tsquery('english', :query)
+                WITH q AS (SELECT websearch_to_tsquery('english', :query) AS query)
+                SELECT dc.vector_id, ts_rank(dc.search_vector, q.query) AS rank
+                FROM document_chunks dc, q
+                WHERE dc.customer_id = :customer_id
+                  AND dc.search_vector @@ q.query
                 ORDER BY rank DESC
                 LIMIT :limit
             """),
@@ -472,79 +840,12 @@ class QueryService:
         )
         return list(result.scalars().all())
 
-    async def _get_customer(self, db: AsyncSession, site_id: str) -> Customer | None:
-        """Get customer by site_id."""
-        result = await db.execute(
-            select(Customer).where(
-                Customer.site_id == site_id,
-                Customer.is_active == True,
-            )
-        )
-        return result.scalar_one_or_none()
-
-    async def _get_widget_config(self, db: AsyncSession, customer_id) -> WidgetConfig | None:
-        """Get widget config for customer."""
-        result = await db.execute(
-            select(WidgetConfig).where(WidgetConfig.customer_id == customer_id)
-        )
-        return result.scalar_one_or_none()
-
-    async def _get_business_profile(self, db: AsyncSession, customer_id) -> BusinessProfile | None:
-        """Get completed business profile for customer."""
-        result = await db.execute(
-            select(BusinessProfile).where(
-                BusinessProfile.customer_id == customer_id,
-                BusinessProfile.status == "completed",
-            )
-        )
-        return result.scalar_one_or_none()
-
-    async def _validate_origin(self, db: AsyncSession, customer_id, origin: str) -> bool:
-        """Validate that origin domain is allowed for customer."""
-        # Extract domain from origin
-        try:
-            from urllib.parse import urlparse
-            parsed = urlparse(origin)
-            domain = parsed.netloc.lower()
-            # Remove port if present
-            domain = domain.split(":")[0]
-            # Remove www. prefix
-            if domain.startswith("www."):
-                domain = domain[4:]
-        except Exception:
-            return False
-
-        # Check if domain is allowed
-        result = await db.execute(
-            select(Domain).where(
-                Domain.customer_id == customer_id,
-                Domain.is_active == True,
-            )
-        )
-        allowed_domains = result.scalars().all()
-
-        for allowed in allowed_domains:
-            allowed_domain = allowed.domain.lower().strip().rstrip("/")
-            # If stored value is a full URL, extract just the hostname
-            if allowed_domain.startswith("http://") or allowed_domain.startswith("https://"):
-                try:
-                    allowed_domain = urlparse(allowed_domain).netloc.split(":")[0]
-                except Exception:
-                    pass
-            if allowed_domain.startswith("www."):
-                allowed_domain = allowed_domain[4:]
-            if domain == allowed_domain or domain == f"www.{allowed_domain}":
-                return True
-
-        # Also allow localhost for development
-        if domain in ["localhost", "127.0.0.1"]:
-            return True
-
-        return False
+    async def get_tenant_context(self, db: AsyncSession, site_id: str) -> TenantContext | None:
+        """Cached customer + widget config + profile + domains for an active site_id."""
+        return await self.tenant_cache.get(db, site_id)
 
     async def _log_query(
         self,
-        db: AsyncSession,
         customer_id,
         question: str,
         answer: str,
@@ -563,13 +864,16 @@ class QueryService:
         retrieval_blocked: bool = False,
         llm_declined: bool = False,
         retrieval_empty: bool = False,
+        answer_cache_hit: bool = False,
     ) -> str | None:
-        """Log query to database. Returns the log ID."""
+        """Queue the query log row on the telemetry writer. Returns its
+        pre-generated ID (the row is written on the writer's next flush)."""
         ip_hash = None
         if ip_address:
             ip_hash = hashlib.sha256(ip_address.encode()).hexdigest()[:64]
 
-        log = QueryLog(
+        log_id = await get_telemetry_writer().add(
+            QueryLog,
             customer_id=customer_id,
             question=question,
             answer=answer,
@@ -588,10 +892,13 @@ class QueryService:
             retrieval_blocked=retrieval_blocked,
             llm_declined=llm_declined,
             retrieval_empty=retrieval_empty,
+            answer_cache_hit=answer_cache_hit,
         )
-        db.add(log)
-        await db.commit()
-        return str(log.id)
+        return str(log_id)
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
 
 
 def _reciprocal_rank_fusion(
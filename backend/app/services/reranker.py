@@ -0,0 +1,161 @@
+"""
+Local lexical reranker for the ambiguous top_score band.
+
+Replaces the extra chat-completion round trip of `LLMService.rerank_chunks`
+with an in-process score over the fused candidates (typically 8 chunks,
+well under a millisecond):
+
+    score = RERANK_BM25_WEIGHT      * bm25        (Okapi BM25, IDF over the candidates)
+          + RERANK_PROXIMITY_WEIGHT * proximity   (query-term coverage x tightness of
+                                                   the smallest window holding them)
+          + RERANK_VECTOR_WEIGHT    * vector      (Pinecone cosine score)
+
+Each component is scaled to 0..1 (best candidate = 1) before weighting, so
+the weights read as shares. Chunks carry `vector_score` when they came
+back from the vector leg; keyword-only chunks score 0 on that component.
+
+Per tenant, `WidgetConfig.rerank_mode` picks the strategy:
+  local         this reranker only (default)
+  llm_fallback  this reranker, then the LLM when its top two scores are
+                within RERANK_LLM_FALLBACK_MARGIN (an undecided ranking)
+  llm           the LLM reranker only (previous behaviour)
+"""
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+
+from app.config import get_settings
+
+settings = get_settings()
+
+_TOKEN_RE = re.compile(r"\w+")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from have how i if in is it its "
+    "me my of on or our so that the their there this to was we what when where "
+    "which who why will with you your".split()
+)
+
+
+def _stem(token: str) -> str:
+    """Fold the common English plurals (policies -> policy, returns -> return)."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased, stemmed word tokens without stopwords."""
+    return [_stem(t) for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _min_window(tokens: list[str], terms: set[str]) -> int:
+    """Length of the smallest token window containing every term in `terms`
+    (all of which occur in `tokens`)."""
+    need = len(terms)
+    counts: Counter = Counter()
+    have = 0
+    best = len(tokens)
+    left = 0
+    for right, token in enumerate(tokens):
+        if token not in terms:
+            continue
+        counts[token] += 1
+        if counts[token] == 1:
+            have += 1
+        while have == need:
+            best = min(best, right - left + 1)
+            if tokens[left] in terms:
+                counts[tokens[left]] -= 1
+                if counts[tokens[left]] == 0:
+                    have -= 1
+            left += 1
+    return best
+
+
+def _scaled(values: list[float]) -> list[float]:
+    """Divide by the maximum, so the best candidate scores 1."""
+    top = max(values, default=0.0)
+    if top <= 0:
+        return [0.0] * len(values)
+    return [v / top for v in values]
+
+
+class LexicalReranker:
+    def __init__(
+        self,
+        bm25_weight: float | None = None,
+        proximity_weight: float | None = None,
+        vector_weight: float | None = None,
+        k1: float | None = None,
+        b: float | None = None,
+    ):
+        self.bm25_weight = settings.rerank_bm25_weight if bm25_weight is None else bm25_weight
+        self.proximity_weight = settings.rerank_proximity_weight if proximity_weight is None else proximity_weight
+        self.vector_weight = settings.rerank_vector_weight if vector_weight is None else vector_weight
+        self.k1 = settings.rerank_bm25_k1 if k1 is None else k1
+        self.b = settings.rerank_bm25_b if b is None else b
+
+    def score(self, question: str, chunks: list[dict]) -> list[float]:
+        """Combined relevance score per chunk, in input order."""
+        query_terms = set(tokenize(question))
+        docs = [tokenize(chunk.get("content", "")) for chunk in chunks]
+        n = len(docs)
+        avg_len = sum(len(d) for d in docs) / n if n else 0.0
+        term_counts = [Counter(d) for d in docs]
+        df = {t: sum(1 for c in term_counts if t in c) for t in query_terms}
+
+        bm25, proximity = [], []
+        for doc, counts in zip(docs, term_counts):
+            score = 0.0
+            for term in query_terms:
+                tf = counts.get(term, 0)
+                if not tf:
+                    continue
+                idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+                norm = 1 - self.b + self.b * (len(doc) / avg_len if avg_len else 1.0)
+                score += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+            bm25.append(score)
+
+            present = {t for t in query_terms if t in counts}
+            if not present:
+                proximity.append(0.0)
+                continue
+            coverage = len(present) / len(query_terms)
+            tightness = len(present) / _min_window(doc, present) if len(present) > 1 else 1.0
+            proximity.append(coverage * tightness)
+
+        # Cosine scores in the ambiguous band sit close together; scaling by
+        # the maximum keeps them a gentle prior rather than stretching a
+        # 0.01 difference across the whole range.
+        vector = _scaled([max(chunk.get("vector_score") or 0.0, 0.0) for chunk in chunks])
+        bm25 = _scaled(bm25)
+        return [
+            self.bm25_weight * lex + self.proximity_weight * prox + self.vector_weight * vec
+            for lex, prox, vec in zip(bm25, proximity, vector)
+        ]
+
+    def rerank(self, question: str, chunks: list[dict]) -> tuple[list[dict], float]:
+        """All chunks, best first, and the margin between the top two scores
+        (how decided the ranking is). Ties keep the fusion order."""
+        if len(chunks) <= 1:
+            return list(chunks), 1.0
+        scores = self.score(question, chunks)
+        order = sorted(range(len(chunks)), key=lambda i: -scores[i])
+        margin = scores[order[0]] - scores[order[1]]
+        return [chunks[i] for i in order], margin
+
+
+# Singleton
+_lexical_reranker: LexicalReranker | None = None
+
+
+def get_lexical_reranker() -> LexicalReranker:
+    global _lexical_reranker
+    if _lexical_reranker is None:
+        _lexical_reranker = LexicalReranker()
+    return _lexical_reranker
@@ -0,0 +1,252 @@
+"""
+Write-behind telemetry writer.
+
+Request paths hand append-only telemetry rows (query_logs,
+chatbot_message_log, chatbot_conversations) and coalescable column updates
+(tenant_admin_tokens.last_used_at) to the process-wide TelemetryWriter
+instead of committing them inline. Buffered work is flushed in one
+transaction when TELEMETRY_BATCH_SIZE rows are pending or
+TELEMETRY_FLUSH_INTERVAL_MS after the first one:
+
+- one multi-row INSERT ... ON CONFLICT DO NOTHING per table, parents before
+  children, so a chatbot_message_log row can reference a query log from the
+  same flush;
+- one executemany UPDATE per table for the coalesced updates (last write
+  per row wins).
+
+Rows get their primary key and created_at when enqueued, so callers can
+still hand out a query_log_id straight away. The trade-offs:
+
+- A row reaches the DB on the next flush. Readers that need this process's
+  own writes (DM history, feedback on a just-returned query_log_id) use
+  `pending()` or `flush()`.
+- A batch that fails is retried row by row, so one bad row (e.g. a tenant
+  deleted mid-flight) doesn't drop its neighbours.
+- At most TELEMETRY_MAX_BUFFERED rows are held; past that `add` flushes
+  inline (backpressure) rather than growing without bound.
+- `close()` (app shutdown) drains whatever is still buffered.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from typing import Any
+
+from sqlalchemy import Table, bindparam, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.config import get_settings
+from app.database import Base, async_session_maker
+
+logger = logging.getLogger("zunkiree.telemetry")
+
+settings = get_settings()
+
+# asyncpg caps a statement at 32767 bind parameters.
+_MAX_BIND_PARAMS = 32000
+
+
+def _table_order(table: Table) -> int:
+    """FK dependency order (parents first) for flushing inserts."""
+    try:
+        return Base.metadata.sorted_tables.index(table)
+    except ValueError:
+        return len(Base.metadata.tables)
+
+
+def _build_row(table: Table, values: dict) -> dict:
+    """`values` plus the table's Python-side column defaults (id, created_at, ...)."""
+    row = dict(values)
+    for column in table.columns:
+        if column.name in row or column.default is None:
+            continue
+        default = column.default
+        if default.is_callable:
+            row[column.name] = default.arg(None)
+        elif default.is_scalar:
+            row[column.name] = default.arg
+    return row
+
+
+class TelemetryWriter:
+    def __init__(
+        self,
+        batch_size: int | None = None,
+        flush_interval_ms: int | None = None,
+        max_buffered: int | None = None,
+        session_maker=None,
+    ):
+        self.batch_size = batch_size or settings.telemetry_batch_size
+        self.flush_interval = (flush_interval_ms or settings.telemetry_flush_interval_ms) / 1000
+        self.max_buffered = max_buffered or settings.telemetry_max_buffered
+        self._session_maker = session_maker or async_session_maker
+        self._inserts: dict[Table, list[dict]] = {}
+        self._updates: dict[tuple[Table, Any], dict] = {}
+        # Rows taken by the running flush, still readable via pending().
+        self._in_flight: dict[Table, list[dict]] = {}
+        self._buffered = 0
+        self._flush_lock = asyncio.Lock()
+        self._has_rows = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def buffered(self) -> int:
+        return self._buffered
+
+    # ---------- Enqueue ----------
+
+    async def add(self, model, **values) -> uuid.UUID:
+        """Buffer one row for `model`'s table. Returns its primary key."""
+        table = model.__table__
+        row = _build_row(table, values)
+        self._inserts.setdefault(table, []).append(row)
+        await self._enqueued()
+        return row["id"]
+
+    async def update(self, model, pk, **values) -> None:
+        """Buffer `UPDATE ... SET values WHERE id = pk`, merged into any
+        pending update of the same row."""
+        key = (model.__table__, pk)
+        pending = self._updates.get(key)
+        if pending is not None:
+            pending.update(values)
+            return
+        self._updates[key] = dict(values)
+        await self._enqueued()
+
+    async def _enqueued(self) -> None:
+        self._buffered += 1
+        if self._buffered >= self.max_buffered:
+            logger.warning("[TELEMETRY] buffer full (%d rows); flushing inline", self._buffered)
+            await self.flush()
+            return
+        self._ensure_started()
+        self._has_rows.set()
+        if self._buffered >= self.batch_size:
+            self._full.set()
+
+    def pending(self, model) -> list[dict]:
+        """Copies of rows for `model` not yet committed by this process."""
+        table = model.__table__
+        rows = self._in_flight.get(table, []) + self._inserts.get(table, [])
+        return [dict(row) for row in rows]
+
+    # ---------- Flushing ----------
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is not None and self._task.get_loop() is loop:
+            if not self._task.done():
+                return
+        elif self._task is not None:
+            # First use on a new event loop: asyncio primitives are per-loop.
+            self._has_rows = asyncio.Event()
+            self._full = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self._has_rows.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("[TELEMETRY] flush failed; continuing")
+
+    async def flush(self) -> int:
+        """Write everything buffered now. Returns the number of rows/updates written."""
+        async with self._flush_lock:
+            inserts, self._inserts = self._inserts, {}
+            updates, self._updates = self._updates, {}
+            self._buffered = 0
+            self._has_rows.clear()
+            self._full.clear()
+            if not inserts and not updates:
+                return 0
+            self._in_flight = inserts
+            try:
+                return await self._write(inserts, updates)
+            finally:
+                self._in_flight = {}
+
+    async def _write(self, inserts: dict[Table, list[dict]], updates: dict[tuple[Table, Any], dict]) -> int:
+        try:
+            await self._execute(inserts, updates)
+            return sum(len(rows) for rows in inserts.values()) + len(updates)
+        except Exception:
+            logger.warning("[TELEMETRY] batch write failed; retrying row by row", exc_info=True)
+        single = [({table: [row]}, {}) for table, rows in sorted(inserts.items(), key=lambda i: _table_order(i[0]))
+                  for row in rows]
+        single += [({}, {key: values}) for key, values in updates.items()]
+        written = 0
+        for one_insert, one_update in single:
+            try:
+                await self._execute(one_insert, one_update)
+                written += 1
+            except Exception as e:
+                logger.error("[TELEMETRY] dropping row that failed to write: %s", e)
+        return written
+
+    async def _execute(self, inserts: dict[Table, list[dict]], updates: dict[tuple[Table, Any], dict]) -> None:
+        async with self._session_maker() as db:
+            for statement, params in self._statements(inserts, updates):
+                if params is None:
+                    await db.execute(statement)
+                else:
+                    await db.execute(statement, params)
+            await db.commit()
+
+    @staticmethod
+    def _statements(inserts: dict[Table, list[dict]], updates: dict[tuple[Table, Any], dict]):
+        for table, rows in sorted(inserts.items(), key=lambda item: _table_order(item[0])):
+            # Rows with the same columns share one multi-row VALUES list.
+            groups: dict[tuple[str, ...], list[dict]] = {}
+            for row in rows:
+                groups.setdefault(tuple(sorted(row)), []).append(row)
+            for columns, group in groups.items():
+                per_statement = max(1, _MAX_BIND_PARAMS // len(columns))
+                for start in range(0, len(group), per_statement):
+                    chunk = group[start:start + per_statement]
+                    yield pg_insert(table).values(chunk).on_conflict_do_nothing(), None
+
+        by_shape: dict[tuple[Table, tuple[str, ...]], list[dict]] = {}
+        for (table, pk), values in updates.items():
+            params = {"_pk": pk, **{f"v_{name}": value for name, value in values.items()}}
+            by_shape.setdefault((table, tuple(sorted(values))), []).append(params)
+        for (table, columns), params in by_shape.items():
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam("_pk"))
+                .values({name: bindparam(f"v_{name}") for name in columns})
+            )
+            yield statement, params
+
+    async def close(self) -> None:
+        """Stop the background flusher and drain the buffer."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        written = await self.flush()
+        if written:
+            logger.info("[TELEMETRY] drained %d rows on shutdown", written)
+
+
+# Singleton
+_telemetry_writer: TelemetryWriter | None = None
+
+
+def get_telemetry_writer() -> TelemetryWriter:
+    global _telemetry_writer
+    if _telemetry_writer is None:
+        _telemetry_writer = TelemetryWriter()
+    return _telemetry_writer
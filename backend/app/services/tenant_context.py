@@ -0,0 +1,256 @@
+"""
+Tenant context cache for the widget query path.
+
+Every widget request used to re-read the tenant from Postgres — customer by
+site_id, widget config, business profile and the allowed-domain rows — and
+the streaming endpoint did it twice (once in the route for greetings and
+verification, again inside QueryService). This module loads all of that
+once per site_id into an immutable TenantContext and serves it from an
+in-process LRU until TENANT_CONTEXT_TTL_SECONDS elapses.
+
+The ORM rows are copied into read-only ModelSnapshot objects, so a cached
+context never touches a session after the load that built it and callers
+cannot mutate shared state by accident. Origin checks use a set of
+normalised domains computed at load time instead of a query per request.
+
+Writers call `await invalidate_tenant(db, customer_id, site_id)` after
+committing a change to the customer, widget config, business profile or
+domains; it also invalidates the tenant's semantic answer cache in every
+worker. The context cache itself is per-process, so the TTL bounds how long
+another worker can keep serving the old snapshot.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+from sqlalchemy import inspect as sa_inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import Customer, Domain, WidgetConfig
+from app.models.business_profile import BusinessProfile
+from app.services.answer_cache import get_answer_cache, invalidate_answers
+
+logger = logging.getLogger("zunkiree.tenant_context")
+
+settings = get_settings()
+
+def _now() -> float:
+    """Cache clock. Tests patch this rather than the time module, which the
+    asyncio event loop also reads."""
+    return time.monotonic()
+
+
+# Always accepted for local widget development.
+_DEV_ORIGINS = frozenset({"localhost", "127.0.0.1"})
+
+
+class ModelSnapshot:
+    """Read-only copy of an ORM row's column values.
+
+    Attribute access mirrors the model (`snapshot.brand_name`); relationships
+    are not copied and assignment raises.
+    """
+
+    __slots__ = ("_model", "_values")
+
+    def __init__(self, row):
+        mapper = sa_inspect(row).mapper
+        object.__setattr__(self, "_model", mapper.class_.__name__)
+        object.__setattr__(
+            self, "_values", {attr.key: getattr(row, attr.key) for attr in mapper.column_attrs},
+        )
+
+    def __getattr__(self, name: str):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(f"{self._model} snapshot has no attribute {name!r}") from None
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"{self._model} snapshot is read-only")
+
+    def __repr__(self) -> str:
+        return f"<{self._model} snapshot id={self._values.get('id')}>"
+
+
+def normalise_domain(value: str) -> str:
+    """Reduce an origin or stored domain to a bare lowercase host without www."""
+    domain = value.lower().strip().rstrip("/")
+    if "://" in domain:
+        domain = urlparse(domain).netloc
+    domain = domain.split(":")[0]
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return domain
+
+
+@dataclass(frozen=True)
+class TenantContext:
+    customer: ModelSnapshot
+    widget_config: ModelSnapshot | None
+    business_profile: ModelSnapshot | None  # completed profiles only
+    allowed_domains: frozenset[str]
+    loaded_at: float
+
+    @property
+    def customer_id(self) -> uuid.UUID:
+        return self.customer.id
+
+    @property
+    def site_id(self) -> str:
+        return self.customer.site_id
+
+    def allows_origin(self, origin: str) -> bool:
+        """True if the request Origin is one of the tenant's active domains."""
+        try:
+            domain = normalise_domain(origin)
+        except Exception:
+            return False
+        return domain in self.allowed_domains or domain in _DEV_ORIGINS
+
+
+async def load_tenant_context(db: AsyncSession, site_id: str) -> TenantContext | None:
+    """Read one active tenant from Postgres. Returns None for unknown site_ids."""
+    customer = (
+        await db.execute(
+            select(Customer).where(Customer.site_id == site_id, Customer.is_active == True)
+        )
+    ).scalar_one_or_none()
+    if customer is None:
+        return None
+
+    config = (
+        await db.execute(select(WidgetConfig).where(WidgetConfig.customer_id == customer.id))
+    ).scalar_one_or_none()
+    profile = (
+        await db.execute(
+            select(BusinessProfile).where(
+                BusinessProfile.customer_id == customer.id,
+                BusinessProfile.status == "completed",
+            )
+        )
+    ).scalar_one_or_none()
+    domains = (
+        await db.execute(
+            select(Domain.domain).where(Domain.customer_id == customer.id, Domain.is_active == True)
+        )
+    ).scalars().all()
+
+    return TenantContext(
+        customer=ModelSnapshot(customer),
+        widget_config=ModelSnapshot(config) if config else None,
+        business_profile=ModelSnapshot(profile) if profile else None,
+        allowed_domains=frozenset(normalise_domain(d) for d in domains if d),
+        loaded_at=_now(),
+    )
+
+
+class TenantContextCache:
+    def __init__(self, ttl_seconds: int | None = None, max_entries: int | None = None):
+        self.ttl_seconds = settings.tenant_context_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.max_entries = settings.tenant_context_max_entries if max_entries is None else max_entries
+        self._entries: OrderedDict[str, tuple[float, TenantContext]] = OrderedDict()
+        self._loading: dict[str, asyncio.Future] = {}
+        self._generation = 0  # bumped by invalidate(); guards in-flight loads
+
+    async def get(self, db: AsyncSession, site_id: str) -> TenantContext | None:
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return await load_tenant_context(db, site_id)
+
+        entry = self._entries.get(site_id)
+        if entry is not None:
+            expires_at, context = entry
+            if expires_at > _now():
+                self._entries.move_to_end(site_id)
+                return context
+            del self._entries[site_id]
+
+        # Concurrent misses for one site_id share a single load.
+        pending = self._loading.get(site_id)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The loading request was cancelled mid-read; load on our own.
+                return await load_tenant_context(db, site_id)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[site_id] = future
+        generation = self._generation
+        try:
+            context = await load_tenant_context(db, site_id)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._loading.pop(site_id, None)
+
+        # Unknown site_ids are not cached, so a newly provisioned tenant works
+        # on its first request. A load that raced an invalidate() is returned
+        # but not stored — it may predate the config commit.
+        if context is not None and generation == self._generation:
+            self._entries[site_id] = (_now() + self.ttl_seconds, context)
+            self._entries.move_to_end(site_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        future.set_result(context)
+        return context
+
+    def invalidate(self, customer_id: uuid.UUID | str | None = None, site_id: str | None = None) -> None:
+        """Drop a tenant's cached context by customer_id and/or site_id."""
+        self._generation += 1
+        cid = str(customer_id) if customer_id is not None else None
+        stale = [
+            key for key, (_, context) in self._entries.items()
+            if key == site_id or (cid is not None and str(context.customer_id) == cid)
+        ]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            logger.info("[TENANT-CONTEXT] invalidated customer_id=%s site_id=%s", cid, site_id)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# Singleton instance
+_tenant_context_cache: TenantContextCache | None = None
+
+
+def get_tenant_context_cache() -> TenantContextCache:
+    global _tenant_context_cache
+    if _tenant_context_cache is None:
+        _tenant_context_cache = TenantContextCache()
+    return _tenant_context_cache
+
+
+async def invalidate_tenant(
+    db: AsyncSession,
+    customer_id: uuid.UUID | str,
+    site_id: str | None = None,
+) -> None:
+    """Invalidation hook for tenant config writes (customer, widget config,
+    business profile, domains): drops the tenant context and answer caches."""
+    get_tenant_context_cache().invalidate(customer_id=customer_id, site_id=site_id)
+    await invalidate_answers(db, customer_id)
+
+
+def forget_tenant(customer_id: uuid.UUID | str, site_id: str | None = None) -> None:
+    """Drop a deleted tenant from this process's caches. There is nothing to
+    version once the customer row is gone; other workers stop serving it when
+    their tenant context expires and the reload finds no active customer."""
+    get_tenant_context_cache().invalidate(customer_id=customer_id, site_id=site_id)
+    get_answer_cache().invalidate(customer_id)
@@ -23,6 +23,7 @@ from app.models.customer import Customer
 from app.models.tenant_admin_token import TenantAdminToken
 from app.models.widget_config import WidgetConfig
 from app.services.admin_token_hash import hash_token
+from app.services.tenant_context import invalidate_tenant
 
 logger = logging.getLogger(__name__)
 
@@ -240,6 +241,7 @@ class TenantProvisioningService:
                 setattr(config, key, value)
         config.updated_at = datetime.utcnow()
         await db.commit()
+        await invalidate_tenant(db, customer_id)
         await db.refresh(config)
         return config
 
@@ -1,19 +1,160 @@
 from __future__ import annotations
+import asyncio
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Protocol
 from pinecone import Pinecone
 from app.config import get_settings
+from app.services.local_vector_index import LocalVectorIndex
 
 logger = logging.getLogger("zunkiree.vector_store")
 settings = get_settings()
 
 
-class VectorStoreService:
-    def __init__(self):
-        self.pc = Pinecone(api_key=settings.pinecone_api_key)
-        self.index = self.pc.Index(
+@dataclass
+class CallStats:
+    """Running latency totals for one vector store operation.
+
+    `call` is time spent inside the index client on a worker thread; `queue`
+    is time spent waiting for a free worker. Under load the two diverge, and
+    only the first is backend latency.
+    """
+
+    count: int = 0
+    errors: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_ms: float = 0.0
+    queue_total_ms: float = 0.0
+    queue_max_ms: float = 0.0
+
+    def record(self, call_ms: float, queue_ms: float, failed: bool) -> None:
+        self.count += 1
+        if failed:
+            self.errors += 1
+        self.total_ms += call_ms
+        self.last_ms = call_ms
+        if call_ms > self.max_ms:
+            self.max_ms = call_ms
+        self.queue_total_ms += queue_ms
+        if queue_ms > self.queue_max_ms:
+            self.queue_max_ms = queue_ms
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "last_ms": round(self.last_ms, 2),
+            "queue_avg_ms": round(self.queue_total_ms / self.count, 2) if self.count else 0.0,
+            "queue_max_ms": round(self.queue_max_ms, 2),
+        }
+
+
+class VectorIndex(Protocol):
+    """Synchronous index surface VectorStoreService drives.
+
+    The Pinecone Index client satisfies it as-is; LocalVectorIndex is the
+    in-process alternative. Query results expose `.matches`, each with `id`,
+    `score` and `metadata`.
+    """
+
+    def upsert(self, vectors: list[dict], namespace: str) -> Any: ...
+
+    def query(
+        self,
+        vector: list[float],
+        namespace: str,
+        top_k: int,
+        include_metadata: bool,
+        filter: dict | None,
+    ) -> Any: ...
+
+    def delete(self, ids: list[str] | None = None, delete_all: bool = False, namespace: str = "") -> Any: ...
+
+
+def build_vector_index(backend: str | None = None) -> VectorIndex:
+    """Create the index for VECTOR_STORE_BACKEND ("pinecone" or "local")."""
+    backend = (backend or settings.vector_store_backend).lower()
+    if backend == "pinecone":
+        missing = [
+            name for name, value in (
+                ("PINECONE_API_KEY", settings.pinecone_api_key),
+                ("PINECONE_HOST", settings.pinecone_host),
+            ) if not value
+        ]
+        if missing:
+            raise ValueError(
+                f"{' and '.join(missing)} must be set when VECTOR_STORE_BACKEND=pinecone "
+                "(or set VECTOR_STORE_BACKEND=local)"
+            )
+        pc = Pinecone(api_key=settings.pinecone_api_key)
+        return pc.Index(
             name=settings.pinecone_index_name,
             host=settings.pinecone_host,
         )
+    if backend == "local":
+        logger.info("[VECTOR-STORE] using local index at %s", settings.local_vector_index_dir)
+        return LocalVectorIndex(settings.local_vector_index_dir)
+    raise ValueError(f"Unknown vector_store_backend: {backend}")
+
+
+class VectorStoreService:
+    def __init__(self, index: VectorIndex | None = None, max_concurrency: int | None = None):
+        self.index = index if index is not None else build_vector_index()
+
+        # Both index backends block (Pinecone on network I/O, the local index
+        # on NumPy/disk). Every call is pushed onto this pool so the event loop keeps serving other
+        # requests; max_workers is the per-process cap on in-flight calls.
+        self.max_concurrency = max_concurrency or settings.vector_store_max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="vector-store",
+        )
+        self._stats: dict[str, CallStats] = {}
+
+    async def _run(self, op: str, fn, /, **kwargs):
+        """Run a blocking index call on the executor and record its latency.
+
+        Queue wait (submit → worker picks it up) and call time are measured
+        separately so executor saturation doesn't read as backend latency.
+        """
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        timing: dict[str, float] = {}
+
+        def _timed_call():
+            timing["started"] = time.perf_counter()
+            try:
+                return fn(**kwargs)
+            finally:
+                timing["finished"] = time.perf_counter()
+
+        failed = False
+        try:
+            return await loop.run_in_executor(self._executor, _timed_call)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            started = timing.get("started")
+            if started is None:
+                # Never reached a worker (e.g. cancelled while queued).
+                queue_ms, call_ms = (time.perf_counter() - submitted) * 1000, 0.0
+            else:
+                queue_ms = (started - submitted) * 1000
+                call_ms = (timing.get("finished", time.perf_counter()) - started) * 1000
+            self._stats.setdefault(op, CallStats()).record(call_ms, queue_ms, failed)
+            logger.debug(
+                "[VECTOR-STORE] op=%s call_ms=%.1f queue_ms=%.1f failed=%s", op, call_ms, queue_ms, failed,
+            )
+
+    def get_latency_stats(self) -> dict[str, dict]:
+        """Per-operation latency snapshot (call avg/max/last ms plus queue wait)."""
+        return {op: stats.as_dict() for op, stats in self._stats.items()}
 
     async def upsert_vectors(
         self,
@@ -35,13 +176,17 @@ class VectorStoreService:
 
         # Batch upserts to stay under Pinecone's 4MB request limit.
         # With 3072-dim embeddings (~12KB per vector), 50 vectors ≈ 600KB.
+        # Batches are sent concurrently; the executor bounds how many run at once.
         batch_size = 50
-        for i in range(0, len(vectors), batch_size):
-            batch = vectors[i:i + batch_size]
-            self.index.upsert(
-                vectors=batch,
+        await asyncio.gather(*(
+            self._run(
+                "upsert",
+                self.index.upsert,
+                vectors=vectors[i:i + batch_size],
                 namespace=namespace,
             )
+            for i in range(0, len(vectors), batch_size)
+        ))
         return len(vectors)
 
     async def query_vectors(
@@ -82,7 +227,9 @@ class VectorStoreService:
         # [TEMP-LOG] Log Pinecone query details
         logger.warning("[QUERY-TRACE] pinecone_query namespace=%s top_k=%d filter=%s index=%s", namespace, top_k, query_filter, settings.pinecone_index_name)
 
-        results = self.index.query(
+        results = await self._run(
+            "query",
+            self.index.query,
             vector=query_vector,
             namespace=namespace,
             top_k=top_k,
@@ -104,12 +251,15 @@ class VectorStoreService:
 
     async def delete_namespace(self, namespace: str) -> None:
         """Delete all vectors in a namespace."""
-        self.index.delete(delete_all=True, namespace=namespace)
+        await self._run("delete_namespace", self.index.delete, delete_all=True, namespace=namespace)
 
     async def delete_vectors(self, ids: list[str], namespace: str) -> None:
-        """Delete specific vectors by ID."""
-        if ids:
-            self.index.delete(ids=ids, namespace=namespace)
+        """Delete specific vectors by ID (Pinecone accepts 1000 per request)."""
+        batch_size = 1000
+        await asyncio.gather(*(
+            self._run("delete", self.index.delete, ids=ids[i:i + batch_size], namespace=namespace)
+            for i in range(0, len(ids), batch_size)
+        ))
 
 
 # Singleton instance
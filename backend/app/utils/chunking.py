@@ -1,13 +1,34 @@
+"""
+Token-aware text chunking.
+
+Each document is encoded once with a cached tiktoken encoder. Chunks are cut
+on token offsets at the last paragraph break that fits in `chunk_size`
+tokens (falling back to a sentence break, then a hard cut), and consecutive
+chunks share `chunk_overlap` tokens. Chunk text is sliced from the original
+document, so nothing is re-encoded to count it.
+"""
+import re
+from functools import lru_cache
+
+import numpy as np
 import tiktoken
 
+_PARAGRAPH_BREAK_RE = re.compile(rb"\n\s*\n")
+_SENTENCE_BREAK_RE = re.compile(rb"(?<=[.!?])\s+")
 
-def count_tokens(text: str, model: str = "gpt-4") -> int:
-    """Count tokens in text using tiktoken."""
+
+@lru_cache(maxsize=8)
+def get_encoding(model: str = "gpt-4") -> tiktoken.Encoding:
+    """Tokenizer for `model`, built once per process."""
     try:
-        encoding = tiktoken.encoding_for_model(model)
+        return tiktoken.encoding_for_model(model)
     except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
-    return len(encoding.encode(text))
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Count tokens in text using tiktoken."""
+    return len(get_encoding(model).encode_ordinary(text))
 
 
 def chunk_text(
@@ -30,96 +51,102 @@ def chunk_text(
     """
     if not text or not text.strip():
         return []
+    encoding = get_encoding(model)
+    return _chunk_tokens(encoding, text, encoding.encode_ordinary(text), chunk_size, chunk_overlap)
+
+
+def chunk_texts(
+    texts: list[str],
+    chunk_size: int = 500,
+    chunk_overlap: int = 50,
+    model: str = "gpt-4",
+) -> list[list[dict]]:
+    """Batch form of chunk_text: one list of chunks per input text.
 
-    # Split by paragraphs first
-    paragraphs = text.split("\n\n")
-    paragraphs = [p.strip() for p in paragraphs if p.strip()]
+    Documents are encoded together with tiktoken's threaded batch encoder.
+    """
+    encoding = get_encoding(model)
+    results: list[list[dict]] = [[] for _ in texts]
+    todo = [i for i, t in enumerate(texts) if t and t.strip()]
+    encoded = encoding.encode_ordinary_batch([texts[i] for i in todo])
+    for i, tokens in zip(todo, encoded):
+        results[i] = _chunk_tokens(encoding, texts[i], tokens, chunk_size, chunk_overlap)
+    return results
+
+
+@lru_cache(maxsize=8)
+def _token_byte_lengths(encoding: tiktoken.Encoding) -> np.ndarray:
+    """UTF-8 byte length of every token id, built once per encoder."""
+    lengths = np.zeros(encoding.n_vocab, dtype=np.int64)
+    for token in range(encoding.n_vocab):
+        try:
+            lengths[token] = len(encoding.decode_single_token_bytes(token))
+        except KeyError:  # unused ids in the vocabulary
+            pass
+    return lengths
+
+
+def _token_breaks(pattern: re.Pattern, data: bytes, starts: np.ndarray) -> np.ndarray:
+    """Token indices at which a `pattern` break ends (the next piece starts)."""
+    ends = [m.end() for m in pattern.finditer(data)]
+    if not ends:
+        return np.empty(0, dtype=np.int64)
+    breaks = np.unique(np.searchsorted(starts, ends, side="left"))
+    return breaks[(breaks > 0) & (breaks < len(starts))]
+
+
+def _last_break(breaks: np.ndarray, start: int, limit: int) -> int | None:
+    i = int(np.searchsorted(breaks, limit, side="right")) - 1
+    if i >= 0 and breaks[i] > start:
+        return int(breaks[i])
+    return None
+
+
+def _chunk_tokens(
+    encoding: tiktoken.Encoding,
+    text: str,
+    tokens: list[int],
+    chunk_size: int,
+    chunk_overlap: int,
+) -> list[dict]:
+    if not tokens:
+        return []
+    # Work in UTF-8 byte space: tokens are byte sequences, so each token's
+    # start offset is a cumulative sum over a per-vocabulary length table.
+    data = text.encode("utf-8")
+    lengths = _token_byte_lengths(encoding)[np.asarray(tokens, dtype=np.int64)]
+    starts = np.cumsum(lengths) - lengths
+    paragraph_breaks = _token_breaks(_PARAGRAPH_BREAK_RE, data, starts)
+    sentence_breaks = _token_breaks(_SENTENCE_BREAK_RE, data, starts)
 
     chunks = []
-    current_chunk = []
-    current_tokens = 0
-    chunk_index = 0
-
-    for para in paragraphs:
-        para_tokens = count_tokens(para, model)
-
-        # If single paragraph exceeds chunk size, split by sentences
-        if para_tokens > chunk_size:
-            # Split by sentences
-            sentences = _split_into_sentences(para)
-            for sentence in sentences:
-                sentence_tokens = count_tokens(sentence, model)
-
-                if current_tokens + sentence_tokens > chunk_size and current_chunk:
-                    # Save current chunk
-                    chunk_text = " ".join(current_chunk)
-                    chunks.append({
-                        "content": chunk_text,
-                        "token_count": current_tokens,
-                        "chunk_index": chunk_index,
-                    })
-                    chunk_index += 1
-
-                    # Start new chunk with overlap
-                    overlap_text = _get_overlap_text(current_chunk, chunk_overlap, model)
-                    current_chunk = [overlap_text] if overlap_text else []
-                    current_tokens = count_tokens(overlap_text, model) if overlap_text else 0
-
-                current_chunk.append(sentence)
-                current_tokens += sentence_tokens
+    total = len(tokens)
+    start = 0
+    while start < total:
+        limit = start + chunk_size
+        if limit >= total:
+            end = total
         else:
-            # Check if adding this paragraph exceeds chunk size
-            if current_tokens + para_tokens > chunk_size and current_chunk:
-                # Save current chunk
-                chunk_text = "\n\n".join(current_chunk)
-                chunks.append({
-                    "content": chunk_text,
-                    "token_count": current_tokens,
-                    "chunk_index": chunk_index,
-                })
-                chunk_index += 1
-
-                # Start new chunk with overlap
-                overlap_text = _get_overlap_text(current_chunk, chunk_overlap, model)
-                current_chunk = [overlap_text] if overlap_text else []
-                current_tokens = count_tokens(overlap_text, model) if overlap_text else 0
-
-            current_chunk.append(para)
-            current_tokens += para_tokens
-
-    # Don't forget the last chunk
-    if current_chunk:
-        chunk_text = "\n\n".join(current_chunk)
-        chunks.append({
-            "content": chunk_text,
-            "token_count": count_tokens(chunk_text, model),
-            "chunk_index": chunk_index,
-        })
+            # A paragraph break wins unless it would leave the chunk less than
+            # half full; then the later of it and the last sentence break.
+            paragraph = _last_break(paragraph_breaks, start, limit)
+            if paragraph is not None and paragraph - start >= chunk_size // 2:
+                end = paragraph
+            else:
+                sentence = _last_break(sentence_breaks, start, limit)
+                end = max(paragraph or 0, sentence or 0) or limit
+
+        byte_end = int(starts[end]) if end < total else len(data)
+        # A hard cut can split a multi-byte character; drop the fragment.
+        content = data[int(starts[start]):byte_end].decode("utf-8", errors="ignore").strip()
+        if content:
+            chunks.append({
+                "content": content,
+                "token_count": end - start,
+                "chunk_index": len(chunks),
+            })
+        if end >= total:
+            break
+        start = end - chunk_overlap if end - chunk_overlap > start else end
 
     return chunks
-
-
-def _split_into_sentences(text: str) -> list[str]:
-    """Split text into sentences."""
-    import re
-    # Simple sentence splitting
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    return [s.strip() for s in sentences if s.strip()]
-
-
-def _get_overlap_text(chunks: list[str], overlap_tokens: int, model: str) -> str:
-    """Get text for overlap from end of chunks."""
-    if not chunks:
-        return ""
-
-    # Take last chunk content
-    last_text = chunks[-1] if isinstance(chunks[-1], str) else " ".join(chunks[-1:])
-
-    # Simple approach: take last N characters roughly equivalent to overlap_tokens
-    # Approximate 4 characters per token
-    char_limit = overlap_tokens * 4
-
-    if len(last_text) <= char_limit:
-        return last_text
-
-    return "..." + last_text[-char_limit:]
@@ -1,37 +1,267 @@
+import asyncio
+import logging
+import re
+from collections import deque
+from typing import AsyncIterator
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+from urllib.robotparser import RobotFileParser
+
 import httpx
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+
+logger = logging.getLogger("zunkiree.crawler")
+
+_SITEMAP_LOC_RE = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.I)
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
 
 
-async def crawl_url(url: str, timeout: int = 30) -> dict:
+async def crawl_url(
+    url: str,
+    timeout: int = 30,
+    client: httpx.AsyncClient | None = None,
+    headers: dict[str, str] | None = None,
+) -> dict:
     """
     Crawl a URL and extract content.
 
     Args:
         url: URL to crawl
         timeout: Request timeout in seconds
+        client: Shared client to reuse pooled connections (one is created
+            for this request when omitted)
+        headers: Extra request headers, e.g. If-None-Match / If-Modified-Since
 
     Returns:
-        Dict with 'title', 'content', 'url', and 'links'
+        Dict with 'title', 'content', 'url', 'links', 'html', 'etag' and
+        'last_modified'. A 304 reply to a conditional request returns only
+        'url' and 'not_modified': True.
     """
-    async with httpx.AsyncClient(
-        follow_redirects=True,
-        timeout=timeout,
-    ) as client:
-        response = await client.get(url)
-        response.raise_for_status()
-
-        html = response.text
-        title, content = extract_text_from_html(html)
-        links = extract_links(html, url)
-
-        return {
-            "title": title or url,
-            "content": content,
-            "url": url,
-            "links": links,
-            "html": html,
-        }
+    if client is None:
+        async with httpx.AsyncClient(follow_redirects=True, timeout=timeout) as own_client:
+            return await crawl_url(url, timeout=timeout, client=own_client, headers=headers)
+
+    response = await client.get(url, headers=headers)
+    if response.status_code == 304:
+        return {"url": url, "not_modified": True}
+    response.raise_for_status()
+
+    html = response.text
+    title, content = extract_text_from_html(html)
+    links = extract_links(html, url)
+
+    return {
+        "title": title or url,
+        "content": content,
+        "url": url,
+        "links": links,
+        "html": html,
+        "etag": response.headers.get("etag"),
+        "last_modified": response.headers.get("last-modified"),
+    }
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form used to dedupe crawl URLs: lowercase scheme and host,
+    no default port, fragment or tracking params, sorted query, and no
+    trailing slash except on the root path."""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    if parsed.port and not (
+        (scheme == "http" and parsed.port == 80) or (scheme == "https" and parsed.port == 443)
+    ):
+        host = f"{host}:{parsed.port}"
+    path = parsed.path or "/"
+    if path != "/":
+        path = path.rstrip("/")
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not k.lower().startswith(_TRACKING_PARAMS)
+    ))
+    return urlunparse((scheme, host, path, "", query, ""))
+
+
+class SiteCrawler:
+    """Breadth-first site crawler over one pooled HTTP client.
+
+    Pages are fetched concurrently (at most `concurrency` in flight, and at
+    most `per_host_concurrency` per host) from a deque frontier of
+    (url, depth) pairs, deduplicated on normalize_url(). `crawl()` yields
+    each page dict as soon as it is fetched, so callers can chunk and embed
+    while the rest of the site is still downloading. Pages are yielded in
+    completion order, not BFS order.
+
+    With `respect_robots`, URLs disallowed by /robots.txt are skipped. With
+    `use_sitemap` and depth > 0, sitemap URLs (from robots.txt `Sitemap:`
+    lines, else /sitemap.xml) are seeded at depth 1 behind the start URL.
+
+    `validators` maps normalised URLs from a previous crawl to their stored
+    {"etag", "last_modified", "links"}. Those pages are requested
+    conditionally; a 304 is yielded as {"url", "not_modified": True} and the
+    stored links keep the BFS going. Pages answering 404/410 are yielded as
+    {"url", "gone": True} so callers can drop their content.
+    """
+
+    def __init__(
+        self,
+        max_pages: int = 1,
+        depth: int = 0,
+        concurrency: int = 8,
+        per_host_concurrency: int = 4,
+        timeout: int = 30,
+        links_per_page: int = 10,
+        respect_robots: bool = False,
+        use_sitemap: bool = False,
+        client: httpx.AsyncClient | None = None,
+        validators: dict[str, dict] | None = None,
+    ):
+        self.max_pages = max_pages
+        self.depth = depth
+        self.concurrency = max(1, concurrency)
+        self.per_host_concurrency = max(1, per_host_concurrency)
+        self.timeout = timeout
+        self.links_per_page = links_per_page
+        self.respect_robots = respect_robots
+        self.use_sitemap = use_sitemap
+        self._client = client
+        self.validators = validators or {}
+        self._host_limits: dict[str, asyncio.Semaphore] = {}
+        self._robots: dict[str, RobotFileParser | None] = {}
+
+    async def crawl(self, start_url: str) -> AsyncIterator[dict]:
+        if self._client is not None:
+            async for page in self._crawl(self._client, start_url):
+                yield page
+            return
+        async with httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+        ) as client:
+            async for page in self._crawl(client, start_url):
+                yield page
+
+    async def _crawl(self, client: httpx.AsyncClient, start_url: str) -> AsyncIterator[dict]:
+        frontier: deque[tuple[str, int]] = deque([(start_url, 0)])
+        seen = {normalize_url(start_url)}
+        if self.use_sitemap and self.depth > 0:
+            for url in await self._sitemap_urls(client, start_url):
+                key = normalize_url(url)
+                if key not in seen and _same_host(url, start_url):
+                    seen.add(key)
+                    frontier.append((url, 1))
+
+        scheduled = 0
+        in_flight: dict[asyncio.Task, int] = {}
+        try:
+            while frontier or in_flight:
+                while frontier and len(in_flight) < self.concurrency and scheduled < self.max_pages:
+                    url, depth = frontier.popleft()
+                    if not await self._allowed(client, url):
+                        continue
+                    scheduled += 1
+                    in_flight[asyncio.create_task(self._fetch(client, url))] = depth
+                if not in_flight:
+                    break
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    depth = in_flight.pop(task)
+                    page = task.result()
+                    if page is None:
+                        continue
+                    if depth < self.depth:
+                        for link in page["links"][:self.links_per_page]:
+                            key = normalize_url(link)
+                            if key not in seen:
+                                seen.add(key)
+                                frontier.append((link, depth + 1))
+                    yield page
+        finally:
+            for task in in_flight:
+                task.cancel()
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def _fetch(self, client: httpx.AsyncClient, url: str) -> dict | None:
+        host = urlparse(url).netloc.lower()
+        limit = self._host_limits.setdefault(host, asyncio.Semaphore(self.per_host_concurrency))
+        known = self.validators.get(normalize_url(url)) or {}
+        headers = {}
+        if known.get("etag"):
+            headers["If-None-Match"] = known["etag"]
+        if known.get("last_modified"):
+            headers["If-Modified-Since"] = known["last_modified"]
+        async with limit:
+            try:
+                page = await crawl_url(url, timeout=self.timeout, client=client, headers=headers or None)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code in (404, 410):
+                    return {"url": url, "gone": True, "links": []}
+                logger.warning("[CRAWLER] Error crawling %s: %s", url, e)
+                return None
+            except Exception as e:
+                logger.warning("[CRAWLER] Error crawling %s: %s", url, e)
+                return None
+        if page.get("not_modified"):
+            page["links"] = list(known.get("links") or [])
+        return page
+
+    async def _robots_for(self, client: httpx.AsyncClient, url: str) -> RobotFileParser | None:
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        if origin not in self._robots:
+            parser = None
+            try:
+                response = await client.get(f"{origin}/robots.txt")
+                if response.status_code == 200:
+                    parser = RobotFileParser()
+                    parser.parse(response.text.splitlines())
+            except httpx.HTTPError as e:
+                logger.info("[CRAWLER] robots.txt unavailable for %s: %s", origin, e)
+            self._robots[origin] = parser
+        return self._robots[origin]
+
+    async def _allowed(self, client: httpx.AsyncClient, url: str) -> bool:
+        if not self.respect_robots:
+            return True
+        parser = await self._robots_for(client, url)
+        return parser is None or parser.can_fetch("*", url)
+
+    async def _sitemap_urls(self, client: httpx.AsyncClient, start_url: str) -> list[str]:
+        parsed = urlparse(start_url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        parser = await self._robots_for(client, start_url)
+        sitemaps = (parser.site_maps() if parser else None) or [f"{origin}/sitemap.xml"]
+
+        urls: list[str] = []
+        # One level of sitemap index nesting is followed.
+        for sitemap in sitemaps[:5]:
+            for loc in await self._sitemap_locs(client, sitemap):
+                if loc.endswith(".xml"):
+                    urls.extend(await self._sitemap_locs(client, loc))
+                else:
+                    urls.append(loc)
+                if len(urls) >= self.max_pages:
+                    return urls[:self.max_pages]
+        return urls
+
+    async def _sitemap_locs(self, client: httpx.AsyncClient, sitemap_url: str) -> list[str]:
+        try:
+            response = await client.get(sitemap_url)
+            if response.status_code != 200:
+                return []
+        except httpx.HTTPError as e:
+            logger.info("[CRAWLER] sitemap unavailable at %s: %s", sitemap_url, e)
+            return []
+        return _SITEMAP_LOC_RE.findall(response.text)
+
+
+def _same_host(url: str, other: str) -> bool:
+    return urlparse(url).netloc.lower() == urlparse(other).netloc.lower()
 
 
 def extract_text_from_html(html: str) -> tuple[str, str]:
@@ -0,0 +1,183 @@
+"""
+Server-Sent Events encoding for the streaming query endpoints.
+
+- Frames are bytes (`data: <json>\\n\\n`). Token frames, the bulk of a
+  stream, are stitched from a pre-serialised prefix/suffix, so only the
+  token text goes through the JSON encoder.
+- JSON is encoded with orjson when it is installed, stdlib json (compact
+  separators) otherwise. Output is single-line either way, which is all the
+  widget's line-based parser needs.
+- `sse_stream()` sends at most one token frame per TOKEN_WINDOW_SECONDS:
+  a token after a quiet spell goes out at once, tokens arriving faster are
+  merged (up to TOKEN_MAX_CHARS) into the next frame. The widget appends each
+  token frame's `data`, so this is invisible to it but cuts frames, encodes
+  and socket writes on fast or bursty streams.
+- When nothing has been sent for KEEPALIVE_SECONDS (e.g. while the agent runs
+  a slow tool), a `: keep-alive` comment goes out so proxies don't time the
+  connection out. Clients ignore comment lines.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterable, AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+TOKEN_WINDOW_SECONDS = 0.025
+TOKEN_MAX_CHARS = 512
+KEEPALIVE_SECONDS = 15.0
+
+_TOKEN_PREFIX = b'data: {"type":"token","data":'
+_FRAME_SUFFIX = b"}\n\n"
+KEEPALIVE_FRAME = b": keep-alive\n\n"
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx-style proxies from buffering the stream.
+    "X-Accel-Buffering": "no",
+}
+
+
+def _now() -> float:
+    return time.monotonic()
+
+
+if orjson is not None:
+    def dumps(value) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+else:  # pragma: no cover
+    def dumps(value) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode()
+
+
+def encode_event(event: dict) -> bytes:
+    """One `data:` frame for an event dict."""
+    return b"data: " + dumps(event) + b"\n\n"
+
+
+def encode_token(text: str) -> bytes:
+    """A token frame, equivalent to encode_event({"type": "token", "data": text})."""
+    return _TOKEN_PREFIX + dumps(text) + _FRAME_SUFFIX
+
+
+async def sse_stream(
+    events: AsyncIterable[dict],
+    token_window: float = TOKEN_WINDOW_SECONDS,
+    token_max_chars: int = TOKEN_MAX_CHARS,
+    keepalive: float = KEEPALIVE_SECONDS,
+) -> AsyncIterator[bytes]:
+    """Encode `events` as SSE frames, coalescing tokens and adding keep-alives.
+
+    Events are pulled by a producer task so that a token window can close,
+    and a keep-alive go out, while the source is still waiting on the LLM.
+    Non-token events flush pending tokens first, so ordering is preserved.
+    """
+    loop = asyncio.get_running_loop()
+    buffer: list[dict] = []
+    # Future the consumer parks on while the buffer is empty; the producer
+    # or the keep-alive timer resolves it.
+    waiter: asyncio.Future | None = None
+    finished = False
+    error: BaseException | None = None
+    last_sent = _now()
+    keepalive_due = False
+
+    def wake() -> None:
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def keepalive_tick() -> None:
+        # One timer per stream, re-armed for `keepalive` after the last send,
+        # rather than a timer per wait.
+        nonlocal keepalive_due, timer
+        idle = _now() - last_sent
+        if idle >= keepalive:
+            keepalive_due = True
+            wake()
+            idle = 0.0
+        timer = loop.call_later(keepalive - idle, keepalive_tick)
+
+    async def produce() -> None:
+        nonlocal finished, error
+        try:
+            async for event in events:
+                buffer.append(event)
+                wake()
+        except Exception as e:
+            error = e
+        finally:
+            finished = True
+            wake()
+
+    producer = loop.create_task(produce())
+    timer = loop.call_later(keepalive, keepalive_tick)
+    pending: list[str] = []
+    pending_chars = 0
+    # Token frames go out at most once per window: a token arriving after a
+    # quiet spell is sent at once, tokens arriving faster are merged.
+    next_flush = 0.0
+    try:
+        while True:
+            if not buffer and not finished:
+                if pending and next_flush > _now():
+                    # Let more tokens land, then take all of them at once.
+                    await asyncio.sleep(next_flush - _now())
+                    continue
+                if not pending:
+                    waiter = loop.create_future()
+                    await waiter
+                    waiter = None
+                    if keepalive_due:
+                        keepalive_due = False
+                        if not buffer and not finished:
+                            last_sent = _now()
+                            yield KEEPALIVE_FRAME
+                    continue
+
+            drained = buffer[:]
+            buffer.clear()
+            out: list[bytes] = []
+            for event in drained:
+                if event.get("type") == "token":
+                    pending.append(event["data"])
+                    pending_chars += len(event["data"])
+                    if pending_chars < token_max_chars:
+                        continue
+                if pending:
+                    out.append(encode_token("".join(pending)))
+                    pending.clear()
+                    pending_chars = 0
+                if event.get("type") != "token":
+                    out.append(encode_event(event))
+            if pending and (finished or _now() >= next_flush):
+                out.append(encode_token("".join(pending)))
+                pending.clear()
+                pending_chars = 0
+            if out:
+                last_sent = _now()
+                next_flush = last_sent + token_window
+                yield b"".join(out)
+            if finished and not buffer and not pending:
+                break
+        if error is not None:
+            raise error
+    finally:
+        timer.cancel()
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except (asyncio.CancelledError, Exception):
+                pass
+
+
+def sse_response(events: AsyncIterable[dict]) -> StreamingResponse:
+    """StreamingResponse for an async iterable of event dicts."""
+    return StreamingResponse(sse_stream(events), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,34 @@
+"""
+Ingestion worker entrypoint.
+
+    python -m app.worker
+
+Runs the durable ingestion queue (app/services/ingestion_queue.py) outside
+the API process. Any number of workers can run against the same database;
+claims use FOR UPDATE SKIP LOCKED. SIGTERM/SIGINT stop claiming new tasks,
+give running ones a grace period, then hand the rest back to the queue.
+"""
+import asyncio
+import logging
+import signal
+
+from app.services.ingestion_queue import IngestionWorker
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] [%(name)s] %(message)s",
+)
+for _lib in ("httpx", "httpcore", "openai", "pinecone", "pinecone_plugin_interface"):
+    logging.getLogger(_lib).setLevel(logging.WARNING)
+
+
+async def main() -> None:
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
+    await IngestionWorker().run(stop_event)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
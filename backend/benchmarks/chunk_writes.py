@@ -0,0 +1,151 @@
+"""
+document_chunks write throughput: ORM objects vs. the bulk chunk writer.
+
+    cd backend
+    python -m benchmarks.chunk_writes                        # 20k chunks, batches of 1000
+    python -m benchmarks.chunk_writes --chunks 100000 --batch 2000
+    python -m benchmarks.chunk_writes --dsn postgresql+asyncpg://... --keep
+
+Creates a scratch schema (bench_chunks, dropped afterwards unless --keep) in
+the database in DATABASE_URL / --dsn, with a document_chunks table shaped
+like the real one: generated search_vector, GIN (customer_id,
+search_vector), and the vector_id / customer_id / job_id indexes. Foreign
+keys are left out. Sessions use search_path=bench_chunks, so the app's
+model and the writer land there. Imports the app's services, so the usual
+backend env (.env) must be set. Needs the btree_gin extension (created if
+missing).
+
+  orm      one DocumentChunk per chunk, db.add() + commit per batch (the
+           previous IngestionService._process_chunks)
+  insert   chunk_writer.write_chunks(method="insert"): multi-row INSERT
+  copy     chunk_writer.write_chunks(method="copy"): asyncpg binary COPY
+
+Every method commits once per batch, so the runs differ only in how rows
+are sent.
+
+Chunk text is synthetic, 120-220 words, about the size the chunker emits.
+Reports rows/s for each method, and the speed-up over orm.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.models import DocumentChunk
+from app.services.chunk_writer import chunk_row, write_chunks
+
+SCHEMA = "bench_chunks"
+
+SCHEMA_SQL = [
+    f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE",
+    f"CREATE SCHEMA {SCHEMA}",
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    f"""CREATE TABLE {SCHEMA}.document_chunks (
+        id uuid PRIMARY KEY, customer_id uuid NOT NULL, job_id uuid NOT NULL,
+        vector_id varchar(255) NOT NULL, chunk_index integer NOT NULL, content text NOT NULL,
+        content_preview varchar(500), source_url text, source_title varchar(255), token_count integer,
+        content_hash varchar(64),
+        search_vector tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
+        created_at timestamp)""",
+    f"CREATE INDEX ON {SCHEMA}.document_chunks (customer_id)",
+    f"CREATE INDEX ON {SCHEMA}.document_chunks (job_id)",
+    f"CREATE INDEX ON {SCHEMA}.document_chunks (vector_id)",
+    f"CREATE INDEX ON {SCHEMA}.document_chunks USING GIN (customer_id, search_vector)",
+]
+
+_WORDS = (
+    "delivery returns policy order shipping size colour refund store customer support warranty "
+    "exchange price discount account payment checkout express courier tracking hours contact "
+    "the a and for with our your this that is are be on in of to from at"
+).split()
+
+
+def make_chunks(count: int, rng: random.Random) -> list[dict]:
+    return [
+        {
+            "content": " ".join(rng.choice(_WORDS) for _ in range(rng.randint(120, 220))),
+            "chunk_index": i,
+            "source_url": f"https://shop.example/page/{i // 8}",
+            "source_title": f"Page {i // 8}",
+            "token_count": 200,
+        }
+        for i in range(count)
+    ]
+
+
+async def write_orm(session_maker, chunks: list[dict], batch: int) -> None:
+    customer_id, job_id = uuid.uuid4(), uuid.uuid4()
+    for start in range(0, len(chunks), batch):
+        async with session_maker() as db:
+            for chunk in chunks[start:start + batch]:
+                db.add(DocumentChunk(
+                    customer_id=customer_id, job_id=job_id, vector_id=f"{job_id}_{chunk['chunk_index']}",
+                    chunk_index=chunk["chunk_index"], content=chunk["content"],
+                    content_preview=chunk["content"][:500], source_url=chunk["source_url"],
+                    source_title=chunk["source_title"], token_count=chunk["token_count"], content_hash="x" * 64,
+                ))
+            await db.commit()
+
+
+async def write_bulk(session_maker, chunks: list[dict], batch: int, method: str) -> None:
+    customer_id, job_id = uuid.uuid4(), uuid.uuid4()
+    rows = [
+        chunk_row(customer_id, job_id, f"{job_id}_{chunk['chunk_index']}", chunk, "x" * 64) for chunk in chunks
+    ]
+    async with session_maker() as db:
+        for start in range(0, len(rows), batch):
+            await write_chunks(db, rows[start:start + batch], method=method, batch_size=batch)
+            await db.commit()
+
+
+async def _main(args) -> None:
+    if args.dsn:
+        dsn = args.dsn
+    else:
+        from app.config import get_settings
+        dsn = get_settings().database_url
+    admin = create_async_engine(dsn)
+    engine = create_async_engine(dsn, connect_args={"server_settings": {"search_path": f"{SCHEMA},public"}})
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    chunks = make_chunks(args.chunks, random.Random(args.seed))
+    try:
+        async with admin.begin() as conn:
+            for statement in SCHEMA_SQL:
+                await conn.execute(text(statement))
+        print(f"{args.chunks} chunks, batch {args.batch}")
+        rates = {}
+        for method in ("orm", "insert", "copy"):
+            started = time.perf_counter()
+            if method == "orm":
+                await write_orm(session_maker, chunks, args.batch)
+            else:
+                await write_bulk(session_maker, chunks, args.batch, method)
+            rates[method] = args.chunks / (time.perf_counter() - started)
+            print(f"{method:<7} {rates[method]:9.0f} rows/s   x{rates[method] / rates['orm']:5.2f} vs orm")
+    finally:
+        if not args.keep:
+            async with admin.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+        await admin.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", help="SQLAlchemy async URL (default: DATABASE_URL)")
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=1000, help="rows per commit (CHUNK_WRITE_BATCH_SIZE)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="keep the bench_chunks schema")
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Chunking throughput: single-pass chunker vs. the previous implementation.
+
+    cd backend
+    python -m benchmarks.chunking_throughput                # 20 MB synthetic corpus
+    python -m benchmarks.chunking_throughput --corpus ./dumps --mb 200
+
+--corpus reads every *.txt / *.md file under a directory (recursively) until
+--mb megabytes are collected; otherwise a synthetic web-page-like corpus is
+generated. Reports MB/s and chunks produced for:
+
+  legacy   count_tokens() building an encoder per call, per paragraph,
+           sentence, overlap and final chunk (the pre-rewrite chunk_text)
+  single   chunk_text(): cached encoder, one encode per document
+  batch    chunk_texts(): one threaded encode_ordinary_batch call
+
+Needs the cl100k_base vocabulary (downloaded by tiktoken on first use, or
+TIKTOKEN_CACHE_DIR). --byte-level swaps in a one-token-per-byte encoder for
+offline smoke runs; its numbers are not representative.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import time
+from pathlib import Path
+
+import tiktoken
+
+from app.utils import chunking
+
+_WORDS = (
+    "delivery returns policy order shipping product size colour cotton refund store "
+    "customer support warranty exchange price discount account payment checkout "
+    "kathmandu express courier tracking business hours contact email phone"
+).split()
+
+
+def synthetic_corpus(megabytes: float, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    docs, size, target = [], 0, int(megabytes * 1024 * 1024)
+    while size < target:
+        paragraphs = []
+        for _ in range(rng.randint(5, 40)):
+            sentences = [
+                " ".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 25))).capitalize() + "."
+                for _ in range(rng.randint(1, 12))
+            ]
+            paragraphs.append(" ".join(sentences))
+        doc = "\n\n".join(paragraphs)
+        docs.append(doc)
+        size += len(doc.encode("utf-8"))
+    return docs
+
+
+def file_corpus(root: Path, megabytes: float) -> list[str]:
+    docs, size, target = [], 0, int(megabytes * 1024 * 1024)
+    for path in sorted(root.rglob("*")):
+        if path.suffix not in (".txt", ".md") or not path.is_file():
+            continue
+        doc = path.read_text(errors="ignore")
+        docs.append(doc)
+        size += len(doc.encode("utf-8"))
+        if size >= target:
+            break
+    return docs
+
+
+# --- previous implementation, kept verbatim for comparison ---
+
+def _legacy_count_tokens(text: str, model: str = "gpt-4") -> int:
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return len(encoding.encode(text))
+
+
+def _legacy_overlap(chunks: list[str], overlap_tokens: int) -> str:
+    if not chunks:
+        return ""
+    last_text = chunks[-1]
+    char_limit = overlap_tokens * 4
+    if len(last_text) <= char_limit:
+        return last_text
+    return "..." + last_text[-char_limit:]
+
+
+def legacy_chunk_text(text: str, chunk_size: int = 500, chunk_overlap: int = 50, model: str = "gpt-4") -> list[dict]:
+    if not text or not text.strip():
+        return []
+    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
+    chunks, current_chunk, current_tokens, chunk_index = [], [], 0, 0
+    for para in paragraphs:
+        para_tokens = _legacy_count_tokens(para, model)
+        if para_tokens > chunk_size:
+            sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', para) if s.strip()]
+            for sentence in sentences:
+                sentence_tokens = _legacy_count_tokens(sentence, model)
+                if current_tokens + sentence_tokens > chunk_size and current_chunk:
+                    chunks.append({"content": " ".join(current_chunk), "token_count": current_tokens,
+                                   "chunk_index": chunk_index})
+                    chunk_index += 1
+                    overlap_text = _legacy_overlap(current_chunk, chunk_overlap)
+                    current_chunk = [overlap_text] if overlap_text else []
+                    current_tokens = _legacy_count_tokens(overlap_text, model) if overlap_text else 0
+                current_chunk.append(sentence)
+                current_tokens += sentence_tokens
+        else:
+            if current_tokens + para_tokens > chunk_size and current_chunk:
+                chunks.append({"content": "\n\n".join(current_chunk), "token_count": current_tokens,
+                               "chunk_index": chunk_index})
+                chunk_index += 1
+                overlap_text = _legacy_overlap(current_chunk, chunk_overlap)
+                current_chunk = [overlap_text] if overlap_text else []
+                current_tokens = _legacy_count_tokens(overlap_text, model) if overlap_text else 0
+            current_chunk.append(para)
+            current_tokens += para_tokens
+    if current_chunk:
+        final = "\n\n".join(current_chunk)
+        chunks.append({"content": final, "token_count": _legacy_count_tokens(final, model),
+                       "chunk_index": chunk_index})
+    return chunks
+
+
+def _run(label: str, fn, docs: list[str], megabytes: float) -> None:
+    started = time.perf_counter()
+    produced = fn(docs)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<8} {elapsed:8.2f}s {megabytes / elapsed:8.2f} MB/s {produced:>9} chunks")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=20.0, help="corpus size in megabytes")
+    parser.add_argument("--corpus", type=Path, help="directory of .txt/.md files (default: synthetic)")
+    parser.add_argument("--skip-legacy", action="store_true", help="legacy is slow on large corpora")
+    parser.add_argument("--byte-level", action="store_true", help="offline smoke run with a byte-level encoder")
+    args = parser.parse_args()
+
+    if args.byte_level:
+        byte_encoding = tiktoken.Encoding(
+            name="bytes", pat_str=r"\s+|\S+",
+            mergeable_ranks={bytes([i]): i for i in range(256)}, special_tokens={},
+        )
+        chunking.get_encoding = lambda model="gpt-4": byte_encoding
+        tiktoken.encoding_for_model = lambda model: byte_encoding
+
+    docs = file_corpus(args.corpus, args.mb) if args.corpus else synthetic_corpus(args.mb)
+    megabytes = sum(len(d.encode("utf-8")) for d in docs) / (1024 * 1024)
+    print(f"corpus: {len(docs)} documents, {megabytes:.1f} MB")
+
+    if not args.skip_legacy:
+        _run("legacy", lambda ds: sum(len(legacy_chunk_text(d)) for d in ds), docs, megabytes)
+    _run("single", lambda ds: sum(len(chunking.chunk_text(d)) for d in ds), docs, megabytes)
+    _run("batch", lambda ds: sum(len(c) for c in chunking.chunk_texts(ds)), docs, megabytes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Ingestion embedding throughput: serial 100-item batches vs. EmbeddingPipeline.
+
+    cd backend
+    python -m benchmarks.embedding_pipeline                    # 5000 chunks
+    python -m benchmarks.embedding_pipeline --chunks 20000 --concurrency 8
+    python -m benchmarks.embedding_pipeline --rpm 300 --tpm 400000
+
+No network: a fake embeddings service sleeps --latency seconds plus
+--per-ktoken seconds per 1000 input tokens for each request, and answers
+429 (with Retry-After: 1) whenever the last minute's requests or tokens
+exceed --rpm / --tpm. `store` sleeps --store seconds per 100 chunks,
+standing in for the vector upsert and chunk write. Imports the app's
+services, so the usual backend env (.env) must be set.
+
+  serial    the previous IngestionService._process_chunks: 100 chunks per
+            request, one after another, then every upsert
+  pipeline  EmbeddingPipeline with token-sized batches, EMBEDDING_CONCURRENCY
+            requests in flight, a limiter at --rpm / --tpm and stores
+            overlapped with the embedding
+
+Chunk token counts are synthetic, 150-450 tokens. Reports chunks/s, 429s
+and retries for each.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import random
+import time
+
+import httpx
+import openai
+
+from app.services import embedding_pipeline
+from app.services.embedding_pipeline import EmbeddingPipeline, EmbeddingRateLimiter
+
+
+class FakeEmbeddingService:
+    def __init__(self, args):
+        self.args = args
+        self.window = collections.deque()  # (sent_at, tokens) over the last minute
+        self.tokens = {}
+        self.rejected = 0
+
+    async def create_embeddings(self, texts, use_cache=True):
+        now = time.monotonic()
+        while self.window and now - self.window[0][0] > 60:
+            self.window.popleft()
+        tokens = sum(self.tokens[t] for t in texts)
+        if len(self.window) >= self.args.rpm or sum(t for _, t in self.window) + tokens > self.args.tpm:
+            self.rejected += 1
+            request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+            response = httpx.Response(429, request=request, headers={"retry-after": "1"})
+            raise openai.RateLimitError("rate limited", response=response, body=None)
+        self.window.append((now, tokens))
+        await asyncio.sleep(self.args.latency + self.args.per_ktoken * tokens / 1000)
+        return [[0.0] for _ in texts]
+
+
+async def run_serial(service, texts, store_seconds) -> None:
+    embeddings = []
+    for start in range(0, len(texts), 100):
+        embeddings.extend(await service.create_embeddings(texts[start:start + 100], use_cache=False))
+    await asyncio.sleep(store_seconds * len(texts) / 100)
+
+
+async def run_pipeline(service, texts, counts, args):
+    async def store(start, end, batch):
+        await asyncio.sleep(args.store * (end - start) / 100)
+
+    limiter = EmbeddingRateLimiter(args.tpm, args.rpm)
+    return await EmbeddingPipeline(service, limiter).run(texts, store, counts)
+
+
+async def _main(args) -> None:
+    embedding_pipeline.settings.embedding_concurrency = args.concurrency
+    rng = random.Random(args.seed)
+    texts = [f"chunk {i}" for i in range(args.chunks)]
+    counts = [rng.randint(150, 450) for _ in texts]
+    print(f"{args.chunks} chunks, {sum(counts)} tokens, rpm {args.rpm}, tpm {args.tpm}")
+
+    service = FakeEmbeddingService(args)
+    service.tokens = dict(zip(texts, counts))
+    started = time.perf_counter()
+    await run_serial(service, texts, args.store)
+    serial = args.chunks / (time.perf_counter() - started)
+    print(f"serial   {serial:8.0f} chunks/s   429s {service.rejected}")
+
+    service = FakeEmbeddingService(args)
+    service.tokens = dict(zip(texts, counts))
+    stats = await run_pipeline(service, texts, counts, args)
+    print(
+        f"pipeline {stats.chunks_per_second:8.0f} chunks/s   429s {service.rejected}   "
+        f"requests {stats.requests}, retries {stats.retries}   x{stats.chunks_per_second / serial:5.2f} vs serial"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=4, help="EMBEDDING_CONCURRENCY")
+    parser.add_argument("--rpm", type=int, default=3000, help="requests per minute (EMBEDDING_RPM_LIMIT)")
+    parser.add_argument("--tpm", type=int, default=1_000_000, help="tokens per minute (EMBEDDING_TPM_LIMIT)")
+    parser.add_argument("--latency", type=float, default=0.25, help="seconds per request")
+    parser.add_argument("--per-ktoken", type=float, default=0.01, help="extra seconds per 1000 tokens")
+    parser.add_argument("--store", type=float, default=0.05, help="store seconds per 100 chunks")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
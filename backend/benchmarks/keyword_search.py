@@ -0,0 +1,218 @@
+"""
+Keyword search: tenant-scoped index + generated search_vector vs. the
+previous all-tenant index + post-insert UPDATE.
+
+    cd backend
+    python -m benchmarks.keyword_search                          # 200 tenants, 200k chunks
+    python -m benchmarks.keyword_search --tenants 1000 --chunks 1000000 --queries 2000
+    python -m benchmarks.keyword_search --dsn postgresql+asyncpg://... --keep
+
+Builds a synthetic multi-tenant corpus in a scratch schema (bench_keyword,
+dropped afterwards unless --keep) of the database in DATABASE_URL / --dsn.
+Tenant sizes are Zipf-skewed, so a few large tenants hold most chunks, and
+every tenant shares a common vocabulary plus its own product words. Needs
+CREATE on the database and the btree_gin extension (created if missing).
+
+  legacy   search_vector filled by UPDATE after each insert batch; GIN index
+           on search_vector alone; plainto_tsquery parsed twice; every match
+           ranked
+  scoped   generated search_vector; GIN index on (customer_id,
+           search_vector); websearch_to_tsquery parsed once; every match
+           ranked (QueryService._keyword_search)
+
+Reports load rows/s and keyword query latency (p50 / p95 / mean), split into
+queries against the largest tenants (top 1%) and the rest.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+SCHEMA = "bench_keyword"
+
+_COMMON = (
+    "delivery returns policy order shipping size colour refund store customer support warranty "
+    "exchange price discount account payment checkout express courier tracking hours contact"
+).split()
+_FILLER = "the a and for with our your this that is are be on in of to from at".split()
+
+LEGACY_SQL = f"""
+    SELECT vector_id,
+           ts_rank(search_vector, plainto_tsquery('english', :query)) AS rank
+    FROM {SCHEMA}.chunks_legacy
+    WHERE customer_id = :customer_id
+      AND search_vector @@ plainto_tsquery('english', :query)
+    ORDER BY rank DESC
+    LIMIT :limit
+"""
+
+SCOPED_SQL = f"""
+    WITH q AS (SELECT websearch_to_tsquery('english', :query) AS query)
+    SELECT dc.vector_id, ts_rank(dc.search_vector, q.query) AS rank
+    FROM {SCHEMA}.chunks_scoped dc, q
+    WHERE dc.customer_id = :customer_id
+      AND dc.search_vector @@ q.query
+    ORDER BY rank DESC
+    LIMIT :limit
+"""
+
+SCHEMA_SQL = [
+    f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE",
+    f"CREATE SCHEMA {SCHEMA}",
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    f"""CREATE TABLE {SCHEMA}.chunks_legacy (
+        id uuid PRIMARY KEY, customer_id uuid NOT NULL, vector_id text NOT NULL,
+        content text NOT NULL, search_vector tsvector)""",
+    f"CREATE INDEX ON {SCHEMA}.chunks_legacy (customer_id)",
+    f"CREATE INDEX ON {SCHEMA}.chunks_legacy USING GIN (search_vector)",
+    f"""CREATE TABLE {SCHEMA}.chunks_scoped (
+        id uuid PRIMARY KEY, customer_id uuid NOT NULL, vector_id text NOT NULL,
+        content text NOT NULL,
+        search_vector tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED)""",
+    f"CREATE INDEX ON {SCHEMA}.chunks_scoped (customer_id)",
+    f"CREATE INDEX ON {SCHEMA}.chunks_scoped USING GIN (customer_id, search_vector)",
+]
+
+
+def tenant_sizes(tenants: int, chunks: int, rng: random.Random) -> list[int]:
+    weights = [1 / (rank + 1) for rank in range(tenants)]
+    total = sum(weights)
+    sizes = [max(1, int(chunks * w / total)) for w in weights]
+    rng.shuffle(sizes)
+    return sizes
+
+
+def tenant_corpus(size: int, rng: random.Random) -> tuple[list[str], list[str]]:
+    own = [f"{rng.choice(_COMMON)}{rng.randint(0, 999)}" for _ in range(40)]
+    vocabulary = _COMMON + own
+    docs = [
+        " ".join(rng.choice(vocabulary if rng.random() < 0.6 else _FILLER) for _ in range(rng.randint(60, 160)))
+        for _ in range(size)
+    ]
+    return docs, own
+
+
+async def load(engine, sizes: list[int], rng: random.Random, batch: int) -> tuple[list[tuple], float, float]:
+    """Insert the corpus into both tables. Returns (tenants, legacy rows/s, scoped rows/s)."""
+    tenants = []
+    legacy_s = scoped_s = 0.0
+    for size in sizes:
+        customer_id = uuid.uuid4()
+        docs, own = tenant_corpus(size, rng)
+        tenants.append((customer_id, size, own))
+        for start in range(0, len(docs), batch):
+            rows = [
+                {"id": uuid.uuid4(), "customer_id": customer_id, "vector_id": f"{customer_id}_{start + i}",
+                 "content": doc}
+                for i, doc in enumerate(docs[start:start + batch])
+            ]
+            started = time.perf_counter()
+            async with engine.begin() as conn:
+                await conn.execute(text(
+                    f"INSERT INTO {SCHEMA}.chunks_legacy (id, customer_id, vector_id, content) "
+                    "VALUES (:id, :customer_id, :vector_id, :content)"
+                ), rows)
+                await conn.execute(text(
+                    f"UPDATE {SCHEMA}.chunks_legacy SET search_vector = to_tsvector('english', content) "
+                    "WHERE vector_id = ANY(:vector_ids) AND search_vector IS NULL"
+                ), {"vector_ids": [r["vector_id"] for r in rows]})
+            legacy_s += time.perf_counter() - started
+
+            started = time.perf_counter()
+            async with engine.begin() as conn:
+                await conn.execute(text(
+                    f"INSERT INTO {SCHEMA}.chunks_scoped (id, customer_id, vector_id, content) "
+                    "VALUES (:id, :customer_id, :vector_id, :content)"
+                ), rows)
+            scoped_s += time.perf_counter() - started
+    total = sum(sizes)
+    return tenants, total / legacy_s, total / scoped_s
+
+
+def make_queries(tenants: list[tuple], count: int, rng: random.Random) -> list[tuple]:
+    queries = []
+    for _ in range(count):
+        customer_id, size, own = rng.choice(tenants)
+        words = rng.sample(_COMMON, rng.randint(1, 2)) + ([rng.choice(own)] if rng.random() < 0.5 else [])
+        queries.append((customer_id, size, " ".join(words)))
+    return queries
+
+
+async def run_queries(engine, sql: str, queries: list[tuple]) -> list[float]:
+    latencies = []
+    async with engine.connect() as conn:
+        for customer_id, _, question in queries:
+            started = time.perf_counter()
+            await conn.execute(text(sql), {"query": question, "customer_id": customer_id, "limit": 8})
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def _summary(latencies: list[float]) -> str:
+    if not latencies:
+        return "n/a"
+    ordered = sorted(latencies)
+    p50 = ordered[len(ordered) // 2]
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {p50 * 1000:7.2f} ms  p95 {p95 * 1000:7.2f} ms  mean {statistics.fmean(ordered) * 1000:7.2f} ms"
+
+
+async def _main(args) -> None:
+    if args.dsn:
+        dsn = args.dsn
+    else:
+        from app.config import get_settings
+        dsn = get_settings().database_url
+    engine = create_async_engine(dsn)
+    rng = random.Random(args.seed)
+    try:
+        async with engine.begin() as conn:
+            for statement in SCHEMA_SQL:
+                await conn.execute(text(statement))
+        sizes = tenant_sizes(args.tenants, args.chunks, rng)
+        tenants, legacy_rate, scoped_rate = await load(engine, sizes, rng, args.batch)
+        async with engine.begin() as conn:
+            await conn.execute(text(f"ANALYZE {SCHEMA}.chunks_legacy"))
+            await conn.execute(text(f"ANALYZE {SCHEMA}.chunks_scoped"))
+        print(f"{args.tenants} tenants, {sum(sizes)} chunks (largest tenant {max(sizes)})")
+        print(f"load     legacy {legacy_rate:9.0f} rows/s   scoped {scoped_rate:9.0f} rows/s")
+
+        queries = make_queries(tenants, args.queries, rng)
+        large_cut = sorted(sizes, reverse=True)[max(0, len(sizes) // 100 - 1)]
+        for label, sql in (("legacy", LEGACY_SQL), ("scoped", SCOPED_SQL)):
+            await run_queries(engine, sql, queries[:20])  # warm the cache
+            latencies = await run_queries(engine, sql, queries)
+            large = [t for t, q in zip(latencies, queries) if q[1] >= large_cut]
+            rest = [t for t, q in zip(latencies, queries) if q[1] < large_cut]
+            print(f"{label:<8} all    {_summary(latencies)}")
+            print(f"{'':<8} large  {_summary(large)}")
+            print(f"{'':<8} rest   {_summary(rest)}")
+    finally:
+        if not args.keep:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", help="SQLAlchemy async URL (default: DATABASE_URL)")
+    parser.add_argument("--tenants", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=200_000, help="total chunks across tenants")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=1000, help="rows per insert transaction")
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="keep the bench_keyword schema")
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Reranking: local lexical reranker vs. the LLM reranker.
+
+    cd backend
+    python -m benchmarks.rerank_agreement                         # 500 synthetic cases, local only
+    python -m benchmarks.rerank_agreement --cases captured.jsonl  # recorded traffic
+    python -m benchmarks.rerank_agreement --llm --limit 50        # live LLM rerank for comparison
+
+Each case is one ambiguous-band query: a question and its fused candidates
+(8 by default). --cases reads JSON lines of
+
+    {"question": "...", "chunks": [{"content": "...", "vector_score": 0.41}, ...],
+     "relevant": [2], "llm_ranking": [2, 0, 5, ...]}
+
+where `relevant` (labelled answer chunks) and `llm_ranking` (a recorded
+LLMService.rerank_chunks order, 0-based) are optional. --llm fills missing
+LLM rankings by calling the configured provider (one chat completion per
+case). Synthetic cases plant one passage that answers the question among
+distractors that share some of its terms, with vector scores drawn from the
+0.30-0.50 ambiguous band for all of them.
+
+Imports the app's services, so the usual backend env (.env) must be set.
+
+Reports per ranker (fusion = the order the reranker receives):
+
+  hit@1     top candidate is a labelled answer chunk
+  mrr       mean reciprocal rank of the first labelled chunk
+  latency   per-query p50 / p95 / max
+
+and, where LLM rankings exist, local-vs-LLM agreement: same top-1, overlap of
+the top --top-n, and mean Kendall tau over the full order.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+
+from app.services.reranker import LexicalReranker
+
+_TOPICS = [
+    ("What are the delivery charges?", "Delivery charges are Rs 150 inside the valley and free on orders over Rs 2000."),
+    ("How do I return an item?", "To return an item, open your order, choose Return and our courier collects it within 3 days."),
+    ("Do you ship internationally?", "We ship internationally to India, the UK and the US; international shipping takes 7-10 days."),
+    ("What sizes do the jackets come in?", "Our jackets come in sizes S, M, L and XL; check the size chart on each product page."),
+    ("What payment methods do you accept?", "We accept eSewa, Khalti, card payment and cash on delivery as payment methods."),
+    ("What are your store opening hours?", "The store is open 10am to 7pm, Sunday to Friday; opening hours differ on holidays."),
+    ("Can I exchange a product for a different colour?", "You can exchange a product for a different colour or size within 7 days of delivery."),
+    ("How long does the warranty last?", "The warranty on electronics lasts 12 months from purchase and covers manufacturing defects."),
+    ("Is cash on delivery available?", "Cash on delivery is available for orders under Rs 10000 within Kathmandu."),
+    ("How can I track my order?", "Track your order from the link in your confirmation SMS or under My Orders in your account."),
+]
+
+_FILLER = (
+    "our team customers love the new collection this season we work with local artisans "
+    "every product is checked before it leaves the warehouse follow us for updates and offers"
+).split()
+
+
+def synthetic_cases(count: int, candidates: int, seed: int = 11) -> list[dict]:
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(count):
+        question, answer = rng.choice(_TOPICS)
+        terms = [w.strip("?").lower() for w in question.split() if len(w) > 3]
+        chunks = []
+        for _ in range(candidates - 1):
+            # Distractors: another topic's passage, sometimes padded with
+            # this question's terms scattered among filler.
+            _, other = rng.choice([t for t in _TOPICS if t[1] != answer])
+            words = other.split() + rng.sample(_FILLER, 12)
+            for term in rng.sample(terms, k=min(len(terms), rng.randint(0, 2))):
+                words.insert(rng.randrange(len(words)), term)
+            chunks.append({"content": " ".join(words), "vector_score": rng.uniform(0.30, 0.50)})
+        relevant = rng.randrange(candidates)
+        padded = " ".join(rng.sample(_FILLER, 6)) + ". " + answer + " " + " ".join(rng.sample(_FILLER, 6)) + "."
+        chunks.insert(relevant, {"content": padded, "vector_score": rng.uniform(0.30, 0.50)})
+        cases.append({"question": question, "chunks": chunks, "relevant": [relevant]})
+    return cases
+
+
+def load_cases(path: Path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def _kendall_tau(a: list[int], b: list[int]) -> float:
+    pos = {item: i for i, item in enumerate(b)}
+    items = [i for i in a if i in pos]
+    n = len(items)
+    if n < 2:
+        return 1.0
+    concordant = discordant = 0
+    for i in range(n):
+        for j in range(i + 1, n):
+            if pos[items[i]] < pos[items[j]]:
+                concordant += 1
+            else:
+                discordant += 1
+    return (concordant - discordant) / (n * (n - 1) / 2)
+
+
+def _quality(rankings: list[list[int]], cases: list[dict]) -> tuple[float, float] | None:
+    labelled = [(r, set(c["relevant"])) for r, c in zip(rankings, cases) if c.get("relevant")]
+    if not labelled:
+        return None
+    hits = sum(1 for r, rel in labelled if r[0] in rel)
+    mrr = statistics.fmean(
+        next((1 / (i + 1) for i, idx in enumerate(r) if idx in rel), 0.0) for r, rel in labelled
+    )
+    return hits / len(labelled), mrr
+
+
+def rank_local(reranker: LexicalReranker, case: dict) -> list[int]:
+    chunks = [dict(chunk, _idx=i) for i, chunk in enumerate(case["chunks"])]
+    ranked, _ = reranker.rerank(case["question"], chunks)
+    return [c["_idx"] for c in ranked]
+
+
+async def rank_llm(cases: list[dict]) -> list[float]:
+    """Fill missing llm_ranking in place; returns per-call latencies."""
+    from app.services.llm import get_llm_service
+
+    llm = get_llm_service()
+    latencies = []
+    for case in cases:
+        if case.get("llm_ranking"):
+            continue
+        chunks = [dict(chunk, _idx=i) for i, chunk in enumerate(case["chunks"])]
+        started = time.perf_counter()
+        ranked = await llm.rerank_chunks(question=case["question"], chunks=chunks, top_n=len(chunks))
+        latencies.append(time.perf_counter() - started)
+        case["llm_ranking"] = [c["_idx"] for c in ranked]
+    return latencies
+
+
+def _report(label: str, rankings: list[list[int]], cases: list[dict], latencies: list[float]) -> None:
+    quality = _quality(rankings, cases)
+    quality_text = f"hit@1 {quality[0]:6.1%}  mrr {quality[1]:.3f}" if quality else "hit@1    n/a  mrr   n/a"
+    if latencies:
+        latency_text = (
+            f"p50 {_percentile(latencies, 0.5) * 1000:8.3f} ms  p95 {_percentile(latencies, 0.95) * 1000:8.3f} ms  "
+            f"max {max(latencies) * 1000:8.3f} ms"
+        )
+    else:
+        latency_text = "latency n/a (recorded)"
+    print(f"{label:<7} {quality_text}  {latency_text}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=Path, help="JSON-lines cases (default: synthetic)")
+    parser.add_argument("--count", type=int, default=500, help="synthetic cases")
+    parser.add_argument("--candidates", type=int, default=8, help="candidates per synthetic case")
+    parser.add_argument("--limit", type=int, help="use only the first N cases")
+    parser.add_argument("--top-n", type=int, default=5, help="top-n for overlap agreement")
+    parser.add_argument("--llm", action="store_true", help="call the LLM reranker for cases without llm_ranking")
+    args = parser.parse_args()
+
+    cases = load_cases(args.cases) if args.cases else synthetic_cases(args.count, args.candidates)
+    if args.limit:
+        cases = cases[:args.limit]
+    reranker = LexicalReranker()
+    print(
+        f"{len(cases)} cases, weights bm25={reranker.bm25_weight} proximity={reranker.proximity_weight} "
+        f"vector={reranker.vector_weight}"
+    )
+
+    fusion = [list(range(len(c["chunks"]))) for c in cases]
+    _report("fusion", fusion, cases, [])
+
+    local, local_latencies = [], []
+    for case in cases:
+        started = time.perf_counter()
+        local.append(rank_local(reranker, case))
+        local_latencies.append(time.perf_counter() - started)
+    _report("local", local, cases, local_latencies)
+
+    llm_latencies = asyncio.run(rank_llm(cases)) if args.llm else []
+    paired = [(ours, c["llm_ranking"]) for ours, c in zip(local, cases) if c.get("llm_ranking")]
+    if not paired:
+        print("no LLM rankings (pass --llm or record llm_ranking in --cases) — agreement skipped")
+        return
+    _report("llm", [c["llm_ranking"] for c in cases if c.get("llm_ranking")],
+            [c for c in cases if c.get("llm_ranking")], llm_latencies)
+    top1 = sum(1 for ours, theirs in paired if ours[0] == theirs[0]) / len(paired)
+    overlap = statistics.fmean(
+        len(set(ours[:args.top_n]) & set(theirs[:args.top_n])) / args.top_n for ours, theirs in paired
+    )
+    tau = statistics.fmean(_kendall_tau(ours, theirs) for ours, theirs in paired)
+    print(f"agreement over {len(paired)} cases: top-1 {top1:6.1%}  overlap@{args.top_n} {overlap:6.1%}  kendall tau {tau:+.3f}")
+
+
+if __name__ == "__main__":
+    main()
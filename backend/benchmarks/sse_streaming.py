@@ -0,0 +1,163 @@
+"""
+SSE streaming: coalescing byte encoder vs. the previous per-token frames.
+
+    cd backend
+    python -m benchmarks.sse_streaming                       # 200 streams x 300 tokens, 40 tok/s
+    python -m benchmarks.sse_streaming --streams 500 --rate 80
+    python -m benchmarks.sse_streaming --rate 0              # tokens back to back: encode cost only
+
+Each stream is a fake LLM emitting --tokens short tokens at --rate tokens/s
+(0 = no delay), then a `done` event with suggestions and sources. Streams run
+concurrently on one event loop, each served through the endpoint's real
+response path (StreamingResponse behind CorrelationMiddleware, a
+BaseHTTPMiddleware that relays each body chunk), with every body message
+written to a real socket so each frame costs a send() syscall.
+Reports per mode:
+
+  legacy   f"data: {json.dumps(event)}\\n\\n" per event, one frame per token
+  sse      app.utils.sse.sse_stream: orjson, pre-serialised token frames,
+           tokens coalesced per TOKEN_WINDOW_SECONDS
+
+Imports the app's middleware, so the usual backend env (.env) must be set.
+
+frames   body messages handed to the server (≈ send syscalls)
+frames/s frames per wall-clock second across all streams
+cpu      process CPU time per stream, which includes the shared fake
+         producers, so compare the difference between modes, not the absolute
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+from app.middleware.correlation import CorrelationMiddleware
+from app.utils import sse
+
+_WORDS = "your order ships within two business days from our kathmandu store and returns are free".split()
+
+
+async def fake_llm(tokens: int, rate: float, seed: int):
+    rng = random.Random(seed)
+    delay = 1.0 / rate if rate else 0.0
+    answer = []
+    for _ in range(tokens):
+        token = " " + rng.choice(_WORDS)
+        answer.append(token)
+        yield {"type": "token", "data": token}
+        if delay:
+            await asyncio.sleep(delay * rng.uniform(0.5, 1.5))
+    yield {
+        "type": "done",
+        "answer": "".join(answer),
+        "suggestions": ["Track my order", "Return policy"],
+        "sources": [{"title": "Shipping", "url": "https://example.test/shipping"}],
+        "session_id": f"sess-{seed}",
+    }
+
+
+# --- previous implementation: the query endpoint's generator, kept for comparison ---
+
+async def legacy_stream(events):
+    async for event in events:
+        yield f"data: {json.dumps(event)}\n\n"
+
+
+def _sink() -> socket.socket:
+    """A socket whose peer is drained by a thread, so every frame costs a real send()."""
+    writer, reader = socket.socketpair()
+
+    def discard() -> None:
+        while reader.recv(1 << 16):
+            pass
+
+    threading.Thread(target=discard, daemon=True).start()
+    return writer
+
+
+def build_app(mode: str, tokens: int, rate: float) -> Starlette:
+    """The endpoint's response path: StreamingResponse behind the app's
+    BaseHTTPMiddleware (CorrelationMiddleware), which relays every body chunk."""
+
+    async def endpoint(request):
+        events = fake_llm(tokens, rate, int(request.query_params["seed"]))
+        if mode == "legacy":
+            return StreamingResponse(legacy_stream(events), media_type="text/event-stream")
+        return sse.sse_response(events)
+
+    app = Starlette(routes=[Route("/stream", endpoint)])
+    app.add_middleware(CorrelationMiddleware)
+    return app
+
+
+async def _request(app, seed: int, sink: socket.socket) -> tuple[int, int]:
+    frames = sent = 0
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/stream", "raw_path": b"/stream", "root_path": "",
+        "query_string": f"seed={seed}".encode(), "headers": [], "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+    disconnect = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal frames, sent
+        if message["type"] == "http.response.body" and message.get("body"):
+            sink.sendall(message["body"])
+            frames += 1
+            sent += len(message["body"])
+
+    await app(scope, receive, send)
+    disconnect.set()
+    return frames, sent
+
+
+async def _run(label: str, streams: int, tokens: int, rate: float) -> None:
+    app = build_app(label, tokens, rate)
+    sink = _sink()
+    wall, cpu = time.perf_counter(), time.process_time()
+    results = await asyncio.gather(*(_request(app, seed, sink) for seed in range(streams)))
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    sink.close()
+    frames = sum(f for f, _ in results)
+    sent = sum(b for _, b in results)
+    print(
+        f"{label:<7} {frames:>9} frames {frames / wall:>11.0f} frames/s "
+        f"{cpu / streams * 1000:>8.2f} ms cpu/stream {sent / streams / 1024:>7.1f} KiB/stream {wall:6.2f}s wall"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=200, help="concurrent streams")
+    parser.add_argument("--tokens", type=int, default=300, help="tokens per stream")
+    parser.add_argument("--rate", type=float, default=40.0, help="tokens/s per stream (0 = back to back)")
+    args = parser.parse_args()
+
+    print(
+        f"{args.streams} streams x {args.tokens} tokens at {args.rate or 'unlimited'} tok/s, "
+        f"window {sse.TOKEN_WINDOW_SECONDS * 1000:.0f} ms, json: {'orjson' if sse.orjson else 'stdlib'}"
+    )
+    asyncio.run(_run("legacy", args.streams, args.tokens, args.rate))
+    asyncio.run(_run("sse", args.streams, args.tokens, args.rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+-- Shared tier of the query embedding cache (app/services/embedding_cache.py).
+--
+-- Only read/written when EMBEDDING_CACHE_SHARED=true. cache_key is
+-- sha256(model, dimensions, normalised text), so rows for a different
+-- embedding model/dimension never collide. Expiry is enforced at read time
+-- against created_at; the created_at index keeps an occasional
+-- `DELETE ... WHERE created_at < NOW() - INTERVAL '...'` sweep cheap.
+--
+-- Idempotent (IF NOT EXISTS).
+
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    cache_key VARCHAR(64) PRIMARY KEY,
+    model VARCHAR(100) NOT NULL,
+    dimensions INTEGER NOT NULL,
+    embedding REAL[] NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_created_at
+    ON embedding_cache(created_at);
@@ -0,0 +1,6 @@
+-- Semantic answer cache: flag query_logs rows served from the per-tenant
+-- answer cache (app/services/answer_cache.py) so the dashboard can report
+-- the hit rate.
+
+ALTER TABLE query_logs
+ADD COLUMN IF NOT EXISTS answer_cache_hit BOOLEAN DEFAULT FALSE;
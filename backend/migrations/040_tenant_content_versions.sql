@@ -0,0 +1,10 @@
+-- Shared per-tenant content version for the semantic answer cache
+-- (app/services/answer_cache.py). Ingestion completion, config/profile
+-- writes and product changes bump the row; every worker compares its cached
+-- answers against it, so an invalidation in one worker reaches all of them.
+
+CREATE TABLE IF NOT EXISTS tenant_content_versions (
+    customer_id UUID PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
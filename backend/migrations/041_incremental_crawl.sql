@@ -0,0 +1,25 @@
+-- Incremental re-crawl (IngestionService.ingest_url): per-URL HTTP
+-- validators, extracted-text hash and links for conditional GETs, plus a
+-- content hash per chunk so only changed chunks are re-embedded and vanished
+-- ones are deleted.
+
+CREATE TABLE IF NOT EXISTS crawled_pages (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    customer_id UUID NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    etag VARCHAR(255),
+    last_modified VARCHAR(64),
+    content_hash VARCHAR(64),
+    links TEXT,
+    last_crawled_at TIMESTAMP DEFAULT NOW(),
+    created_at TIMESTAMP DEFAULT NOW(),
+    CONSTRAINT uq_crawled_pages_customer_url UNIQUE (customer_id, url)
+);
+
+CREATE INDEX IF NOT EXISTS idx_crawled_pages_customer_id ON crawled_pages(customer_id);
+
+ALTER TABLE document_chunks
+ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_customer_source_url
+ON document_chunks(customer_id, source_url);
@@ -0,0 +1,31 @@
+-- Durable ingestion queue (app/services/ingestion_queue.py). API replicas
+-- insert rows; the ingestion worker (`python -m app.worker`) claims them with
+-- FOR UPDATE SKIP LOCKED, heartbeats while running, and retries with backoff.
+-- A running row with a stale heartbeat is reclaimed.
+
+CREATE TABLE IF NOT EXISTS ingestion_tasks (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    customer_id UUID NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+    job_id UUID REFERENCES ingestion_jobs(id) ON DELETE CASCADE,
+    kind VARCHAR(20) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    blob BYTEA,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_by VARCHAR(100),
+    heartbeat_at TIMESTAMPTZ,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_ingestion_tasks_customer_id ON ingestion_tasks(customer_id);
+
+-- Claim paths: due queued rows, and running rows whose heartbeat went stale.
+CREATE INDEX IF NOT EXISTS idx_ingestion_tasks_queued
+ON ingestion_tasks(run_after) WHERE status = 'queued';
+
+CREATE INDEX IF NOT EXISTS idx_ingestion_tasks_running
+ON ingestion_tasks(heartbeat_at) WHERE status = 'running';
@@ -0,0 +1,31 @@
+-- Durable inbox for Meta (Instagram / Messenger / WhatsApp) webhook events
+-- (app/services/meta_inbox.py). POST /webhooks/meta verifies the signature,
+-- inserts one row per message event and acks; the inbox worker processes
+-- rows oldest-first per (page_id, sender_id), one at a time per sender.
+-- (platform, dedup_key) dedupes Meta's redeliveries.
+
+CREATE TABLE IF NOT EXISTS meta_webhook_inbox (
+    id BIGSERIAL PRIMARY KEY,
+    platform VARCHAR(20) NOT NULL,
+    page_id VARCHAR(100) NOT NULL,
+    sender_id VARCHAR(100) NOT NULL,
+    dedup_key VARCHAR(200) NOT NULL,
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_after TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_by VARCHAR(100),
+    locked_at TIMESTAMPTZ,
+    last_error TEXT,
+    received_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    processed_at TIMESTAMPTZ,
+    CONSTRAINT uq_meta_webhook_inbox_platform_dedup_key UNIQUE (platform, dedup_key)
+);
+
+-- Claim path: the oldest unfinished row per conversation.
+CREATE INDEX IF NOT EXISTS idx_meta_webhook_inbox_open
+ON meta_webhook_inbox(page_id, sender_id, id) WHERE status IN ('pending', 'processing');
+
+-- Retention purge.
+CREATE INDEX IF NOT EXISTS idx_meta_webhook_inbox_processed_at
+ON meta_webhook_inbox(processed_at) WHERE status IN ('done', 'failed');
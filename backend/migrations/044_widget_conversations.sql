@@ -0,0 +1,13 @@
+-- Shared widget agent conversation history (app/services/conversation.py,
+-- CONVERSATION_STORE_BACKEND=postgres). One row per widget session; the
+-- store appends and trims `messages` in a single upsert and a background
+-- sweep deletes rows idle past the TTL.
+
+CREATE TABLE IF NOT EXISTS widget_conversations (
+    session_id VARCHAR(100) PRIMARY KEY,
+    messages JSONB NOT NULL DEFAULT '[]'::jsonb,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_widget_conversations_updated_at
+ON widget_conversations(updated_at);
@@ -0,0 +1,7 @@
+-- Versioned carts (app/services/cart.py). Every write bumps `version` and
+-- only succeeds if the row is still at the version the writer read
+-- (compare-and-swap), so replicas can't overwrite each other's carts. The
+-- in-process cart cache revalidates by version instead of reloading items.
+
+ALTER TABLE shopping_carts
+ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1;
@@ -0,0 +1,16 @@
+-- Shared short-lived keyed state with per-key expiry
+-- (app/services/keyed_state.py, KEYED_STATE_BACKEND=postgres). Replaces the
+-- DM handler's module-level dicts so pending "Add to Cart" products and last
+-- product results survive restarts and are visible to every inbox worker.
+-- Reads ignore expired rows; a background sweep deletes them.
+
+CREATE TABLE IF NOT EXISTS keyed_state (
+    namespace VARCHAR(64) NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    value JSONB NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_keyed_state_expires_at
+ON keyed_state(expires_at);
@@ -0,0 +1,5 @@
+-- 047: Per-tenant rerank strategy for the ambiguous top_score band
+-- Queries rerank locally (BM25 + term proximity + vector score) by default;
+-- tenants can opt back into the LLM reranker.
+ALTER TABLE widget_configs ADD COLUMN IF NOT EXISTS rerank_mode VARCHAR(20) NOT NULL DEFAULT 'local';
+-- rerank_mode: 'local' | 'llm_fallback' (LLM only when the local ranking is undecided) | 'llm'
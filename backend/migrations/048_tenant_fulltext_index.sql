@@ -0,0 +1,29 @@
+-- 048: Tenant-scoped full-text search on document_chunks
+-- search_vector becomes a generated column, so ingestion no longer runs a
+-- post-insert UPDATE to fill it. The all-tenant GIN index from 003 is
+-- replaced by a composite (customer_id, search_vector) GIN index (btree_gin),
+-- so a keyword search only walks the posting lists of its own tenant instead
+-- of every tenant's matches filtered afterwards.
+-- Replacing the column rewrites document_chunks once; run off-peak on large
+-- installs.
+
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'document_chunks'
+          AND column_name = 'search_vector'
+          AND is_generated = 'ALWAYS'
+    ) THEN
+        ALTER TABLE document_chunks DROP COLUMN IF EXISTS search_vector;
+        ALTER TABLE document_chunks ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (to_tsvector('english', content)) STORED;
+    END IF;
+END $$;
+
+DROP INDEX IF EXISTS idx_document_chunks_search_vector;
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_customer_search
+ON document_chunks USING GIN (customer_id, search_vector);
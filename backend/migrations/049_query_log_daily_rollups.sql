@@ -0,0 +1,43 @@
+-- 049: Per-tenant daily analytics rollups of query_logs
+-- (app/services/analytics_rollups.py). A background job rolls each closed
+-- UTC day into one row per tenant; the dashboard/admin analytics endpoints
+-- read these and aggregate only the days not rolled yet from query_logs.
+
+CREATE TABLE IF NOT EXISTS query_log_daily_rollups (
+    customer_id UUID NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    with_answer INTEGER NOT NULL DEFAULT 0,
+    fallback INTEGER NOT NULL DEFAULT 0,
+    blocked INTEGER NOT NULL DEFAULT 0,
+    llm_declined INTEGER NOT NULL DEFAULT 0,
+    empty INTEGER NOT NULL DEFAULT 0,
+    rerank INTEGER NOT NULL DEFAULT 0,
+    cache_hit INTEGER NOT NULL DEFAULT 0,
+    threshold_guard INTEGER NOT NULL DEFAULT 0,
+    feedback_positive INTEGER NOT NULL DEFAULT 0,
+    feedback_negative INTEGER NOT NULL DEFAULT 0,
+    top_score_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    top_score_n INTEGER NOT NULL DEFAULT 0,
+    response_time_sum BIGINT NOT NULL DEFAULT 0,
+    response_time_n INTEGER NOT NULL DEFAULT 0,
+    context_tokens_sum BIGINT NOT NULL DEFAULT 0,
+    context_tokens_n INTEGER NOT NULL DEFAULT 0,
+    latency_histogram JSONB NOT NULL DEFAULT '[]',
+    modes JSONB NOT NULL DEFAULT '{}',
+    top_questions JSONB NOT NULL DEFAULT '[]',
+    failed_questions JSONB NOT NULL DEFAULT '[]',
+    computed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (customer_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_rollup_state (
+    name VARCHAR(64) PRIMARY KEY,
+    rolled_through DATE,
+    feedback_checked_at TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- The job re-rolls days that received feedback since its last pass.
+CREATE INDEX IF NOT EXISTS idx_query_logs_feedback_at
+ON query_logs(feedback_at) WHERE feedback_at IS NOT NULL;
@@ -0,0 +1,49 @@
+-- 050: Normalised order line items (OrderItem, app/models/order.py).
+-- Orders keep their `items` JSON snapshot; order_items holds one row per
+-- line so ecommerce analytics (top products, revenue) aggregate in SQL
+-- instead of parsing every paid order's JSON in Python. New orders write
+-- both; the backfill below copies existing orders' items once.
+
+CREATE TABLE IF NOT EXISTS order_items (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    order_id UUID NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+    customer_id UUID NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+    line_no INTEGER NOT NULL DEFAULT 0,
+    product_id VARCHAR(255) NOT NULL,
+    name VARCHAR(500) NOT NULL DEFAULT 'Unknown',
+    price FLOAT NOT NULL DEFAULT 0,
+    quantity INTEGER NOT NULL DEFAULT 1,
+    currency VARCHAR(10),
+    size VARCHAR(100),
+    color VARCHAR(100),
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_order_items_customer_product ON order_items(customer_id, product_id);
+CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);
+
+-- Backfill. Same fallbacks the old Python aggregation used: product_id,
+-- else the item name, else 'unknown' (null or empty counts as missing, as
+-- in order.build_order_items); quantity 1; price 0. Orders that
+-- already have rows are skipped, so re-running is a no-op.
+INSERT INTO order_items (
+    order_id, customer_id, line_no, product_id, name, price, quantity, currency, size, color, created_at
+)
+SELECT
+    o.id,
+    o.customer_id,
+    (line.ordinality - 1)::int,
+    LEFT(COALESCE(NULLIF(line.item->>'product_id', ''), NULLIF(line.item->>'name', ''), 'unknown'), 255),
+    LEFT(COALESCE(NULLIF(line.item->>'name', ''), 'Unknown'), 500),
+    COALESCE((line.item->>'price')::float8, 0),
+    COALESCE((line.item->>'quantity')::int, 1),
+    COALESCE(NULLIF(line.item->>'currency', ''), o.currency),
+    LEFT(NULLIF(line.item->>'size', ''), 100),
+    LEFT(NULLIF(line.item->>'color', ''), 100),
+    o.created_at
+FROM orders o
+CROSS JOIN LATERAL jsonb_array_elements(
+    CASE WHEN jsonb_typeof(o.items::jsonb) = 'array' THEN o.items::jsonb ELSE '[]'::jsonb END
+) WITH ORDINALITY AS line(item, ordinality)
+WHERE o.items IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM order_items oi WHERE oi.order_id = o.id);
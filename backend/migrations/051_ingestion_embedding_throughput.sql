@@ -0,0 +1,8 @@
+-- 051: Embedding throughput per ingestion job (app/services/embedding_pipeline.py).
+-- Chunks embedded and seconds spent embedding, summed over the job's
+-- batches; chunks/s = embedding_chunks / embedding_seconds. NULL for jobs
+-- that ran before this migration.
+
+ALTER TABLE ingestion_jobs
+ADD COLUMN IF NOT EXISTS embedding_chunks INTEGER,
+ADD COLUMN IF NOT EXISTS embedding_seconds DOUBLE PRECISION;
@@ -26,14 +26,16 @@ from app.config import get_settings
 
 
 def _analytics_mock_db():
-    """Build an AsyncMock db whose four execute() calls return zero-row
-    aggregates."""
-    agg_row = MagicMock()
-    agg_row.total = 0
-    agg_row.with_answer = 0
-    agg_row.p95 = None
-    agg_result = MagicMock()
-    agg_result.one.return_value = agg_row
+    """Build an AsyncMock db for get_analytics with no rolled-up days: the
+    rollup-state lookup finds nothing, the four raw query_logs aggregations
+    return no rows, then the leads and orders counts return zero."""
+    state_result = MagicMock()
+    state_result.scalar.return_value = None
+
+    def _empty():
+        result = MagicMock()
+        result.all.return_value = []
+        return result
 
     leads_result = MagicMock()
     leads_result.scalar.return_value = 0
@@ -41,19 +43,19 @@ def _analytics_mock_db():
     orders_result = MagicMock()
     orders_result.scalar.return_value = 0
 
-    top_result = MagicMock()
-    top_result.all.return_value = []
-
     db = AsyncMock()
-    db.execute.side_effect = [agg_result, leads_result, orders_result, top_result]
+    db.execute.side_effect = [
+        state_result, _empty(), _empty(), _empty(), _empty(), leads_result, orders_result,
+    ]
     return db
 
 
 def _captured_where_bounds(db: AsyncMock) -> tuple[datetime, datetime]:
-    """Pull (from_, to) out of the first execute() call's compiled statement.
+    """Pull (from_, to) out of the first query_logs aggregation's compiled
+    statement (execute() call 1; call 0 is the rollup-state lookup).
     SQLAlchemy 2.x exposes bound parameters via stmt.compile().params.
     """
-    stmt = db.execute.call_args_list[0].args[0]
+    stmt = db.execute.call_args_list[1].args[0]
     params = stmt.compile().params
     # WHERE created_at >= from_  →  bind name created_at_1
     # WHERE created_at <= to     →  bind name created_at_2
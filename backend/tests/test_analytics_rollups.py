@@ -0,0 +1,182 @@
+"""
+Analytics rollup tests.
+
+Pins how QueryStats merges and derives (percentiles from the histogram, top
+and failed questions across days), how a reporting window splits into whole
+rolled days plus raw query_logs ranges, that query_stats adds the two
+together, and which days a rollup pass rolls: closed days past the grace
+period, capped per run, plus already-rolled days that got late feedback.
+"""
+from __future__ import annotations
+
+import uuid
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services import analytics_rollups as rollups
+from app.services.analytics_rollups import LATENCY_BUCKETS_MS, QueryStats, split_window
+
+
+def test_merge_adds_counters_histograms_and_questions():
+    monday = QueryStats(total=3, with_answer=2, top_score_sum=1.2, top_score_n=3, modes={"hybrid": 3})
+    monday.latency_histogram[LATENCY_BUCKETS_MS.index(500)] = 3
+    monday.questions = {"delivery?": ["Delivery?", 2], "returns?": ["returns?", 1]}
+    monday.failed = {"returns?": [1, 0.1, 1, 1]}
+    tuesday = QueryStats(total=2, with_answer=2, top_score_sum=0.8, top_score_n=1, modes={"hybrid": 1, "vector": 1})
+    tuesday.latency_histogram[LATENCY_BUCKETS_MS.index(500)] = 1
+    tuesday.latency_histogram[LATENCY_BUCKETS_MS.index(5000)] = 1
+    tuesday.questions = {"returns?": ["Returns?", 3]}
+    tuesday.failed = {"returns?": [2, 0.3, 2, 0]}
+
+    monday.merge(tuesday)
+
+    assert (monday.total, monday.with_answer) == (5, 4)
+    assert monday.avg_top_score == pytest.approx(0.5)
+    assert monday.modes == {"hybrid": 4, "vector": 1}
+    assert monday.top_questions(10) == [("Returns?", 4), ("Delivery?", 2)]
+    assert monday.failed_questions(10) == [
+        {"question": "returns?", "count": 3, "avg_score": 0.133, "negative_feedback": 1},
+    ]
+    # 4 of 5 in the 500-750ms bucket, the slowest in the 5000-7500ms one.
+    assert 500 <= monday.latency_percentile(0.95) < 750
+    assert 5000 <= monday.latency_percentile(1.0) < 7500
+    assert QueryStats().latency_percentile(0.95) is None
+
+
+def test_rollup_row_round_trip_keeps_top_limit():
+    stats = QueryStats(total=4, feedback_negative=1, response_time_sum=900, response_time_n=3)
+    stats.questions = {f"q{i}": [f"Q{i}", 4 - i] for i in range(4)}
+    stats.failed = {"q3": [1, 0.1, 1, 1]}
+    customer_id = uuid.uuid4()
+
+    row = stats.to_row(customer_id, date(2026, 10, 1), top_limit=2)
+    restored = QueryStats.from_row(SimpleNamespace(**row))
+
+    assert row["customer_id"] == customer_id and row["day"] == date(2026, 10, 1)
+    assert restored.total == 4 and restored.avg_response_time == 300
+    assert restored.top_questions(10) == [("Q0", 4), ("Q1", 3)]
+    assert restored.failed == {"q3": [1, 0.1, 1, 1]}
+
+
+def test_split_window_serves_whole_rolled_days_from_rollups():
+    since = datetime(2026, 10, 1, 9, 30)
+    until = datetime(2026, 10, 17, 8, 0)
+
+    days, ranges = split_window(since, until, rolled_through=date(2026, 10, 15))
+
+    assert days == (date(2026, 10, 2), date(2026, 10, 15))
+    assert ranges == [
+        (since, datetime(2026, 10, 2), False),
+        (datetime(2026, 10, 16), until, True),
+    ]
+
+
+def test_split_window_falls_back_to_raw_when_nothing_rolled():
+    until = datetime(2026, 10, 17, 8, 0)
+    since = datetime(2026, 10, 16)
+
+    assert split_window(since, until, None) == (None, [(since, until, True)])
+    # Window entirely after the rolled days.
+    assert split_window(since, until, date(2026, 10, 10)) == (None, [(since, until, True)])
+    # All history: rollups from the start, raw after the last rolled day.
+    days, ranges = split_window(None, until, date(2026, 10, 15))
+    assert days == (date.min, date(2026, 10, 15))
+    assert ranges == [(datetime(2026, 10, 16), until, True)]
+
+
+@pytest.mark.asyncio
+async def test_query_stats_adds_rollups_to_raw_partial_days(monkeypatch):
+    monkeypatch.setattr(rollups, "_now", lambda: datetime(2026, 10, 17, 8, 0))
+    monkeypatch.setattr(rollups, "_rolled_through", AsyncMock(return_value=date(2026, 10, 15)))
+    customer_id = uuid.uuid4()
+    rolled = [
+        SimpleNamespace(**QueryStats(total=10, with_answer=8).to_row(customer_id, date(2026, 10, d), 50))
+        for d in (14, 15)
+    ]
+    today = QueryStats(total=3, with_answer=1)
+    today.questions = {"hours?": ["Hours?", 3]}
+    aggregate = AsyncMock(return_value={(customer_id, date(2026, 10, 17)): today})
+    monkeypatch.setattr(rollups, "aggregate", aggregate)
+    db = MagicMock(execute=AsyncMock(return_value=MagicMock(scalars=lambda: MagicMock(all=lambda: rolled))))
+
+    stats = await rollups.query_stats(db, customer_id, datetime(2026, 10, 14))
+
+    assert (stats.total, stats.with_answer) == (23, 17)
+    assert stats.top_questions(5) == [("Hours?", 3)]
+    ranges = aggregate.await_args.args[1]
+    assert ranges == [(datetime(2026, 10, 16), datetime(2026, 10, 17, 8, 0), True)]
+
+
+def _session_maker(db):
+    @asynccontextmanager
+    async def _maker():
+        yield db
+
+    return _maker
+
+
+@pytest.mark.asyncio
+async def test_roll_up_rolls_closed_days_and_late_feedback(monkeypatch):
+    monkeypatch.setattr(rollups, "_now", lambda: datetime(2026, 10, 17, 0, 5))
+    monkeypatch.setattr(rollups.settings, "analytics_rollup_grace_seconds", 600)
+    monkeypatch.setattr(rollups.settings, "analytics_rollup_max_days_per_run", 31)
+    rolled = []
+
+    async def _roll_day(db, day, customer_ids=None):
+        rolled.append((day, customer_ids))
+        return 1
+
+    monkeypatch.setattr(rollups, "_roll_day", _roll_day)
+    customer_id = uuid.uuid4()
+    state = SimpleNamespace(
+        rolled_through=date(2026, 10, 13), feedback_checked_at=datetime(2026, 10, 16, 23, 0), updated_at=None,
+    )
+    db = MagicMock(commit=AsyncMock(), get=AsyncMock(return_value=state))
+    db.execute = AsyncMock(side_effect=[
+        MagicMock(scalar=lambda: True),  # advisory lock
+        MagicMock(all=lambda: [(customer_id, date(2026, 10, 12))]),  # late votes
+    ])
+
+    written = await rollups.roll_up(_session_maker(db))
+
+    # 00:05 is inside the 10-minute grace, so Oct 16 waits for the next pass.
+    assert rolled == [(date(2026, 10, 12), [customer_id]), (date(2026, 10, 14), None), (date(2026, 10, 15), None)]
+    assert written == 3
+    assert state.rolled_through == date(2026, 10, 15)
+    assert state.feedback_checked_at == datetime(2026, 10, 17, 0, 0)
+    db.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_roll_up_backfill_is_capped_and_skips_when_locked(monkeypatch):
+    monkeypatch.setattr(rollups, "_now", lambda: datetime(2026, 10, 17, 12, 0))
+    monkeypatch.setattr(rollups.settings, "analytics_rollup_max_days_per_run", 3)
+    rolled = []
+
+    async def _roll_day(db, day, customer_ids=None):
+        rolled.append(day)
+        return 0
+
+    monkeypatch.setattr(rollups, "_roll_day", _roll_day)
+    state = SimpleNamespace(rolled_through=None, feedback_checked_at=None, updated_at=None)
+    db = MagicMock(commit=AsyncMock(), get=AsyncMock(return_value=state))
+    db.execute = AsyncMock(side_effect=[
+        MagicMock(scalar=lambda: True),
+        MagicMock(scalar=lambda: datetime(2026, 9, 1, 14, 0)),  # first query_logs row
+    ])
+
+    await rollups.roll_up(_session_maker(db))
+
+    assert rolled == [date(2026, 9, 1), date(2026, 9, 2), date(2026, 9, 3)]
+    assert state.rolled_through == date(2026, 9, 3)
+
+    # Another replica holds the lock: nothing happens.
+    busy = MagicMock(commit=AsyncMock(), get=AsyncMock())
+    busy.execute = AsyncMock(return_value=MagicMock(scalar=lambda: False))
+    assert await rollups.roll_up(_session_maker(busy)) == 0
+    busy.get.assert_not_awaited()
+    busy.commit.assert_not_awaited()
@@ -0,0 +1,238 @@
+"""
+Semantic answer cache tests.
+
+Pins similarity matching per (tenant, language), the cosine threshold,
+invalidation, TTL expiry, shared content versions (a bucket written under an
+older version is never served), and the QueryService wiring: the lookup runs
+inside the vector leg, a near-duplicate question is served without keyword
+retrieval or generation (the keyword leg is cancelled), the streaming path
+replays the cached answer as tokens, and the hit is logged with
+answer_cache_hit=True. Verified users are never served from the cache.
+"""
+from __future__ import annotations
+
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services import answer_cache as cache_mod
+from app.services import query as query_mod
+from app.services.answer_cache import CachedAnswer, SemanticAnswerCache, iter_answer_tokens
+from app.services.query import QueryService
+
+CUSTOMER_ID = uuid.uuid4()
+V = 3  # current content version in most tests
+
+
+def _answer(text="Delivery is free over Rs 2000.") -> CachedAnswer:
+    return CachedAnswer(
+        answer=text,
+        suggestions=["Return policy?"],
+        sources=[{"title": "Shipping", "url": "https://acme.test/shipping"}],
+        chunks_used=3,
+        top_score=0.81,
+        avg_score=0.7,
+        context_tokens=420,
+    )
+
+
+def _cache(**kwargs) -> SemanticAnswerCache:
+    defaults = dict(enabled=True, similarity_threshold=0.95, ttl_seconds=60, max_entries_per_tenant=8)
+    defaults.update(kwargs)
+    return SemanticAnswerCache(**defaults)
+
+
+def test_near_duplicate_hits_and_dissimilar_misses():
+    cache = _cache()
+    cache.store(CUSTOMER_ID, "en", [1.0, 0.0, 0.0], _answer(), version=V)
+
+    hit = cache.lookup(CUSTOMER_ID, "en", [0.99, 0.05, 0.0], version=V)
+    assert hit is not None
+    assert hit[0].answer == "Delivery is free over Rs 2000."
+    assert hit[1] > 0.95
+
+    assert cache.lookup(CUSTOMER_ID, "en", [0.0, 1.0, 0.0], version=V) is None
+
+
+def test_buckets_are_per_tenant_and_language():
+    cache = _cache()
+    cache.store(CUSTOMER_ID, "en", [1.0, 0.0], _answer(), version=V)
+
+    assert cache.lookup(uuid.uuid4(), "en", [1.0, 0.0], version=V) is None
+    assert cache.lookup(CUSTOMER_ID, "ne", [1.0, 0.0], version=V) is None
+    assert cache.lookup(CUSTOMER_ID, None, [1.0, 0.0], version=V) is not None  # None == "en"
+
+
+def test_newer_content_version_discards_bucket():
+    cache = _cache()
+    cache.store(CUSTOMER_ID, "en", [1.0, 0.0], _answer(), version=V)
+
+    # Another worker bumped the version (ingestion finished there).
+    assert cache.lookup(CUSTOMER_ID, "en", [1.0, 0.0], version=V + 1) is None
+    # ...and the stale bucket is gone even for a reader still on the old version.
+    assert cache.lookup(CUSTOMER_ID, "en", [1.0, 0.0], version=V) is None
+
+
+def test_invalidate_drops_all_languages_for_tenant_only():
+    other = uuid.uuid4()
+    cache = _cache()
+    cache.store(CUSTOMER_ID, "en", [1.0, 0.0], _answer(), version=V)
+    cache.store(CUSTOMER_ID, "ne", [1.0, 0.0], _answer(), version=V)
+    cache.store(other, "en", [1.0, 0.0], _answer(), version=V)
+
+    cache.invalidate(CUSTOMER_ID)
+
+    assert cache.lookup(CUSTOMER_ID, "en", [1.0, 0.0], version=V) is None
+    assert cache.lookup(CUSTOMER_ID, "ne", [1.0, 0.0], version=V) is None
+    assert cache.lookup(other, "en", [1.0, 0.0], version=V) is not None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [500.0]
+    monkeypatch.setattr(cache_mod, "_now", lambda: now[0])
+    cache = _cache(ttl_seconds=10)
+    cache.store(CUSTOMER_ID, "en", [1.0, 0.0], _answer(), version=V)
+
+    now[0] += 11
+    assert cache.lookup(CUSTOMER_ID, "en", [1.0, 0.0], version=V) is None
+
+
+def test_bucket_is_bounded_oldest_first():
+    cache = _cache(max_entries_per_tenant=2)
+    cache.store(CUSTOMER_ID, "en", [1.0, 0.0, 0.0], _answer("first"), version=V)
+    cache.store(CUSTOMER_ID, "en", [0.0, 1.0, 0.0], _answer("second"), version=V)
+    cache.store(CUSTOMER_ID, "en", [0.0, 0.0, 1.0], _answer("third"), version=V)
+
+    assert cache.lookup(CUSTOMER_ID, "en", [1.0, 0.0, 0.0], version=V) is None
+    assert cache.lookup(CUSTOMER_ID, "en", [0.0, 0.0, 1.0], version=V)[0].answer == "third"
+
+
+def test_iter_answer_tokens_round_trips():
+    text = "Free delivery  over Rs 2000.\nReturns within 7 days."
+    tokens = iter_answer_tokens(text)
+    assert "".join(tokens) == text
+    assert len(tokens) == 9
+
+
+@pytest.mark.asyncio
+async def test_invalidate_answers_bumps_shared_version_and_drops_local(monkeypatch):
+    cache = _cache()
+    cache.store(CUSTOMER_ID, "en", [1.0, 0.0], _answer(), version=V)
+    monkeypatch.setattr(cache_mod, "get_answer_cache", lambda: cache)
+    db = MagicMock(execute=AsyncMock(), commit=AsyncMock())
+
+    await cache_mod.invalidate_answers(db, CUSTOMER_ID)
+
+    assert db.execute.await_args.args[0] is cache_mod.BUMP_CONTENT_VERSION_SQL
+    assert db.execute.await_args.args[1] == {"cid": str(CUSTOMER_ID)}
+    db.commit.assert_awaited_once()
+    assert cache.lookup(CUSTOMER_ID, "en", [1.0, 0.0], version=V) is None
+
+
+# ---------- QueryService wiring ----------
+
+def _service(cache: SemanticAnswerCache, monkeypatch, version: int | None = V):
+    svc = QueryService.__new__(QueryService)
+    svc.answer_cache = cache
+    svc._inflight = {}
+    async def _embed(text):
+        await asyncio.sleep(0.01)
+        return [1.0, 0.0, 0.0]
+
+    svc.embedding_service = MagicMock(create_embedding=AsyncMock(side_effect=_embed))
+    svc.vector_store = MagicMock(query_vectors=AsyncMock(return_value=[]))
+    svc.llm_service = MagicMock()
+    svc.get_tenant_context = AsyncMock(return_value=SimpleNamespace(
+        customer=SimpleNamespace(id=CUSTOMER_ID, site_id="acme", name="Acme", website_type="service"),
+        widget_config=None,
+        business_profile=None,
+    ))
+    keyword_calls = []
+
+    @asynccontextmanager
+    async def _session_factory():
+        yield object()
+
+    async def _keyword_search(db, customer_id, question, limit=5):
+        keyword_calls.append(question)
+        await asyncio.sleep(5)  # must be cancelled on a hit
+        return []
+
+    svc.session_factory = _session_factory
+    svc._keyword_search = _keyword_search
+    svc._check_ingestion_status = AsyncMock(return_value="empty")
+    svc._log_query = AsyncMock(return_value="log-1")
+    monkeypatch.setattr(query_mod, "get_content_version", AsyncMock(return_value=version))
+    return svc, keyword_calls
+
+
+@pytest.mark.asyncio
+async def test_process_query_serves_cache_hit_and_logs_it(monkeypatch):
+    cache = _cache()
+    cache.store(CUSTOMER_ID, "en", [1.0, 0.0, 0.0], _answer(), version=V)
+    svc, keyword_calls = _service(cache, monkeypatch)
+
+    result = await asyncio.wait_for(
+        svc.process_query(db=MagicMock(), site_id="acme", question="delivery charges?"), timeout=2,
+    )
+
+    assert result["answer"] == "Delivery is free over Rs 2000."
+    assert result["_meta"]["answer_cache_hit"] is True
+    assert result["_meta"]["query_log_id"] == "log-1"
+    kwargs = svc._log_query.await_args.kwargs
+    assert kwargs["answer_cache_hit"] is True
+    assert kwargs["retrieval_mode"] == "answer_cache"
+    # The keyword leg started alongside the embed, then was cancelled.
+    assert keyword_calls == ["delivery charges?"]
+    svc.vector_store.query_vectors.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_process_query_stream_replays_cached_answer_as_tokens(monkeypatch):
+    cache = _cache()
+    cache.store(CUSTOMER_ID, "en", [1.0, 0.0, 0.0], _answer(), version=V)
+    svc, _ = _service(cache, monkeypatch)
+
+    events = [e async for e in svc.process_query_stream(db=MagicMock(), site_id="acme", question="delivery charges?")]
+
+    tokens = [e["data"] for e in events if e["type"] == "token"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == "Delivery is free over Rs 2000."
+    done = events[-1]
+    assert done["type"] == "done"
+    assert done["sources"] == [{"title": "Shipping", "url": "https://acme.test/shipping"}]
+    assert done["query_log_id"] == "log-1"
+    assert svc._log_query.await_args.kwargs["answer_cache_hit"] is True
+
+
+@pytest.mark.asyncio
+async def test_stale_version_falls_through_to_retrieval(monkeypatch):
+    cache = _cache()
+    cache.store(CUSTOMER_ID, "en", [1.0, 0.0, 0.0], _answer(), version=V)
+    svc, keyword_calls = _service(cache, monkeypatch, version=V + 1)
+    svc._keyword_search = AsyncMock(return_value=[])
+
+    result = await svc.process_query(db=MagicMock(), site_id="acme", question="delivery charges?")
+
+    svc.vector_store.query_vectors.assert_awaited_once()
+    assert "still setting up" in result["answer"]
+
+
+@pytest.mark.asyncio
+async def test_verified_user_bypasses_cache(monkeypatch):
+    cache = _cache()
+    cache.store(CUSTOMER_ID, "en", [1.0, 0.0, 0.0], _answer(), version=V)
+    svc, _ = _service(cache, monkeypatch)
+    svc._keyword_search = AsyncMock(return_value=[])
+
+    result = await svc.process_query(
+        db=MagicMock(), site_id="acme", question="delivery charges?", user_email="a@b.test",
+    )
+
+    query_mod.get_content_version.assert_not_awaited()
+    svc.vector_store.query_vectors.assert_awaited_once()
+    assert "still setting up" in result["answer"]
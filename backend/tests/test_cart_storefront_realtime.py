@@ -100,16 +100,16 @@ def _result_with(value):
 
 def _make_db_with_widget_config(config):
     """Storefront/realtime path: one SELECT for WidgetConfig, then save_to_db's
-    SELECT for ShoppingCart returns None so the service inserts a new row."""
-    return _make_async_db(_result_with(config), _result_with(None))
+    INSERT of a new ShoppingCart row returns version 1."""
+    return _make_async_db(_result_with(config), _result_with(1))
 
 
 def _make_db_for_legacy_path(*, config, local_product):
-    """Legacy path needs three execute() returns: WidgetConfig, Product, Cart."""
+    """Legacy path needs three execute() returns: WidgetConfig, Product, Cart insert."""
     return _make_async_db(
         _result_with(config),
         _result_with(local_product),
-        _result_with(None),
+        _result_with(1),
     )
 
 
@@ -0,0 +1,166 @@
+"""
+Versioned cart cache tests.
+
+Pins the CartService contract: a revalidation whose version is unchanged
+doesn't rebuild the cart; cart writes inside an agent turn are coalesced
+into one compare-and-swap at end_turn; a lost CAS rebases on the winner's
+row and replays local changes (removals by product/size/color, not
+index); a cart emptied and deleted by checkout is not
+re-inserted; idle carts are evicted (time via the module `_now()` clock).
+"""
+from __future__ import annotations
+
+import json
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services import cart as cart_mod
+from app.services.cart import _CAS_UPDATE_SQL, _INSERT_SQL, _LOAD_SQL, CartService
+
+CUSTOMER = uuid.uuid4()
+
+
+def _item(product_id: str, quantity: int = 1) -> dict:
+    return {"product_id": product_id, "name": product_id, "price": 10.0, "currency": "NPR", "quantity": quantity}
+
+
+def _load_result(version: int | None, items: list[dict] | None = None):
+    row = None if version is None else SimpleNamespace(version=version, items=None if items is None else json.dumps(items))
+    return MagicMock(one_or_none=lambda: row)
+
+
+def _write_result(version: int | None):
+    return MagicMock(scalar_one_or_none=lambda: version)
+
+
+def _db(*results) -> MagicMock:
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=list(results))
+    db.commit = AsyncMock()
+    return db
+
+
+def _statements(db) -> list:
+    return [c.args[0] for c in db.execute.await_args_list]
+
+
+def _add(service: CartService, session_id: str, product_id: str) -> None:
+    service.add_item(session_id, product_id=product_id, name=product_id, price=10.0, currency="NPR")
+
+
+@pytest.mark.asyncio
+async def test_revalidation_rebuilds_only_when_version_moves():
+    service = CartService()
+    db = _db(_load_result(3, [_item("a")]), _load_result(3), _load_result(4, [_item("a"), _item("b")]))
+
+    cart = await service.load_from_db(db, "s")
+    assert [i.product_id for i in cart.items] == ["a"]
+    assert db.execute.await_args_list[0].args[1]["known_version"] == 0
+
+    assert await service.load_from_db(db, "s") is cart  # unchanged version: same object, no parse
+    assert db.execute.await_args_list[1].args[1]["known_version"] == 3
+
+    cart = await service.load_from_db(db, "s")
+    assert [i.product_id for i in cart.items] == ["a", "b"]
+    assert _statements(db) == [_LOAD_SQL] * 3
+
+
+@pytest.mark.asyncio
+async def test_turn_coalesces_writes_into_one_cas():
+    service = CartService()
+    db = _db(_load_result(2, [_item("a")]), _write_result(3))
+
+    await service.load_from_db(db, "s")
+    service.begin_turn("s")
+    for product_id in ("b", "c"):
+        _add(service, "s", product_id)
+        await service.save_to_db(db, "s", CUSTOMER)
+    service.remove_item("s", 0)
+    await service.save_to_db(db, "s", CUSTOMER)
+    await service.load_from_db(db, "s")  # validated at turn start: no query
+    assert db.execute.await_count == 1
+
+    await service.end_turn(db, "s")
+
+    assert _statements(db) == [_LOAD_SQL, _CAS_UPDATE_SQL]
+    params = db.execute.await_args_list[1].args[1]
+    assert params["expected_version"] == 2
+    assert [i["product_id"] for i in json.loads(params["items"])] == ["b", "c"]
+    db.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_lost_cas_rebases_and_replays_local_changes():
+    service = CartService()
+    db = _db(
+        _load_result(2, [_item("a")]),
+        _write_result(None),  # another replica wrote version 3 first
+        _load_result(3, [_item("a"), _item("z")]),
+        _write_result(4),
+    )
+    await service.load_from_db(db, "s")
+    _add(service, "s", "b")
+    await service.save_to_db(db, "s", CUSTOMER)
+
+    assert _statements(db) == [_LOAD_SQL, _CAS_UPDATE_SQL, _LOAD_SQL, _CAS_UPDATE_SQL]
+    final = db.execute.await_args_list[3].args[1]
+    assert final["expected_version"] == 3
+    assert [i["product_id"] for i in json.loads(final["items"])] == ["a", "z", "b"]
+    assert [i.product_id for i in service.get_cart("s").items] == ["a", "z", "b"]
+
+
+@pytest.mark.asyncio
+async def test_replayed_remove_matches_the_line_not_the_index():
+    service = CartService()
+    db = _db(
+        _load_result(2, [_item("a"), _item("b")]),
+        _write_result(None),  # another replica removed "a" and added "c"
+        _load_result(3, [_item("b"), _item("c")]),
+        _write_result(4),
+    )
+    await service.load_from_db(db, "s")
+    service.remove_item("s", 1)  # "b"
+    service.remove_item("s", 0)  # "a", already gone on the winner's row
+    service.remove_item("s", 5)  # out of range: not recorded
+    await service.save_to_db(db, "s", CUSTOMER)
+
+    final = db.execute.await_args_list[3].args[1]
+    assert [i["product_id"] for i in json.loads(final["items"])] == ["c"]
+
+
+@pytest.mark.asyncio
+async def test_new_cart_is_inserted_and_cleared_deleted_cart_is_not_reinserted():
+    service = CartService()
+    db = _db(_load_result(None), _write_result(1))
+    await service.load_from_db(db, "s")
+    _add(service, "s", "a")
+    await service.save_to_db(db, "s", CUSTOMER)
+    assert _statements(db)[-1] is _INSERT_SQL
+
+    # Checkout: the order service clears the cart and deletes the row.
+    db = _db(_write_result(None), _load_result(None))
+    service.clear_cart("s")
+    await service.save_to_db(db, "s", CUSTOMER)
+    assert _statements(db) == [_CAS_UPDATE_SQL, _LOAD_SQL]
+    db.commit.assert_not_awaited()
+    assert service.get_cart("s").items == []
+
+
+def test_idle_carts_are_evicted(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cart_mod, "_now", lambda: now[0])
+    service = CartService(idle_seconds=60, max_carts=100)
+    _add(service, "old", "a")
+    now[0] = 30
+    _add(service, "fresh", "a")
+    service.begin_turn("busy")
+    service.get_cart("busy")
+    service._carts["busy"].last_access = 0  # as stale as "old", but its turn is open
+    now[0] = 75
+
+    service.get_cart("fresh")
+
+    assert set(service._carts) == {"fresh", "busy"}
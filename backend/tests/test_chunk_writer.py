@@ -0,0 +1,75 @@
+"""
+Bulk chunk writer tests.
+
+Pins that write_chunks sends each CHUNK_WRITE_BATCH_SIZE batch as one COPY
+(or one multi-row INSERT) and never commits (the caller owns the
+transaction), that rows follow CHUNK_COLUMNS (never search_vector), and that
+an unknown method is refused.
+"""
+from __future__ import annotations
+
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services import chunk_writer
+from app.services.chunk_writer import CHUNK_COLUMNS, chunk_row, write_chunks
+
+
+def _rows(count: int) -> list[tuple]:
+    customer_id, job_id = uuid.uuid4(), uuid.uuid4()
+    return [
+        chunk_row(customer_id, job_id, f"{job_id}_{i}", {"content": f"chunk {i}", "chunk_index": i}, f"h{i}")
+        for i in range(count)
+    ]
+
+
+def test_chunk_row_matches_columns():
+    row = chunk_row(uuid.uuid4(), uuid.uuid4(), "j_0", {"content": "x" * 600, "chunk_index": 3}, "abc")
+
+    values = dict(zip(CHUNK_COLUMNS, row))
+    assert len(row) == len(CHUNK_COLUMNS) and "search_vector" not in CHUNK_COLUMNS
+    assert (values["vector_id"], values["chunk_index"], values["content_hash"]) == ("j_0", 3, "abc")
+    assert len(values["content_preview"]) == 500
+
+
+@pytest.mark.asyncio
+async def test_copy_sends_one_copy_per_batch_without_committing(monkeypatch):
+    monkeypatch.setattr(chunk_writer.settings, "chunk_write_batch_size", 2)
+    driver = MagicMock(copy_records_to_table=AsyncMock())
+    connection = MagicMock(get_raw_connection=AsyncMock(return_value=SimpleNamespace(driver_connection=driver)))
+    events = []
+    db = MagicMock(connection=AsyncMock(return_value=connection), commit=AsyncMock())
+    driver.copy_records_to_table.side_effect = lambda table, records, columns: events.append(("copy", len(records)))
+    rows = _rows(5)
+
+    assert await write_chunks(db, rows, method="copy") == 5
+
+    assert events == [("copy", 2), ("copy", 2), ("copy", 1)]
+    db.commit.assert_not_awaited()
+    call = driver.copy_records_to_table.call_args
+    assert call.args == ("document_chunks",)
+    assert call.kwargs["columns"] == CHUNK_COLUMNS
+    assert call.kwargs["records"] == rows[4:]
+
+
+@pytest.mark.asyncio
+async def test_insert_sends_each_batch_as_one_executemany():
+    db = MagicMock(execute=AsyncMock(), commit=AsyncMock())
+    rows = _rows(3)
+
+    await write_chunks(db, rows, method="insert", batch_size=1000)
+
+    db.execute.assert_awaited_once()
+    db.commit.assert_not_awaited()
+    params = db.execute.await_args.args[1]
+    assert [p["vector_id"] for p in params] == [r[3] for r in rows]
+    assert set(params[0]) == set(CHUNK_COLUMNS)
+
+
+@pytest.mark.asyncio
+async def test_unknown_method_is_refused():
+    with pytest.raises(ValueError):
+        await write_chunks(MagicMock(), _rows(1), method="orm")
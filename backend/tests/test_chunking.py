@@ -0,0 +1,105 @@
+"""
+Chunking tests.
+
+Pins the single-pass chunker: the encoder is built once and reused, each
+document is encoded exactly once, chunks respect chunk_size and prefer
+paragraph then sentence breaks, consecutive chunks overlap, and the batch
+API matches per-document chunking. A byte-level tiktoken Encoding (one token
+per byte, no merges) stands in for cl100k_base so no vocabulary download is
+needed.
+"""
+from __future__ import annotations
+
+import tiktoken
+import pytest
+
+from app.utils import chunking
+from app.utils.chunking import chunk_text, chunk_texts, count_tokens
+
+
+class _CountingEncoding(tiktoken.Encoding):
+    def __init__(self):
+        super().__init__(
+            name="bytes",
+            pat_str=r"\s+|\S+",
+            mergeable_ranks={bytes([i]): i for i in range(256)},
+            special_tokens={},
+        )
+        self.encoded = 0
+
+    def encode_ordinary(self, text):
+        self.encoded += 1
+        return super().encode_ordinary(text)
+
+    def encode_ordinary_batch(self, texts, num_threads=8):
+        self.encoded += len(texts)
+        return [super(_CountingEncoding, self).encode_ordinary(t) for t in texts]
+
+
+@pytest.fixture
+def encoding(monkeypatch):
+    enc = _CountingEncoding()
+    monkeypatch.setattr(chunking, "get_encoding", lambda model="gpt-4": enc)
+    return enc
+
+
+def test_get_encoding_is_cached(monkeypatch):
+    built = []
+    chunking.get_encoding.cache_clear()
+    monkeypatch.setattr(chunking.tiktoken, "encoding_for_model", lambda model: built.append(model) or object())
+    try:
+        assert chunking.get_encoding("gpt-4") is chunking.get_encoding("gpt-4")
+        assert built == ["gpt-4"]
+    finally:
+        chunking.get_encoding.cache_clear()
+
+
+def test_short_text_is_one_chunk(encoding):
+    chunks = chunk_text("Hello there.\n\nSecond paragraph.", chunk_size=100)
+    assert chunks == [{
+        "content": "Hello there.\n\nSecond paragraph.",
+        "token_count": len("Hello there.\n\nSecond paragraph."),
+        "chunk_index": 0,
+    }]
+    assert count_tokens("abc") == 3
+
+
+def test_document_is_encoded_once_and_split_on_paragraphs(encoding):
+    paragraphs = [("p%d " % i) + "x" * 70 for i in range(6)]
+    text = "\n\n".join(paragraphs)
+
+    chunks = chunk_text(text, chunk_size=160, chunk_overlap=0)
+
+    assert encoding.encoded == 1
+    assert [c["content"] for c in chunks] == [
+        "\n\n".join(paragraphs[0:2]), "\n\n".join(paragraphs[2:4]), "\n\n".join(paragraphs[4:6]),
+    ]
+    assert all(c["token_count"] <= 160 for c in chunks)
+    assert [c["chunk_index"] for c in chunks] == [0, 1, 2]
+
+
+def test_long_paragraph_splits_on_sentences_with_overlap(encoding):
+    sentences = ["Sentence number %d is here." % i for i in range(20)]
+    text = " ".join(sentences)
+
+    chunks = chunk_text(text, chunk_size=120, chunk_overlap=10)
+
+    assert len(chunks) > 1
+    assert all(c["token_count"] <= 120 for c in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous["content"].endswith(".")
+        # The overlap repeats the tail of the previous chunk.
+        assert previous["content"][-8:] in current["content"]
+    assert chunks[-1]["content"].endswith(sentences[-1])
+
+
+def test_unbroken_text_is_hard_cut(encoding):
+    chunks = chunk_text("y" * 250, chunk_size=100, chunk_overlap=0)
+    assert [c["token_count"] for c in chunks] == [100, 100, 50]
+
+
+def test_batch_matches_single_document_chunking(encoding):
+    texts = ["First doc.\n\n" + "a" * 300, "", "Second doc. " * 40]
+    batched = chunk_texts(texts, chunk_size=100, chunk_overlap=10)
+    assert batched == [chunk_text(t, chunk_size=100, chunk_overlap=10) for t in texts]
+    assert batched[1] == []
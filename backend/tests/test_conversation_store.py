@@ -0,0 +1,113 @@
+"""
+Conversation store tests.
+
+Pins the bounded in-process store (LRU eviction on session count and on the
+byte cap, TTL expiry through the background sweep, per-session trimming,
+copies out) and the shared Postgres store's single-statement append. Time is
+driven through the module-level `_now()` clock.
+"""
+from __future__ import annotations
+
+import json
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services import conversation as conv_mod
+from app.services.conversation import (
+    MAX_MESSAGES,
+    InMemoryConversationStore,
+    PostgresConversationStore,
+    build_conversation_store,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(conv_mod, "_now", lambda: now[0])
+    return now
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_least_recently_used_session(clock):
+    store = InMemoryConversationStore(max_sessions=2, max_bytes=10**9)
+    await store.add_message("a", "user", "hi")
+    await store.add_message("b", "user", "hi")
+    await store.get_messages("a")  # a is now most recently used
+    await store.add_message("c", "user", "hi")
+
+    assert await store.get_messages("b") == []
+    assert await store.get_messages("a") == [{"role": "user", "content": "hi"}]
+    assert len(store) == 2
+
+
+@pytest.mark.asyncio
+async def test_byte_cap_bounds_memory(clock):
+    store = InMemoryConversationStore(max_sessions=1000, max_bytes=5000)
+    for i in range(20):
+        await store.add_message(f"s{i}", "user", "x" * 1000)
+
+    assert store.total_bytes <= 5000
+    assert len(store) < 20
+    assert await store.get_messages("s19") != []
+
+
+@pytest.mark.asyncio
+async def test_sweep_expires_idle_sessions(clock):
+    store = InMemoryConversationStore(ttl_seconds=60)
+    await store.add_message("old", "user", "hi")
+    clock[0] += 45
+    await store.add_message("fresh", "user", "hi")
+    clock[0] += 30
+
+    assert await store.sweep() == 1
+    assert len(store) == 1
+    assert store.total_bytes > 0
+    clock[0] += 61
+    # An expired session reads as empty even before the next sweep.
+    assert await store.get_messages("fresh") == []
+
+
+@pytest.mark.asyncio
+async def test_history_is_trimmed_and_returned_as_a_copy(clock):
+    store = InMemoryConversationStore()
+    for i in range(MAX_MESSAGES + 5):
+        await store.add_message("s", "user", str(i))
+    await store.add_tool_result("s", "call_1", "{}")
+
+    messages = await store.get_messages("s")
+    assert len(messages) == MAX_MESSAGES
+    assert messages[-1] == {"role": "tool", "tool_call_id": "call_1", "content": "{}"}
+    messages.append({"role": "user", "content": "mutated"})
+    assert len(await store.get_messages("s")) == MAX_MESSAGES
+
+
+@pytest.mark.asyncio
+async def test_postgres_store_appends_in_one_upsert():
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(scalar_one_or_none=lambda: [{"role": "user", "content": "hi"}]))
+    db.commit = AsyncMock()
+
+    @asynccontextmanager
+    async def maker():
+        yield db
+
+    store = PostgresConversationStore(session_maker=maker)
+    await store.add_message("s", "assistant", "hello")
+
+    statement, params = db.execute.await_args.args
+    assert "ON CONFLICT (session_id) DO UPDATE" in str(statement)
+    assert json.loads(params["messages"]) == [{"role": "assistant", "content": "hello"}]
+    assert params["max_messages"] == MAX_MESSAGES
+    db.commit.assert_awaited_once()
+
+    assert await store.get_messages("s") == [{"role": "user", "content": "hi"}]
+
+
+def test_backend_is_selected_by_setting():
+    assert isinstance(build_conversation_store("memory"), InMemoryConversationStore)
+    assert isinstance(build_conversation_store("postgres"), PostgresConversationStore)
+    with pytest.raises(ValueError):
+        build_conversation_store("redis")
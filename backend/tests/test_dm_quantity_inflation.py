@@ -82,8 +82,8 @@ def _make_agent(response_sequences):
     agent.model = "gpt-4o-mini"
 
     cs = MagicMock()
-    cs.get_messages.return_value = []
-    cs.add_message = MagicMock()
+    cs.get_messages = AsyncMock(return_value=[])
+    cs.add_message = AsyncMock()
     agent.conversation_store = cs
 
     streams = iter([_AsyncStream(chunks) for chunks in response_sequences])
@@ -104,6 +104,8 @@ async def _run(agent, execute_mock, question="add white silk shirt size M to car
     with patch("app.services.agent.execute_tool", execute_mock):
         with patch("app.services.cart.get_cart_service") as mock_cart_svc:
             mock_cart_svc.return_value.load_from_db = AsyncMock()
+            mock_cart_svc.return_value.flush_turn = AsyncMock()
+            mock_cart_svc.return_value.end_turn = AsyncMock()
             async for event in agent.process_agent_stream(
                 db=AsyncMock(),
                 site_id="kasa",
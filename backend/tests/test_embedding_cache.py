@@ -0,0 +1,124 @@
+"""
+Query embedding cache tests.
+
+Pins the in-process LRU/TTL behaviour, the normalised key (model and
+dimensions included), and that EmbeddingService only sends cache misses to
+the OpenAI API. The shared Postgres tier is stubbed at its two private
+methods — no database in unit tests.
+"""
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services import embedding_cache as cache_mod
+from app.services.embedding_cache import EmbeddingCache, make_cache_key, normalize_text
+from app.services.embeddings import EmbeddingService
+
+
+def _service(cache: EmbeddingCache) -> tuple[EmbeddingService, AsyncMock]:
+    svc = EmbeddingService(cache=cache)
+
+    async def _create(model, input, dimensions):
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[float(len(t)), 0.5]) for t in input])
+
+    create = AsyncMock(side_effect=_create)
+    svc.client = SimpleNamespace(embeddings=SimpleNamespace(create=create))
+    return svc, create
+
+
+def test_normalize_text_collapses_case_and_whitespace():
+    assert normalize_text("  Delivery   Charges?\n") == "delivery charges?"
+
+
+def test_cache_key_includes_model_and_dimensions():
+    base = make_cache_key("return policy", "text-embedding-3-large", 3072)
+    assert base == make_cache_key("Return  POLICY", "text-embedding-3-large", 3072)
+    assert base != make_cache_key("return policy", "text-embedding-3-small", 3072)
+    assert base != make_cache_key("return policy", "text-embedding-3-large", 1536)
+
+
+def test_injected_empty_cache_is_used():
+    # EmbeddingCache defines __len__, so an empty one is falsy.
+    cache = EmbeddingCache(max_entries=5, ttl_seconds=60, shared=False)
+    assert EmbeddingService(cache=cache).cache is cache
+
+
+@pytest.mark.asyncio
+async def test_repeated_question_hits_cache_and_skips_api():
+    cache = EmbeddingCache(max_entries=10, ttl_seconds=60, shared=False)
+    svc, create = _service(cache)
+
+    first = await svc.create_embedding("Delivery charges?")
+    second = await svc.create_embedding("delivery   charges?")
+
+    assert first == second
+    assert create.await_count == 1
+    assert cache.stats.as_dict() == {
+        "memory_hits": 1, "shared_hits": 0, "misses": 1, "hit_rate": 0.5,
+    }
+
+
+@pytest.mark.asyncio
+async def test_batch_only_sends_misses_and_preserves_order():
+    svc, create = _service(EmbeddingCache(max_entries=10, ttl_seconds=60, shared=False))
+    await svc.create_embedding("a")
+
+    vectors = await svc.create_embeddings(["bbb", "a", "cc", "bbb"])
+
+    assert [v[0] for v in vectors] == [3.0, 1.0, 2.0, 3.0]
+    assert create.await_args.kwargs["input"] == ["bbb", "cc"]
+
+
+@pytest.mark.asyncio
+async def test_use_cache_false_bypasses_cache():
+    cache = EmbeddingCache(max_entries=10, ttl_seconds=60, shared=False)
+    svc, create = _service(cache)
+
+    await svc.create_embeddings(["chunk one"], use_cache=False)
+    await svc.create_embeddings(["chunk one"], use_cache=False)
+
+    assert create.await_count == 2
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_least_recently_used():
+    cache = EmbeddingCache(max_entries=2, ttl_seconds=60, shared=False)
+    await cache.put_many({"k1": [1.0], "k2": [2.0]}, "m", 1)
+    await cache.get_many(["k1"])  # k1 now most recent
+    await cache.put_many({"k3": [3.0]}, "m", 1)
+
+    found = await cache.get_many(["k1", "k2", "k3"])
+    assert set(found) == {"k1", "k3"}
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_misses(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_mod, "_now", lambda: now[0])
+    cache = EmbeddingCache(max_entries=10, ttl_seconds=30, shared=False)
+    await cache.put_many({"k": [1.0]}, "m", 1)
+
+    now[0] += 31
+    assert await cache.get_many(["k"]) == {}
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_shared_tier_consulted_on_local_miss_and_backfills_local(monkeypatch):
+    cache = EmbeddingCache(max_entries=10, ttl_seconds=60, shared=True)
+    get_shared = AsyncMock(return_value={"k1": [0.25, 0.5]})
+    monkeypatch.setattr(cache, "_get_shared", get_shared)
+
+    found = await cache.get_many(["k1", "k2"])
+
+    assert found == {"k1": [0.25, 0.5]}
+    get_shared.assert_awaited_once_with(["k1", "k2"])
+    assert cache.stats.shared_hits == 1
+    assert cache.stats.misses == 1
+    # Second lookup is served locally.
+    await cache.get_many(["k1"])
+    assert cache.stats.memory_hits == 1
@@ -0,0 +1,157 @@
+"""
+Embedding pipeline tests.
+
+Pins token-sized batching, the token bucket's waits, retries (429 honours
+Retry-After and drains the shared limiter, 5xx backs off, 4xx fails at
+once), and the pipelining: batches embed concurrently up to
+EMBEDDING_CONCURRENCY, `store` runs in batch order and overlaps the
+embedding of later batches, and stats report chunks per second.
+"""
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from app.services import embedding_pipeline as pipeline_mod
+from app.services.embedding_pipeline import (
+    EmbeddingPipeline,
+    EmbeddingRateLimiter,
+    TokenBucket,
+    plan_batches,
+)
+
+
+class _Clock:
+    """Stands in for _now/_sleep: sleeping advances the clock instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(pipeline_mod, "_now", clock.time)
+    monkeypatch.setattr(pipeline_mod, "_sleep", clock.sleep)
+    return clock
+
+
+def _error(cls, status: int, headers: dict | None = None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    return cls("boom", response=httpx.Response(status, request=request, headers=headers or {}), body=None)
+
+
+class _Service:
+    def __init__(self, failures=(), delays=None):
+        self.failures = list(failures)
+        self.delays = delays or {}
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create_embeddings(self, texts, use_cache=True):
+        assert use_cache is False
+        self.calls.append(list(texts))
+        if self.failures:
+            raise self.failures.pop(0)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delays.get(texts[0], 0))
+        self.in_flight -= 1
+        return [[float(len(t))] for t in texts]
+
+
+def test_plan_batches_by_tokens_and_items():
+    assert plan_batches([400, 400, 400, 9000, 10], max_tokens=1000, max_items=10) == [(0, 2), (2, 3), (3, 4), (4, 5)]
+    assert plan_batches([1] * 5, max_tokens=1000, max_items=2) == [(0, 2), (2, 4), (4, 5)]
+    assert plan_batches([], max_tokens=1000, max_items=2) == []
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(per_minute=600)  # 10 per second
+
+    await bucket.acquire(600)
+    assert clock.sleeps == []
+    await bucket.acquire(50)
+    assert clock.sleeps == [pytest.approx(5.0)]
+    # Disabled bucket never waits.
+    await TokenBucket(per_minute=0).acquire(10**9)
+    assert len(clock.sleeps) == 1
+
+
+@pytest.mark.asyncio
+async def test_429_honours_retry_after_and_drains_limiter(clock, monkeypatch):
+    monkeypatch.setattr(pipeline_mod.settings, "embedding_max_retries", 3)
+    service = _Service(failures=[_error(openai.RateLimitError, 429, {"retry-after": "7"})])
+    limiter = EmbeddingRateLimiter(tokens_per_minute=100000, requests_per_minute=600)
+    stored = []
+
+    async def store(start, end, embeddings):
+        stored.append((start, end, embeddings))
+
+    stats = await EmbeddingPipeline(service, limiter).run(["ab", "cde"], store, [1, 1])
+
+    assert stored == [(0, 2, [[2.0], [3.0]])]
+    assert (stats.requests, stats.retries) == (2, 1)
+    # Retry-After first; then the retry waits for the drained request bucket.
+    assert clock.sleeps[0] == 7.0
+    assert limiter.requests.tokens < 600
+
+
+@pytest.mark.asyncio
+async def test_5xx_retries_with_backoff_and_4xx_fails_fast(clock, monkeypatch):
+    monkeypatch.setattr(pipeline_mod.settings, "embedding_max_retries", 2)
+    monkeypatch.setattr(pipeline_mod.settings, "embedding_retry_base_seconds", 1.0)
+    limiter = EmbeddingRateLimiter(0, 0)
+
+    async def store(start, end, embeddings):
+        pass
+
+    flaky = _Service(failures=[_error(openai.InternalServerError, 503), _error(openai.InternalServerError, 502)])
+    stats = await EmbeddingPipeline(flaky, limiter).run(["a"], store, [1])
+    assert stats.retries == 2
+    assert 0.5 <= clock.sleeps[0] <= 1.0 and 1.0 <= clock.sleeps[1] <= 2.0
+
+    down = _Service(failures=[_error(openai.InternalServerError, 500)] * 3)
+    with pytest.raises(openai.InternalServerError):
+        await EmbeddingPipeline(down, limiter).run(["a"], store, [1])
+    assert len(down.calls) == 3
+
+    bad = _Service(failures=[_error(openai.BadRequestError, 400)])
+    with pytest.raises(openai.BadRequestError):
+        await EmbeddingPipeline(bad, limiter).run(["a"], store, [1])
+    assert len(bad.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_batches_run_concurrently_and_store_in_order(monkeypatch):
+    monkeypatch.setattr(pipeline_mod.settings, "embedding_batch_max_tokens", 10)
+    monkeypatch.setattr(pipeline_mod.settings, "embedding_batch_max_items", 1)
+    monkeypatch.setattr(pipeline_mod.settings, "embedding_concurrency", 2)
+    # Batch 0 is the slowest, so later batches finish first.
+    service = _Service(delays={"t0": 0.03, "t1": 0.01, "t2": 0.0})
+    events = []
+
+    async def store(start, end, embeddings):
+        events.append(("store", start, len(service.calls)))
+        await asyncio.sleep(0)
+
+    stats = await EmbeddingPipeline(service, EmbeddingRateLimiter(0, 0)).run(["t0", "t1", "t2"], store, [1, 1, 1])
+
+    assert [e[1] for e in events] == [0, 1, 2]
+    assert service.max_in_flight == 2
+    # Batch 2 started embedding before batch 0 was stored: the upsert overlaps it.
+    assert events[0][2] == 3
+    assert stats.chunks == 3 and stats.chunks_per_second > 0
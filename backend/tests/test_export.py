@@ -0,0 +1,146 @@
+"""
+Streaming export tests.
+
+Pins the export engine: column whitelisting and per-endpoint defaults
+(the old CSV headers), created_at range filters with tz-aware bounds
+normalised to naive UTC, CSV/NDJSON encoding of datetimes and NULLs, a
+gzip container that decompresses to the plain body, and that rows are read
+batch by batch from a server-side cursor and encoded as they arrive rather
+than collected first.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.api import dashboard
+from app.services import export
+from app.services.export import (
+    LEADS,
+    QUERY_EXPORT_COLUMNS,
+    QUERY_LOGS,
+    ExportRequestError,
+    build_query,
+    export_response,
+    select_columns,
+)
+
+CREATED = datetime(2026, 10, 1, 9, 30)
+
+
+def test_select_columns_defaults_whitelist_and_dedupes():
+    assert select_columns(QUERY_LOGS, None, QUERY_EXPORT_COLUMNS) == list(QUERY_EXPORT_COLUMNS)
+    assert select_columns(QUERY_LOGS, " question, created_at,question ", QUERY_EXPORT_COLUMNS) == [
+        "question", "created_at",
+    ]
+    with pytest.raises(ExportRequestError, match="ip_hash"):
+        select_columns(QUERY_LOGS, "question,ip_hash", QUERY_EXPORT_COLUMNS)
+
+
+def test_build_query_selects_columns_for_tenant_and_range():
+    customer_id = uuid.uuid4()
+    npt = timezone(timedelta(hours=5, minutes=45))
+
+    statement = build_query(
+        LEADS, customer_id, ["email", "created_at"], since=datetime(2026, 10, 1, 5, 45, tzinfo=npt),
+        until=datetime(2026, 10, 2),
+    )
+
+    compiled = statement.compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert sql.startswith("SELECT user_profiles.email, user_profiles.created_at \nFROM user_profiles")
+    assert "ORDER BY user_profiles.created_at DESC" in sql
+    assert compiled.params["customer_id_1"] == customer_id
+    assert compiled.params["created_at_1"] == datetime(2026, 10, 1, 0, 0)
+    assert compiled.params["created_at_2"] == datetime(2026, 10, 2)
+
+
+class _FakeStream:
+    def __init__(self, batches, pulled):
+        self.batches = batches
+        self.pulled = pulled
+
+    async def partitions(self, size):
+        for batch in self.batches:
+            self.pulled.append(len(batch))
+            yield batch
+
+
+def _session_maker(batches, pulled, statements):
+    async def _stream(statement):
+        statements.append(statement)
+        return _FakeStream(batches, pulled)
+
+    @asynccontextmanager
+    async def _maker():
+        yield SimpleNamespace(stream=_stream)
+
+    return _maker
+
+
+async def _body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+@pytest.mark.asyncio
+async def test_csv_export_streams_batches_from_a_server_side_cursor(monkeypatch):
+    monkeypatch.setattr(export.settings, "export_batch_size", 2)
+    batches = [[("Hi, there", None, CREATED), ("Hours?", 0.5, CREATED)], [("Returns?", 0.25, CREATED)]]
+    pulled, statements = [], []
+
+    response = export_response(
+        QUERY_LOGS, uuid.uuid4(), "acme_queries", QUERY_EXPORT_COLUMNS,
+        columns="question,top_score,created_at", session_maker=_session_maker(batches, pulled, statements),
+    )
+    chunks = response.body_iterator
+    header = await chunks.__anext__()
+    first = await chunks.__anext__()
+
+    assert pulled == [2]  # encoded before the next batch is read
+    assert statements[0].get_execution_options()["yield_per"] == 2
+    assert header == b"question,top_score,created_at\r\n"
+    assert first == b'"Hi, there",,2026-10-01T09:30:00\r\nHours?,0.5,2026-10-01T09:30:00\r\n'
+    assert b"".join([chunk async for chunk in chunks]) == b"Returns?,0.25,2026-10-01T09:30:00\r\n"
+    assert response.media_type == "text/csv"
+    assert response.headers["content-disposition"] == "attachment; filename=acme_queries.csv"
+
+
+@pytest.mark.asyncio
+async def test_ndjson_export_gzipped():
+    lead_id = uuid.uuid4()
+    batches = [[(lead_id, "a@example.test", None, CREATED)]]
+
+    response = export_response(
+        LEADS, uuid.uuid4(), "acme_leads", ("email",), columns="id,email,phone,created_at", fmt="ndjson",
+        compress=True, session_maker=_session_maker(batches, [], []),
+    )
+    body = gzip.decompress(await _body(response))
+
+    assert [json.loads(line) for line in body.splitlines()] == [
+        {"id": str(lead_id), "email": "a@example.test", "phone": None, "created_at": "2026-10-01T09:30:00"},
+    ]
+    assert response.media_type == "application/gzip"
+    assert response.headers["content-disposition"] == "attachment; filename=acme_leads.ndjson.gz"
+
+
+@pytest.mark.asyncio
+async def test_unknown_column_is_a_400():
+    customer = SimpleNamespace(id=uuid.uuid4(), site_id="acme")
+
+    with pytest.raises(HTTPException) as exc:
+        await dashboard.export_queries(
+            columns="question,ip_hash", fmt="csv", gzip=False, from_=None, to=None, customer=customer,
+        )
+
+    assert exc.value.status_code == 400
+    with pytest.raises(ExportRequestError):
+        export_response(QUERY_LOGS, customer.id, "x", QUERY_EXPORT_COLUMNS, fmt="xlsx", session_maker=AsyncMock())
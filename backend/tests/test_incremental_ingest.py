@@ -0,0 +1,116 @@
+"""
+Incremental re-crawl tests.
+
+Pins IngestionService._diff_page_chunks: a re-crawled page's chunks are
+matched to its stored chunks by content hash, so only new text is sent for
+embedding, unchanged chunks keep their row and vector id, and chunks that
+disappeared (including duplicate copies from earlier full re-ingests) are
+deleted with their vector ids queued for removal. Also pins that
+_process_chunks commits once, after every embedding batch is written, so a
+failed batch leaves the crawl's page hashes and deletes uncommitted.
+"""
+from __future__ import annotations
+
+import hashlib
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.models import DocumentChunk
+from app.services import chunk_writer
+from app.services import embedding_pipeline
+from app.services.ingestion import IngestionService
+
+
+def _row(content: str, vector_id: str, with_hash: bool = True) -> DocumentChunk:
+    return DocumentChunk(
+        id=uuid.uuid4(),
+        vector_id=vector_id,
+        chunk_index=0,
+        content=content,
+        content_hash=hashlib.sha256(content.encode()).hexdigest() if with_hash else None,
+        source_url="https://shop.test/about",
+    )
+
+
+@pytest.mark.asyncio
+async def test_only_changed_chunks_are_returned_and_vanished_are_deleted():
+    stored = [
+        _row("intro", "job1_0"),
+        _row("returns policy", "job1_1", with_hash=False),  # pre-hash legacy row
+        _row("old shipping text", "job1_2"),
+        _row("intro", "job0_0"),  # duplicate left by an earlier re-ingest
+    ]
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = stored
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=result)
+    svc = IngestionService.__new__(IngestionService)
+    vanished: list[str] = []
+
+    chunks = [
+        {"content": "returns policy", "chunk_index": 0},
+        {"content": "intro", "chunk_index": 1},
+        {"content": "new shipping text", "chunk_index": 2},
+    ]
+    fresh, kept, deleted = await svc._diff_page_chunks(
+        db, uuid.uuid4(), "https://shop.test/about", chunks, vanished,
+    )
+
+    assert [c["content"] for c in fresh] == ["new shipping text"]
+    assert (kept, deleted) == (2, 2)
+    # One "intro" copy is kept (the last stored), the other is deleted.
+    assert sorted(vanished) == ["job1_0", "job1_2"]
+    assert stored[3].chunk_index == 1
+    assert stored[1].chunk_index == 0 and stored[1].content_hash is not None
+    assert db.execute.await_count == 2  # one SELECT, one bulk DELETE
+
+
+def _chunking_service(monkeypatch, embed):
+    monkeypatch.setattr(chunk_writer.settings, "chunk_write_method", "insert")
+    monkeypatch.setattr(embedding_pipeline.settings, "embedding_batch_max_items", 1)
+    monkeypatch.setattr(embedding_pipeline.settings, "embedding_max_retries", 0)
+    svc = IngestionService.__new__(IngestionService)
+    svc.embedding_service = MagicMock(create_embeddings=AsyncMock(side_effect=embed))
+    svc.vector_store = MagicMock(upsert_vectors=AsyncMock())
+    return svc
+
+
+def _chunks(count: int) -> list[dict]:
+    return [{"content": f"chunk {i}", "chunk_index": i, "token_count": 2} for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_process_chunks_commits_once_after_every_batch(monkeypatch):
+    events = []
+    svc = _chunking_service(monkeypatch, lambda texts, use_cache: [[0.1]] * len(texts))
+    db = MagicMock(
+        execute=AsyncMock(side_effect=lambda *a: events.append("write")),
+        commit=AsyncMock(side_effect=lambda: events.append("commit")),
+    )
+    job = SimpleNamespace(id=uuid.uuid4(), customer_id=uuid.uuid4(), embedding_chunks=None, embedding_seconds=None)
+
+    await svc._process_chunks(db, job, "acme", _chunks(3))
+
+    assert events == ["write", "write", "write", "commit"]
+    assert job.embedding_chunks == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_commits_nothing(monkeypatch):
+    def embed(texts, use_cache):
+        if texts == ["chunk 2"]:
+            raise RuntimeError("embedding failed")
+        return [[0.1]] * len(texts)
+
+    svc = _chunking_service(monkeypatch, embed)
+    db = MagicMock(execute=AsyncMock(), commit=AsyncMock())
+    job = SimpleNamespace(id=uuid.uuid4(), customer_id=uuid.uuid4(), embedding_chunks=None, embedding_seconds=None)
+
+    with pytest.raises(RuntimeError):
+        await svc._process_chunks(db, job, "acme", _chunks(3))
+
+    # Earlier batches were written but left for ingest_url's rollback.
+    db.commit.assert_not_awaited()
@@ -0,0 +1,201 @@
+"""
+Ingestion queue tests.
+
+Pins the durable queue contract without a database: the claim SQL takes due
+and stale-heartbeat rows with FOR UPDATE SKIP LOCKED and spends an attempt;
+enqueue creates the pending IngestionJob alongside the task; a claimed task
+is dispatched by kind with its job, then marked done, re-queued with backoff,
+or failed once attempts run out; the worker never claims more than its free
+slots and hands unfinished tasks back on shutdown. Queued (pending) jobs
+make a tenant's ingestion status "processing", not "empty".
+"""
+from __future__ import annotations
+
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models import IngestionJob, IngestionTask
+from app.services import ingestion_queue as queue_mod
+from app.services.ingestion_queue import (
+    CLAIM_SQL,
+    FINISH_SQL,
+    RELEASE_SQL,
+    RETRY_SQL,
+    IngestionWorker,
+    enqueue_ingestion,
+    retry_delay_seconds,
+)
+from app.services.query import QueryService
+
+
+def _session(objects: dict | None = None) -> MagicMock:
+    objects = objects or {}
+    db = MagicMock()
+    db.add = MagicMock()
+    db.commit = AsyncMock()
+    db.rollback = AsyncMock()
+    db.execute = AsyncMock()
+    db.get = AsyncMock(side_effect=lambda model, key: objects.get((model, key)))
+    return db
+
+
+def _patch_sessions(monkeypatch, db):
+    @asynccontextmanager
+    async def maker():
+        yield db
+
+    monkeypatch.setattr(queue_mod, "async_session_maker", maker)
+
+
+def _executed(db, statement) -> list[dict]:
+    return [c.args[1] for c in db.execute.await_args_list if c.args[0] is statement]
+
+
+def _task(kind="url", attempts=1, max_attempts=3, with_job=True):
+    task = IngestionTask(
+        id=uuid.uuid4(), customer_id=uuid.uuid4(), kind=kind,
+        payload={"site_id": "shop", "url": "https://shop.test/"},
+        attempts=attempts, max_attempts=max_attempts,
+    )
+    job = None
+    if with_job:
+        job = IngestionJob(id=uuid.uuid4(), customer_id=task.customer_id, source_type="url", status="pending")
+        task.job_id = job.id
+    objects = {(IngestionTask, task.id): task}
+    if job is not None:
+        objects[(IngestionJob, job.id)] = job
+    return task, job, objects
+
+
+def test_claim_sql_skips_locked_rows_and_reclaims_stale_heartbeats():
+    sql = " ".join(str(CLAIM_SQL).split())
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "status = 'queued' AND run_after <= NOW()" in sql
+    assert "status = 'running' AND heartbeat_at < NOW()" in sql
+    assert "attempts = t.attempts + 1" in sql
+    assert "LIMIT :limit" in sql
+
+
+@pytest.mark.asyncio
+async def test_enqueue_creates_pending_job_with_the_task():
+    db = _session()
+    task = await enqueue_ingestion(
+        db, customer_id=uuid.uuid4(), site_id="shop", kind="url", payload={"url": "https://shop.test/"},
+    )
+
+    job, queued = [c.args[0] for c in db.add.call_args_list]
+    assert isinstance(job, IngestionJob) and job.status == "pending"
+    assert job.source_url == "https://shop.test/"
+    assert queued is task and task.job_id == job.id
+    assert task.status == "queued" and task.payload["site_id"] == "shop"
+    db.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_enqueue_auto_ingest_has_no_job_and_unknown_kinds_are_rejected():
+    db = _session()
+    task = await enqueue_ingestion(
+        db, customer_id=uuid.uuid4(), site_id="shop", kind="auto_ingest",
+        payload={"domains": ["shop.test"]}, commit=False,
+    )
+    assert task.job_id is None
+    assert db.add.call_count == 1
+    db.commit.assert_not_awaited()
+
+    with pytest.raises(ValueError):
+        await enqueue_ingestion(db, customer_id=uuid.uuid4(), site_id="shop", kind="bogus", payload={})
+
+
+@pytest.mark.asyncio
+async def test_successful_task_is_dispatched_with_its_job_and_marked_done(monkeypatch):
+    task, job, objects = _task()
+    db = _session(objects)
+    _patch_sessions(monkeypatch, db)
+    handler = AsyncMock()
+    monkeypatch.setitem(queue_mod.HANDLERS, "url", handler)
+
+    await IngestionWorker(worker_id="w1").run_task(task.id)
+
+    handler.assert_awaited_once_with(db, task, job)
+    assert _executed(db, FINISH_SQL) == [{"id": task.id, "worker_id": "w1", "status": "done", "error": None}]
+    assert _executed(db, RETRY_SQL) == []
+
+
+@pytest.mark.asyncio
+async def test_failed_task_is_requeued_with_backoff_until_attempts_run_out(monkeypatch):
+    monkeypatch.setitem(queue_mod.HANDLERS, "url", AsyncMock(side_effect=RuntimeError("boom")))
+
+    task, _, objects = _task(attempts=1, max_attempts=3)
+    db = _session(objects)
+    _patch_sessions(monkeypatch, db)
+    await IngestionWorker(worker_id="w1").run_task(task.id)
+
+    db.rollback.assert_awaited_once()
+    [retry] = _executed(db, RETRY_SQL)
+    assert retry["id"] == task.id and "boom" in retry["error"]
+    assert _executed(db, FINISH_SQL) == []
+
+    task, _, objects = _task(attempts=3, max_attempts=3)
+    db = _session(objects)
+    _patch_sessions(monkeypatch, db)
+    await IngestionWorker(worker_id="w1").run_task(task.id)
+
+    assert _executed(db, RETRY_SQL) == []
+    [finish] = _executed(db, FINISH_SQL)
+    assert finish["status"] == "failed" and "boom" in finish["error"]
+
+
+def test_retry_delay_doubles_and_is_capped():
+    delays = [retry_delay_seconds(n, base_seconds=10) for n in (1, 2, 3)]
+    assert 8 <= delays[0] <= 12
+    assert 16 <= delays[1] <= 24
+    assert 32 <= delays[2] <= 48
+    assert retry_delay_seconds(30, base_seconds=10) <= queue_mod.MAX_BACKOFF_SECONDS * 1.2
+
+
+@pytest.mark.asyncio
+async def test_worker_claims_only_free_slots_and_releases_on_shutdown(monkeypatch):
+    db = _session()
+    _patch_sessions(monkeypatch, db)
+    monkeypatch.setattr(queue_mod, "POLL_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(queue_mod, "SHUTDOWN_GRACE_SECONDS", 0.01)
+
+    limits: list[int] = []
+    claimed = [uuid.uuid4(), uuid.uuid4(), uuid.uuid4()]
+
+    async def fake_claim(session, worker_id, limit, stale_seconds):
+        limits.append(limit)
+        ids, claimed[:] = claimed[:limit], claimed[limit:]
+        return ids
+
+    monkeypatch.setattr(queue_mod, "claim_tasks", fake_claim)
+    worker = IngestionWorker(concurrency=2, worker_id="w1")
+    monkeypatch.setattr(worker, "run_task", lambda task_id: asyncio.sleep(60))
+
+    stop_event = asyncio.Event()
+    runner = asyncio.create_task(worker.run(stop_event))
+    await asyncio.sleep(0.05)
+    stop_event.set()
+    await runner
+
+    # Both slots filled on the first tick; nothing more claimed while busy.
+    assert limits == [2]
+    [release] = _executed(db, RELEASE_SQL)
+    assert len(release["ids"]) == 2 and release["worker_id"] == "w1"
+
+
+@pytest.mark.asyncio
+async def test_pending_jobs_count_as_processing_in_ingestion_status():
+    row = MagicMock(total=2, completed=0, processing=2)
+    db = MagicMock(execute=AsyncMock(return_value=MagicMock(one=lambda: row)))
+
+    assert await QueryService._check_ingestion_status(None, db, uuid.uuid4()) == "processing"
+    sql = str(db.execute.await_args.args[0].compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True},
+    ))
+    assert "IN ('pending', 'processing')" in sql
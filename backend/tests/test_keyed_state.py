@@ -0,0 +1,118 @@
+"""
+Keyed state store tests.
+
+Pins the in-process store (per-key TTL, LRU bound on key count, atomic pop,
+add-if-absent, oversized values refused) and the shared Postgres store's
+single-statement pop. Time is driven through the module-level `_now()` clock.
+"""
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services import keyed_state as ks_mod
+from app.services.keyed_state import (
+    MAX_VALUE_BYTES,
+    InMemoryKeyedStateStore,
+    PostgresKeyedStateStore,
+    build_keyed_state_store,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ks_mod, "_now", lambda: now[0])
+    return now
+
+
+@pytest.mark.asyncio
+async def test_keys_expire_per_key(clock):
+    store = InMemoryKeyedStateStore()
+    await store.set("ns", "short", "a", ttl_seconds=10)
+    await store.set("ns", "long", "b", ttl_seconds=100)
+    clock[0] += 11
+
+    assert await store.get("ns", "short") is None
+    assert await store.get("ns", "long") == "b"
+    clock[0] += 100
+    assert await store.sweep() == 1
+    assert len(store) == 0
+
+
+@pytest.mark.asyncio
+async def test_pop_returns_value_once(clock):
+    store = InMemoryKeyedStateStore()
+    await store.set("ns", "k", "pid-1", ttl_seconds=60)
+
+    assert await store.pop("ns", "k") == "pid-1"
+    assert await store.pop("ns", "k") is None
+    await store.set("ns", "k", "pid-2", ttl_seconds=60)
+    clock[0] += 61
+    assert await store.pop("ns", "k") is None
+
+
+@pytest.mark.asyncio
+async def test_add_only_sets_absent_or_expired_keys(clock):
+    store = InMemoryKeyedStateStore()
+    assert await store.add("ns", "k", "first", ttl_seconds=60)
+    assert not await store.add("ns", "k", "second", ttl_seconds=60)
+    assert await store.get("ns", "k") == "first"
+    clock[0] += 61
+    assert await store.add("ns", "k", "third", ttl_seconds=60)
+    assert await store.get("ns", "k") == "third"
+
+
+@pytest.mark.asyncio
+async def test_entry_bound_evicts_least_recently_set_and_values_are_copies(clock):
+    store = InMemoryKeyedStateStore(max_entries=2)
+    await store.set("ns", "a", [{"id": 1}], ttl_seconds=60)
+    await store.set("other", "a", [{"id": 2}], ttl_seconds=60)
+    await store.set("ns", "b", [{"id": 3}], ttl_seconds=60)
+
+    assert await store.get("ns", "a") is None
+    value = await store.get("other", "a")
+    value.append({"id": 4})
+    assert await store.get("other", "a") == [{"id": 2}]
+    assert len(store) == 2
+
+
+@pytest.mark.asyncio
+async def test_oversized_values_are_refused(clock):
+    store = InMemoryKeyedStateStore()
+    await store.set("ns", "k", "x" * MAX_VALUE_BYTES, ttl_seconds=60)
+    assert await store.get("ns", "k") is None
+    assert not await store.add("ns", "k", "x" * MAX_VALUE_BYTES, ttl_seconds=60)
+
+
+@pytest.mark.asyncio
+async def test_postgres_pop_is_one_delete_returning():
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=[
+        MagicMock(one_or_none=lambda: SimpleNamespace(value="pid-1", live=True)),
+        MagicMock(one_or_none=lambda: SimpleNamespace(value="pid-2", live=False)),
+    ])
+    db.commit = AsyncMock()
+
+    @asynccontextmanager
+    async def maker():
+        yield db
+
+    store = PostgresKeyedStateStore(session_maker=maker)
+    assert await store.pop("ns", "k") == "pid-1"
+    statement, params = db.execute.await_args.args
+    assert "DELETE FROM keyed_state" in str(statement) and "RETURNING" in str(statement)
+    assert params == {"namespace": "ns", "key": "k"}
+    # An expired row is deleted but not returned.
+    assert await store.pop("ns", "k") is None
+    assert db.commit.await_count == 2
+
+
+def test_backend_is_selected_by_setting():
+    assert isinstance(build_keyed_state_store("memory"), InMemoryKeyedStateStore)
+    assert isinstance(build_keyed_state_store("postgres"), PostgresKeyedStateStore)
+    with pytest.raises(ValueError):
+        build_keyed_state_store("redis")
@@ -0,0 +1,75 @@
+"""
+Keyword search tests.
+
+Pins that document_chunks.search_vector is a generated column the app never
+writes (inserts leave it out, ingestion's bulk write runs no backfill
+UPDATE), and that
+_keyword_search parses the question once with websearch_to_tsquery, filters
+by tenant and ranks every tenant match (no cap ahead of the ORDER BY).
+"""
+from __future__ import annotations
+
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql
+
+from app.models import DocumentChunk
+from app.services import chunk_writer
+from app.services.ingestion import IngestionService
+from app.services.query import QueryService
+
+
+def test_search_vector_is_generated_and_never_inserted():
+    column = DocumentChunk.__table__.c.search_vector
+    assert column.computed is not None and column.computed.persisted
+
+    statement = insert(DocumentChunk).values(
+        customer_id=uuid.uuid4(), job_id=uuid.uuid4(), vector_id="j_0", chunk_index=0, content="hello",
+    )
+    assert "search_vector" not in str(statement.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.asyncio
+async def test_keyword_search_parses_query_once_per_tenant():
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(fetchall=lambda: [("v2", 0.4), ("v1", 0.1)]))
+    customer_id = uuid.uuid4()
+
+    ids = await QueryService._keyword_search(None, db, customer_id, '"free delivery" -express', limit=8)
+
+    assert ids == ["v2", "v1"]
+    statement, params = db.execute.await_args.args
+    sql = str(statement)
+    assert sql.count("websearch_to_tsquery") == 1
+    assert "plainto_tsquery" not in sql
+    assert "customer_id = :customer_id" in sql
+    # The only LIMIT is the final one, after ranking.
+    assert sql.count("LIMIT") == 1 and sql.index("ORDER BY rank DESC") < sql.index("LIMIT")
+    assert params == {"query": '"free delivery" -express', "customer_id": str(customer_id), "limit": 8}
+
+
+@pytest.mark.asyncio
+async def test_process_chunks_runs_no_search_vector_backfill(monkeypatch):
+    monkeypatch.setattr(chunk_writer.settings, "chunk_write_method", "insert")
+    svc = IngestionService.__new__(IngestionService)
+    svc.embedding_service = MagicMock(create_embeddings=AsyncMock(return_value=[[0.1], [0.2]]))
+    svc.vector_store = MagicMock(upsert_vectors=AsyncMock())
+    db = MagicMock(commit=AsyncMock(), execute=AsyncMock())
+    job = SimpleNamespace(id=uuid.uuid4(), customer_id=uuid.uuid4(), embedding_chunks=None, embedding_seconds=None)
+
+    await svc._process_chunks(db, job, "acme", [
+        {"content": "Delivery is free.", "chunk_index": 0, "token_count": 4},
+        {"content": "Returns within 7 days.", "chunk_index": 1, "token_count": 5},
+    ])
+
+    # One bulk INSERT of both rows; no UPDATE afterwards.
+    db.execute.assert_awaited_once()
+    statement, rows = db.execute.await_args.args
+    sql = str(statement.compile(dialect=postgresql.dialect(), column_keys=list(rows[0])))
+    assert sql.startswith("INSERT INTO document_chunks")
+    assert "search_vector" not in sql
+    assert [row["vector_id"] for row in rows] == [f"{job.id}_0", f"{job.id}_1"]
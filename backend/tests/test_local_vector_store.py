@@ -0,0 +1,144 @@
+"""
+Local vector index tests.
+
+Pins the LocalVectorIndex backend behind VectorStoreService: cosine top-k
+ordering, the site_id / type metadata filters query_vectors builds, upsert
+overwrite, deletes (by id and whole namespace), namespace isolation, and
+memory-mapped persistence — a second index instance on the same directory
+(standing in for another worker) sees writes, including after compaction.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.services.local_vector_index import LocalVectorIndex
+from app.services.vector_store import VectorStoreService, build_vector_index
+
+
+def _vec(*values):
+    return list(values)
+
+
+@pytest.fixture
+def service(tmp_path):
+    return VectorStoreService(index=LocalVectorIndex(tmp_path), max_concurrency=2)
+
+
+async def _seed(service):
+    await service.upsert_vectors([
+        {"id": "c1", "values": _vec(1.0, 0.0, 0.0), "metadata": {"site_id": "acme", "job_id": "j1"}},
+        {"id": "c2", "values": _vec(0.8, 0.6, 0.0), "metadata": {"site_id": "acme", "job_id": "j1"}},
+        {"id": "p1", "values": _vec(0.9, 0.0, 0.1), "metadata": {"site_id": "acme", "type": "product", "product_id": "42"}},
+        {"id": "x1", "values": _vec(0.0, 0.0, 1.0), "metadata": {"site_id": "acme"}},
+    ], namespace="acme")
+
+
+@pytest.mark.asyncio
+async def test_query_returns_cosine_top_k_in_order(service):
+    await _seed(service)
+
+    matches = await service.query_vectors(_vec(2.0, 0.0, 0.0), namespace="acme", top_k=3, site_id="acme")
+
+    assert [m["id"] for m in matches] == ["c1", "p1", "c2"]
+    assert matches[0]["score"] == pytest.approx(1.0, abs=1e-6)
+    assert matches[2]["score"] == pytest.approx(0.8, abs=1e-6)
+    assert matches[0]["metadata"] == {}  # metadata only when a type filter asks for it
+
+
+@pytest.mark.asyncio
+async def test_metadata_filters_match_query_vectors(service):
+    await _seed(service)
+
+    products = await service.query_vectors(
+        _vec(1.0, 0.0, 0.0), namespace="acme", top_k=10, site_id="acme", filter_metadata={"type": "product"},
+    )
+    assert [m["id"] for m in products] == ["p1"]
+    assert products[0]["metadata"]["product_id"] == "42"
+
+    assert await service.query_vectors(_vec(1.0, 0.0, 0.0), namespace="acme", site_id="other") == []
+
+
+@pytest.mark.asyncio
+async def test_upsert_overwrites_and_delete_removes(service):
+    await _seed(service)
+    await service.upsert_vectors([{"id": "x1", "values": _vec(1.0, 0.0, 0.0), "metadata": {"site_id": "acme"}}], namespace="acme")
+    await service.delete_vectors(["c1"], namespace="acme")
+
+    matches = await service.query_vectors(_vec(1.0, 0.0, 0.0), namespace="acme", top_k=2)
+    assert [m["id"] for m in matches] == ["x1", "p1"]
+
+
+@pytest.mark.asyncio
+async def test_namespaces_are_isolated_and_deletable(service):
+    await _seed(service)
+    await service.upsert_vectors([{"id": "o1", "values": _vec(1.0, 0.0, 0.0), "metadata": {}}], namespace="other site")
+
+    await service.delete_namespace("acme")
+
+    assert await service.query_vectors(_vec(1.0, 0.0, 0.0), namespace="acme") == []
+    assert [m["id"] for m in await service.query_vectors(_vec(1.0, 0.0, 0.0), namespace="other site")] == ["o1"]
+
+
+def test_second_instance_sees_writes_through_shared_files(tmp_path):
+    writer = LocalVectorIndex(tmp_path)
+    reader = LocalVectorIndex(tmp_path)
+    writer.upsert([{"id": "a", "values": [1.0, 0.0], "metadata": {}}], namespace="acme")
+    assert [m.id for m in reader.query([1.0, 0.0], namespace="acme", top_k=5).matches] == ["a"]
+
+    # Grow past the initial capacity and compact away most rows — forces new
+    # generation files the reader has to remap.
+    rng = np.random.default_rng(0)
+    writer.upsert(
+        [{"id": f"v{i}", "values": rng.normal(size=2).tolist(), "metadata": {}} for i in range(600)],
+        namespace="acme",
+    )
+    writer.delete(ids=[f"v{i}" for i in range(600)], namespace="acme")
+    writer.upsert([{"id": "b", "values": [0.0, 1.0], "metadata": {}}], namespace="acme")
+
+    assert [m.id for m in reader.query([0.0, 1.0], namespace="acme", top_k=5).matches] == ["b", "a"]
+    assert len(list((tmp_path / "acme").glob("vectors.*.f32"))) == 1
+    assert len(list((tmp_path / "acme").glob("rows.*.jsonl"))) == 1
+
+
+def test_upsert_appends_to_journal_without_rewriting_meta(tmp_path):
+    writer = LocalVectorIndex(tmp_path)
+    reader = LocalVectorIndex(tmp_path)
+    writer.upsert([{"id": "a", "values": [1.0, 0.0], "metadata": {"n": 1}}], namespace="acme")
+    meta = (tmp_path / "acme" / "meta.json").stat()
+
+    writer.upsert([{"id": "b", "values": [0.0, 1.0], "metadata": {"n": 2}}], namespace="acme")
+    writer.upsert([{"id": "a", "values": [0.6, 0.8], "metadata": {"n": 3}}], namespace="acme")
+    writer.delete(ids=["b"], namespace="acme")
+
+    after = (tmp_path / "acme" / "meta.json").stat()
+    assert (after.st_ino, after.st_mtime_ns) == (meta.st_ino, meta.st_mtime_ns)
+    (journal,) = (tmp_path / "acme").glob("rows.*.jsonl")
+    assert len(journal.read_text().splitlines()) == 4
+    matches = reader.query([0.0, 1.0], namespace="acme", top_k=5, include_metadata=True).matches
+    assert [(m.id, m.metadata) for m in matches] == [("a", {"n": 3})]
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    index = LocalVectorIndex(tmp_path)
+    index.upsert([{"id": "a", "values": [1.0, 0.0]}], namespace="acme")
+    with pytest.raises(ValueError):
+        index.upsert([{"id": "b", "values": [1.0, 0.0, 0.0]}], namespace="acme")
+
+
+def test_build_vector_index_selects_local_backend(tmp_path, monkeypatch):
+    from app.services import vector_store as vs_mod
+
+    monkeypatch.setattr(vs_mod.settings, "local_vector_index_dir", str(tmp_path))
+    assert isinstance(build_vector_index("local"), LocalVectorIndex)
+    with pytest.raises(ValueError):
+        build_vector_index("faiss")
+
+
+def test_build_vector_index_requires_pinecone_credentials(monkeypatch):
+    from app.services import vector_store as vs_mod
+
+    monkeypatch.setattr(vs_mod.settings, "pinecone_api_key", "")
+    monkeypatch.setattr(vs_mod.settings, "pinecone_host", "https://idx.example.pinecone.io")
+    with pytest.raises(ValueError, match="PINECONE_API_KEY must be set"):
+        build_vector_index("pinecone")
@@ -0,0 +1,110 @@
+"""
+Order line-item tests.
+
+Pins that a new order writes one order_items row per cart line in the same
+commit as the order (with the fallbacks the migration 050 backfill uses),
+and that the ecommerce analytics endpoints aggregate in SQL: top products
+from order_items joined to paid orders, overview KPIs in a single query.
+"""
+from __future__ import annotations
+
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.api import ecommerce_dashboard
+from app.models import OrderItem
+from app.services import order as order_mod
+from app.services.cart import CartItem, CartState
+from app.services.order import OrderService, build_order_items
+
+
+def test_build_order_items_uses_backfill_fallbacks():
+    order = SimpleNamespace(
+        id=uuid.uuid4(), customer_id=uuid.uuid4(), currency="NPR", created_at=datetime(2026, 10, 1, 12, 0),
+    )
+
+    rows = build_order_items(order, [
+        {"product_id": "p1", "name": "Tee", "price": 1499.0, "quantity": 2, "size": "M", "color": ""},
+        {"name": "Gift wrap", "price": 100.0},
+        {},
+        {"product_id": None, "name": "Sticker"},
+    ])
+
+    assert [(r.line_no, r.product_id, r.name, r.price, r.quantity) for r in rows] == [
+        (0, "p1", "Tee", 1499.0, 2),
+        (1, "Gift wrap", "Gift wrap", 100.0, 1),
+        (2, "unknown", "Unknown", 0, 1),
+        (3, "Sticker", "Sticker", 0, 1),
+    ]
+    assert rows[0].size == "M" and rows[0].color is None
+    assert all(r.order_id == order.id and r.customer_id == order.customer_id for r in rows)
+    assert all(r.currency == "NPR" and r.created_at == order.created_at for r in rows)
+
+
+@pytest.mark.asyncio
+async def test_create_order_writes_line_items_with_the_order(monkeypatch):
+    cart = CartState(
+        items=[CartItem(product_id="p1", name="Tee", price=10.0, currency="NPR", quantity=3)],
+        item_count=3, subtotal=30.0, currency="NPR",
+    )
+    cart_service = MagicMock(get_cart=MagicMock(return_value=cart))
+    monkeypatch.setattr(order_mod, "get_cart_service", lambda: cart_service)
+    added = []
+    commits_at = []
+    db = MagicMock(refresh=AsyncMock())
+    db.add = MagicMock(side_effect=added.append)
+    db.add_all = MagicMock(side_effect=added.extend)
+    db.commit = AsyncMock(side_effect=lambda: commits_at.append(len(added)))
+    db.execute = AsyncMock(return_value=MagicMock(scalar_one_or_none=lambda: None))
+
+    result = await OrderService().create_order_from_cart(db, "sess-1", uuid.uuid4(), payment_method="cod")
+
+    order, item = added
+    assert isinstance(item, OrderItem)
+    assert (item.order_id, item.product_id, item.quantity) == (order.id, "p1", 3)
+    assert commits_at[0] == 2  # both rows in the order's own commit
+    assert result["order"]["order_number"] == order.order_number
+
+
+def _sql(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.asyncio
+async def test_top_products_aggregates_order_items_in_sql(monkeypatch):
+    monkeypatch.setattr(ecommerce_dashboard, "_authenticate", AsyncMock(return_value=SimpleNamespace(id=uuid.uuid4())))
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(all=lambda: [
+        SimpleNamespace(name="Tee", revenue=4497.004, units_sold=3),
+    ]))
+
+    result = await ecommerce_dashboard.analytics_top_products(x_api_key="k", limit=5, db=db)
+
+    assert result == {"products": [{"name": "Tee", "revenue": 4497.0, "units_sold": 3}]}
+    sql = _sql(db.execute.await_args.args[0])
+    assert "FROM order_items JOIN orders" in sql
+    assert "GROUP BY order_items.product_id" in sql
+    assert "orders.payment_status" in sql
+    assert "orders.items" not in sql
+
+
+@pytest.mark.asyncio
+async def test_overview_is_one_query(monkeypatch):
+    monkeypatch.setattr(ecommerce_dashboard, "_authenticate", AsyncMock(return_value=SimpleNamespace(id=uuid.uuid4())))
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(one=lambda: SimpleNamespace(
+        total_revenue=300.0, paid_orders=3, total_orders=5, pending_orders=1,
+    )))
+
+    result = await ecommerce_dashboard.analytics_overview(x_api_key="k", db=db)
+
+    db.execute.assert_awaited_once()
+    assert result == {
+        "total_revenue": 300.0, "total_orders": 5, "paid_orders": 3, "pending_orders": 1, "avg_order_value": 100.0,
+    }
+    assert _sql(db.execute.await_args.args[0]).count("FILTER (WHERE") == 3
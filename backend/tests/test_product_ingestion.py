@@ -0,0 +1,121 @@
+"""
+Batched product ingestion tests.
+
+Pins IngestionService._scrape_and_store_products as a bulk pipeline: one
+source_hash lookup for every crawled page, one embeddings call per 100
+texts, one vector upsert call, one commit — and no re-embedding for a
+product whose embedding text has not changed. Scraping, the database
+session, OpenAI and the vector store are all stubbed.
+"""
+from __future__ import annotations
+
+import json
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.models import Product
+from app.services import ingestion as ingestion_mod
+from app.services.ingestion import IngestionService
+from app.utils.product_scraper import ProductData
+
+
+def _product(name: str, **fields) -> ProductData:
+    return ProductData(name=name, url=f"https://shop.test/{name}", source_hash=f"hash-{name}", **fields)
+
+
+def _service(existing: list[Product]):
+    svc = IngestionService.__new__(IngestionService)
+
+    async def _embed(texts, use_cache=True):
+        return [[float(len(t)), 1.0] for t in texts]
+
+    svc.embedding_service = MagicMock()
+    svc.embedding_service.create_embeddings = AsyncMock(side_effect=_embed)
+    svc.vector_store = MagicMock()
+    svc.vector_store.upsert_vectors = AsyncMock(return_value=0)
+
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = existing
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=result)
+    db.commit = AsyncMock()
+    return svc, db
+
+
+def _stored(data: ProductData, customer_id: uuid.UUID) -> Product:
+    row = Product(
+        id=uuid.uuid4(),
+        customer_id=customer_id,
+        name=data.name,
+        description=data.description,
+        category=data.category,
+        brand=data.brand,
+        sizes=json.dumps(data.sizes),
+        colors=json.dumps(data.colors),
+        tags=json.dumps(data.tags),
+        source_hash=data.source_hash,
+    )
+    row.vector_id = f"product_{row.id}"
+    return row
+
+
+@pytest.mark.asyncio
+async def test_products_across_pages_are_looked_up_embedded_and_upserted_once(monkeypatch):
+    pages = {
+        "https://shop.test/a": [_product("tee"), _product("cap")],
+        "https://shop.test/b": [_product("mug"), _product("tee")],  # tee seen twice
+    }
+    monkeypatch.setattr(ingestion_mod, "scrape_products", lambda html, url: pages[url])
+    svc, db = _service(existing=[])
+
+    stored = await svc._scrape_and_store_products(
+        db, uuid.uuid4(), "acme", pages=[(url, "<html/>") for url in pages],
+    )
+
+    assert stored == 3
+    db.execute.assert_awaited_once()
+    svc.embedding_service.create_embeddings.assert_awaited_once()
+    assert len(svc.embedding_service.create_embeddings.await_args.args[0]) == 3
+    svc.vector_store.upsert_vectors.assert_awaited_once()
+    vectors = svc.vector_store.upsert_vectors.await_args.args[0]
+    assert {v["metadata"]["type"] for v in vectors} == {"product"}
+    new_rows = db.add_all.call_args.args[0]
+    assert {row.vector_id for row in new_rows} == {v["id"] for v in vectors}
+    db.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_unchanged_embedding_text_skips_reembedding(monkeypatch):
+    customer_id = uuid.uuid4()
+    same = _product("tee", description="Soft cotton", colors=["red"])
+    changed = _product("cap", description="Wool")
+    existing = [
+        _stored(same, customer_id),
+        _stored(_product("cap", description="Cotton"), customer_id),
+    ]
+    # A price change alone does not alter the embedding text.
+    same.price = 19.0
+    monkeypatch.setattr(ingestion_mod, "scrape_products", lambda html, url: [same, changed])
+    svc, db = _service(existing=existing)
+
+    await svc._scrape_and_store_products(db, customer_id, "acme", pages=[("https://shop.test/", "")])
+
+    texts = svc.embedding_service.create_embeddings.await_args.args[0]
+    assert texts == [changed.embedding_text()]
+    assert existing[0].price == 19.0
+    assert [v["id"] for v in svc.vector_store.upsert_vectors.await_args.args[0]] == [existing[1].vector_id]
+
+
+@pytest.mark.asyncio
+async def test_embeddings_are_requested_in_batches_of_100(monkeypatch):
+    products = [_product(f"p{i}") for i in range(250)]
+    monkeypatch.setattr(ingestion_mod, "scrape_products", lambda html, url: products)
+    svc, db = _service(existing=[])
+
+    await svc._scrape_and_store_products(db, uuid.uuid4(), "acme", pages=[("https://shop.test/", "")])
+
+    sizes = [len(call.args[0]) for call in svc.embedding_service.create_embeddings.await_args_list]
+    assert sizes == [100, 100, 50]
+    assert len(svc.vector_store.upsert_vectors.await_args.args[0]) == 250
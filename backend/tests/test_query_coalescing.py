@@ -0,0 +1,226 @@
+"""
+Single-flight query coalescing tests.
+
+Pins that identical concurrent personalisation-free questions (same site,
+case/whitespace-normalised text, language) share one retrieval + generation
+while each request still gets its own query log; that the streaming path
+fans the same token stream out to every waiter, including one that attaches
+mid-stream; that different languages, personalised requests and the
+disabled setting are not coalesced; that a failure or a cancelled flight
+reaches every waiter as an error; and that a finished flight is not reused.
+"""
+from __future__ import annotations
+
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services import query as query_mod
+from app.services.query import QueryService
+
+CUSTOMER_ID = uuid.uuid4()
+
+
+def _retrieval() -> dict:
+    return {
+        "chunks_for_llm": [{"content": "Free delivery over Rs 2000.", "source_url": "https://acme.test/shipping",
+                            "source_title": "Shipping"}],
+        "top_score": 0.8,
+        "avg_score": 0.7,
+        "threshold": 0.25,
+        "rerank_triggered": False,
+        "retrieval_mode": "hybrid",
+        "retrieval_empty": False,
+        "no_data_status": None,
+        "answer_cache_hit": None,
+        "query_embedding": [1.0, 0.0],
+        "content_version": None,
+    }
+
+
+def _service(gate: asyncio.Event | None = None):
+    svc = QueryService.__new__(QueryService)
+    svc._inflight = {}
+    svc.answer_cache = MagicMock(enabled=False)
+    svc.get_tenant_context = AsyncMock(return_value=SimpleNamespace(
+        customer=SimpleNamespace(id=CUSTOMER_ID, site_id="acme", name="Acme", website_type="service"),
+        widget_config=None,
+        business_profile=None,
+        allows_origin=lambda origin: True,
+    ))
+    sessions = []
+
+    @asynccontextmanager
+    async def _session_factory():
+        sessions.append(object())
+        yield sessions[-1]
+
+    async def _retrieve(*args, **kwargs):
+        if gate is not None:
+            await gate.wait()
+        return _retrieval()
+
+    svc.session_factory = _session_factory
+    svc._retrieve_and_rank = AsyncMock(side_effect=_retrieve)
+    svc.llm_service = MagicMock()
+    svc.llm_service.generate_answer = AsyncMock(return_value={
+        "answer": "Delivery is free over Rs 2000.", "suggestions": ["Returns?"], "context_tokens": 40,
+    })
+    log_ids = iter(f"log-{i}" for i in range(100))
+    svc._log_query = AsyncMock(side_effect=lambda **kwargs: next(log_ids))
+    return svc, sessions
+
+
+def _stream_llm(tokens: list[str], release: asyncio.Event):
+    calls = []
+
+    async def generate_answer_stream(**kwargs):
+        calls.append(kwargs)
+        yield {"type": "token", "data": tokens[0]}
+        await release.wait()
+        for token in tokens[1:]:
+            yield {"type": "token", "data": token}
+        yield {"type": "done", "answer": "".join(tokens), "suggestions": [], "context_tokens": 40}
+
+    return generate_answer_stream, calls
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_share_one_generation_and_log_separately():
+    gate = asyncio.Event()
+    svc, sessions = _service(gate)
+
+    tasks = [
+        asyncio.create_task(svc.process_query(db=MagicMock(), site_id="acme", question=q, ip_address=ip))
+        for q, ip in [("Delivery charges?", "1.1.1.1"), ("  delivery   CHARGES? ", "2.2.2.2"),
+                      ("delivery charges?", "3.3.3.3")]
+    ]
+    await asyncio.sleep(0)
+    gate.set()
+    results = await asyncio.gather(*tasks)
+
+    svc._retrieve_and_rank.assert_awaited_once()
+    svc.llm_service.generate_answer.assert_awaited_once()
+    assert len(sessions) == 1
+    assert {r["answer"] for r in results} == {"Delivery is free over Rs 2000."}
+    assert sorted(r["_meta"]["query_log_id"] for r in results) == ["log-0", "log-1", "log-2"]
+    logged = [c.kwargs for c in svc._log_query.await_args_list]
+    assert sorted(k["ip_address"] for k in logged) == ["1.1.1.1", "2.2.2.2", "3.3.3.3"]
+    # Each request logs the question as it asked it.
+    assert {k["question"] for k in logged} == {"Delivery charges?", "  delivery   CHARGES? ", "delivery charges?"}
+    assert svc._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_stream_fans_tokens_out_to_every_waiter_including_late_joiner():
+    release = asyncio.Event()
+    svc, _ = _service()
+    stream, calls = _stream_llm(["Free", " delivery", " over", " Rs 2000."], release)
+    svc.llm_service.generate_answer_stream = stream
+
+    async def collect():
+        return [e async for e in svc.process_query_stream(db=MagicMock(), site_id="acme", question="delivery?")]
+
+    first = asyncio.create_task(collect())
+    # Let the first request reach the LLM and receive its first token.
+    for _ in range(10):
+        await asyncio.sleep(0)
+    late = asyncio.create_task(collect())
+    await asyncio.sleep(0)
+    release.set()
+    streams = await asyncio.gather(first, late)
+
+    assert len(calls) == 1
+    for events in streams:
+        assert [e["data"] for e in events if e["type"] == "token"] == ["Free", " delivery", " over", " Rs 2000."]
+        assert events[-1]["type"] == "done"
+        assert events[-1]["answer"] == "Free delivery over Rs 2000."
+    assert {s[-1]["query_log_id"] for s in streams} == {"log-0", "log-1"}
+
+
+@pytest.mark.asyncio
+async def test_not_coalesced_across_languages_personalisation_or_when_disabled(monkeypatch):
+    gate = asyncio.Event()
+    svc, _ = _service(gate)
+
+    tasks = [
+        asyncio.create_task(svc.process_query(db=MagicMock(), site_id="acme", question="delivery?")),
+        asyncio.create_task(svc.process_query(db=MagicMock(), site_id="acme", question="delivery?", language="ne")),
+        asyncio.create_task(svc.process_query(
+            db=MagicMock(), site_id="acme", question="delivery?", user_email="a@b.test",
+        )),
+        asyncio.create_task(svc.process_query(
+            db=MagicMock(), site_id="acme", question="delivery?", user_profile={"name": "Asha"},
+        )),
+    ]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(*tasks)
+    assert svc.llm_service.generate_answer.await_count == 4
+
+    monkeypatch.setattr(query_mod.settings, "query_coalescing_enabled", False)
+    svc.llm_service.generate_answer.reset_mock()
+    gate.clear()
+    tasks = [
+        asyncio.create_task(svc.process_query(db=MagicMock(), site_id="acme", question="delivery?"))
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(*tasks)
+    assert svc.llm_service.generate_answer.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_failure_reaches_every_waiter_and_flight_is_not_reused():
+    gate = asyncio.Event()
+    svc, _ = _service(gate)
+    svc.llm_service.generate_answer = AsyncMock(side_effect=RuntimeError("llm down"))
+
+    tasks = [
+        asyncio.create_task(svc.process_query(db=MagicMock(), site_id="acme", question="delivery?"))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0)
+    gate.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    svc.llm_service.generate_answer.assert_awaited_once()
+    svc._log_query.assert_not_awaited()
+    assert svc._inflight == {}
+
+    # A later identical question starts a fresh flight.
+    svc.llm_service.generate_answer = AsyncMock(return_value={
+        "answer": "Back up.", "suggestions": [], "context_tokens": 40,
+    })
+    result = await svc.process_query(db=MagicMock(), site_id="acme", question="delivery?")
+    assert result["answer"] == "Back up."
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("started", [False, True])
+async def test_cancelled_flight_fails_every_waiter(started):
+    gate = asyncio.Event()
+    svc, _ = _service(gate)
+
+    tasks = [
+        asyncio.create_task(svc.process_query(db=MagicMock(), site_id="acme", question="delivery?"))
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0)
+    (flight,) = svc._inflight.values()
+    if started:
+        while not svc._retrieve_and_rank.await_count:
+            await asyncio.sleep(0)
+    flight.task.cancel()  # e.g. shutdown, before or during retrieval
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert [str(r) for r in results] == ["Query was cancelled before it finished"] * 2
+    assert all(isinstance(r, RuntimeError) for r in results)
+    svc._log_query.assert_not_awaited()
+    assert svc._inflight == {}
@@ -0,0 +1,124 @@
+"""
+Local reranker tests.
+
+Pins the lexical scoring (a passage answering the question in one place
+beats one that only scatters its terms, plurals fold, the vector score
+breaks lexical ties) and the QueryService wiring per WidgetConfig.rerank_mode:
+`local` never calls the LLM and trims to the adaptive top_n, `llm` keeps the
+previous LLM rerank, and `llm_fallback` only calls the LLM when the local
+ranking is undecided.
+"""
+from __future__ import annotations
+
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services.query import QueryService
+from app.services.reranker import LexicalReranker, tokenize
+
+SHIPPING = "Delivery charges are free for orders over Rs 2000 inside Kathmandu valley."
+SCATTERED = (
+    "Our store opened in 2015. We take orders by phone. Customers ask about charges "
+    "for gift wrapping. Delivery partners include several courier companies."
+)
+OFF_TOPIC = "Our jackets are made from recycled cotton and polyester blends."
+
+
+def _chunk(content: str, vector_score: float | None = None) -> dict:
+    return {"content": content, "source_url": "", "source_title": "Source", "score": 0, "vector_score": vector_score}
+
+
+def test_tokenize_drops_stopwords_and_folds_plurals():
+    assert tokenize("What are the delivery charges for policies?") == ["delivery", "charge", "policy"]
+
+
+def test_compact_answer_beats_scattered_terms_and_off_topic():
+    reranker = LexicalReranker()
+    chunks = [_chunk(OFF_TOPIC, 0.41), _chunk(SCATTERED, 0.40), _chunk(SHIPPING, 0.38)]
+
+    ranked, margin = reranker.rerank("delivery charges on orders?", chunks)
+
+    assert [c["content"] for c in ranked] == [SHIPPING, SCATTERED, OFF_TOPIC]
+    assert margin > 0
+
+
+def test_vector_score_breaks_lexical_ties():
+    reranker = LexicalReranker()
+    chunks = [_chunk("Returns accepted within 7 days.", 0.30), _chunk("Returns accepted within 7 days.", 0.52)]
+
+    ranked, _ = reranker.rerank("returns", chunks)
+
+    assert [c["vector_score"] for c in ranked] == [0.52, 0.30]
+
+
+def _service(rerank_mode: str | None, llm_ranking=None):
+    svc = QueryService.__new__(QueryService)
+    svc.embedding_service = MagicMock(create_embedding=AsyncMock(return_value=[0.1] * 8))
+    # top_score 0.41 lands in the ambiguous band → rerank, adaptive top_n 5.
+    vector_ids = [f"v{i}" for i in range(8)]
+    svc.vector_store = MagicMock(query_vectors=AsyncMock(return_value=[
+        {"id": vid, "score": 0.41 - i * 0.01} for i, vid in enumerate(vector_ids)
+    ]))
+    svc.llm_service = MagicMock()
+    svc.llm_service.rerank_chunks = AsyncMock(side_effect=lambda question, chunks, top_n: chunks[::-1][:top_n])
+
+    @asynccontextmanager
+    async def _session_factory():
+        yield object()
+
+    contents = {vid: OFF_TOPIC for vid in vector_ids}
+    contents["v6"] = SHIPPING
+
+    async def _fetch_chunks(db, ids, customer_id):
+        return [SimpleNamespace(vector_id=vid, content=contents[vid], source_url="", source_title=vid) for vid in ids]
+
+    svc.session_factory = _session_factory
+    svc._keyword_search = AsyncMock(return_value=[])
+    svc._fetch_chunks_by_vector_ids = _fetch_chunks
+    config = SimpleNamespace(confidence_threshold=0.25, rerank_mode=rerank_mode)
+    return svc, config
+
+
+@pytest.mark.asyncio
+async def test_local_mode_reranks_in_process():
+    svc, config = _service("local")
+
+    result = await svc._retrieve_and_rank(object(), SimpleNamespace(id=uuid.uuid4()), config, "acme", "delivery charges?")
+
+    svc.llm_service.rerank_chunks.assert_not_awaited()
+    assert result["rerank_triggered"] is True
+    assert result["retrieval_mode"] == "hybrid_local_rerank"
+    assert result["chunks_for_llm"][0]["content"] == SHIPPING
+    assert len(result["chunks_for_llm"]) == 5
+    assert "local_rerank_ms" in result["timings"]
+
+
+@pytest.mark.asyncio
+async def test_llm_mode_keeps_llm_rerank():
+    svc, config = _service("llm")
+
+    result = await svc._retrieve_and_rank(object(), SimpleNamespace(id=uuid.uuid4()), config, "acme", "delivery charges?")
+
+    svc.llm_service.rerank_chunks.assert_awaited_once()
+    assert result["retrieval_mode"] == "hybrid_rerank"
+    assert "local_rerank_ms" not in result["timings"]
+
+
+@pytest.mark.asyncio
+async def test_llm_fallback_only_when_local_ranking_is_undecided():
+    svc, config = _service("llm_fallback")
+    customer = SimpleNamespace(id=uuid.uuid4())
+
+    # One clear winner: the local ranking stands.
+    result = await svc._retrieve_and_rank(object(), customer, config, "acme", "delivery charges?")
+    svc.llm_service.rerank_chunks.assert_not_awaited()
+    assert result["retrieval_mode"] == "hybrid_local_rerank"
+
+    # No query term matches anything and vector scores are close: undecided.
+    result = await svc._retrieve_and_rank(object(), customer, config, "acme", "gift vouchers?")
+    svc.llm_service.rerank_chunks.assert_awaited_once()
+    assert result["retrieval_mode"] == "hybrid_rerank"
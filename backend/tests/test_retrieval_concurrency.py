@@ -0,0 +1,130 @@
+"""
+Retrieval pipeline concurrency benchmark.
+
+_retrieve_and_rank runs the vector leg (embed → Pinecone) and the keyword
+leg (Postgres full-text, own session) concurrently. With stubbed backends of
+known latency, end-to-end retrieval should land close to the slowest leg
+plus the chunk fetch — not the sum of every stage.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services.query import QueryService
+
+EMBED_S = 0.06
+VECTOR_S = 0.08
+KEYWORD_S = 0.14
+FETCH_S = 0.02
+
+
+class _StubEmbeddings:
+    async def create_embedding(self, text):
+        await asyncio.sleep(EMBED_S)
+        return [0.1] * 8
+
+
+class _StubVectorStore:
+    async def query_vectors(self, **kwargs):
+        await asyncio.sleep(VECTOR_S)
+        return [{"id": "v1", "score": 0.82}, {"id": "v2", "score": 0.71}]
+
+
+def _build_service() -> tuple[QueryService, list]:
+    svc = QueryService.__new__(QueryService)
+    svc.embedding_service = _StubEmbeddings()
+    svc.vector_store = _StubVectorStore()
+    svc.llm_service = MagicMock()
+
+    keyword_sessions = []
+
+    @asynccontextmanager
+    async def _session_factory():
+        session = object()
+        keyword_sessions.append(session)
+        yield session
+
+    svc.session_factory = _session_factory
+
+    async def _keyword_search(db, customer_id, question, limit=5):
+        await asyncio.sleep(KEYWORD_S)
+        return ["v2", "k1"]
+
+    async def _fetch_chunks(db, vector_ids, customer_id):
+        await asyncio.sleep(FETCH_S)
+        return [
+            SimpleNamespace(vector_id=vid, content=f"content {vid}", source_url="", source_title=vid)
+            for vid in vector_ids
+        ]
+
+    svc._keyword_search = _keyword_search
+    svc._fetch_chunks_by_vector_ids = _fetch_chunks
+    return svc, keyword_sessions
+
+
+@pytest.mark.asyncio
+async def test_retrieval_latency_tracks_slowest_leg_not_sum():
+    svc, keyword_sessions = _build_service()
+    request_db = object()
+    customer = SimpleNamespace(id=uuid.uuid4())
+
+    started = time.perf_counter()
+    result = await svc._retrieve_and_rank(request_db, customer, None, "acme", "delivery charges?")
+    elapsed = time.perf_counter() - started
+
+    serial = EMBED_S + VECTOR_S + KEYWORD_S + FETCH_S
+    slowest_leg = max(EMBED_S + VECTOR_S, KEYWORD_S) + FETCH_S
+    assert elapsed < serial - 0.05
+    assert elapsed < slowest_leg + 0.05
+
+    # Keyword leg ran on its own session, not the request session.
+    assert len(keyword_sessions) == 1
+    assert keyword_sessions[0] is not request_db
+
+    # Fusion still sees both legs.
+    assert {c["source_title"] for c in result["chunks_for_llm"]} == {"v1", "v2", "k1"}
+
+    timings = result["timings"]
+    for stage in ("embed_ms", "vector_ms", "keyword_ms", "fetch_ms", "total_ms"):
+        assert stage in timings
+    assert timings["keyword_ms"] >= KEYWORD_S * 1000 * 0.9
+    assert timings["total_ms"] < (serial - 0.05) * 1000
+
+
+@pytest.mark.asyncio
+async def test_failing_leg_cancels_the_other_and_releases_its_session():
+    svc, _ = _build_service()
+    released = []
+
+    @asynccontextmanager
+    async def _session_factory():
+        try:
+            yield object()
+        finally:
+            released.append(True)
+
+    async def _slow_keyword_search(db, customer_id, question, limit=5):
+        await asyncio.sleep(5)
+        return []
+
+    class _FailingVectorStore:
+        async def query_vectors(self, **kwargs):
+            raise RuntimeError("pinecone down")
+
+    svc.session_factory = _session_factory
+    svc._keyword_search = _slow_keyword_search
+    svc.vector_store = _FailingVectorStore()
+
+    started = time.perf_counter()
+    with pytest.raises(RuntimeError, match="pinecone down"):
+        await svc._retrieve_and_rank(object(), SimpleNamespace(id=uuid.uuid4()), None, "acme", "q")
+
+    assert time.perf_counter() - started < 1
+    assert released == [True]
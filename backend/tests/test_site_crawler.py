@@ -0,0 +1,136 @@
+"""
+Site crawler tests.
+
+Pins SiteCrawler against an in-memory site served by httpx.MockTransport:
+depth-bounded BFS, dedup on normalised URLs, the max_pages budget, the
+per-host concurrency limit, robots.txt disallow rules and sitemap seeding.
+"""
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.utils.crawling import SiteCrawler, normalize_url
+
+
+def _html(*links: str) -> str:
+    anchors = "".join(f'<a href="{href}">link</a>' for href in links)
+    return f"<html><head><title>t</title></head><body><main>Some page text here{anchors}</main></body></html>"
+
+
+SITE = {
+    "/": _html("/a", "/a/", "/b?utm_source=x", "#top", "https://other.test/x"),
+    "/a": _html("/deep"),
+    "/b": _html("/deep"),
+    "/deep": _html(),
+    "/robots.txt": "User-agent: *\nDisallow: /b\nSitemap: https://shop.test/sitemap.xml\n",
+    "/sitemap.xml": "<urlset><url><loc>https://shop.test/deep</loc></url></urlset>",
+}
+
+
+def _client(site=SITE, on_request=None) -> tuple[httpx.AsyncClient, list[str]]:
+    requested: list[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+        if on_request is not None:
+            await on_request(request)
+        body = site.get(request.url.path)
+        if body is None:
+            return httpx.Response(404)
+        return httpx.Response(200, text=body)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), requested
+
+
+async def _crawl(crawler: SiteCrawler, start="https://shop.test/") -> list[str]:
+    return sorted([page["url"] async for page in crawler.crawl(start)])
+
+
+def test_normalize_url_canonicalises_equivalent_urls():
+    assert normalize_url("HTTPS://Shop.test:443/a/?b=2&a=1&utm_source=x#frag") == "https://shop.test/a?a=1&b=2"
+    assert normalize_url("https://shop.test") == "https://shop.test/"
+
+
+@pytest.mark.asyncio
+async def test_bfs_respects_depth_and_dedupes_normalised_urls():
+    client, requested = _client()
+    async with client:
+        urls = await _crawl(SiteCrawler(max_pages=20, depth=1, client=client))
+
+    # /a and /a/ are one page, /b's tracking param is dropped, /deep is depth 2.
+    assert urls == ["https://shop.test/", "https://shop.test/a", "https://shop.test/b?utm_source=x"]
+    assert requested.count("/a") == 1
+    assert "/deep" not in requested
+
+
+@pytest.mark.asyncio
+async def test_max_pages_bounds_fetches():
+    client, requested = _client()
+    async with client:
+        urls = await _crawl(SiteCrawler(max_pages=2, depth=2, client=client))
+    assert len(urls) == 2
+    assert len(requested) == 2
+
+
+@pytest.mark.asyncio
+async def test_per_host_concurrency_is_bounded():
+    site = {"/": _html(*[f"/p{i}" for i in range(8)])}
+    site.update({f"/p{i}": _html() for i in range(8)})
+    active = 0
+    peak = 0
+
+    async def on_request(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    client, _ = _client(site, on_request)
+    async with client:
+        urls = await _crawl(SiteCrawler(
+            max_pages=9, depth=1, concurrency=8, per_host_concurrency=2, client=client,
+        ))
+    assert len(urls) == 9
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_robots_disallow_and_sitemap_seeding():
+    client, requested = _client()
+    async with client:
+        urls = await _crawl(SiteCrawler(
+            max_pages=20, depth=1, respect_robots=True, use_sitemap=True, client=client,
+        ))
+
+    assert "https://shop.test/deep" in urls  # seeded from the sitemap
+    assert all("/b" not in u for u in urls)
+    assert "/b" not in requested
+    assert requested.count("/robots.txt") == 1
+
+
+@pytest.mark.asyncio
+async def test_known_pages_are_requested_conditionally():
+    seen_headers = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen_headers[request.url.path] = request.headers.get("if-none-match")
+        if request.url.path == "/" and request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        if request.url.path == "/gone":
+            return httpx.Response(410)
+        return httpx.Response(200, text=_html(), headers={"ETag": '"v2"'})
+
+    validators = {"https://shop.test/": {"etag": '"v1"', "links": ["https://shop.test/a", "https://shop.test/gone"]}}
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        crawler = SiteCrawler(max_pages=5, depth=1, client=client, validators=validators)
+        pages = {page["url"]: page async for page in crawler.crawl("https://shop.test/")}
+
+    assert seen_headers["/"] == '"v1"'
+    assert pages["https://shop.test/"]["not_modified"] is True
+    # The stored links keep the crawl going past a 304.
+    assert pages["https://shop.test/a"]["etag"] == '"v2"'
+    assert pages["https://shop.test/gone"]["gone"] is True
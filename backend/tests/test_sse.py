@@ -0,0 +1,110 @@
+"""
+SSE encoder tests.
+
+Pins the wire format the widget parses (single-line `data:` JSON frames,
+token frames identical to a generic event encode), token coalescing (tokens
+already waiting merge into one frame, tokens further apart than the window
+don't, the size cap splits), event ordering, keep-alive comments during
+silence, and cleanup of the source when the client goes away.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from app.utils.sse import KEEPALIVE_FRAME, encode_event, encode_token, sse_stream
+
+
+async def _collect(stream) -> list[bytes]:
+    return [chunk async for chunk in stream]
+
+
+def _events(chunks: list[bytes]) -> list[dict]:
+    frames = b"".join(chunks).split(b"\n\n")
+    return [json.loads(f[len(b"data: "):]) for f in frames if f.startswith(b"data: ")]
+
+
+def test_token_frame_matches_generic_encoding():
+    text = 'Say "namaste" — नमस्ते\n'
+    assert encode_token(text) == encode_event({"type": "token", "data": text})
+    frame = encode_token(text)
+    assert frame.startswith(b"data: ") and frame.endswith(b"\n\n") and frame.count(b"\n") == 2
+    assert json.loads(frame[6:]) == {"type": "token", "data": text}
+
+
+@pytest.mark.asyncio
+async def test_waiting_tokens_merge_and_order_is_kept():
+    async def source():
+        for t in ("Hel", "lo", " there"):
+            yield {"type": "token", "data": t}
+        yield {"type": "products", "data": [{"id": 1}]}
+        yield {"type": "token", "data": "!"}
+        yield {"type": "done", "answer": "Hello there!"}
+
+    events = _events(await _collect(sse_stream(source(), token_window=0.05)))
+
+    assert events == [
+        {"type": "token", "data": "Hello there"},
+        {"type": "products", "data": [{"id": 1}]},
+        {"type": "token", "data": "!"},
+        {"type": "done", "answer": "Hello there!"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_first_token_is_immediate_and_window_bounds_latency():
+    async def source():
+        yield {"type": "token", "data": "a"}
+        await asyncio.sleep(0.05)
+        yield {"type": "token", "data": "b"}
+        yield {"type": "token", "data": "c"}
+        await asyncio.sleep(0.05)
+        yield {"type": "token", "data": "d"}
+
+    chunks = await _collect(sse_stream(source(), token_window=0.01))
+
+    assert [e["data"] for e in _events(chunks)] == ["a", "bc", "d"]
+    assert len(chunks) == 3
+
+
+@pytest.mark.asyncio
+async def test_size_cap_splits_frames():
+    async def source():
+        for t in ("ab", "cd", "ef", "g"):
+            yield {"type": "token", "data": t}
+
+    events = _events(await _collect(sse_stream(source(), token_window=1.0, token_max_chars=4)))
+    assert [e["data"] for e in events] == ["abcd", "efg"]
+
+
+@pytest.mark.asyncio
+async def test_keepalive_comment_during_silence():
+    async def source():
+        await asyncio.sleep(0.05)
+        yield {"type": "done", "answer": ""}
+
+    chunks = await _collect(sse_stream(source(), keepalive=0.01))
+
+    assert KEEPALIVE_FRAME in chunks
+    assert _events(chunks) == [{"type": "done", "answer": ""}]
+
+
+@pytest.mark.asyncio
+async def test_closing_the_stream_stops_the_source():
+    closed = asyncio.Event()
+
+    async def source():
+        try:
+            yield {"type": "token", "data": "a"}
+            await asyncio.sleep(10)
+            yield {"type": "token", "data": "never"}
+        finally:
+            closed.set()
+
+    stream = sse_stream(source())
+    assert _events([await stream.__anext__()]) == [{"type": "token", "data": "a"}]
+    await stream.aclose()
+
+    assert closed.is_set()
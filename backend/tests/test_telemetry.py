@@ -0,0 +1,152 @@
+"""
+Write-behind telemetry writer tests.
+
+Pins the TelemetryWriter contract: rows get their id at enqueue time and are
+written as one multi-row INSERT per table (parents first) in one
+transaction; a full batch flushes without waiting for the interval; updates
+to the same row coalesce; a failed batch is retried row by row; close()
+drains the buffer; DM history sees messages that are still buffered.
+"""
+from __future__ import annotations
+
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.models import ChatbotConversation, ChatbotMessageLog, QueryLog, TenantAdminToken
+from app.services import chatbot_conversation as conv_mod
+from app.services.chatbot_conversation import ChatbotConversationService
+from app.services.telemetry import TelemetryWriter
+
+CUSTOMER = uuid.uuid4()
+CHANNEL = uuid.uuid4()
+
+
+def _maker(db):
+    @asynccontextmanager
+    async def maker():
+        yield db
+
+    return maker
+
+
+def _db(execute=None) -> MagicMock:
+    db = MagicMock()
+    db.execute = execute or AsyncMock()
+    db.commit = AsyncMock()
+    return db
+
+
+def _writer(db, **kwargs) -> TelemetryWriter:
+    kwargs.setdefault("flush_interval_ms", 60_000)
+    return TelemetryWriter(session_maker=_maker(db), **kwargs)
+
+
+def _tables(db) -> list[str]:
+    return [c.args[0].table.name for c in db.execute.await_args_list]
+
+
+@pytest.mark.asyncio
+async def test_rows_flush_as_one_multi_row_insert_per_table_parents_first():
+    db = _db()
+    writer = _writer(db)
+    log_id = await writer.add(ChatbotMessageLog, channel_id=CHANNEL, customer_id=CUSTOMER,
+                              platform_sender_id="s", direction="outbound")
+    query_ids = [await writer.add(QueryLog, customer_id=CUSTOMER, question=f"q{i}") for i in range(3)]
+    assert all(isinstance(i, uuid.UUID) for i in [log_id, *query_ids])
+
+    assert await writer.flush() == 4
+
+    assert _tables(db) == ["query_logs", "chatbot_message_log"]
+    compiled = db.execute.await_args_list[0].args[0].compile()
+    assert [compiled.params[f"id_m{i}"] for i in range(3)] == query_ids
+    assert "ON CONFLICT DO NOTHING" in str(compiled)
+    db.commit.assert_awaited_once()
+    assert writer.pending(QueryLog) == []
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting_for_the_interval():
+    db = _db()
+    writer = _writer(db, batch_size=2)
+    await writer.add(QueryLog, customer_id=CUSTOMER, question="a")
+    await asyncio.sleep(0.01)
+    db.commit.assert_not_awaited()
+
+    await writer.add(QueryLog, customer_id=CUSTOMER, question="b")
+    for _ in range(50):
+        if db.commit.await_count:
+            break
+        await asyncio.sleep(0.001)
+    db.commit.assert_awaited_once()
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_updates_to_the_same_row_coalesce():
+    db = _db()
+    writer = _writer(db)
+    token_id = uuid.uuid4()
+    await writer.update(TenantAdminToken, token_id, last_used_at="t1")
+    await writer.update(TenantAdminToken, token_id, last_used_at="t2")
+    assert writer.buffered == 1
+
+    await writer.flush()
+
+    statement, params = db.execute.await_args.args
+    assert statement.table.name == "tenant_admin_tokens"
+    assert params == [{"_pk": token_id, "v_last_used_at": "t2"}]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_row_by_row():
+    calls = []
+
+    async def execute(statement, *args):
+        rows = statement.compile().params
+        calls.append(rows)
+        if len(calls) == 1 or rows.get("question_m0") == "bad":
+            raise RuntimeError("insert failed")
+
+    db = _db(execute=AsyncMock(side_effect=execute))
+    writer = _writer(db)
+    for question in ("ok-1", "bad", "ok-2"):
+        await writer.add(QueryLog, customer_id=CUSTOMER, question=question)
+
+    assert await writer.flush() == 2
+    assert len(calls) == 4  # the batch, then one statement per row
+    assert db.commit.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_close_drains_the_buffer():
+    db = _db()
+    writer = _writer(db)
+    await writer.add(QueryLog, customer_id=CUSTOMER, question="q")
+
+    await writer.close()
+
+    db.commit.assert_awaited_once()
+    assert writer.buffered == 0
+
+
+@pytest.mark.asyncio
+async def test_dm_history_includes_buffered_messages(monkeypatch):
+    writer = _writer(_db())
+    monkeypatch.setattr(conv_mod, "get_telemetry_writer", lambda: writer)
+    service = ChatbotConversationService()
+    await service.add_message(None, CHANNEL, "s", "user", "hi")
+    await service.add_message(None, CHANNEL, "other", "user", "not mine")
+    await service.add_message(None, CHANNEL, "s", "assistant", "hello")
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(scalars=lambda: MagicMock(all=lambda: [])))
+
+    history = await service.get_history(db, CHANNEL, "s")
+
+    assert history == [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    assert len(writer.pending(ChatbotConversation)) == 3
+    await writer.close()
@@ -0,0 +1,144 @@
+"""
+Tenant context cache tests.
+
+Pins that a site_id is loaded once and then served from the cache, that
+concurrent misses share one load, that TTL expiry and invalidate_tenant()
+force a reload (and also drop the answer cache), that a load racing an
+invalidation is not stored, that snapshots are read-only, and that origin
+checks run against the precomputed normalised domain set.
+"""
+from __future__ import annotations
+
+import asyncio
+import uuid
+
+import pytest
+
+from app.models import Customer, WidgetConfig
+from app.services import tenant_context as tc_mod
+from app.services.tenant_context import (
+    ModelSnapshot,
+    TenantContext,
+    TenantContextCache,
+    normalise_domain,
+)
+
+CUSTOMER_ID = uuid.uuid4()
+
+
+def _context(domains=("acme.test",)) -> TenantContext:
+    return TenantContext(
+        customer=ModelSnapshot(Customer(id=CUSTOMER_ID, site_id="acme", name="Acme", api_key="k", is_active=True)),
+        widget_config=ModelSnapshot(WidgetConfig(customer_id=CUSTOMER_ID, brand_name="Acme Bot")),
+        business_profile=None,
+        allowed_domains=frozenset(normalise_domain(d) for d in domains),
+        loaded_at=0.0,
+    )
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    calls = []
+
+    async def _load(db, site_id):
+        calls.append(site_id)
+        await asyncio.sleep(0.01)
+        return _context() if site_id == "acme" else None
+
+    monkeypatch.setattr(tc_mod, "load_tenant_context", _load)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_second_lookup_is_served_from_cache(loads):
+    cache = TenantContextCache(ttl_seconds=60, max_entries=8)
+
+    first = await cache.get(object(), "acme")
+    second = await cache.get(object(), "acme")
+
+    assert first is second
+    assert first.widget_config.brand_name == "Acme Bot"
+    assert loads == ["acme"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load(loads):
+    cache = TenantContextCache(ttl_seconds=60, max_entries=8)
+
+    results = await asyncio.gather(*(cache.get(object(), "acme") for _ in range(5)))
+
+    assert loads == ["acme"]
+    assert all(r is results[0] for r in results)
+
+
+@pytest.mark.asyncio
+async def test_unknown_site_is_not_cached(loads):
+    cache = TenantContextCache(ttl_seconds=60, max_entries=8)
+
+    assert await cache.get(object(), "nope") is None
+    assert await cache.get(object(), "nope") is None
+    assert loads == ["nope", "nope"]
+
+
+@pytest.mark.asyncio
+async def test_ttl_expiry_reloads(loads, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(tc_mod, "_now", lambda: now[0])
+    cache = TenantContextCache(ttl_seconds=10, max_entries=8)
+
+    await cache.get(object(), "acme")
+    now[0] += 11
+    await cache.get(object(), "acme")
+
+    assert loads == ["acme", "acme"]
+
+
+@pytest.mark.asyncio
+async def test_invalidate_tenant_drops_context_and_answer_cache(loads, monkeypatch):
+    cache = TenantContextCache(ttl_seconds=60, max_entries=8)
+    bumped = []
+
+    async def _invalidate_answers(db, customer_id):
+        bumped.append((db, customer_id))
+
+    monkeypatch.setattr(tc_mod, "get_tenant_context_cache", lambda: cache)
+    monkeypatch.setattr(tc_mod, "invalidate_answers", _invalidate_answers)
+    db = object()
+
+    await cache.get(object(), "acme")
+    await tc_mod.invalidate_tenant(db, CUSTOMER_ID)  # by customer_id alone
+    await cache.get(object(), "acme")
+
+    assert loads == ["acme", "acme"]
+    assert bumped == [(db, CUSTOMER_ID)]
+
+
+@pytest.mark.asyncio
+async def test_load_racing_invalidation_is_not_stored(loads):
+    cache = TenantContextCache(ttl_seconds=60, max_entries=8)
+
+    pending = asyncio.create_task(cache.get(object(), "acme"))
+    await asyncio.sleep(0)
+    cache.invalidate(site_id="acme")
+    assert (await pending) is not None
+
+    await cache.get(object(), "acme")
+    assert loads == ["acme", "acme"]
+
+
+def test_snapshot_is_read_only():
+    context = _context()
+    with pytest.raises(AttributeError):
+        context.widget_config.brand_name = "changed"
+    with pytest.raises(AttributeError):
+        context.customer.domains  # relationships are not copied
+
+
+def test_allows_origin_uses_normalised_domains():
+    context = _context(domains=("https://www.Acme.test/", "shop.acme.test"))
+
+    assert context.allows_origin("https://acme.test")
+    assert context.allows_origin("https://www.acme.test:443")
+    assert context.allows_origin("https://shop.acme.test")
+    assert context.allows_origin("http://localhost:5173")
+    assert not context.allows_origin("https://evil.test")
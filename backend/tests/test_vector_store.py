@@ -0,0 +1,149 @@
+"""
+VectorStoreService executor tests.
+
+The Pinecone Index client is synchronous. These tests pin that calls are
+pushed off the event loop — N concurrent query_vectors calls overlap instead
+of serialising — that the executor size bounds how many run at once, and that
+per-operation latency stats are recorded.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.vector_store import VectorStoreService
+
+CALL_SECONDS = 0.2
+
+
+class _SlowIndex:
+    """Blocking stand-in for pinecone.Index — sleeps like a network round trip."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.upserted: list[list[dict]] = []
+
+    def _enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def query(self, **kwargs):
+        self._enter()
+        try:
+            time.sleep(CALL_SECONDS)
+        finally:
+            self._exit()
+        match = SimpleNamespace(id="v1", score=0.9, metadata={"site_id": kwargs["namespace"]})
+        return SimpleNamespace(matches=[match])
+
+    def upsert(self, vectors, namespace):
+        self._enter()
+        try:
+            time.sleep(CALL_SECONDS)
+            self.upserted.append(vectors)
+        finally:
+            self._exit()
+
+    def delete(self, **kwargs):
+        raise RuntimeError("pinecone down")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_overlap_instead_of_serialising():
+    index = _SlowIndex()
+    vss = VectorStoreService(index=index, max_concurrency=8)
+
+    n = 6
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        vss.query_vectors([0.1, 0.2], namespace="acme", site_id="acme") for _ in range(n)
+    ))
+    elapsed = time.perf_counter() - started
+
+    assert all(r[0]["id"] == "v1" for r in results)
+    # Serial would be n * CALL_SECONDS (1.2s); overlapping is ~one call.
+    assert elapsed < CALL_SECONDS * 3
+    assert index.peak_in_flight == n
+
+
+@pytest.mark.asyncio
+async def test_event_loop_stays_responsive_during_query():
+    vss = VectorStoreService(index=_SlowIndex(), max_concurrency=2)
+
+    ticks = 0
+
+    async def _ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker = asyncio.create_task(_ticker())
+    await vss.query_vectors([0.1], namespace="acme")
+    ticker.cancel()
+
+    # A blocking call on the loop would leave the ticker starved at 0-1 ticks.
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_max_concurrency_bounds_in_flight_calls():
+    index = _SlowIndex()
+    vss = VectorStoreService(index=index, max_concurrency=2)
+
+    await asyncio.gather(*(vss.query_vectors([0.1], namespace="acme") for _ in range(4)))
+
+    assert index.peak_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_upsert_batches_run_through_executor():
+    index = _SlowIndex()
+    vss = VectorStoreService(index=index, max_concurrency=4)
+    vectors = [{"id": f"v{i}", "values": [0.0]} for i in range(120)]
+
+    count = await vss.upsert_vectors(vectors, namespace="acme")
+
+    assert count == 120
+    assert sorted(len(b) for b in index.upserted) == [20, 50, 50]
+    assert index.peak_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_latency_stats_record_successes_and_errors():
+    vss = VectorStoreService(index=_SlowIndex(), max_concurrency=2)
+
+    await vss.query_vectors([0.1], namespace="acme")
+    with pytest.raises(RuntimeError):
+        await vss.delete_namespace("acme")
+
+    stats = vss.get_latency_stats()
+    assert stats["query"]["count"] == 1
+    assert stats["query"]["errors"] == 0
+    assert stats["query"]["avg_ms"] >= CALL_SECONDS * 1000 * 0.9
+    assert stats["delete_namespace"]["count"] == 1
+    assert stats["delete_namespace"]["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_queue_wait_is_recorded_separately_from_call_time():
+    vss = VectorStoreService(index=_SlowIndex(), max_concurrency=1)
+
+    await asyncio.gather(*(vss.query_vectors([0.1], namespace="acme") for _ in range(3)))
+
+    stats = vss.get_latency_stats()["query"]
+    # One worker: calls 2 and 3 queue behind call 1, but each call's own
+    # latency stays ~CALL_SECONDS.
+    assert stats["max_ms"] < CALL_SECONDS * 1000 * 1.5
+    assert stats["queue_max_ms"] >= CALL_SECONDS * 2 * 1000 * 0.9